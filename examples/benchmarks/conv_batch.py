@@ -0,0 +1,38 @@
+#!/usr/bin/python
+from magnum import *
+import magnum.magneto as magneto
+
+import time
+
+# Batched FFT convolution of K magnetizations (execute_many) vs. K separate
+# convolutions (execute) on the same mesh: average time per field.
+
+meshes = [
+  (256, 256,  1),
+  (128, 128, 16),
+  ( 64,  64, 64),
+]
+batch_sizes = [2, 4, 8]
+num_runs = 10
+
+for nx, ny, nz in meshes:
+  conv = magneto.GenerateDemagTensorConvolution(nx, ny, nz, 5e-9, 5e-9, 5e-9, False, False, False, 1, magneto.PADDING_ROUND_4, cfg.global_cache_directory, cfg.getTensorThreads())
+
+  for K in batch_sizes:
+    M = [magneto.VectorMatrix(magneto.Shape(nx, ny, nz)) for k in range(K)]
+    H = [magneto.VectorMatrix(magneto.Shape(nx, ny, nz)) for k in range(K)]
+    for m in M: m.randomize()
+
+    conv.execute_many(M, H) # warm-up (sets up the batched plans)
+
+    t0 = time.time()
+    for n in range(num_runs):
+      for k in range(K): conv.execute(M[k], H[k])
+    t_single = (time.time() - t0) / (num_runs * K)
+
+    t0 = time.time()
+    for n in range(num_runs):
+      conv.execute_many(M, H)
+    t_batch = (time.time() - t0) / (num_runs * K)
+
+    print("Mesh %sx%sx%s, K=%s: separate: %7.3f ms/field, batched: %7.3f ms/field, speedup: %5.2f" % (nx, ny, nz, K, t_single * 1000, t_batch * 1000, t_single / t_batch))
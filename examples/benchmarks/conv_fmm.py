@@ -0,0 +1,49 @@
+#!/usr/bin/python
+from magnum import *
+import magnum.magneto as magneto
+
+import math
+import time
+
+# Compares the fast multipole stray field calculation (StrayField(method="fmm"))
+# with the FFT convolution for arrays of discs of decreasing filling factor:
+# relative error of the stray field in the magnetic cells, and average time per
+# field evaluation (without setup).
+
+nx, ny, nz = 256, 256, 1
+spacings = [12, 16, 24, 32]  # disc spacing in cells, the disc diameter is 10 cells
+num_runs = 5
+
+def timed(calc, M, H):
+  calc(M, H) # warm-up (sets up the tree)
+  t0 = time.time()
+  for n in range(num_runs): calc(M, H)
+  return (time.time() - t0) / num_runs * 1000.0
+
+mesh = RectangularMesh((nx, ny, nz), (5e-9, 5e-9, 5e-9))
+fft = StrayFieldCalculator(mesh, "tensor")
+
+for spacing in spacings:
+  M = VectorField(mesh); M.randomize(); M.normalize(8e5)
+  num_magnetic = 0
+  for x in range(nx):
+    for y in range(ny):
+      dx, dy = x % spacing - 4.5, y % spacing - 4.5
+      if dx*dx + dy*dy > 5.0**2:
+        M.set(x, y, 0, (0.0, 0.0, 0.0))
+      else:
+        num_magnetic += 1
+
+  H_fft = VectorField(mesh); H_fmm = VectorField(mesh)
+  t_fft = timed(fft.calculate, M, H_fft)
+  t_fmm = timed(StrayFieldCalculator(mesh, "fmm").calculate, M, H_fmm)
+
+  # compare in the magnetic cells only
+  err, ref = 0.0, 0.0
+  for i in range(nx*ny):
+    if M.get(i) == (0.0, 0.0, 0.0): continue
+    a, b = H_fft.get(i), H_fmm.get(i)
+    err = max(err, max(abs(a[c] - b[c]) for c in range(3)))
+    ref = max(ref, max(abs(a[c]) for c in range(3)))
+
+  print("Filling factor %5.1f%%: fft: %8.3f ms, fmm: %8.3f ms, rel. max error %.2e" % (100.0 * num_magnetic / (nx*ny), t_fft, t_fmm, err / ref))
@@ -0,0 +1,46 @@
+#!/usr/bin/python
+from magnum import *
+import magnum.magneto as magneto
+
+import shutil
+import tempfile
+
+# Compares the layered stray field convolution (StrayField(method="layered"),
+# 2D FFTs per layer and a dense layer coupling) with the 3D FFT convolution for
+# thin multilayer films: difference of the stray field for a random
+# magnetization, and average time per convolution.
+
+meshes = [
+  (256, 256, 2),
+  (256, 256, 4),
+  (256, 256, 8),
+  (128, 128, 16),
+]
+num_runs = 20
+
+cfg.enableProfiling(True)
+
+cache_dir = tempfile.mkdtemp()
+try:
+  for nx, ny, nz in meshes:
+    N = magneto.GenerateDemagTensor(nx, ny, nz, 5e-9, 5e-9, 3e-9, False, False, False, 1, magneto.PADDING_ROUND_4, cache_dir, cfg.getTensorThreads())
+    convs = {
+      "fft":     (magneto.SymmetricMatrixVectorConvolution_FFT(N, nx, ny, nz), "conv3d"),
+      "layered": (magneto.LayeredMatrixVectorConvolution_FFT(N, nx, ny, nz), "convlayered"),
+    }
+
+    M = magneto.VectorMatrix(magneto.Shape(nx, ny, nz)); M.randomize(); M.normalize(8e5)
+    H = {}
+    times = {}
+    for name, (conv, bench_id) in convs.items():
+      H[name] = magneto.VectorMatrix(magneto.Shape(nx, ny, nz))
+      conv.execute(M, H[name]) # warm-up
+      magneto.resetBenchmark()
+      for n in range(num_runs): conv.execute(M, H[name])
+      desc, num, total, avg = magneto.getBenchmarkRecord(bench_id)
+      times[name] = avg
+
+    D = magneto.VectorMatrix(H["layered"]); D.add(H["fft"], -1.0)
+    print("Mesh %sx%sx%s: 3D FFT: %7.3f ms, layered: %7.3f ms, speedup: %5.2f, rel. difference: %.2e" % (nx, ny, nz, times["fft"], times["layered"], times["fft"] / times["layered"], D.absMax() / H["fft"].absMax()))
+finally:
+  shutil.rmtree(cache_dir)
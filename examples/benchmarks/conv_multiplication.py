@@ -0,0 +1,47 @@
+#!/usr/bin/python
+from magnum import *
+import magnum.magneto as magneto
+
+import os
+import shutil
+import tempfile
+
+# Benchmarks the multiplication stage of the FFT convolution (the product of the
+# transformed demag tensor and magnetization), for the real-valued kernel and for
+# the full complex kernel (MAGNUM_CONV_NO_REAL_KERNEL).
+# The tensor values don't matter here, so their computation is skipped.
+
+meshes = [
+  (256, 256,  1),
+  (128, 128, 16),
+  ( 64,  64, 64),
+]
+num_runs = 50
+
+os.environ["MAGNUM_DEMAG_GARBAGE"] = "1"
+cfg.enableProfiling(True)
+
+cache_dir = tempfile.mkdtemp()
+try:
+  for nx, ny, nz in meshes:
+    N = magneto.GenerateDemagTensor(nx, ny, nz, 5e-9, 5e-9, 5e-9, False, False, False, 1, magneto.PADDING_ROUND_4, cache_dir)
+    bench_id = "conv2d.mult" if nz == 1 else "conv3d.mult"
+
+    M = magneto.VectorMatrix(magneto.Shape(nx, ny, nz)); M.fill((1.0, 0.0, 0.0))
+    H = magneto.VectorMatrix(magneto.Shape(nx, ny, nz))
+
+    times = {}
+    for kernel in ["real", "complex"]:
+      if kernel == "complex": os.environ["MAGNUM_CONV_NO_REAL_KERNEL"] = "1"
+      conv = magneto.SymmetricMatrixVectorConvolution_FFT(N, nx, ny, nz)
+      if kernel == "complex": del os.environ["MAGNUM_CONV_NO_REAL_KERNEL"]
+
+      conv.execute(M, H) # warm-up
+      magneto.resetBenchmark()
+      for n in range(num_runs): conv.execute(M, H)
+      desc, num, total, avg = magneto.getBenchmarkRecord(bench_id)
+      times[kernel] = avg
+
+    print("Mesh %sx%sx%s: multiplication real kernel: %7.3f ms, complex kernel: %7.3f ms, speedup: %5.2f" % (nx, ny, nz, times["real"], times["complex"], times["complex"] / times["real"]))
+finally:
+  shutil.rmtree(cache_dir)
@@ -0,0 +1,47 @@
+#!/usr/bin/python
+from magnum import *
+import magnum.magneto as magneto
+
+import math
+import shutil
+import tempfile
+
+# Compares the single precision CPU FFT convolution (StrayField(precision="single"))
+# with the default double precision convolution: relative error of the stray
+# field for a random magnetization, and average time per convolution.
+
+meshes = [
+  (256, 256,  1),
+  (128, 128, 16),
+  ( 64,  64, 64),
+]
+num_runs = 20
+
+cfg.enableProfiling(True)
+
+cache_dir = tempfile.mkdtemp()
+try:
+  for nx, ny, nz in meshes:
+    bench_id = "conv2d" if nz == 1 else "conv3d"
+
+    M = magneto.VectorMatrix(magneto.Shape(nx, ny, nz)); M.randomize(); M.normalize(8e5)
+    H = {}
+    times = {}
+    for precision in ["double", "single"]:
+      conv = magneto.GenerateDemagTensorConvolution(nx, ny, nz, 5e-9, 5e-9, 5e-9, False, False, False, 1, magneto.PADDING_ROUND_4, cache_dir, cfg.getTensorThreads())
+      if precision == "single": conv.enableSinglePrecision()
+
+      H[precision] = magneto.VectorMatrix(magneto.Shape(nx, ny, nz))
+      conv.execute(M, H[precision]) # warm-up
+      magneto.resetBenchmark()
+      for n in range(num_runs): conv.execute(M, H[precision])
+      desc, num, total, avg = magneto.getBenchmarkRecord(bench_id)
+      times[precision] = avg
+
+    D = magneto.VectorMatrix(H["single"]); D.add(H["double"], -1.0)
+    max_err = D.absMax() / H["double"].absMax()
+    rms_err = math.sqrt(D.dotSum(D) / H["double"].dotSum(H["double"]))
+
+    print("Mesh %sx%sx%s: double: %7.3f ms, single: %7.3f ms, speedup: %5.2f, rel. error: max %.2e, rms %.2e" % (nx, ny, nz, times["double"], times["single"], times["double"] / times["single"], max_err, rms_err))
+finally:
+  shutil.rmtree(cache_dir)
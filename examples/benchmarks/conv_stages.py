@@ -0,0 +1,50 @@
+#!/usr/bin/python
+from magnum import *
+import magnum.magneto as magneto
+
+import math
+import os
+
+# Time per stage of the 3D FFT convolution, and the share of the 1D FFT work
+# that the pruned partial transforms save compared to full 3D FFTs of the
+# zero-padded field (estimated from the number of 1D transforms, each
+# weighted by n*log2(n)).
+# The tensor values don't matter here, so their computation is skipped.
+
+meshes = [
+  ( 64,  64,  8),
+  (128, 128, 16),
+  ( 64,  64, 64),
+]
+num_runs = 20
+
+stages = ["pad", "fft.x", "fft.transpose1", "fft.y", "fft.transpose2", "fft.z", "mult",
+          "ifft.z", "ifft.transpose2", "ifft.y", "ifft.transpose1", "ifft.x", "unpad"]
+
+os.environ["MAGNUM_DEMAG_GARBAGE"] = "1"
+cfg.enableProfiling(True)
+
+def fft_work(n, num_lines):
+  return num_lines * n * math.log(max(n, 2), 2)
+
+for nx, ny, nz in meshes:
+  N = magneto.GenerateDemagTensor(nx, ny, nz, 5e-9, 5e-9, 5e-9, False, False, False, 1, magneto.PADDING_ROUND_4, cfg.global_cache_directory)
+  ex, ey, ez = (N.getShape().getDim(d) for d in (1, 2, 3))
+  cx = ex // 2 + 1  # complex length after the r2c transform in x
+
+  full   = fft_work(ex, ey * ez) + fft_work(ey, cx * ez) + fft_work(ez, cx * ey)
+  pruned = fft_work(ex, ny * nz) + fft_work(ey, cx * nz) + fft_work(ez, cx * ey)
+
+  conv = magneto.SymmetricMatrixVectorConvolution_FFT(N, nx, ny, nz)
+  M = magneto.VectorMatrix(magneto.Shape(nx, ny, nz)); M.randomize()
+  H = magneto.VectorMatrix(magneto.Shape(nx, ny, nz))
+  conv.execute(M, H) # warm-up
+  magneto.resetBenchmark()
+  for n in range(num_runs): conv.execute(M, H)
+
+  print("Mesh %sx%sx%s (padded: %sx%sx%s), FFT work of pruned transforms: %.0f%% of full 3D FFTs" % (nx, ny, nz, ex, ey, ez, 100.0 * pruned / full))
+  for stage in stages:
+    desc, num, total, avg = magneto.getBenchmarkRecord("conv3d." + stage)
+    print("  %-16s %8.3f ms" % (stage, avg))
+  desc, num, total, avg = magneto.getBenchmarkRecord("conv3d")
+  print("  %-16s %8.3f ms" % ("total", avg))
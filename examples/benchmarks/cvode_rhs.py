@@ -0,0 +1,27 @@
+#!/usr/bin/python
+from magnum import *
+
+import time
+
+# Time per CVode step with the right-hand side evaluated in Python (via
+# LlgDiffEq) and natively (native_rhs=True).
+
+meshes = [
+  ( 32,  32,  1),
+  (128, 128,  1),
+]
+t_end = 1e-10
+
+for nn in meshes:
+  for native_rhs in [False, True]:
+    world = World(RectangularMesh(nn, (5e-9, 5e-9, 3e-9)), Body("all", Material.Py(alpha=0.02)))
+    solver = create_solver(world, [StrayField, ExchangeField], evolver="cvode", native_rhs=native_rhs)
+    solver.state.M = (8e5, 4e5, 2e5)
+
+    t0 = time.time()
+    while solver.state.t < t_end: solver.step()
+    t = time.time() - t0
+    num_steps = solver.state.step
+
+    rhs = "native" if native_rhs else "python"
+    print("mesh %sx%sx%s, %s right-hand side: %s steps, %.3f ms per step" % (nn[0], nn[1], nn[2], rhs, num_steps, t * 1000.0 / num_steps))
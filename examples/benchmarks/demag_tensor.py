@@ -0,0 +1,43 @@
+#!/usr/bin/python
+from magnum import *
+import magnum.magneto as magneto
+
+import multiprocessing
+import shutil
+import tempfile
+import time
+
+# Benchmarks the demag tensor generation for different numbers of threads.
+# The tensor cache is bypassed by using an empty temporary cache directory.
+
+meshes = [
+  # (num_nodes, delta, pbc, pbc_repeat)
+  ((128, 128, 4), (5e-9, 5e-9, 3e-9), "",   1),
+  (( 64,  64, 1), (5e-9, 5e-9, 3e-9), "xy", 15),
+]
+
+max_threads = multiprocessing.cpu_count()
+thread_counts = [1]
+while thread_counts[-1] * 2 <= max_threads: thread_counts.append(thread_counts[-1] * 2)
+if thread_counts[-1] != max_threads: thread_counts.append(max_threads)
+
+cache_dir = tempfile.mkdtemp()
+try:
+  for nn, dd, pbc, pbc_repeat in meshes:
+    print("Mesh %sx%sx%s, pbc='%s', pbc_repeat=%s" % (nn[0], nn[1], nn[2], pbc, pbc_repeat))
+
+    N_ref, t_ref = None, None
+    for num_threads in thread_counts:
+      t0 = time.time()
+      N = magneto.GenerateDemagTensor(
+        nn[0], nn[1], nn[2], dd[0], dd[1], dd[2],
+        "x" in pbc, "y" in pbc, "z" in pbc, pbc_repeat,
+        magneto.PADDING_ROUND_4, cache_dir, num_threads
+      )
+      t = time.time() - t0
+
+      if N_ref is None: N_ref, t_ref = str(N.toByteArray()), t
+      identical = (str(N.toByteArray()) == N_ref)
+      print("  threads: %3i   time: %8.3fs   speedup: %5.2f   bit-identical: %s" % (num_threads, t, t_ref / t, identical))
+finally:
+  shutil.rmtree(cache_dir)
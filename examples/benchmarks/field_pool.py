@@ -0,0 +1,31 @@
+#!/usr/bin/python
+from magnum import *
+from magnum.mesh.field_pool import field_pool
+
+import time
+
+# Full-mesh field allocations per Runge-Kutta step (with the field pool,
+# there should be none after the first few steps), and time per step.
+
+meshes = [
+  ( 64,  64,  1),
+  (128, 128,  4),
+]
+num_steps = 50
+
+for evolver in ["rkf45", "dp54"]:
+  for nn in meshes:
+    world = World(RectangularMesh(nn, (5e-9, 5e-9, 3e-9)), Body("all", Material.Py(alpha=0.02)))
+    solver = create_solver(world, [StrayField, ExchangeField], evolver=evolver)
+    solver.state.M = (8e5, 4e5, 2e5)
+
+    field_pool.reset_statistics()
+    solver.step()
+    first = field_pool.num_allocated
+
+    field_pool.reset_statistics()
+    t0 = time.time()
+    for n in range(num_steps): solver.step()
+    t = (time.time() - t0) / num_steps
+
+    print("%s, mesh %sx%sx%s: %s fields allocated in the first step, %.2f per step afterwards (%.1f reused), %.3f ms per step" % (evolver, nn[0], nn[1], nn[2], first, float(field_pool.num_allocated) / num_steps, float(field_pool.num_reused) / num_steps, t * 1000.0))
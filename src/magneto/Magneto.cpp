@@ -38,6 +38,7 @@
 
 #include <cstdlib> // std::free
 #include <fstream>
+#include <sstream>
 #include <iostream>
 using namespace std;
 
@@ -45,6 +46,7 @@ using namespace std;
 static PythonCallable callback;
 static CudaMode cuda_mode = CUDA_DISABLED;
 static bool profiling_enabled = false;
+static FFTWPlanner fftw_planner = FFTW_PLANNER_MEASURE;
 
 void setDebugCallback(PythonCallable &callback)
 {
@@ -146,49 +148,132 @@ void setFFTWThreads(int num_threads)
 #ifdef HAVE_FFTW_THREADS
 	LOG_INFO << "FFTW using " << num_threads << " threads from now on";
 	fftw_plan_with_nthreads(num_threads);
+	fftwf_plan_with_nthreads(num_threads);
 #else
 	LOG_WARN << "FFTW thread support not compiled in: FFTs are single-threaded";
 #endif
 }
 
+void setFFTWPlanner(FFTWPlanner planner)
+{
+	::fftw_planner = planner;
+}
+
+FFTWPlanner getFFTWPlanner()
+{
+	return ::fftw_planner;
+}
+
+unsigned getFFTWPlannerFlags()
+{
+	unsigned flags = FFTW_MEASURE;
+	switch (::fftw_planner) {
+		case FFTW_PLANNER_ESTIMATE:   flags = FFTW_ESTIMATE; break;
+		case FFTW_PLANNER_MEASURE:    flags = FFTW_MEASURE; break;
+		case FFTW_PLANNER_PATIENT:    flags = FFTW_PATIENT; break;
+		case FFTW_PLANNER_EXHAUSTIVE: flags = FFTW_EXHAUSTIVE; break;
+	}
+	if (os::disable_SSE_for_FFTW()) {
+		flags |= FFTW_UNALIGNED; // see os.h for explanation
+	}
+	return flags;
+}
+
+// FFTW wisdom (the accumulated plans) for the double and single precision routines
 static const std::string fftw_wisdom_file = "fftw.wisdom";
+static const std::string fftwf_wisdom_file = "fftwf.wisdom";
 
-void initialize(const std::string &config_path)
+static bool readFile(const std::string &path, std::string &content)
 {
-#ifdef HAVE_FFTW_THREADS
-	// Enable FFTW threads
-	fftw_init_threads();
-#endif
+	std::ifstream f(path.c_str());
+	if (!f) return false;
+	std::stringstream ss; ss << f.rdbuf();
+	content = ss.str();
+	return true;
+}
 
-	// Load FFTW wisdom if any
-	const std::string fftw_wisdom_path = config_path + os::pathSeparator() + fftw_wisdom_file;
-	std::ifstream f(fftw_wisdom_path.c_str());
-	if (f) {
-		// read f into string
-		std::stringstream ss; std::string line;
-		while (std::getline(f, line)) ss << line << "\n";
-		// and import wisdom from string
-		if (fftw_import_wisdom_from_string(ss.str().c_str())) {
+static void importWisdom(const std::string &config_path)
+{
+	std::string wisdom;
+
+	if (readFile(config_path + os::pathSeparator() + fftw_wisdom_file, wisdom)) {
+		if (fftw_import_wisdom_from_string(wisdom.c_str())) {
 			LOG_DEBUG << "Imported FFTW wisdom from file";
 		} else {
 			LOG_WARN << "FFTW wisdom file seems to be invalid.";
 		}
 	} else {
-		LOG_WARN << "Failed to import FFTW wisdom from file " << fftw_wisdom_path;
+		LOG_DEBUG << "No FFTW wisdom file found in " << config_path;
+	}
+
+	if (readFile(config_path + os::pathSeparator() + fftwf_wisdom_file, wisdom)) {
+		if (fftwf_import_wisdom_from_string(wisdom.c_str())) {
+			LOG_DEBUG << "Imported FFTW wisdom (single precision) from file";
+		} else {
+			LOG_WARN << "FFTW wisdom file (single precision) seems to be invalid.";
+		}
 	}
 }
 
+static void writeFileAtomic(const std::string &path, const char *content)
+{
+	// Write to a private file first, so that concurrent runs never see a partial file.
+	std::stringstream tmp_path;
+	tmp_path << path << ".tmp-" << os::getHostName() << "-" << os::getProcessId();
+	{
+		std::ofstream f(tmp_path.str().c_str());
+		f << content;
+		if (!f) {
+			LOG_WARN << "Failed to write " << tmp_path.str();
+			os::removeFile(tmp_path.str());
+			return;
+		}
+	}
+	if (!os::renameFile(tmp_path.str(), path)) {
+		LOG_WARN << "Failed to write " << path;
+		os::removeFile(tmp_path.str());
+	}
+}
+
+static void exportWisdom(const std::string &config_path)
+{
+	// Another run may have saved new wisdom in the meantime: merge it in first
+	// (wisdom is cumulative), so that its plans are not lost.
+	importWisdom(config_path);
+
+	char *wisdom = fftw_export_wisdom_to_string();
+	if (wisdom) {
+		writeFileAtomic(config_path + os::pathSeparator() + fftw_wisdom_file, wisdom);
+		std::free(wisdom);
+	}
+
+	char *wisdomf = fftwf_export_wisdom_to_string();
+	if (wisdomf) {
+		writeFileAtomic(config_path + os::pathSeparator() + fftwf_wisdom_file, wisdomf);
+		std::free(wisdomf);
+	}
+}
+
+void initialize(const std::string &config_path)
+{
+#ifdef HAVE_FFTW_THREADS
+	// Enable FFTW threads
+	fftw_init_threads();
+	fftwf_init_threads();
+#endif
+
+	// Load FFTW wisdom if any
+	importWisdom(config_path);
+}
+
 void deinitialize(const std::string &config_path)
 {
 	// Save FFTW wisdom
-	const std::string fftw_wisdom_path = config_path + os::pathSeparator() + fftw_wisdom_file;
-	char *wisdom = fftw_export_wisdom_to_string();
-	std::ofstream f(fftw_wisdom_path.c_str());
-	f << wisdom;
-	std::free(wisdom);
+	exportWisdom(config_path);
 
 #ifdef HAVE_FFTW_THREADS
 	fftw_cleanup_threads();
+	fftwf_cleanup_threads();
 #endif
 
 	// just to be sure
@@ -67,6 +67,19 @@ void cudaSync();
 bool haveFFTWThreads();
 void setFFTWThreads(int num_threads);
 
+// FFTW planning effort for new CPU FFT plans. Higher efforts take (much)
+// longer to plan, but the results are kept in the FFTW wisdom files in the
+// config path (see initialize/deinitialize) and reused by later runs.
+enum FFTWPlanner {
+	FFTW_PLANNER_ESTIMATE=0,
+	FFTW_PLANNER_MEASURE=1,
+	FFTW_PLANNER_PATIENT=2,
+	FFTW_PLANNER_EXHAUSTIVE=3
+};
+void setFFTWPlanner(FFTWPlanner planner);
+FFTWPlanner getFFTWPlanner();
+unsigned getFFTWPlannerFlags(); // flags for fftw_plan_* calls
+
 // Flush memory allocators
 void flush();
 
@@ -31,6 +31,7 @@
 #ifdef HAVE_CVODE
   #include "evolver/diffeq.h"
   #include "evolver/cvode.h"
+  #include "evolver/native_llg_diffeq.h"
 #endif
 %}
 
@@ -94,6 +95,22 @@ void rk_combine_result(
   VectorMatrix &y_error
 );
 
+void rk_prepare_step(
+  int step,
+  double h,
+  ButcherTableau &tab,
+  const std::vector<VectorMatrix*> &k,
+  const VectorMatrix &y,
+  VectorMatrix &ytmp
+);
+
+void rk_combine_result(
+  double h,
+  ButcherTableau &tab,
+  const std::vector<VectorMatrix*> &k,
+  VectorMatrix &y,
+  VectorMatrix &y_error
+);
 
 double rk_adjust_stepsize(int order, double h, double eps_abs, double eps_rel, const VectorMatrix &y, const VectorMatrix &y_error);
 
@@ -101,4 +118,19 @@ double rk_adjust_stepsize(int order, double h, double eps_abs, double eps_rel, c
   %feature("director") DiffEq;
   %include "evolver/cvode.h";
   %include "evolver/diffeq.h";
+
+  // (declared here because SWIG doesn't know the common base class of the convolutions)
+  class NativeLlgDiffEq : public DiffEq {
+  public:
+    NativeLlgDiffEq(VectorMatrix &My, const Field &Ms, const Matrix &f1, const Matrix &f2);
+    virtual ~NativeLlgDiffEq();
+
+    void setStaticField(const VectorMatrix &H);
+    void setExchange(const Field &A);
+    void setUniaxialAnisotropy(const VectorMatrix &axis, const Matrix &k);
+    void setCubicAnisotropy(const VectorMatrix &axis1, const VectorMatrix &axis2, const Matrix &k);
+    void setStrayField(SymmetricMatrixVectorConvolution_FFT &conv);
+
+    int getNumSubsteps() const;
+  };
 #endif
@@ -64,8 +64,8 @@ namespace std {
 
 // Magneto parts
 %include "../matrix/matty.inc.i" // Matrix subsystem definitions
-%include "mmm.i"
 %include "math.i"
+%include "mmm.i"
 %include "evolver.i"
 %include "benchmark.i"
 
@@ -101,4 +101,13 @@ void cudaSync();
 bool haveFFTWThreads();
 void setFFTWThreads(int num_threads);
 
+enum FFTWPlanner {
+	FFTW_PLANNER_ESTIMATE=0,
+	FFTW_PLANNER_MEASURE=1,
+	FFTW_PLANNER_PATIENT=2,
+	FFTW_PLANNER_EXHAUSTIVE=3
+};
+void setFFTWPlanner(FFTWPlanner planner);
+FFTWPlanner getFFTWPlanner();
+
 void flush();
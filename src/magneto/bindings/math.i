@@ -23,16 +23,23 @@
 %{
 #include "math/conv/SymmetricMatrixVectorConvolution_FFT.h"
 #include "math/conv/SymmetricMatrixVectorConvolution_Simple.h"
+#include "math/conv/LayeredMatrixVectorConvolution_FFT.h"
 #include "math/conv/AntisymmetricMatrixVectorConvolution_FFT.h"
 #include "math/conv/VectorVectorConvolution_FFT.h"
 %}
 
+%template(VectorMatrixVector) std::vector<VectorMatrix*>;
+
 class SymmetricMatrixVectorConvolution_FFT
 {
 public:
 	SymmetricMatrixVectorConvolution_FFT(const Matrix &lhs, int dim_x, int dim_y, int dim_z);
 	virtual ~SymmetricMatrixVectorConvolution_FFT();
 	virtual void execute(const VectorMatrix &rhs, VectorMatrix &res);
+	void execute_many(const std::vector<VectorMatrix*> &rhs, const std::vector<VectorMatrix*> &res);
+
+	bool enableSinglePrecision();
+	bool isSinglePrecision() const;
 };
 
 class SymmetricMatrixVectorConvolution_Simple
@@ -43,6 +50,14 @@ public:
 	virtual void execute(const VectorMatrix &rhs, VectorMatrix &res);
 };
 
+class LayeredMatrixVectorConvolution_FFT
+{
+public:
+	LayeredMatrixVectorConvolution_FFT(const Matrix &lhs, int dim_x, int dim_y, int dim_z);
+	virtual ~LayeredMatrixVectorConvolution_FFT();
+	virtual void execute(const VectorMatrix &rhs, VectorMatrix &res);
+};
+
 class AntisymmetricMatrixVectorConvolution_FFT
 {
 public:
@@ -63,8 +78,16 @@ public:
 %{
 #include "math/gradient.h"
 #include "math/ScaledAbsMax.h"
+#include "math/permute_axes.h"
+#include "math/crop.h"
+#include "math/mask.h"
 %}
 
 void gradient(double delta_x, double delta_y, double delta_z, const Matrix &pot, VectorMatrix &field);
 double scaled_abs_max(VectorMatrix &M, Matrix &scale);
+void permute_axes(const VectorMatrix &in, VectorMatrix &out, int perm_x, int perm_y, int perm_z);
+std::vector<int> nonzero_bounding_box(const Matrix &A);
+void copy_box(const VectorMatrix &in, VectorMatrix &out, int in_x, int in_y, int in_z, int out_x, int out_y, int out_z, int size_x, int size_y, int size_z);
+void clear_masked_cells(VectorMatrix &A, const Matrix &mask);
+void clear_masked_cells(Matrix &A, const Matrix &mask);
 
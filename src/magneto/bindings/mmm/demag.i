@@ -23,6 +23,7 @@
 %{
 #include "mmm/demag/demag_tensor.h"
 #include "mmm/demag/demag_static.h"
+#include "mmm/demag/demag_fmm.h"
 #include "mmm/demag/tensor_round.h"
 #include "mmm/demag/phi/demag_phi_tensor.h"
 %}
@@ -41,9 +42,43 @@ Matrix GenerateDemagTensor(
 	double delta_x, double delta_y, double delta_z, 
 	bool periodic_x, bool periodic_y, bool periodic_z, int periodic_repeat,
 	int padding,
-	const char *cache_dir
+	const char *cache_dir,
+	int num_threads = 1,
+	double asymptotic_radius = 0.0,
+	bool lattice_sum = false
 );
 
+%newobject GenerateDemagTensorConvolution;
+SymmetricMatrixVectorConvolution_FFT *GenerateDemagTensorConvolution(
+	int dim_x, int dim_y, int dim_z, 
+	double delta_x, double delta_y, double delta_z, 
+	bool periodic_x, bool periodic_y, bool periodic_z, int periodic_repeat,
+	int padding,
+	const char *cache_dir,
+	int num_threads = 1,
+	double asymptotic_radius = 0.0,
+	bool lattice_sum = false
+);
+
+class DemagFMM
+{
+public:
+	DemagFMM(
+		int dim_x, int dim_y, int dim_z,
+		double delta_x, double delta_y, double delta_z,
+		int order, double tolerance,
+		const char *cache_dir,
+		int num_threads = 1
+	);
+	virtual ~DemagFMM();
+
+	virtual void execute(const VectorMatrix &rhs, VectorMatrix &res);
+
+	int getOrder() const;
+	double getTolerance() const;
+	int getNumMagneticCells() const;
+};
+
 Matrix GeneratePhiDemagTensor(
 	int dim_x, int dim_y, int dim_z, 
 	double delta_x, double delta_y, double delta_z, 
@@ -22,6 +22,7 @@
 
 %{
 #include "mmm/exchange/exchange.h"
+#include "mmm/exchange/exchange_implicit.h"
 %}
 
 double exchange(
@@ -40,3 +41,32 @@ double exchange(
 	const VectorField &M,
 	VectorField &H
 );
+
+class ImplicitExchangeSolver
+{
+public:
+	ImplicitExchangeSolver(const RectangularMesh &mesh);
+	virtual ~ImplicitExchangeSolver();
+
+	int solve(
+		const Field &Ms, const Field &A,
+		const Matrix &f1, const Matrix &f2,
+		const VectorField &M,
+		double h,
+		const VectorField &rhs,
+		VectorField &X,
+		double tol = 1e-8,
+		int max_iter = 100
+	);
+
+	void apply(
+		const Field &Ms, const Field &A,
+		const Matrix &f1, const Matrix &f2,
+		const VectorField &M,
+		const VectorField &X,
+		VectorField &Y
+	);
+
+	void setupPreconditioner(const Field &Ms, const Field &A, const Matrix &f1, const Matrix &f2, const VectorMatrix &M, double h);
+	void precondition(const VectorMatrix &X, VectorMatrix &Y);
+};
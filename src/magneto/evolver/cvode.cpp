@@ -28,23 +28,25 @@
 #include "cvode.h"
 #include <cvode/cvode.h>
 #include <cvode/cvode_spgmr.h>
-#include <cvode/cvode_dense.h>       /* prototype for CVDense */
-#include <nvector/nvector_serial.h>
+#include <cvode/cvode_spbcgs.h>
 
 // Magnum
 //#include "config.h"
 #include "Magneto.h"
 #include "diffeq.h"
+#include "nvector_vectormatrix.h"
+#include "mmm/exchange/exchange_implicit.h"
 
 /*
  * Cvode constructor
  */
-Cvode::Cvode(DiffEq &diff, double abstol, double reltol, bool newton_method)
-  : _Ny(), _diff(diff), _abstol(abstol), _reltol(reltol)
+Cvode::Cvode(DiffEq &diff, double abstol, double reltol, bool newton_method, int linear_solver, double t0)
+  : _Ny(), _diff(diff), _abstol(abstol), _reltol(reltol), _newton_method(newton_method),
+    _pre(0), _pre_Ms(0), _pre_A(0), _pre_f1(0), _pre_f2(0), _pre_M(0), _pre_r(0), _pre_gamma(0.0)
 {
   _size = _diff.size();
-  _Ny = N_VNew_Serial(_size);
-  _diff.getN_Vector(_diff.getY(), _Ny);
+  _Ny = N_VMake_VectorMatrix(_diff._My);                 // initial value
+  _Nyout = N_VNew_VectorMatrix(_diff._My.getShape());    // output buffer
 
   /*
    * CVode initialisation
@@ -59,20 +61,52 @@ Cvode::Cvode(DiffEq &diff, double abstol, double reltol, bool newton_method)
 
   if ( _cvode_mem == NULL)  throw std::runtime_error("CVode Init failed!");
 
-  if ( CVodeSetUserData   (_cvode_mem, &_diff)           != 0)  throw std::runtime_error("CVode Init failed!");
-  if ( CVodeInit          (_cvode_mem, callf, T0, _Ny)   != 0)  throw std::runtime_error("CVode Init failed!");
+  if ( CVodeSetUserData   (_cvode_mem, this)             != 0)  throw std::runtime_error("CVode Init failed!");
+  if ( CVodeInit          (_cvode_mem, callf, t0, _Ny)   != 0)  throw std::runtime_error("CVode Init failed!");
   if ( CVodeSStolerances  (_cvode_mem, _reltol, _abstol) != 0)  throw std::runtime_error("CVode Init failed!");
-  if ( CVSpgmr            (_cvode_mem, PREC_BOTH, 5)     != 0)  throw std::runtime_error("CVode Init failed!");
   if ( CVodeSetMaxOrd     (_cvode_mem, 2)                != 0)  throw std::runtime_error("CVode Init failed!"); //Order of BDF
-  if ( CVDense            (_cvode_mem, _size)            != 0)  throw std::runtime_error("CVode Init failed!");
   if ( CVodeSetMaxNumSteps(_cvode_mem, 10000)            != 0)  throw std::runtime_error("CVode Init failed!");
 
+  // Matrix-free linear solver for the Newton iteration (the Jacobian-vector
+  // products default to difference quotients of callf). A dense Jacobian
+  // would need O(size^2) memory and work.
+  if (newton_method) {
+    switch (linear_solver) {
+      case CVODE_SPGMR:
+        if ( CVSpgmr(_cvode_mem, PREC_NONE, 5) != 0)  throw std::runtime_error("CVode Init failed!");
+        break;
+      case CVODE_SPBCG:
+        if ( CVSpbcg(_cvode_mem, PREC_NONE, 5) != 0)  throw std::runtime_error("CVode Init failed!");
+        break;
+      default:
+        throw std::runtime_error("Cvode: Invalid linear solver!");
+    }
+  }
 }
 
 Cvode::~Cvode()
 {
-  N_VDestroy_Serial(_Ny);
   CVodeFree(&_cvode_mem);
+  N_VDestroy_VectorMatrix(_Ny);
+  N_VDestroy_VectorMatrix(_Nyout);
+  delete _pre_M;
+  delete _pre_r;
+}
+
+void Cvode::setExchangePreconditioner(ImplicitExchangeSolver &solver, const Field &Ms, const Field &A, const Matrix &f1, const Matrix &f2)
+{
+  if (!_newton_method) return;
+
+  _pre = &solver;
+  _pre_Ms = &Ms; _pre_A = &A;
+  _pre_f1 = &f1; _pre_f2 = &f2;
+  if (!_pre_M) {
+    _pre_M = new VectorMatrix(_diff._My.getShape());
+    _pre_r = new VectorMatrix(_diff._My.getShape());
+  }
+
+  if ( CVSpilsSetPrecType     (_cvode_mem, PREC_LEFT)      != 0)  throw std::runtime_error("CVode Init failed!");
+  if ( CVSpilsSetPreconditioner(_cvode_mem, psetup, psolve) != 0)  throw std::runtime_error("CVode Init failed!");
 }
 
 /*
@@ -80,31 +114,61 @@ Cvode::~Cvode()
  */
 void Cvode::evolve(double t, const double Tmax) 
 {
-  N_Vector yout;
-
-  yout = NULL;
-  yout = N_VNew_Serial(_size);
-  if (yout != NULL);
-
-
   /* call CVode */
-  if ( CVode(_cvode_mem, Tmax, yout, &t, CV_NORMAL) != 0) throw std::runtime_error("CVode Init failed!");
-
-  if (yout == NULL) throw std::runtime_error("CVode Init failed!");
-
-  _diff.saveStateC(yout);
+  // CVode also uses the output vector for its iterates, so it must not be
+  // My, which the right-hand side may overwrite.
+  if ( CVode(_cvode_mem, Tmax, _Nyout, &t, CV_NORMAL) != 0) throw std::runtime_error("CVode Init failed!");
 
-  N_VDestroy_Serial(yout);
+  _diff._My.assign(N_VGetVectorMatrix(_Nyout));
 }
 
 
 int Cvode::callf(realtype t, N_Vector Ny, N_Vector Nydot, void *user_data)
 {
-  DiffEq* ode = (DiffEq*) user_data;
+  DiffEq* ode = &((Cvode*) user_data)->_diff;
 
-  ode->diffN(Ny, Nydot, t);
+  ode->diffX(N_VGetVectorMatrix(Ny), N_VGetVectorMatrix(Nydot), t);
   ode->substep();
   ode->saveTime(t);
 
   return(0);
 }
+
+/*
+ * Preconditioner of the Newton matrix I - gamma*J: The block diagonal of
+ * the exchange part of I - gamma*J, linearized about y. J is only
+ * re-evaluated (i.e. y stored) when CVode asks for it (jok false).
+ */
+int Cvode::psetup(realtype t, N_Vector y, N_Vector fy, booleantype jok, booleantype *jcurPtr, realtype gamma, void *user_data, N_Vector tmp1, N_Vector tmp2, N_Vector tmp3)
+{
+  Cvode *cv = (Cvode*) user_data;
+
+  if (!jok) {
+    cv->_pre_M->assign(N_VGetVectorMatrix(y));
+    *jcurPtr = TRUE;
+  } else {
+    *jcurPtr = FALSE;
+  }
+
+  cv->_pre->setupPreconditioner(*cv->_pre_Ms, *cv->_pre_A, *cv->_pre_f1, *cv->_pre_f2, *cv->_pre_M, gamma);
+  cv->_pre_gamma = gamma;
+  return(0);
+}
+
+int Cvode::psolve(realtype t, N_Vector y, N_Vector fy, N_Vector r, N_Vector z, realtype gamma, realtype delta, int lr, void *user_data, N_Vector tmp)
+{
+  Cvode *cv = (Cvode*) user_data;
+
+  if (gamma != cv->_pre_gamma) {
+    cv->_pre->setupPreconditioner(*cv->_pre_Ms, *cv->_pre_A, *cv->_pre_f1, *cv->_pre_f2, *cv->_pre_M, gamma);
+    cv->_pre_gamma = gamma;
+  }
+
+  if (r == z) {
+    cv->_pre_r->assign(N_VGetVectorMatrix(r));
+    cv->_pre->precondition(*cv->_pre_r, N_VGetVectorMatrix(z));
+  } else {
+    cv->_pre->precondition(N_VGetVectorMatrix(r), N_VGetVectorMatrix(z));
+  }
+  return(0);
+}
@@ -24,29 +24,67 @@
 
 #include <nvector/nvector_serial.h>
 #include "matrix/matty.h"
+#include "mesh/Field.h"
 #include "diffeq.h"
 
+class ImplicitExchangeSolver;
+
 #define T0    RCONST(0.0)      /* initial time           */
 
+/*
+ * Linear solvers for the Newton iteration. Both are matrix-free Krylov
+ * solvers: The Jacobian is never stored, the Jacobian-vector products are
+ * finite differences of the right-hand side.
+ */
+enum CvodeLinearSolver {
+  CVODE_SPGMR = 0, // GMRES
+  CVODE_SPBCG = 1  // BiCGStab
+};
+
 class Cvode {
 
   public:
     /*
      * @param newton_method   Use Newton iteration or default: functional.
      *                        Functional is faster and Newton more stable.
+     * @param linear_solver   Linear solver of the Newton iteration
+     *                        (CVODE_SPGMR or CVODE_SPBCG).
+     * @param t0              Initial time.
      */
-    Cvode(DiffEq &diff, double abstol, double reltol, bool newton_method);
+    Cvode(DiffEq &diff, double abstol, double reltol, bool newton_method, int linear_solver = CVODE_SPGMR, double t0 = T0);
     virtual ~Cvode();
+    /*
+     * Evolves the state of the DiffEq (its VectorMatrix My) to Tmax. The
+     * right-hand side may use My as scratch space, the result is assigned
+     * to My at the end.
+     */
     void evolve(double t, const double Tmax);
 
+    /*
+     * Preconditions the linear solver of the Newton iteration with the
+     * inverses of the 3x3 diagonal blocks of the exchange term of the LLG
+     * equation (see ImplicitExchangeSolver). The arguments must stay alive
+     * as long as this object. Has no effect with functional iteration.
+     */
+    void setExchangePreconditioner(ImplicitExchangeSolver &solver, const Field &Ms, const Field &A, const Matrix &f1, const Matrix &f2);
+
   private:
     static int callf(realtype t, N_Vector y, N_Vector ydot, void *user_data);
+    static int psetup(realtype t, N_Vector y, N_Vector fy, booleantype jok, booleantype *jcurPtr, realtype gamma, void *user_data, N_Vector tmp1, N_Vector tmp2, N_Vector tmp3);
+    static int psolve(realtype t, N_Vector y, N_Vector fy, N_Vector r, N_Vector z, realtype gamma, realtype delta, int lr, void *user_data, N_Vector tmp);
 
-    N_Vector _Ny;
+    N_Vector _Ny, _Nyout; // VectorMatrix N_Vectors (see nvector_vectormatrix.h)
     double _reltol, _abstol;
     int _size;
     DiffEq& _diff;
     void *_cvode_mem;
+    bool _newton_method;
 
+    // Exchange preconditioner
+    ImplicitExchangeSolver *_pre;
+    const Field *_pre_Ms, *_pre_A;
+    const Matrix *_pre_f1, *_pre_f2;
+    VectorMatrix *_pre_M, *_pre_r;
+    double _pre_gamma;
 };
 #endif
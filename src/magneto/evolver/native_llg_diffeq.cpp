@@ -0,0 +1,114 @@
+/*
+ * Copyright 2012 by the Micromagnum authors.
+ *
+ * This file is part of magnum.fd.
+ * magnum.fd is based heavily on MicroMagnum.
+ * (https://github.com/MicroMagnum/MicroMagnum)
+ * 
+ * magnum.fd is free software: you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation, either version 3 of the License, or
+ * (at your option) any later version.
+ * 
+ * magnum.fd is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ * 
+ * You should have received a copy of the GNU General Public License
+ * along with magnum.fd. If not, see <http://www.gnu.org/licenses/>.
+ */
+
+#include "native_llg_diffeq.h"
+
+#include "Magneto.h"
+#include "Benchmark.h"
+
+#include "mmm/llge/llge.h"
+#include "mmm/exchange/exchange.h"
+#include "mmm/anisotropy/anisotropy.h"
+#include "math/conv/MatrixVectorConvolution_FFT.h"
+
+NativeLlgDiffEq::NativeLlgDiffEq(VectorMatrix &My, const Field &Ms, const Matrix &f1, const Matrix &f2)
+  : DiffEq(My), _Ms(Ms), _f1(f1), _f2(f2),
+    _H_static(0), _A(0), _uni_axis(0), _cub_axis1(0), _cub_axis2(0), _uni_k(0), _cub_k(0), _stray(0),
+    _H(My.getShape()), _tmp(My.getShape()), _num_substeps(0)
+{
+}
+
+NativeLlgDiffEq::~NativeLlgDiffEq()
+{
+}
+
+void NativeLlgDiffEq::setStaticField(const VectorMatrix &H)
+{
+  _H_static = &H;
+}
+
+void NativeLlgDiffEq::setExchange(const Field &A)
+{
+  _A = &A;
+}
+
+void NativeLlgDiffEq::setUniaxialAnisotropy(const VectorMatrix &axis, const Matrix &k)
+{
+  _uni_axis = &axis; _uni_k = &k;
+}
+
+void NativeLlgDiffEq::setCubicAnisotropy(const VectorMatrix &axis1, const VectorMatrix &axis2, const Matrix &k)
+{
+  _cub_axis1 = &axis1; _cub_axis2 = &axis2; _cub_k = &k;
+}
+
+void NativeLlgDiffEq::setStrayField(MatrixVectorConvolution_FFT &conv)
+{
+  _stray = &conv;
+}
+
+void NativeLlgDiffEq::diffX(const VectorMatrix &My, VectorMatrix &Mydot, double t)
+{
+  TIC("native_llg_rhs");
+
+  if (_H_static) {
+    _H.assign(*_H_static);
+  } else {
+    _H.fill(Vector3d(0.0, 0.0, 0.0));
+  }
+
+  if (_A) {
+    const RectangularMesh &mesh = _Ms.getMesh();
+    const bool px = mesh.pbc.find("x") != std::string::npos;
+    const bool py = mesh.pbc.find("y") != std::string::npos;
+    const bool pz = mesh.pbc.find("z") != std::string::npos;
+    exchange(mesh.nx, mesh.ny, mesh.nz, mesh.dx, mesh.dy, mesh.dz, px, py, pz, _Ms, *_A, My, _tmp);
+    _H.add(_tmp);
+  }
+
+  if (_uni_k) {
+    uniaxial_anisotropy(*_uni_axis, *_uni_k, _Ms, My, _tmp);
+    _H.add(_tmp);
+  }
+
+  if (_cub_k) {
+    cubic_anisotropy(*_cub_axis1, *_cub_axis2, *_cub_k, _Ms, My, _tmp);
+    _H.add(_tmp);
+  }
+
+  if (_stray) {
+    _stray->execute(My, _tmp);
+    _H.add(_tmp);
+  }
+
+  llge(_f1, _f2, My, _H, Mydot);
+
+  TOC("native_llg_rhs");
+}
+
+void NativeLlgDiffEq::saveTime(double t)
+{
+}
+
+void NativeLlgDiffEq::substep()
+{
+  _num_substeps += 1;
+}
@@ -0,0 +1,74 @@
+/*
+ * Copyright 2012 by the Micromagnum authors.
+ *
+ * This file is part of magnum.fd.
+ * magnum.fd is based heavily on MicroMagnum.
+ * (https://github.com/MicroMagnum/MicroMagnum)
+ * 
+ * magnum.fd is free software: you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation, either version 3 of the License, or
+ * (at your option) any later version.
+ * 
+ * magnum.fd is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ * 
+ * You should have received a copy of the GNU General Public License
+ * along with magnum.fd. If not, see <http://www.gnu.org/licenses/>.
+ */
+
+#ifndef NATIVE_LLG_DIFFEQ_H
+#define NATIVE_LLG_DIFFEQ_H
+
+#include "matrix/matty.h"
+#include "mesh/Field.h"
+#include "diffeq.h"
+
+class MatrixVectorConvolution_FFT;
+
+/*
+ * Right-hand side of the LLG equation for the Cvode evolver, computed
+ * without calling back into Python:
+ *
+ *   dM/dt = llge(f1, f2, M, H_tot),
+ *   H_tot = H_static + H_exch + H_aniso + H_stray,
+ *
+ * where each term is optional. H_static is the sum of the time-independent
+ * fields (e.g. a static external field). This only works if all modules of
+ * the simulation are covered by these terms (see magnum.evolver.cvode).
+ * All arguments must stay alive as long as this object.
+ */
+class NativeLlgDiffEq : public DiffEq {
+  public:
+    NativeLlgDiffEq(VectorMatrix &My, const Field &Ms, const Matrix &f1, const Matrix &f2);
+    virtual ~NativeLlgDiffEq();
+
+    void setStaticField(const VectorMatrix &H);
+    void setExchange(const Field &A);
+    void setUniaxialAnisotropy(const VectorMatrix &axis, const Matrix &k);
+    void setCubicAnisotropy(const VectorMatrix &axis1, const VectorMatrix &axis2, const Matrix &k);
+    void setStrayField(MatrixVectorConvolution_FFT &conv);
+
+    virtual void diffX(const VectorMatrix &My, VectorMatrix &Mydot, double t);
+    virtual void saveTime(double t);
+    virtual void substep();
+
+    int getNumSubsteps() const { return _num_substeps; }
+
+  private:
+    const Field &_Ms;
+    const Matrix &_f1, &_f2;
+
+    const VectorMatrix *_H_static;
+    const Field *_A;
+    const VectorMatrix *_uni_axis, *_cub_axis1, *_cub_axis2;
+    const Matrix *_uni_k, *_cub_k;
+    MatrixVectorConvolution_FFT *_stray;
+
+    VectorMatrix _H, _tmp;
+    int _num_substeps;
+};
+
+#endif
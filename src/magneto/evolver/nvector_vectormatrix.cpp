@@ -0,0 +1,353 @@
+/*
+ * Copyright 2012 by the Micromagnum authors.
+ *
+ * This file is part of magnum.fd.
+ * magnum.fd is based heavily on MicroMagnum.
+ * (https://github.com/MicroMagnum/MicroMagnum)
+ * 
+ * magnum.fd is free software: you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation, either version 3 of the License, or
+ * (at your option) any later version.
+ * 
+ * magnum.fd is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ * 
+ * You should have received a copy of the GNU General Public License
+ * along with magnum.fd. If not, see <http://www.gnu.org/licenses/>.
+ */
+
+#include "nvector_vectormatrix.h"
+
+#include <cmath>
+#include <cstring>
+#include <stdexcept>
+
+namespace {
+
+struct Content
+{
+  VectorMatrix *mat; // NULL for empty clones
+  bool own;
+};
+
+Content *content(N_Vector v)
+{
+  return (Content*) v->content;
+}
+
+/*
+ * Pointers to the component arrays of up to three vectors. The matrix of
+ * the first vector is locked for writing if 'write' is set. Each matrix is
+ * locked only once because CVode calls the operations with aliased
+ * arguments (e.g. z = x), and a matrix can't have a read and a write lock
+ * at the same time.
+ */
+class Arrays
+{
+public:
+  Arrays(bool write, N_Vector v0, N_Vector v1 = 0, N_Vector v2 = 0)
+  {
+    N_Vector v[3] = {v0, v1, v2};
+    for (int i=0; i<3; ++i) {
+      acc[i] = 0; const_acc[i] = 0;
+      mat[i] = v[i] ? content(v[i])->mat : 0;
+      if (!mat[i]) continue;
+
+      int j = 0;
+      while (j < i && mat[j] != mat[i]) ++j;
+      if (j < i) {
+        for (int c=0; c<3; ++c) p[i][c] = p[j][c];
+      } else if (write && i == 0) {
+        acc[i] = new VectorMatrix::accessor(*mat[i]);
+        p[i][0] = acc[i]->ptr_x(); p[i][1] = acc[i]->ptr_y(); p[i][2] = acc[i]->ptr_z();
+      } else {
+        const_acc[i] = new VectorMatrix::const_accessor(*mat[i]);
+        p[i][0] = const_cast<double*>(const_acc[i]->ptr_x());
+        p[i][1] = const_cast<double*>(const_acc[i]->ptr_y());
+        p[i][2] = const_cast<double*>(const_acc[i]->ptr_z());
+      }
+    }
+    n = mat[0]->size();
+  }
+
+  ~Arrays()
+  {
+    for (int i=0; i<3; ++i) {
+      delete acc[i];
+      delete const_acc[i];
+    }
+  }
+
+  int n;          // number of cells
+  double *p[3][3]; // p[vector][component]
+
+private:
+  VectorMatrix *mat[3];
+  VectorMatrix::accessor *acc[3];
+  VectorMatrix::const_accessor *const_acc[3];
+};
+
+#define FOR_EACH(arr) for (int c=0; c<3; ++c) for (int i=0; i<(arr).n; ++i)
+
+N_Vector make(VectorMatrix *mat, bool own);
+
+N_Vector nvCloneEmpty(N_Vector w)
+{
+  return make(0, false);
+}
+
+N_Vector nvClone(N_Vector w)
+{
+  return make(new VectorMatrix(content(w)->mat->getShape()), true);
+}
+
+void nvDestroy(N_Vector v)
+{
+  N_VDestroy_VectorMatrix(v);
+}
+
+void nvSpace(N_Vector v, long *lrw, long *liw)
+{
+  *lrw = 3 * content(v)->mat->size();
+  *liw = 1;
+}
+
+realtype *nvGetArrayPointer(N_Vector v)
+{
+  return 0; // the data is not contiguous
+}
+
+void nvSetArrayPointer(realtype *data, N_Vector v)
+{
+  throw std::runtime_error("N_VSetArrayPointer is not supported by VectorMatrix N_Vectors");
+}
+
+void nvLinearSum(realtype a, N_Vector x, realtype b, N_Vector y, N_Vector z)
+{
+  Arrays arr(true, z, x, y);
+  FOR_EACH(arr) arr.p[0][c][i] = a * arr.p[1][c][i] + b * arr.p[2][c][i];
+}
+
+void nvConstant(realtype c0, N_Vector z)
+{
+  content(z)->mat->fill(Vector3d(c0, c0, c0));
+}
+
+void nvProd(N_Vector x, N_Vector y, N_Vector z)
+{
+  Arrays arr(true, z, x, y);
+  FOR_EACH(arr) arr.p[0][c][i] = arr.p[1][c][i] * arr.p[2][c][i];
+}
+
+void nvDiv(N_Vector x, N_Vector y, N_Vector z)
+{
+  Arrays arr(true, z, x, y);
+  FOR_EACH(arr) arr.p[0][c][i] = arr.p[1][c][i] / arr.p[2][c][i];
+}
+
+void nvScale(realtype a, N_Vector x, N_Vector z)
+{
+  Arrays arr(true, z, x);
+  FOR_EACH(arr) arr.p[0][c][i] = a * arr.p[1][c][i];
+}
+
+void nvAbs(N_Vector x, N_Vector z)
+{
+  Arrays arr(true, z, x);
+  FOR_EACH(arr) arr.p[0][c][i] = std::fabs(arr.p[1][c][i]);
+}
+
+void nvInv(N_Vector x, N_Vector z)
+{
+  Arrays arr(true, z, x);
+  FOR_EACH(arr) arr.p[0][c][i] = 1.0 / arr.p[1][c][i];
+}
+
+void nvAddConst(N_Vector x, realtype b, N_Vector z)
+{
+  Arrays arr(true, z, x);
+  FOR_EACH(arr) arr.p[0][c][i] = arr.p[1][c][i] + b;
+}
+
+realtype nvDotProd(N_Vector x, N_Vector y)
+{
+  Arrays arr(false, x, y);
+  double sum = 0.0;
+  FOR_EACH(arr) sum += arr.p[0][c][i] * arr.p[1][c][i];
+  return sum;
+}
+
+realtype nvMaxNorm(N_Vector x)
+{
+  Arrays arr(false, x);
+  double m = 0.0;
+  FOR_EACH(arr) if (std::fabs(arr.p[0][c][i]) > m) m = std::fabs(arr.p[0][c][i]);
+  return m;
+}
+
+realtype nvWrmsNorm(N_Vector x, N_Vector w)
+{
+  Arrays arr(false, x, w);
+  double sum = 0.0;
+  FOR_EACH(arr) { const double xw = arr.p[0][c][i] * arr.p[1][c][i]; sum += xw * xw; }
+  return std::sqrt(sum / (3 * arr.n));
+}
+
+realtype nvWrmsNormMask(N_Vector x, N_Vector w, N_Vector id)
+{
+  Arrays arr(false, x, w, id);
+  double sum = 0.0;
+  FOR_EACH(arr) if (arr.p[2][c][i] > 0.0) { const double xw = arr.p[0][c][i] * arr.p[1][c][i]; sum += xw * xw; }
+  return std::sqrt(sum / (3 * arr.n));
+}
+
+realtype nvMin(N_Vector x)
+{
+  Arrays arr(false, x);
+  double m = arr.p[0][0][0];
+  FOR_EACH(arr) if (arr.p[0][c][i] < m) m = arr.p[0][c][i];
+  return m;
+}
+
+realtype nvWl2Norm(N_Vector x, N_Vector w)
+{
+  Arrays arr(false, x, w);
+  double sum = 0.0;
+  FOR_EACH(arr) { const double xw = arr.p[0][c][i] * arr.p[1][c][i]; sum += xw * xw; }
+  return std::sqrt(sum);
+}
+
+realtype nvL1Norm(N_Vector x)
+{
+  Arrays arr(false, x);
+  double sum = 0.0;
+  FOR_EACH(arr) sum += std::fabs(arr.p[0][c][i]);
+  return sum;
+}
+
+void nvCompare(realtype c0, N_Vector x, N_Vector z)
+{
+  Arrays arr(true, z, x);
+  FOR_EACH(arr) arr.p[0][c][i] = std::fabs(arr.p[1][c][i]) >= c0 ? 1.0 : 0.0;
+}
+
+booleantype nvInvTest(N_Vector x, N_Vector z)
+{
+  Arrays arr(true, z, x);
+  booleantype ok = TRUE;
+  FOR_EACH(arr) {
+    if (arr.p[1][c][i] == 0.0) ok = FALSE;
+    else arr.p[0][c][i] = 1.0 / arr.p[1][c][i];
+  }
+  return ok;
+}
+
+booleantype nvConstrMask(N_Vector cons, N_Vector x, N_Vector m)
+{
+  // see N_VConstrMask_Serial
+  Arrays arr(true, m, cons, x);
+  booleantype ok = TRUE;
+  FOR_EACH(arr) {
+    const double ci = arr.p[1][c][i], xi = arr.p[2][c][i];
+    double mi = 0.0;
+    if (ci > 1.5 || ci < -1.5) {
+      if (xi * ci <= 0.0) { ok = FALSE; mi = 1.0; }
+    } else if (ci > 0.5 || ci < -0.5) {
+      if (xi * ci < 0.0) { ok = FALSE; mi = 1.0; }
+    }
+    arr.p[0][c][i] = mi;
+  }
+  return ok;
+}
+
+realtype nvMinQuotient(N_Vector num, N_Vector denom)
+{
+  Arrays arr(false, num, denom);
+  double m = BIG_REAL;
+  FOR_EACH(arr) {
+    if (arr.p[1][c][i] == 0.0) continue;
+    const double q = arr.p[0][c][i] / arr.p[1][c][i];
+    if (q < m) m = q;
+  }
+  return m;
+}
+
+#undef FOR_EACH
+
+_generic_N_Vector_Ops *getOps()
+{
+  // Filled by name (operations that are unknown here stay NULL).
+  static _generic_N_Vector_Ops ops;
+  static bool init = false;
+  if (!init) {
+    std::memset(&ops, 0, sizeof(ops));
+    ops.nvclone           = nvClone;
+    ops.nvcloneempty      = nvCloneEmpty;
+    ops.nvdestroy         = nvDestroy;
+    ops.nvspace           = nvSpace;
+    ops.nvgetarraypointer = nvGetArrayPointer;
+    ops.nvsetarraypointer = nvSetArrayPointer;
+    ops.nvlinearsum       = nvLinearSum;
+    ops.nvconst           = nvConstant;
+    ops.nvprod            = nvProd;
+    ops.nvdiv             = nvDiv;
+    ops.nvscale           = nvScale;
+    ops.nvabs             = nvAbs;
+    ops.nvinv             = nvInv;
+    ops.nvaddconst        = nvAddConst;
+    ops.nvdotprod         = nvDotProd;
+    ops.nvmaxnorm         = nvMaxNorm;
+    ops.nvwrmsnorm        = nvWrmsNorm;
+    ops.nvwrmsnormmask    = nvWrmsNormMask;
+    ops.nvmin             = nvMin;
+    ops.nvwl2norm         = nvWl2Norm;
+    ops.nvl1norm          = nvL1Norm;
+    ops.nvcompare         = nvCompare;
+    ops.nvinvtest         = nvInvTest;
+    ops.nvconstrmask      = nvConstrMask;
+    ops.nvminquotient     = nvMinQuotient;
+    init = true;
+  }
+  return &ops;
+}
+
+N_Vector make(VectorMatrix *mat, bool own)
+{
+  Content *cont = new Content();
+  cont->mat = mat;
+  cont->own = own;
+
+  N_Vector v = new _generic_N_Vector();
+  v->content = cont;
+  v->ops = getOps(); // shared by all vectors
+  return v;
+}
+
+} // ns
+
+N_Vector N_VMake_VectorMatrix(VectorMatrix &mat)
+{
+  return make(&mat, false);
+}
+
+N_Vector N_VNew_VectorMatrix(const Shape &shape)
+{
+  return make(new VectorMatrix(shape), true);
+}
+
+void N_VDestroy_VectorMatrix(N_Vector v)
+{
+  if (!v) return;
+  Content *cont = content(v);
+  if (cont->own) delete cont->mat;
+  delete cont;
+  delete v;
+}
+
+VectorMatrix &N_VGetVectorMatrix(N_Vector v)
+{
+  return *content(v)->mat;
+}
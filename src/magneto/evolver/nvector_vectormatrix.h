@@ -0,0 +1,49 @@
+/*
+ * Copyright 2012 by the Micromagnum authors.
+ *
+ * This file is part of magnum.fd.
+ * magnum.fd is based heavily on MicroMagnum.
+ * (https://github.com/MicroMagnum/MicroMagnum)
+ * 
+ * magnum.fd is free software: you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation, either version 3 of the License, or
+ * (at your option) any later version.
+ * 
+ * magnum.fd is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ * 
+ * You should have received a copy of the GNU General Public License
+ * along with magnum.fd. If not, see <http://www.gnu.org/licenses/>.
+ */
+
+#ifndef NVECTOR_VECTORMATRIX_H
+#define NVECTOR_VECTORMATRIX_H
+
+#include <sundials/sundials_nvector.h>
+#include "matrix/matty.h"
+
+/*
+ * N_Vector implementation for CVode whose data is a VectorMatrix: The
+ * vector consists of the x, y and z component arrays of the matrix. CVode
+ * can thus work directly on the magnetization (no copies between N_Vectors
+ * and VectorMatrices), and the right-hand side gets and returns
+ * VectorMatrices.
+ *
+ * Clones of a vector allocate (and own) a new VectorMatrix of the same
+ * shape. Vectors made by N_VMake_VectorMatrix don't own their matrix.
+ */
+
+// New vector that wraps 'mat' (not owned).
+N_Vector N_VMake_VectorMatrix(VectorMatrix &mat);
+
+// New vector with its own VectorMatrix of the given shape.
+N_Vector N_VNew_VectorMatrix(const Shape &shape);
+
+void N_VDestroy_VectorMatrix(N_Vector v);
+
+VectorMatrix &N_VGetVectorMatrix(N_Vector v);
+
+#endif
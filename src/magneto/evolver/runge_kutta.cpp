@@ -98,6 +98,63 @@ void rk_combine_result(
 	}
 }
 
+void rk_prepare_step(
+	int step, double h, ButcherTableau &tab,
+	const std::vector<VectorMatrix*> &k,
+	const VectorMatrix &y,
+	VectorMatrix &ytmp)
+{
+	if (step < 1 || step >= tab.num_steps) throw std::runtime_error("rk_prepare_step: Invalid step.");
+	if (int(k.size()) < step) throw std::runtime_error("rk_prepare_step: Need the step vectors k[0] to k[step-1].");
+	for (int j=0; j<step; ++j) {
+		if (k[j]->size() != y.size()) throw std::runtime_error("rk_prepare_step: Input matrix size mismatch.");
+	}
+
+	if (isCudaEnabled()) {
+		// There is only a CUDA kernel for 6 steps, otherwise use the matrix operations.
+		if (tab.num_steps == 6) {
+			const VectorMatrix &k0 = *k[0];
+			rk_prepare_step(step, h, tab, k0, step > 1 ? *k[1] : k0, step > 2 ? *k[2] : k0, step > 3 ? *k[3] : k0, step > 4 ? *k[4] : k0, k0, y, ytmp);
+		} else {
+			ytmp.assign(y);
+			for (int j=0; j<step; ++j) {
+				if (tab.b[step][j] != 0.0) ytmp.add(*k[j], h * tab.b[step][j]);
+			}
+		}
+	} else {
+		rk_prepare_step_cpu(step, h, tab, k, y, ytmp);
+	}
+}
+
+void rk_combine_result(
+	double h, ButcherTableau &tab,
+	const std::vector<VectorMatrix*> &k,
+	VectorMatrix &y, VectorMatrix &y_error)
+{
+	if (int(k.size()) != tab.num_steps) throw std::runtime_error("rk_combine_result: Need one step vector per step.");
+	for (int j=0; j<tab.num_steps; ++j) {
+		if (k[j]->size() != y.size()) throw std::runtime_error("rk_combine_result: Input matrix size mismatch.");
+	}
+	if (y_error.size() != y.size()) throw std::runtime_error("rk_combine_result: Input matrix size mismatch.");
+
+	if (isCudaEnabled()) {
+		// There are only CUDA kernels for 3 and 6 steps, otherwise use the matrix operations.
+		if (tab.num_steps == 6) {
+			rk_combine_result(h, tab, *k[0], *k[1], *k[2], *k[3], *k[4], *k[5], y, y_error);
+		} else if (tab.num_steps == 3) {
+			rk_combine_result(h, tab, *k[0], *k[1], *k[2], *k[0], y, y_error);
+		} else {
+			y_error.clear();
+			for (int j=0; j<tab.num_steps; ++j) {
+				if (tab.c [j] != 0.0) y      .add(*k[j], h * tab.c [j]);
+				if (tab.ec[j] != 0.0) y_error.add(*k[j], h * tab.ec[j]);
+			}
+		}
+	} else {
+		rk_combine_result_cpu(h, tab, k, y, y_error);
+	}
+}
+
 double rk_adjust_stepsize(int order, double h, double eps_abs, double eps_rel, const VectorMatrix &y, const VectorMatrix &y_error)
 {
 	double norm = 0.0;
@@ -106,6 +106,26 @@ void rk_combine_result(
 	VectorMatrix &y_error
 );
 
+// Generic versions for any tableau: k holds the step vectors k[0], k[1], ...
+// (for rk_prepare_step, at least k[0] to k[step-1]). Each call is a single pass
+// over the fields.
+void rk_prepare_step(
+	int step,
+	double h,
+	ButcherTableau &tab,
+	const std::vector<VectorMatrix*> &k,
+	const VectorMatrix &y,
+	VectorMatrix &ytmp
+);
+
+void rk_combine_result(
+	double h,
+	ButcherTableau &tab,
+	const std::vector<VectorMatrix*> &k,
+	VectorMatrix &y,
+	VectorMatrix &y_error
+);
+
 double rk_adjust_stepsize(int order, double h, double eps_abs, double eps_rel, const VectorMatrix &y, const VectorMatrix &y_error);
 
 #endif
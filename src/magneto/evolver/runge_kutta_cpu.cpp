@@ -27,6 +27,7 @@
 #include <cmath>
 #include <stdexcept>
 #include <cstddef>
+#include <memory>
 
 void rk_prepare_step_cpu(
 	int step,
@@ -196,6 +197,102 @@ void rk_combine_result_cpu(
 	}
 }
 
+// Generic (any number of stages) versions. Only the step vectors with nonzero
+// coefficients are read, and all of them in the same pass.
+
+static const int RK_MAX_STAGES = 16;
+
+static const double *component(const VectorMatrix::const_accessor &acc, int c)
+{
+	return c == 0 ? acc.ptr_x() : (c == 1 ? acc.ptr_y() : acc.ptr_z());
+}
+
+static double *component(const VectorMatrix::accessor &acc, int c)
+{
+	return c == 0 ? acc.ptr_x() : (c == 1 ? acc.ptr_y() : acc.ptr_z());
+}
+
+void rk_prepare_step_cpu(
+	int step, double h, ButcherTableau &tab,
+	const std::vector<VectorMatrix*> &k,
+	const VectorMatrix &y, VectorMatrix &ytmp)
+{
+	const size_t s = y.size();
+
+	// The step vectors with nonzero b[step][j]
+	double hb[RK_MAX_STAGES];
+	const VectorMatrix *terms[RK_MAX_STAGES];
+	int n = 0;
+	for (int j=0; j<step; ++j) {
+		if (tab.b[step][j] == 0.0) continue;
+		if (n == RK_MAX_STAGES) throw std::runtime_error("Runge-Kutta methods with more than 16 steps are not supported");
+		hb[n] = h * tab.b[step][j];
+		terms[n] = k[j];
+		n += 1;
+	}
+
+	std::auto_ptr<VectorMatrix::const_accessor> k_acc[RK_MAX_STAGES];
+	for (int j=0; j<n; ++j) k_acc[j].reset(new VectorMatrix::const_accessor(*terms[j]));
+	VectorMatrix::const_accessor y_acc(y);
+	VectorMatrix::accessor ytmp_acc(ytmp);
+
+	for (int c=0; c<3; ++c) {
+		const double *kc[RK_MAX_STAGES];
+		for (int j=0; j<n; ++j) kc[j] = component(*k_acc[j], c);
+		const double *yc = component(y_acc, c);
+		double *ytmpc = component(ytmp_acc, c);
+
+		for (size_t i=0; i<s; ++i) {
+			double sum = 0.0;
+			for (int j=0; j<n; ++j) sum += hb[j] * kc[j][i];
+			ytmpc[i] = yc[i] + sum;
+		}
+	}
+}
+
+void rk_combine_result_cpu(
+	double h, ButcherTableau &tab,
+	const std::vector<VectorMatrix*> &k,
+	VectorMatrix &y, VectorMatrix &y_error)
+{
+	const size_t s = y.size();
+	const int num_steps = tab.num_steps;
+
+	// The step vectors with nonzero c or ec
+	double hc[RK_MAX_STAGES], hec[RK_MAX_STAGES];
+	const VectorMatrix *terms[RK_MAX_STAGES];
+	int n = 0;
+	for (int j=0; j<num_steps; ++j) {
+		if (tab.c[j] == 0.0 && tab.ec[j] == 0.0) continue;
+		if (n == RK_MAX_STAGES) throw std::runtime_error("Runge-Kutta methods with more than 16 steps are not supported");
+		hc[n] = h * tab.c[j];
+		hec[n] = h * tab.ec[j];
+		terms[n] = k[j];
+		n += 1;
+	}
+
+	std::auto_ptr<VectorMatrix::const_accessor> k_acc[RK_MAX_STAGES];
+	for (int j=0; j<n; ++j) k_acc[j].reset(new VectorMatrix::const_accessor(*terms[j]));
+	VectorMatrix::accessor y_acc(y), y_error_acc(y_error);
+
+	for (int c=0; c<3; ++c) {
+		const double *kc[RK_MAX_STAGES];
+		for (int j=0; j<n; ++j) kc[j] = component(*k_acc[j], c);
+		double *yc = component(y_acc, c);
+		double *ec = component(y_error_acc, c);
+
+		for (size_t i=0; i<s; ++i) {
+			double sum = 0.0, err = 0.0;
+			for (int j=0; j<n; ++j) {
+				sum += hc[j] * kc[j][i];
+				err += hec[j] * kc[j][i];
+			}
+			yc[i] += sum;
+			ec[i] = err;
+		}
+	}
+}
+
 double rk_scaled_error_norm_cpu(double h, double eps_abs, double eps_rel, const VectorMatrix &y, const VectorMatrix &y_error)
 {
 	double norm;
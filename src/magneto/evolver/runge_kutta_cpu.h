@@ -55,6 +55,18 @@ void rk_combine_result_cpu(
 	VectorMatrix &y, VectorMatrix &y_error
 );
 
+void rk_prepare_step_cpu(
+	int step, double h, ButcherTableau &tab,
+	const std::vector<VectorMatrix*> &k,
+	const VectorMatrix &y, VectorMatrix &ytmp
+);
+
+void rk_combine_result_cpu(
+	double h, ButcherTableau &tab,
+	const std::vector<VectorMatrix*> &k,
+	VectorMatrix &y, VectorMatrix &y_error
+);
+
 double rk_scaled_error_norm_cpu(double h, double eps_abs, double eps_rel, const VectorMatrix &y, const VectorMatrix &y_error);
 
 #endif
@@ -0,0 +1,338 @@
+/*
+ * Copyright 2012-2014 by the MicroMagnum Team
+ * Copyright 2014 by the magnum.fd Team
+ *
+ * This file is part of magnum.fd.
+ * magnum.fd is based heavily on MicroMagnum.
+ * (https://github.com/MicroMagnum/MicroMagnum)
+ * 
+ * magnum.fd is free software: you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation, either version 3 of the License, or
+ * (at your option) any later version.
+ * 
+ * magnum.fd is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ * 
+ * You should have received a copy of the GNU General Public License
+ * along with magnum.fd. If not, see <http://www.gnu.org/licenses/>.
+ */
+
+#include "LayeredMatrixVectorConvolution_FFT.h"
+
+#include "Magneto.h"
+#include "Benchmark.h"
+#include "Logger.h"
+
+#include "matrix/matty_ext.h"
+
+#include "kernels/cpu_copy_pad.h"
+#include "kernels/cpu_copy_unpad.h"
+
+#include <algorithm>
+#include <cassert>
+#include <cmath>
+#include <cstring>
+#include <vector>
+
+LayeredMatrixVectorConvolution_FFT::LayeredMatrixVectorConvolution_FFT(const Matrix &lhs, int dim_x, int dim_y, int dim_z)
+	: dim_x(dim_x), dim_y(dim_y), dim_z(dim_z)
+{
+	assert(lhs.getShape().getDim(0) == 6);
+	exp_x = lhs.getShape().getDim(1);
+	exp_y = lhs.getShape().getDim(2);
+	exp_z = lhs.getShape().getDim(3);
+	assert(exp_z >= dim_z);
+
+	LOG_DEBUG << "Convolution is layered (" << dim_z << " layers)";
+
+	// Allocate buffers
+	for (int e=0; e<3; ++e) {
+		R[e] = Matrix(Shape(exp_x, dim_y, dim_z));
+		C[e] = Matrix(Shape(2, exp_x/2+1, exp_y, dim_z));
+		H[e] = Matrix(Shape(2, exp_x/2+1, exp_y, dim_z));
+	}
+
+	setupPlans();
+	setupKernel(lhs);
+}
+
+LayeredMatrixVectorConvolution_FFT::~LayeredMatrixVectorConvolution_FFT()
+{
+	fftw_destroy_plan(plan_x_r2c);
+	fftw_destroy_plan(plan_x_c2r);
+	fftw_destroy_plan(plan_y_forw);
+	fftw_destroy_plan(plan_y_inv);
+}
+
+void LayeredMatrixVectorConvolution_FFT::setupKernel(const Matrix &lhs)
+{
+	const int cx = exp_x/2+1;
+	const double scale = 1.0 / (exp_x * exp_y);
+
+	// 2d-transform each component e and layer z of (e, exp_x, exp_y, exp_z).
+	ComplexMatrix N(Shape(6, exp_x, exp_y, exp_z));
+	{
+		Matrix::ro_accessor lhs_acc(lhs);
+		ComplexMatrix::accessor N_acc(N);
+		for (int n=0; n<N.getShape().getNumEl(); ++n) {
+			N_acc.real(n) = lhs_acc.at(n);
+			N_acc.imag(n) = 0.0;
+		}
+	}
+	const int loop_dims[] = {0, 3};
+	matty_ext::fftn(N, std::vector<int>(loop_dims, loop_dims+2));
+
+	// Keep the layer offsets d = 0..dim_z-1. The tensor at offset -d (stored
+	// at z = exp_z-d) follows from the symmetries, which are checked here:
+	// Nxx, Nxy, Nyy, Nzz are even in x and y (Nxy: odd in both), so their
+	// transforms are real, and even in z. Nxz, Nyz are odd in x resp. y, so
+	// their transforms are imaginary, and odd in z.
+	static const bool odd[6] = {false, false, true, false, true, false};
+
+	double max_val = 0.0, max_err = 0.0;
+	{
+		ComplexMatrix::const_accessor N_acc(N);
+		for (int e=0; e<6; ++e) {
+			K[e] = Matrix(Shape(cx, exp_y, dim_z));
+			Matrix::wo_accessor K_acc(K[e]);
+			for (int d=0; d<dim_z; ++d) {
+				const int z_pos = d, z_neg = (exp_z-d) % exp_z;
+				for (int y=0; y<exp_y; ++y)
+				for (int x=0; x<cx; ++x) {
+					const double re_pos = N_acc.real(e,x,y,z_pos), im_pos = N_acc.imag(e,x,y,z_pos);
+					const double re_neg = N_acc.real(e,x,y,z_neg), im_neg = N_acc.imag(e,x,y,z_neg);
+					double val, err;
+					if (!odd[e]) {
+						val = re_pos;
+						err = std::max(std::max(std::fabs(im_pos), std::fabs(im_neg)), std::fabs(re_neg - re_pos));
+					} else {
+						val = im_pos;
+						err = std::max(std::max(std::fabs(re_pos), std::fabs(re_neg)), std::fabs(im_neg + im_pos));
+					}
+					K_acc.at(x,y,d) = scale * val;
+					max_val = std::max(max_val, std::fabs(val));
+					max_err = std::max(max_err, err);
+				}
+			}
+		}
+	}
+
+	LOG_DEBUG << "Layered convolution kernel: absmax = " << max_val << ", absmax(asymmetric part) = " << max_err;
+	if (max_err > 1e-10 * max_val) {
+		LOG_WARN << "Layered convolution: The tensor field lacks the symmetries of the demag tensor, the result will be inaccurate";
+	}
+}
+
+void LayeredMatrixVectorConvolution_FFT::setupPlans()
+{
+	const int cx = exp_x/2+1;
+	const unsigned fftw_strategy = getFFTWPlannerFlags();
+
+	Matrix::rw_accessor R_acc(R[0]), C_acc(C[0]), H_acc(H[0]);
+	double *r = R_acc.ptr(), *c = C_acc.ptr(), *h = H_acc.ptr();
+
+	fftw_iodim dims, loop[2];
+
+	// X-Transform: (dim_y*dim_z) x 1d-R2C-FFT (length: exp_x), R -> C.
+	// The output rows y >= dim_y are left out (they are zeroed before the y-transform).
+	dims.n = exp_x;
+	dims.is = 1;
+	dims.os = 1;
+
+	loop[0].n = dim_z;
+	loop[0].is = exp_x*dim_y;
+	loop[0].os = cx*exp_y;
+	loop[1].n = dim_y;
+	loop[1].is = exp_x;
+	loop[1].os = cx;
+
+	plan_x_r2c = fftw_plan_guru_dft_r2c(
+		1, &dims,
+		2, loop,
+		(      double*)r,
+		(fftw_complex*)c,
+		fftw_strategy
+	);
+	assert(plan_x_r2c);
+
+	// Inverse X-Transform: only the rows y < dim_y are needed, H -> R
+	dims.n = exp_x;
+	dims.is = 1;
+	dims.os = 1;
+
+	loop[0].n = dim_z;
+	loop[0].is = cx*exp_y;
+	loop[0].os = exp_x*dim_y;
+	loop[1].n = dim_y;
+	loop[1].is = cx;
+	loop[1].os = exp_x;
+
+	plan_x_c2r = fftw_plan_guru_dft_c2r(
+		1, &dims,
+		2, loop,
+		(fftw_complex*)h,
+		(      double*)r,
+		fftw_strategy
+	);
+	assert(plan_x_c2r);
+
+	// Y-Transform: (dim_z*exp_x/2+1) x 1d-C2C-FFT (length: exp_y) with stride exp_x/2+1, in-place transform
+	dims.n = exp_y;
+	dims.is = cx;
+	dims.os = cx;
+
+	loop[0].n = dim_z;
+	loop[0].is = cx*exp_y;
+	loop[0].os = cx*exp_y;
+	loop[1].n = cx;
+	loop[1].is = 1;
+	loop[1].os = 1;
+
+	plan_y_forw = fftw_plan_guru_dft(
+		1, &dims,
+		2, loop,
+		(fftw_complex*)c, // in
+		(fftw_complex*)c, // out (-> in-place transform)
+		FFTW_FORWARD,
+		fftw_strategy
+	);
+	assert(plan_y_forw);
+
+	plan_y_inv = fftw_plan_guru_dft(
+		1, &dims,
+		2, loop,
+		(fftw_complex*)h, // in
+		(fftw_complex*)h, // out (-> in-place transform)
+		FFTW_BACKWARD,
+		fftw_strategy
+	);
+	assert(plan_y_inv);
+}
+
+void LayeredMatrixVectorConvolution_FFT::execute(const VectorMatrix &rhs, VectorMatrix &res)
+{
+	assert(rhs.dimX() == dim_x && rhs.dimY() == dim_y && rhs.dimZ() == dim_z);
+	assert(res.dimX() == dim_x && res.dimY() == dim_y && res.dimZ() == dim_z);
+
+	const int cx = exp_x/2+1;
+
+	Matrix::rw_accessor Rx_acc(R[0]), Ry_acc(R[1]), Rz_acc(R[2]);
+	Matrix::rw_accessor Cx_acc(C[0]), Cy_acc(C[1]), Cz_acc(C[2]);
+	Matrix::rw_accessor Hx_acc(H[0]), Hy_acc(H[1]), Hz_acc(H[2]);
+	double *r[3] = {Rx_acc.ptr(), Ry_acc.ptr(), Rz_acc.ptr()};
+	double *c[3] = {Cx_acc.ptr(), Cy_acc.ptr(), Cz_acc.ptr()};
+	double *h[3] = {Hx_acc.ptr(), Hy_acc.ptr(), Hz_acc.ptr()};
+
+	TIC("convlayered");
+		TIC("convlayered.pad");
+		{
+			VectorMatrix::const_accessor M_acc(rhs);
+			cpu_copy_pad_r2r(
+				dim_x, dim_y, dim_z,
+				exp_x,
+				M_acc.ptr_x(), M_acc.ptr_y(), M_acc.ptr_z(),
+				r[0], r[1], r[2]
+			);
+		}
+		TOC("convlayered.pad");
+
+		TIC("convlayered.fft");
+			TIC("convlayered.fft.x");
+			for (int e=0; e<3; ++e) {
+				fftw_execute_dft_r2c(plan_x_r2c, r[e], (fftw_complex*)c[e]);
+				// zero-pad in y-direction
+				for (int z=0; z<dim_z; ++z) {
+					std::memset(c[e] + 2*cx*(z*exp_y + dim_y), 0, 2*cx*(exp_y-dim_y) * sizeof(double));
+				}
+			}
+			TOC("convlayered.fft.x");
+
+			TIC("convlayered.fft.y");
+			for (int e=0; e<3; ++e) {
+				fftw_execute_dft(plan_y_forw, (fftw_complex*)c[e], (fftw_complex*)c[e]);
+			}
+			TOC("convlayered.fft.y");
+		TOC("convlayered.fft");
+
+		TIC("convlayered.mult");
+		calculate_multiplication(c[0], c[1], c[2], h[0], h[1], h[2]);
+		TOC("convlayered.mult");
+
+		TIC("convlayered.ifft");
+			TIC("convlayered.ifft.y");
+			for (int e=0; e<3; ++e) {
+				fftw_execute_dft(plan_y_inv, (fftw_complex*)h[e], (fftw_complex*)h[e]);
+			}
+			TOC("convlayered.ifft.y");
+
+			TIC("convlayered.ifft.x");
+			for (int e=0; e<3; ++e) {
+				fftw_execute_dft_c2r(plan_x_c2r, (fftw_complex*)h[e], r[e]);
+			}
+			TOC("convlayered.ifft.x");
+		TOC("convlayered.ifft");
+
+		TIC("convlayered.unpad");
+		{
+			VectorMatrix::accessor H_acc(res);
+			cpu_copy_unpad_r2r(
+				exp_x, dim_y, dim_z,
+				dim_x,
+				r[0], r[1], r[2],
+				H_acc.ptr_x(), H_acc.ptr_y(), H_acc.ptr_z()
+			);
+		}
+		TOC("convlayered.unpad");
+	TOC("convlayered");
+}
+
+// For each frequency: H(z) = sum_o N(z-o) * M(o), with the 3x3 tensor
+//
+//   N = | Nxx  Nxy  Nxz |     Nxx, Nxy, Nyy, Nzz: real, even in z-o
+//       | Nxy  Nyy  Nyz |     Nxz, Nyz: imaginary, odd in z-o
+//       | Nxz  Nyz  Nzz |
+void LayeredMatrixVectorConvolution_FFT::calculate_multiplication(const double *in_x, const double *in_y, const double *in_z, double *out_x, double *out_y, double *out_z)
+{
+	Matrix::ro_accessor K_acc[6] = {K[0], K[1], K[2], K[3], K[4], K[5]};
+	const double *Nxx = K_acc[0].ptr(), *Nxy = K_acc[1].ptr(), *Nxz = K_acc[2].ptr();
+	const double *Nyy = K_acc[3].ptr(), *Nyz = K_acc[4].ptr(), *Nzz = K_acc[5].ptr();
+
+	const int layer_size = (exp_x/2+1) * exp_y; // number of frequencies per layer
+
+	for (int n=0; n<layer_size; ++n) {
+		for (int z=0; z<dim_z; ++z) {
+			double Hx_re = 0.0, Hx_im = 0.0;
+			double Hy_re = 0.0, Hy_im = 0.0;
+			double Hz_re = 0.0, Hz_im = 0.0;
+
+			for (int o=0; o<dim_z; ++o) {
+				const int k = std::abs(z-o)*layer_size + n; // kernel index
+				const int m = 2*(o*layer_size + n);         // field index
+				const double sign = (z >= o) ? 1.0 : -1.0;
+
+				const double xx = Nxx[k], xy = Nxy[k], xz = sign*Nxz[k];
+				const double yy = Nyy[k], yz = sign*Nyz[k], zz = Nzz[k];
+
+				const double Mx_re = in_x[m+0], Mx_im = in_x[m+1];
+				const double My_re = in_y[m+0], My_im = in_y[m+1];
+				const double Mz_re = in_z[m+0], Mz_im = in_z[m+1];
+
+				// real coefficients: a*M, imaginary coefficients: (i*b)*M = -b*M_im + i*b*M_re
+				Hx_re += xx*Mx_re + xy*My_re - xz*Mz_im;
+				Hx_im += xx*Mx_im + xy*My_im + xz*Mz_re;
+				Hy_re += xy*Mx_re + yy*My_re - yz*Mz_im;
+				Hy_im += xy*Mx_im + yy*My_im + yz*Mz_re;
+				Hz_re += zz*Mz_re - xz*Mx_im - yz*My_im;
+				Hz_im += zz*Mz_im + xz*Mx_re + yz*My_re;
+			}
+
+			const int m = 2*(z*layer_size + n);
+			out_x[m+0] = Hx_re; out_x[m+1] = Hx_im;
+			out_y[m+0] = Hy_re; out_y[m+1] = Hy_im;
+			out_z[m+0] = Hz_re; out_z[m+1] = Hz_im;
+		}
+	}
+}
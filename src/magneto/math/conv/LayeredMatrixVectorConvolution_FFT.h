@@ -0,0 +1,73 @@
+/*
+ * Copyright 2012-2014 by the MicroMagnum Team
+ * Copyright 2014 by the magnum.fd Team
+ *
+ * This file is part of magnum.fd.
+ * magnum.fd is based heavily on MicroMagnum.
+ * (https://github.com/MicroMagnum/MicroMagnum)
+ * 
+ * magnum.fd is free software: you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation, either version 3 of the License, or
+ * (at your option) any later version.
+ * 
+ * magnum.fd is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ * 
+ * You should have received a copy of the GNU General Public License
+ * along with magnum.fd. If not, see <http://www.gnu.org/licenses/>.
+ */
+
+#ifndef LAYERED_MATRIX_VECTOR_CONVOLUTION_FFT_H
+#define LAYERED_MATRIX_VECTOR_CONVOLUTION_FFT_H
+
+#include <fftw3.h>
+
+#include "matrix/matty.h"
+
+// Convolution with a symmetric tensor field (e.g. the demag tensor) for thin
+// multilayer films: Only the x- and y-directions are Fourier transformed (2D
+// FFTs per layer), and the layers are coupled by an explicit dim_z x dim_z sum
+// in Fourier space. Nothing is padded in z-direction, which saves FFT work and
+// kernel memory compared to SymmetricMatrixVectorConvolution_FFT when dim_z is
+// small (up to about 8 layers). The multiplication is O(dim_z^2) per
+// frequency, so the 3D FFT convolution is faster for thicker meshes.
+//
+// The tensor field has the same layout as for the other convolutions, i.e.
+// shape (6, exp_x, exp_y, exp_z). Its symmetries (Nxx, Nxy, Nyy, Nzz even and
+// Nxz, Nyz odd in z) are used to store only one real number per frequency,
+// tensor component and layer offset. CPU only.
+class LayeredMatrixVectorConvolution_FFT
+{
+public:
+	LayeredMatrixVectorConvolution_FFT(const Matrix &lhs, int dim_x, int dim_y, int dim_z);
+	virtual ~LayeredMatrixVectorConvolution_FFT();
+
+	virtual void execute(const VectorMatrix &rhs, VectorMatrix &res);
+
+private:
+	void setupKernel(const Matrix &lhs);
+	void setupPlans();
+	void calculate_multiplication(const double *in_x, const double *in_y, const double *in_z, double *out_x, double *out_y, double *out_z);
+
+	// Problem size
+	int dim_x, dim_y, dim_z;
+	int exp_x, exp_y, exp_z;
+
+	// Transformed tensor field, shape (exp_x/2+1, exp_y, dim_z) per component,
+	// the last index is the layer offset. Real part of Nxx, Nxy, Nyy, Nzz and
+	// imaginary part of Nxz, Nyz.
+	Matrix K[6];
+
+	// Buffers: zero-padded fields (exp_x, dim_y, dim_z), spectra of the
+	// magnetization and of the result (complex, exp_x/2+1, exp_y, dim_z)
+	Matrix R[3], C[3], H[3];
+
+	// FFTW plan handles
+	fftw_plan plan_x_r2c, plan_x_c2r;
+	fftw_plan plan_y_forw, plan_y_inv;
+};
+
+#endif
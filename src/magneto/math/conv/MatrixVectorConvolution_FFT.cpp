@@ -28,8 +28,11 @@
 #include "Benchmark.h"
 #include "Logger.h"
 
+#include <stdexcept>
+
 #include "kernels/Transposer_CPU.h"
 #include "kernels/Transformer_CPU.h"
+#include "kernels/Transformer_CPU32.h"
 #include "kernels/cpu_multiplication.h"
 #ifdef HAVE_CUDA
 #include <cuda_runtime.h> // cudaThreadSynchronize
@@ -39,7 +42,7 @@
 #endif
 
 MatrixVectorConvolution_FFT::MatrixVectorConvolution_FFT(int dim_x, int dim_y, int dim_z, int exp_x, int exp_y, int exp_z)
-	: dim_x(dim_x), dim_y(dim_y), dim_z(dim_z), exp_x(exp_x), exp_y(exp_y), exp_z(exp_z)
+	: single_precision(false), dim_x(dim_x), dim_y(dim_y), dim_z(dim_z), exp_x(exp_x), exp_y(exp_y), exp_z(exp_z), batch_size(0)
 {
 	// Enable CUDA?
 #ifdef HAVE_CUDA
@@ -55,6 +58,7 @@ MatrixVectorConvolution_FFT::MatrixVectorConvolution_FFT(int dim_x, int dim_y, i
 	for (int e=0; e<3; ++e) {
 		s1.M[e] = Matrix(Shape(2, exp_x/2+1, exp_y, exp_z));
 		s2.M[e] = Matrix(Shape(2, exp_x/2+1, exp_y, exp_z));
+		f1.M[e] = f2.M[e] = 0;
 	}
 
 	// Initializer transposer & transformer
@@ -86,6 +90,8 @@ MatrixVectorConvolution_FFT::MatrixVectorConvolution_FFT(int dim_x, int dim_y, i
 		Benchmark::inst().setDescription("conv2d.ifft.transpose", "transpose for ifft");
 		Benchmark::inst().setDescription("conv2d.ifft.x", "partial FFT x");
 		Benchmark::inst().setDescription("conv2d.unpad", "unpadding");
+		Benchmark::inst().setDescription("conv2d.batch", "batched convolution total (2d)");
+		Benchmark::inst().setDescription("conv2d.batch.mult", "batched multiplication");
 	} else {
 		Benchmark::inst().setDescription("conv3d", "convolution total (3d)");
 		Benchmark::inst().setDescription("conv3d.pad", "padding");
@@ -103,11 +109,266 @@ MatrixVectorConvolution_FFT::MatrixVectorConvolution_FFT(int dim_x, int dim_y, i
 		Benchmark::inst().setDescription("conv3d.ifft.transpose1", "transpose1 for ifft");
 		Benchmark::inst().setDescription("conv3d.ifft.x", "partial FFT x");
 		Benchmark::inst().setDescription("conv3d.unpad", "unpadding");
+		Benchmark::inst().setDescription("conv3d.batch", "batched convolution total (3d)");
+		Benchmark::inst().setDescription("conv3d.batch.mult", "batched multiplication");
 	}
 }
 
 MatrixVectorConvolution_FFT::~MatrixVectorConvolution_FFT()
 {
+	for (int e=0; e<3; ++e) {
+		fftwf_free(f1.M[e]);
+		fftwf_free(f2.M[e]);
+	}
+}
+
+bool MatrixVectorConvolution_FFT::enableSinglePrecision()
+{
+	if (single_precision) return true;
+
+	if (use_cuda) {
+		LOG_WARN << "Single precision CPU convolution not available when CUDA is enabled";
+		return false;
+	}
+
+	if (!convertKernelToSinglePrecision()) {
+		LOG_WARN << "Single precision not supported by this convolution";
+		return false;
+	}
+
+	LOG_DEBUG << "Using single precision CPU routines for Matrix-Vector convolution";
+	const int size = 2 * (exp_x/2+1) * exp_y * exp_z;
+	for (int e=0; e<3; ++e) {
+		f1.M[e] = (float*)fftwf_malloc(sizeof(float) * size);
+		f2.M[e] = (float*)fftwf_malloc(sizeof(float) * size);
+		if (!f1.M[e] || !f2.M[e]) throw std::runtime_error("MatrixVectorConvolution_FFT: out of memory");
+		s1.M[e] = Matrix(Shape()); // double precision buffers are not needed anymore
+		s2.M[e] = Matrix(Shape());
+	}
+	transformer32.reset(new Transformer_CPU32(dim_x, dim_y, dim_z, exp_x, exp_y, exp_z));
+	transformer.reset();
+
+	single_precision = true;
+	return true;
+}
+
+void MatrixVectorConvolution_FFT::calculate_multiplication_single(float *, float *, float *)
+{
+	assert(0); // only called if convertKernelToSinglePrecision succeeded
+}
+
+void MatrixVectorConvolution_FFT::calculate_multiplication_many(int num_fields, double **inout_x, double **inout_y, double **inout_z)
+{
+	for (int f=0; f<num_fields; ++f) {
+		calculate_multiplication(inout_x[f], inout_y[f], inout_z[f]);
+	}
+}
+
+void MatrixVectorConvolution_FFT::execute_many(const std::vector<VectorMatrix*> &rhs, const std::vector<VectorMatrix*> &res)
+{
+	if (rhs.size() != res.size()) {
+		throw std::invalid_argument("MatrixVectorConvolution_FFT::execute_many: rhs and res must have the same number of fields");
+	}
+	const int num_fields = rhs.size();
+
+	if (use_cuda || single_precision || num_fields < 2) {
+		for (int f=0; f<num_fields; ++f) execute(*rhs[f], *res[f]);
+		return;
+	}
+
+	for (int f=0; f<num_fields; ++f) {
+		assert(rhs[f]->dimX() == dim_x && rhs[f]->dimY() == dim_y && rhs[f]->dimZ() == dim_z);
+		assert(res[f]->dimX() == dim_x && res[f]->dimY() == dim_y && res[f]->dimZ() == dim_z);
+	}
+
+	// (Re-)allocate the batch buffers and plans if the number of fields has changed.
+	const int block = 2 * (exp_x/2+1) * exp_y * exp_z;
+	if (num_fields != batch_size) {
+		LOG_DEBUG << "Setting up batched Matrix-Vector convolution for " << num_fields << " fields";
+		transformer_batch.reset();
+		b1 = Matrix(Shape(block, 3*num_fields));
+		b2 = Matrix(Shape(block, 3*num_fields));
+		transformer_batch.reset(new Transformer_CPU(dim_x, dim_y, dim_z, exp_x, exp_y, exp_z, 3*num_fields));
+		batch_size = num_fields;
+	}
+
+	Matrix::rw_accessor b1_acc(b1), b2_acc(b2);
+	double *b1_ptr = b1_acc.ptr(), *b2_ptr = b2_acc.ptr();
+
+	// Component buffers of field f
+	std::vector<double*> s1x(num_fields), s1y(num_fields), s1z(num_fields);
+	std::vector<double*> s2x(num_fields), s2y(num_fields), s2z(num_fields);
+	for (int f=0; f<num_fields; ++f) {
+		s1x[f] = b1_ptr + (3*f+0)*block; s1y[f] = b1_ptr + (3*f+1)*block; s1z[f] = b1_ptr + (3*f+2)*block;
+		s2x[f] = b2_ptr + (3*f+0)*block; s2y[f] = b2_ptr + (3*f+1)*block; s2z[f] = b2_ptr + (3*f+2)*block;
+	}
+
+	Transformer_CPU &fft = *transformer_batch;
+	if (is_2d) {
+		TIC("conv2d.batch");
+			for (int f=0; f<num_fields; ++f) transposer->copy_pad(*rhs[f], s1x[f], s1y[f], s1z[f]);
+			fft.transform_forward_x(b1_ptr);
+			for (int f=0; f<num_fields; ++f) transposer->transpose_zeropad_yzx(s1x[f], s1y[f], s1z[f], s2x[f], s2y[f], s2z[f]);
+			fft.transform_forward_y(b2_ptr);
+
+			TIC("conv2d.batch.mult");
+				calculate_multiplication_many(num_fields, &s2x[0], &s2y[0], &s2z[0]);
+			TOC("conv2d.batch.mult");
+
+			fft.transform_inverse_y(b2_ptr);
+			for (int f=0; f<num_fields; ++f) transposer->transpose_unpad_xyz(s2x[f], s2y[f], s2z[f], s1x[f], s1y[f], s1z[f]);
+			fft.transform_inverse_x(b1_ptr);
+			for (int f=0; f<num_fields; ++f) transposer->copy_unpad(s1x[f], s1y[f], s1z[f], *res[f]);
+		TOC("conv2d.batch");
+	} else {
+		TIC("conv3d.batch");
+			for (int f=0; f<num_fields; ++f) transposer->copy_pad(*rhs[f], s1x[f], s1y[f], s1z[f]);
+			fft.transform_forward_x(b1_ptr);
+			for (int f=0; f<num_fields; ++f) transposer->transpose_zeropad_yzx(s1x[f], s1y[f], s1z[f], s2x[f], s2y[f], s2z[f]);
+			fft.transform_forward_y(b2_ptr);
+			for (int f=0; f<num_fields; ++f) transposer->transpose_zeropad_zxy(s2x[f], s2y[f], s2z[f], s1x[f], s1y[f], s1z[f]);
+			fft.transform_forward_z(b1_ptr);
+
+			TIC("conv3d.batch.mult");
+				calculate_multiplication_many(num_fields, &s1x[0], &s1y[0], &s1z[0]);
+			TOC("conv3d.batch.mult");
+
+			fft.transform_inverse_z(b1_ptr);
+			for (int f=0; f<num_fields; ++f) transposer->transpose_unpad_yzx(s1x[f], s1y[f], s1z[f], s2x[f], s2y[f], s2z[f]);
+			fft.transform_inverse_y(b2_ptr);
+			for (int f=0; f<num_fields; ++f) transposer->transpose_unpad_xyz(s2x[f], s2y[f], s2z[f], s1x[f], s1y[f], s1z[f]);
+			fft.transform_inverse_x(b1_ptr);
+			for (int f=0; f<num_fields; ++f) transposer->copy_unpad(s1x[f], s1y[f], s1z[f], *res[f]);
+		TOC("conv3d.batch");
+	}
+}
+
+// CPU convolution, either in double (real=double, Transformer=Transformer_CPU)
+// or in single precision (real=float, Transformer=Transformer_CPU32).
+template <typename real, class Transformer>
+void MatrixVectorConvolution_FFT::execute_cpu(const VectorMatrix &rhs, VectorMatrix &res, real *s1x, real *s1y, real *s1z, real *s2x, real *s2y, real *s2z, Transformer &fft)
+{
+	if (is_2d) {
+		TIC("conv2d");
+			TIC("conv2d.pad");
+				transposer->copy_pad(rhs, s1x, s1y, s1z);
+			TOC("conv2d.pad");
+
+			TIC("conv2d.fft");
+				TIC("conv2d.fft.x");
+					fft.transform_forward_x(s1x);
+					fft.transform_forward_x(s1y);
+					fft.transform_forward_x(s1z);
+				TOC("conv2d.fft.x");
+
+				TIC("conv2d.fft.transpose");
+					transposer->transpose_zeropad_yzx(s1x, s1y, s1z, s2x, s2y, s2z);
+				TOC("conv2d.fft.transpose");
+
+				TIC("conv2d.fft.y");
+					fft.transform_forward_y(s2x);
+					fft.transform_forward_y(s2y);
+					fft.transform_forward_y(s2z);
+				TOC("conv2d.fft.y");
+			TOC("conv2d.fft");
+
+			TIC("conv2d.mult");
+				multiply(s2x, s2y, s2z);
+			TOC("conv2d.mult");
+
+			TIC("conv2d.ifft");
+				TIC("conv2d.ifft.y");
+					fft.transform_inverse_y(s2x);
+					fft.transform_inverse_y(s2y);
+					fft.transform_inverse_y(s2z);
+				TOC("conv2d.ifft.y");
+
+				TIC("conv2d.ifft.transpose");
+					transposer->transpose_unpad_xyz(s2x, s2y, s2z, s1x, s1y, s1z);
+				TOC("conv2d.ifft.transpose");
+
+				TIC("conv2d.ifft.x");
+					fft.transform_inverse_x(s1x);
+					fft.transform_inverse_x(s1y);
+					fft.transform_inverse_x(s1z);
+				TOC("conv2d.ifft.x");
+			TOC("conv2d.ifft");
+
+			TIC("conv2d.unpad");
+			transposer->copy_unpad(s1x, s1y, s1z, res);
+			TOC("conv2d.unpad");
+		TOC("conv2d");
+	} else {
+		TIC("conv3d");
+			TIC("conv3d.pad");
+				transposer->copy_pad(rhs, s1x, s1y, s1z);
+			TOC("conv3d.pad");
+
+			TIC("conv3d.fft");
+				TIC("conv3d.fft.x");
+					fft.transform_forward_x(s1x);
+					fft.transform_forward_x(s1y);
+					fft.transform_forward_x(s1z);
+				TOC("conv3d.fft.x");
+
+				TIC("conv3d.fft.transpose1");
+					transposer->transpose_zeropad_yzx(s1x, s1y, s1z, s2x, s2y, s2z);
+				TOC("conv3d.fft.transpose1");
+
+				TIC("conv3d.fft.y");
+					fft.transform_forward_y(s2x);
+					fft.transform_forward_y(s2y);
+					fft.transform_forward_y(s2z);
+				TOC("conv3d.fft.y");
+
+				TIC("conv3d.fft.transpose2");
+					transposer->transpose_zeropad_zxy(s2x, s2y, s2z, s1x, s1y, s1z);
+				TOC("conv3d.fft.transpose2");
+
+				TIC("conv3d.fft.z");
+					fft.transform_forward_z(s1x);
+					fft.transform_forward_z(s1y);
+					fft.transform_forward_z(s1z);
+				TOC("conv3d.fft.z");
+			TOC("conv3d.fft");
+
+			TIC("conv3d.mult");
+				multiply(s1x, s1y, s1z);
+			TOC("conv3d.mult");
+
+			TIC("conv3d.ifft");
+				TIC("conv3d.ifft.z");
+					fft.transform_inverse_z(s1x);
+					fft.transform_inverse_z(s1y);
+					fft.transform_inverse_z(s1z);
+				TOC("conv3d.ifft.z");
+
+				TIC("conv3d.ifft.transpose2");
+					transposer->transpose_unpad_yzx(s1x, s1y, s1z, s2x, s2y, s2z);
+				TOC("conv3d.ifft.transpose2");
+
+				TIC("conv3d.ifft.y");
+					fft.transform_inverse_y(s2x);
+					fft.transform_inverse_y(s2y);
+					fft.transform_inverse_y(s2z);
+				TOC("conv3d.ifft.y");
+
+				TIC("conv3d.ifft.transpose1");
+					transposer->transpose_unpad_xyz(s2x, s2y, s2z, s1x, s1y, s1z);
+				TOC("conv3d.ifft.transpose1");
+
+				TIC("conv3d.ifft.x");
+					fft.transform_inverse_x(s1x);
+					fft.transform_inverse_x(s1y);
+					fft.transform_inverse_x(s1z);
+				TOC("conv3d.ifft.x");
+			TOC("conv3d.ifft");
+
+			TIC("conv3d.unpad");
+				transposer->copy_unpad(s1x, s1y, s1z, res);
+			TOC("conv3d.unpad");
+		TOC("conv3d");
+	}
 }
 
 void MatrixVectorConvolution_FFT::execute(const VectorMatrix &rhs, VectorMatrix &res)
@@ -116,131 +377,12 @@ void MatrixVectorConvolution_FFT::execute(const VectorMatrix &rhs, VectorMatrix
 	assert(res.dimX() == dim_x && res.dimY() == dim_y && res.dimZ() == dim_z);
 
 	if (!use_cuda) {
-		Matrix::rw_accessor s1x_acc(s1.M[0]), s1y_acc(s1.M[1]), s1z_acc(s1.M[2]);
-		Matrix::rw_accessor s2x_acc(s2.M[0]), s2y_acc(s2.M[1]), s2z_acc(s2.M[2]);
-		double *s1x = s1x_acc.ptr(), *s1y = s1y_acc.ptr(), *s1z = s1z_acc.ptr();
-		double *s2x = s2x_acc.ptr(), *s2y = s2y_acc.ptr(), *s2z = s2z_acc.ptr();
-
-		if (is_2d) {
-			TIC("conv2d");
-				TIC("conv2d.pad");
-					transposer->copy_pad(rhs, s1x, s1y, s1z);
-				TOC("conv2d.pad");
-
-				TIC("conv2d.fft");
-					TIC("conv2d.fft.x");
-						transformer->transform_forward_x(s1x);
-						transformer->transform_forward_x(s1y);
-						transformer->transform_forward_x(s1z);
-					TOC("conv2d.fft.x");
-
-					TIC("conv2d.fft.transpose");
-						transposer->transpose_zeropad_yzx(s1x, s1y, s1z, s2x, s2y, s2z);
-					TOC("conv2d.fft.transpose");
-
-					TIC("conv2d.fft.y");
-						transformer->transform_forward_y(s2x);
-						transformer->transform_forward_y(s2y);
-						transformer->transform_forward_y(s2z);
-					TOC("conv2d.fft.y");
-				TOC("conv2d.fft");
-
-				TIC("conv2d.mult");
-					calculate_multiplication(s2x, s2y, s2z);
-				TOC("conv2d.mult");
-
-				TIC("conv2d.ifft");
-					TIC("conv2d.ifft.y");
-						transformer->transform_inverse_y(s2x);
-						transformer->transform_inverse_y(s2y);
-						transformer->transform_inverse_y(s2z);
-					TOC("conv2d.ifft.y");
-
-					TIC("conv2d.ifft.transpose");
-						transposer->transpose_unpad_xyz(s2x, s2y, s2z, s1x, s1y, s1z);
-					TOC("conv2d.ifft.transpose");
-
-					TIC("conv2d.ifft.x");
-						transformer->transform_inverse_x(s1x);
-						transformer->transform_inverse_x(s1y);
-						transformer->transform_inverse_x(s1z);
-					TOC("conv2d.ifft.x");
-				TOC("conv2d.ifft");
-
-				TIC("conv2d.unpad");
-				transposer->copy_unpad(s1x, s1y, s1z, res);
-				TOC("conv2d.unpad");
-			TOC("conv2d");
+		if (single_precision) {
+			execute_cpu(rhs, res, f1.M[0], f1.M[1], f1.M[2], f2.M[0], f2.M[1], f2.M[2], *transformer32);
 		} else {
-			TIC("conv3d");
-				TIC("conv3d.pad");
-					transposer->copy_pad(rhs, s1x, s1y, s1z);
-				TOC("conv3d.pad");
-
-				TIC("conv3d.fft");
-					TIC("conv3d.fft.x");
-						transformer->transform_forward_x(s1x);
-						transformer->transform_forward_x(s1y);
-						transformer->transform_forward_x(s1z);
-					TOC("conv3d.fft.x");
-
-					TIC("conv3d.fft.transpose1");
-						transposer->transpose_zeropad_yzx(s1x, s1y, s1z, s2x, s2y, s2z);
-					TOC("conv3d.fft.transpose1");
-
-					TIC("conv3d.fft.y");
-						transformer->transform_forward_y(s2x);
-						transformer->transform_forward_y(s2y);
-						transformer->transform_forward_y(s2z);
-					TOC("conv3d.fft.y");
-
-					TIC("conv3d.fft.transpose2");
-						transposer->transpose_zeropad_zxy(s2x, s2y, s2z, s1x, s1y, s1z);
-					TOC("conv3d.fft.transpose2");
-
-					TIC("conv3d.fft.z");
-						transformer->transform_forward_z(s1x);
-						transformer->transform_forward_z(s1y);
-						transformer->transform_forward_z(s1z);
-					TOC("conv3d.fft.z");
-				TOC("conv3d.fft");
-
-				TIC("conv3d.mult");
-					calculate_multiplication(s1x, s1y, s1z);
-				TOC("conv3d.mult");
-
-				TIC("conv3d.ifft");
-					TIC("conv3d.ifft.z");
-						transformer->transform_inverse_z(s1x);
-						transformer->transform_inverse_z(s1y);
-						transformer->transform_inverse_z(s1z);
-					TOC("conv3d.ifft.z");
-
-					TIC("conv3d.ifft.transpose2");
-						transposer->transpose_unpad_yzx(s1x, s1y, s1z, s2x, s2y, s2z);
-					TOC("conv3d.ifft.transpose2");
-
-					TIC("conv3d.ifft.y");
-						transformer->transform_inverse_y(s2x);
-						transformer->transform_inverse_y(s2y);
-						transformer->transform_inverse_y(s2z);
-					TOC("conv3d.ifft.y");
-
-					TIC("conv3d.ifft.transpose1");
-						transposer->transpose_unpad_xyz(s2x, s2y, s2z, s1x, s1y, s1z);
-					TOC("conv3d.ifft.transpose1");
-
-					TIC("conv3d.ifft.x");
-						transformer->transform_inverse_x(s1x);
-						transformer->transform_inverse_x(s1y);
-						transformer->transform_inverse_x(s1z);
-					TOC("conv3d.ifft.x");
-				TOC("conv3d.ifft");
-
-				TIC("conv3d.unpad");
-					transposer->copy_unpad(s1x, s1y, s1z, res);
-				TOC("conv3d.unpad");
-			TOC("conv3d");
+			Matrix::rw_accessor s1x_acc(s1.M[0]), s1y_acc(s1.M[1]), s1z_acc(s1.M[2]);
+			Matrix::rw_accessor s2x_acc(s2.M[0]), s2y_acc(s2.M[1]), s2z_acc(s2.M[2]);
+			execute_cpu(rhs, res, s1x_acc.ptr(), s1y_acc.ptr(), s1z_acc.ptr(), s2x_acc.ptr(), s2y_acc.ptr(), s2z_acc.ptr(), *transformer);
 		}
 	} else { // cuda
 #ifdef HAVE_CUDA
@@ -24,11 +24,13 @@
 #define MATRIX_VECTOR_CONVOLUTION_FFT_H
 
 #include <memory>
+#include <vector>
 
 #include "matrix/matty.h"
 
 #include "kernels/Transposer_CPU.h"
 #include "kernels/Transformer_CPU.h"
+#include "kernels/Transformer_CPU32.h"
 #ifdef HAVE_CUDA
 #include "kernels/Transposer_CUDA.h"
 #include "kernels/Transformer_CUDA.h"
@@ -42,14 +44,33 @@ public:
 
 	virtual void execute(const VectorMatrix &rhs, VectorMatrix &res);
 
+	// Convolves several fields at once: res[f] = conv(rhs[f]). The FFTs of all
+	// fields are done by the same plans, and each kernel element is loaded once
+	// for all fields. Only the double precision CPU convolution is batched,
+	// otherwise this is equivalent to calling execute for each field.
+	void execute_many(const std::vector<VectorMatrix*> &rhs, const std::vector<VectorMatrix*> &res);
+
+	// Switches the CPU convolution to single precision (fftwf plans, float
+	// buffers and kernel). Input and output stay double precision.
+	// Returns false (and does nothing) if not supported.
+	bool enableSinglePrecision();
+	bool isSinglePrecision() const { return single_precision; }
+
 protected:
 	virtual void calculate_multiplication(double *inout_x, double *inout_y, double *inout_z) = 0;
+	// Multiplication of num_fields fields. The default calls calculate_multiplication for each field.
+	virtual void calculate_multiplication_many(int num_fields, double **inout_x, double **inout_y, double **inout_z);
+	// Single precision support: convertKernelToSinglePrecision is called once by
+	// enableSinglePrecision, calculate_multiplication_single by execute afterwards.
+	virtual bool convertKernelToSinglePrecision() { return false; }
+	virtual void calculate_multiplication_single(float *inout_x, float *inout_y, float *inout_z);
 #ifdef HAVE_CUDA
 	virtual void calculate_multiplication_cuda(float *inout_x, float *inout_y, float *inout_z) = 0;
 #endif
 
 	bool use_cuda;
 	bool is_2d;
+	bool single_precision;
 
 	// Problem size
 	int dim_x, dim_y, dim_z;
@@ -59,14 +80,29 @@ protected:
 	struct scratch_buf {
 		Matrix M[3];
 	} s1, s2;
+	struct scratch_buf32 {
+		float *M[3]; // allocated with fftwf_malloc
+	} f1, f2;
+	// Batch buffers for execute_many: 3*batch_size consecutive component buffers
+	int batch_size;
+	Matrix b1, b2;
 
 	// Transpose and transform algorithms
 	std::auto_ptr<Transposer_CPU> transposer;
 	std::auto_ptr<Transformer_CPU> transformer;
+	std::auto_ptr<Transformer_CPU32> transformer32;
+	std::auto_ptr<Transformer_CPU> transformer_batch; // for 3*batch_size buffers
 #ifdef HAVE_CUDA
 	std::auto_ptr<Transposer_CUDA> transposer_cuda;
 	std::auto_ptr<Transformer_CUDA> transformer_cuda;
 #endif
+
+private:
+	template <typename real, class Transformer>
+	void execute_cpu(const VectorMatrix &rhs, VectorMatrix &res, real *s1x, real *s1y, real *s1z, real *s2x, real *s2y, real *s2z, Transformer &fft);
+
+	void multiply(double *inout_x, double *inout_y, double *inout_z) { calculate_multiplication(inout_x, inout_y, inout_z); }
+	void multiply(float *inout_x, float *inout_y, float *inout_z) { calculate_multiplication_single(inout_x, inout_y, inout_z); }
 };
 
 #endif
@@ -31,21 +31,15 @@
 
 #include "Logger.h"
 
+#include <algorithm>
+#include <cstdlib>
+
 SymmetricMatrixVectorConvolution_FFT::SymmetricMatrixVectorConvolution_FFT(const Matrix &lhs, int dim_x, int dim_y, int dim_z)
-	: MatrixVectorConvolution_FFT(dim_x, dim_y, dim_z, lhs.getShape().getDim(1), lhs.getShape().getDim(2), lhs.getShape().getDim(3))
+	: MatrixVectorConvolution_FFT(dim_x, dim_y, dim_z, lhs.getShape().getDim(1), lhs.getShape().getDim(2), lhs.getShape().getDim(3)), real_kernel(false)
 {
 	assert(lhs.getShape().getDim(0) == 6);
 
-	// Allocate buffers
-	for (int e=0; e<6; ++e) {
-		if (!is_2d) {
-			N.re[e] = Matrix(Shape(exp_z, exp_x/2+1, exp_y));
-			N.im[e] = Matrix(Shape(exp_z, exp_x/2+1, exp_y));
-		} else {
-			N.re[e] = Matrix(Shape(exp_y, exp_z, exp_x/2+1));
-			N.im[e] = Matrix(Shape(exp_y, exp_z, exp_x/2+1));
-		}
-	}
+	allocateKernel();
 
 	// Setup tensor field
 	TensorFieldSetup setup(6, dim_x, dim_y, dim_z, exp_x, exp_y, exp_z);
@@ -61,19 +55,65 @@ SymmetricMatrixVectorConvolution_FFT::SymmetricMatrixVectorConvolution_FFT(const
 	}
 
 	// Optimization: Handle cases where imaginary parts of FFT(N[i]) (=N.im[i]) are zero.
-	/*for (int i=0; i<6; ++i) {
-		cout << i << " absmax(re): " << N.re[i].absMax() << endl;
-		cout << i << " absmax(im): " << N.im[i].absMax() << endl;
-	}*/
+	// This is the case for the demag tensor, which is even (Nxx, Nyy, Nzz) or odd in
+	// two directions (Nxy, Nxz, Nyz). Up to round-off errors, that is.
+	double max_re = 0.0, max_im = 0.0;
+	for (int e=0; e<6; ++e) {
+		max_re = std::max(max_re, N.re[e].absMax());
+		max_im = std::max(max_im, N.im[e].absMax());
+	}
+	LOG_DEBUG << "Convolution kernel: absmax(re) = " << max_re << ", absmax(im) = " << max_im;
+
+	if (max_im <= 1e-10 * max_re && !std::getenv("MAGNUM_CONV_NO_REAL_KERNEL")) {
+		LOG_DEBUG << "Convolution kernel is real";
+		real_kernel = true;
+		for (int e=0; e<6; ++e) N.im[e] = Matrix(Shape());
+	}
+}
+
+SymmetricMatrixVectorConvolution_FFT::SymmetricMatrixVectorConvolution_FFT(int dim_x, int dim_y, int dim_z, int exp_x, int exp_y, int exp_z, bool real_kernel)
+	: MatrixVectorConvolution_FFT(dim_x, dim_y, dim_z, exp_x, exp_y, exp_z), real_kernel(real_kernel)
+{
+	allocateKernel();
 }
 
 SymmetricMatrixVectorConvolution_FFT::~SymmetricMatrixVectorConvolution_FFT()
 {
 }
 
+void SymmetricMatrixVectorConvolution_FFT::allocateKernel()
+{
+	const Shape shape = !is_2d ? Shape(exp_z, exp_x/2+1, exp_y) : Shape(exp_y, exp_z, exp_x/2+1);
+	for (int e=0; e<6; ++e) {
+		N.re[e] = Matrix(shape);
+		if (!real_kernel) N.im[e] = Matrix(shape);
+	}
+}
+
+// The transformed (and transposed) kernel: N.re[0..5], followed by N.im[0..5] unless the kernel is real.
+std::vector<Matrix*> SymmetricMatrixVectorConvolution_FFT::getKernel()
+{
+	assert(!isSinglePrecision());
+	std::vector<Matrix*> kernel;
+	for (int e=0; e<6; ++e) kernel.push_back(&N.re[e]);
+	if (!real_kernel) {
+		for (int e=0; e<6; ++e) kernel.push_back(&N.im[e]);
+	}
+	return kernel;
+}
+
 void SymmetricMatrixVectorConvolution_FFT::calculate_multiplication(double *inout_x, double *inout_y, double *inout_z)
 {
 	Matrix::ro_accessor N_re_acc[6] = {N.re[0], N.re[1], N.re[2], N.re[3], N.re[4], N.re[5]};
+	if (real_kernel) {
+		cpu_multiplication_symmetric_real(
+			(exp_x/2+1) * exp_y * exp_z, // num_elements
+			N_re_acc[0].ptr(), N_re_acc[1].ptr(), N_re_acc[2].ptr(), N_re_acc[3].ptr(), N_re_acc[4].ptr(), N_re_acc[5].ptr(),
+			inout_x, inout_y, inout_z
+		);
+		return;
+	}
+
 	Matrix::ro_accessor N_im_acc[6] = {N.im[0], N.im[1], N.im[2], N.im[3], N.im[4], N.im[5]};
 	cpu_multiplication_symmetric(
 		(exp_x/2+1) * exp_y * exp_z, // num_elements
@@ -83,10 +123,78 @@ void SymmetricMatrixVectorConvolution_FFT::calculate_multiplication(double *inou
 	);
 }
 
+void SymmetricMatrixVectorConvolution_FFT::calculate_multiplication_many(int num_fields, double **inout_x, double **inout_y, double **inout_z)
+{
+	Matrix::ro_accessor N_re_acc[6] = {N.re[0], N.re[1], N.re[2], N.re[3], N.re[4], N.re[5]};
+	if (real_kernel) {
+		cpu_multiplication_symmetric_real_many(
+			(exp_x/2+1) * exp_y * exp_z, num_fields,
+			N_re_acc[0].ptr(), N_re_acc[1].ptr(), N_re_acc[2].ptr(), N_re_acc[3].ptr(), N_re_acc[4].ptr(), N_re_acc[5].ptr(),
+			inout_x, inout_y, inout_z
+		);
+		return;
+	}
+
+	Matrix::ro_accessor N_im_acc[6] = {N.im[0], N.im[1], N.im[2], N.im[3], N.im[4], N.im[5]};
+	cpu_multiplication_symmetric_many(
+		(exp_x/2+1) * exp_y * exp_z, num_fields,
+		N_re_acc[0].ptr(), N_re_acc[1].ptr(), N_re_acc[2].ptr(), N_re_acc[3].ptr(), N_re_acc[4].ptr(), N_re_acc[5].ptr(),
+		N_im_acc[0].ptr(), N_im_acc[1].ptr(), N_im_acc[2].ptr(), N_im_acc[3].ptr(), N_im_acc[4].ptr(), N_im_acc[5].ptr(),
+		inout_x, inout_y, inout_z
+	);
+}
+
+static void toSinglePrecision(Matrix &in, std::vector<float> &out)
+{
+	{
+		Matrix::ro_accessor in_acc(in);
+		out.assign(in_acc.ptr(), in_acc.ptr() + in.size());
+	}
+	in = Matrix(Shape());
+}
+
+bool SymmetricMatrixVectorConvolution_FFT::convertKernelToSinglePrecision()
+{
+	for (int e=0; e<6; ++e) {
+		toSinglePrecision(N.re[e], N32.re[e]);
+		if (!real_kernel) toSinglePrecision(N.im[e], N32.im[e]);
+	}
+	return true;
+}
+
+void SymmetricMatrixVectorConvolution_FFT::calculate_multiplication_single(float *inout_x, float *inout_y, float *inout_z)
+{
+	const std::vector<float> *re = N32.re, *im = N32.im;
+	if (real_kernel) {
+		cpu_multiplication_symmetric_real(
+			(exp_x/2+1) * exp_y * exp_z, // num_elements
+			&re[0][0], &re[1][0], &re[2][0], &re[3][0], &re[4][0], &re[5][0],
+			inout_x, inout_y, inout_z
+		);
+		return;
+	}
+
+	cpu_multiplication_symmetric(
+		(exp_x/2+1) * exp_y * exp_z, // num_elements
+		&re[0][0], &re[1][0], &re[2][0], &re[3][0], &re[4][0], &re[5][0],
+		&im[0][0], &im[1][0], &im[2][0], &im[3][0], &im[4][0], &im[5][0],
+		inout_x, inout_y, inout_z
+	);
+}
+
 #ifdef HAVE_CUDA
 void SymmetricMatrixVectorConvolution_FFT::calculate_multiplication_cuda(float *inout_x, float *inout_y, float *inout_z)
 {
 	Matrix::const_cu32_accessor N_re_acc[6] = {N.re[0], N.re[1], N.re[2], N.re[3], N.re[4], N.re[5]};
+	if (real_kernel) {
+		cuda_multiplication_symmetric_real(
+			(exp_x/2+1) * exp_y * exp_z, // num_elements
+			N_re_acc[0].ptr(), N_re_acc[1].ptr(), N_re_acc[2].ptr(), N_re_acc[3].ptr(), N_re_acc[4].ptr(), N_re_acc[5].ptr(),
+			inout_x, inout_y, inout_z
+		);
+		return;
+	}
+
 	Matrix::const_cu32_accessor N_im_acc[6] = {N.im[0], N.im[1], N.im[2], N.im[3], N.im[4], N.im[5]};
 	cuda_multiplication_symmetric(
 		(exp_x/2+1) * exp_y * exp_z, // num_elements
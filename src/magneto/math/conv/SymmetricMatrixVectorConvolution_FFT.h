@@ -25,14 +25,29 @@
 
 #include "MatrixVectorConvolution_FFT.h"
 
+#include <vector>
+
 class SymmetricMatrixVectorConvolution_FFT : public MatrixVectorConvolution_FFT
 {
 public:
 	SymmetricMatrixVectorConvolution_FFT(const Matrix &lhs, int dim_x, int dim_y, int dim_z);
+	// Creates the convolution without a kernel. The kernel must be filled in via getKernel.
+	SymmetricMatrixVectorConvolution_FFT(int dim_x, int dim_y, int dim_z, int exp_x, int exp_y, int exp_z, bool real_kernel);
 	virtual ~SymmetricMatrixVectorConvolution_FFT();
 
+	// Access to the transformed (and transposed) kernel matrices, e.g. for caching.
+	// For real kernels, the imaginary parts are not stored. Not available
+	// in single precision mode.
+	std::vector<Matrix*> getKernel();
+	bool hasRealKernel() const { return real_kernel; }
+
 private:
+	void allocateKernel();
+
 	virtual void calculate_multiplication(double *inout_x, double *inout_y, double *inout_z);
+	virtual void calculate_multiplication_many(int num_fields, double **inout_x, double **inout_y, double **inout_z);
+	virtual bool convertKernelToSinglePrecision();
+	virtual void calculate_multiplication_single(float *inout_x, float *inout_y, float *inout_z);
 #ifdef HAVE_CUDA
 	virtual void calculate_multiplication_cuda(float *inout_x, float *inout_y, float *inout_z);
 #endif
@@ -41,6 +56,10 @@ private:
 	struct tensor_buf {
 		Matrix re[6], im[6];
 	} N;
+	struct tensor_buf32 {
+		std::vector<float> re[6], im[6];
+	} N32; // used instead of N in single precision mode
+	bool real_kernel; // if true, N.im is unused
 };
 
 #endif
@@ -46,7 +46,6 @@
 #include <fstream>
 using namespace std;
 
-static const int fftw_strategy = FFTW_MEASURE;
 static const int R = 1;
 
 VectorVectorConvolution_FFT::VectorVectorConvolution_FFT(const Matrix &lhs, int dim_x, int dim_y, int dim_z, double delta_x, double delta_y, double delta_z)
@@ -266,6 +265,7 @@ void VectorVectorConvolution_FFT::setupInverseTransforms()
 		Matrix::rw_accessor s1x_acc(s1.M[0]);
 		double *s1x = s1x_acc.ptr();
 
+		const unsigned fftw_strategy = getFFTWPlannerFlags();
 		fftw_iodim dims, loop;
 
 		// X-Transform: ((dim_y+R)*(dim_z+R)) x 1d-C2C-FFT (length: exp_x) in x-direction, in-place transform
@@ -25,23 +25,23 @@
 #include <stdexcept>
 #include <cassert>
 
-#include "os.h"
+#include "Magneto.h"
 
-static int fftw_strategy = FFTW_MEASURE;
-
-Transformer_CPU::Transformer_CPU(int dim_x, int dim_y, int dim_z, int exp_x, int exp_y, int exp_z)
-	: dim_x(dim_x), dim_y(dim_y), dim_z(dim_z), exp_x(exp_x), exp_y(exp_y), exp_z(exp_z)
+Transformer_CPU::Transformer_CPU(int dim_x, int dim_y, int dim_z, int exp_x, int exp_y, int exp_z, int num_blocks)
+	: dim_x(dim_x), dim_y(dim_y), dim_z(dim_z), exp_x(exp_x), exp_y(exp_y), exp_z(exp_z), num_blocks(num_blocks)
 {
-	if (os::disable_SSE_for_FFTW()) {
-		fftw_strategy |= FFTW_UNALIGNED; // see os.h for explanation
-	}
+	const unsigned fftw_strategy = getFFTWPlannerFlags();
 
-	Matrix tmp(Shape(2, exp_x, exp_y, exp_z));
+	Matrix tmp(Shape(2*num_blocks, exp_x, exp_y, exp_z));
 	Matrix::rw_accessor tmp_acc(tmp);
 	double *tmp_inout = tmp_acc.ptr();
 
-	// Create fftw plans
-	fftw_iodim dims, loop;
+	// Create fftw plans. The loop over the blocks (if any) is the outer loop dimension.
+	const int block = (exp_x/2+1)*exp_y*exp_z; // block size in complex numbers
+	const int loop_rank = (num_blocks > 1) ? 2 : 1;
+	fftw_iodim dims, loops[2];
+	fftw_iodim &loop = loops[loop_rank-1];
+	loops[0].n = num_blocks;
 
 	// X-Transform: (dim_y*dim_z) x 1d-C2C-FFT (length: exp_x) in x-direction, in-place transform
 	dims.n = exp_x;
@@ -51,10 +51,12 @@ Transformer_CPU::Transformer_CPU(int dim_x, int dim_y, int dim_z, int exp_x, int
 	loop.n = dim_y*dim_z;
 	loop.is = exp_x;
 	loop.os = exp_x/2+1;
+	loops[0].is = 2*block;
+	loops[0].os = block;
 
 	plan_x_r2c = fftw_plan_guru_dft_r2c(
 		1, &dims, 
-		1, &loop, 
+		loop_rank, loops, 
 		(      double*)tmp_inout,
 		(fftw_complex*)tmp_inout, 
 		fftw_strategy
@@ -68,10 +70,12 @@ Transformer_CPU::Transformer_CPU(int dim_x, int dim_y, int dim_z, int exp_x, int
 	loop.n = dim_y*dim_z;
 	loop.is = exp_x/2+1;
 	loop.os = exp_x;
+	loops[0].is = block;
+	loops[0].os = 2*block;
 
 	plan_x_c2r = fftw_plan_guru_dft_c2r(
 		1, &dims, 
-		1, &loop, 
+		loop_rank, loops, 
 		(fftw_complex*)tmp_inout, 
 		(      double*)tmp_inout,
 		fftw_strategy
@@ -86,10 +90,11 @@ Transformer_CPU::Transformer_CPU(int dim_x, int dim_y, int dim_z, int exp_x, int
 	loop.n = dim_z*(exp_x/2+1);
 	loop.is = exp_y;
 	loop.os = exp_y;
+	loops[0].is = loops[0].os = block;
 
 	plan_y_forw = fftw_plan_guru_dft(
 		1, &dims,
-		1, &loop,
+		loop_rank, loops,
 		(fftw_complex*)tmp_inout, // in
 		(fftw_complex*)tmp_inout, // out (-> in-place transform)
 		FFTW_FORWARD,
@@ -99,7 +104,7 @@ Transformer_CPU::Transformer_CPU(int dim_x, int dim_y, int dim_z, int exp_x, int
 
 	plan_y_inv = fftw_plan_guru_dft(
 		1, &dims,
-		1, &loop,
+		loop_rank, loops,
 		(fftw_complex*)tmp_inout, // in
 		(fftw_complex*)tmp_inout, // out (-> in-place transform)
 		FFTW_BACKWARD,
@@ -115,10 +120,11 @@ Transformer_CPU::Transformer_CPU(int dim_x, int dim_y, int dim_z, int exp_x, int
 	loop.n = (exp_x/2+1)*exp_y;
 	loop.is = exp_z;
 	loop.os = exp_z;
+	loops[0].is = loops[0].os = block;
 
 	plan_z_forw = fftw_plan_guru_dft(
 		1, &dims,
-		1, &loop,
+		loop_rank, loops,
 		(fftw_complex*)tmp_inout, // in
 		(fftw_complex*)tmp_inout, // out (-> in-place transform)
 		FFTW_FORWARD,
@@ -128,7 +134,7 @@ Transformer_CPU::Transformer_CPU(int dim_x, int dim_y, int dim_z, int exp_x, int
 
 	plan_z_inv = fftw_plan_guru_dft(
 		1, &dims,
-		1, &loop,
+		loop_rank, loops,
 		(fftw_complex*)tmp_inout, // in
 		(fftw_complex*)tmp_inout, // out (-> in-place transform)
 		FFTW_BACKWARD,
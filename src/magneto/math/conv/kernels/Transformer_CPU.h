@@ -27,10 +27,19 @@
 
 #include "matrix/matty.h"
 
+// The partial FFTs are pruned: The x- and y-transforms only run over the lines
+// that contain data (the zero-padded lines are skipped in the forward direction,
+// and the lines discarded by the unpad kernels are skipped in the inverse
+// direction). Only the z-transforms (the y-transforms in 2D) cover the full
+// padded size.
+//
+// With num_blocks > 1, each transform is applied to num_blocks consecutive
+// buffers of 2*(exp_x/2+1)*exp_y*exp_z doubles at once (e.g. the components of
+// several fields), using a second loop dimension of the FFTW plans.
 class Transformer_CPU
 {
 public:
-	Transformer_CPU(int dim_x, int dim_y, int dim_z, int exp_x, int exp_y, int exp_z);
+	Transformer_CPU(int dim_x, int dim_y, int dim_z, int exp_x, int exp_y, int exp_z, int num_blocks = 1);
 	~Transformer_CPU();
 
 	void transform_forward_x(double *inout);
@@ -43,6 +52,7 @@ public:
 private:
 	const int dim_x, dim_y, dim_z;
 	const int exp_x, exp_y, exp_z;
+	const int num_blocks;
 
 	// FFTW plan handles
 	fftw_plan plan_x_r2c, plan_x_c2r;
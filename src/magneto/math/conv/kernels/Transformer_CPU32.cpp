@@ -0,0 +1,175 @@
+/*
+ * Copyright 2012-2014 by the MicroMagnum Team
+ * Copyright 2014 by the magnum.fd Team
+ *
+ * This file is part of magnum.fd.
+ * magnum.fd is based heavily on MicroMagnum.
+ * (https://github.com/MicroMagnum/MicroMagnum)
+ * 
+ * magnum.fd is free software: you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation, either version 3 of the License, or
+ * (at your option) any later version.
+ * 
+ * magnum.fd is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ * 
+ * You should have received a copy of the GNU General Public License
+ * along with magnum.fd. If not, see <http://www.gnu.org/licenses/>.
+ */
+
+#include "Transformer_CPU32.h"
+
+#include <stdexcept>
+#include <cassert>
+
+#include "Magneto.h"
+
+Transformer_CPU32::Transformer_CPU32(int dim_x, int dim_y, int dim_z, int exp_x, int exp_y, int exp_z)
+	: dim_x(dim_x), dim_y(dim_y), dim_z(dim_z), exp_x(exp_x), exp_y(exp_y), exp_z(exp_z)
+{
+	const unsigned fftw_strategy = getFFTWPlannerFlags();
+
+	float *tmp_inout = (float*)fftwf_malloc(sizeof(float) * 2 * exp_x * exp_y * exp_z);
+	if (!tmp_inout) throw std::runtime_error("Transformer_CPU32: out of memory");
+
+	// Create fftw plans
+	fftwf_iodim dims, loop;
+
+	// X-Transform: (dim_y*dim_z) x 1d-C2C-FFT (length: exp_x) in x-direction, in-place transform
+	dims.n = exp_x;
+	dims.is = 1;
+	dims.os = 1;
+	
+	loop.n = dim_y*dim_z;
+	loop.is = exp_x;
+	loop.os = exp_x/2+1;
+
+	plan_x_r2c = fftwf_plan_guru_dft_r2c(
+		1, &dims, 
+		1, &loop, 
+		(        float*)tmp_inout,
+		(fftwf_complex*)tmp_inout, 
+		fftw_strategy
+	);
+	assert(plan_x_r2c);
+
+	dims.n = exp_x;
+	dims.is = 1;
+	dims.os = 1;
+	
+	loop.n = dim_y*dim_z;
+	loop.is = exp_x/2+1;
+	loop.os = exp_x;
+
+	plan_x_c2r = fftwf_plan_guru_dft_c2r(
+		1, &dims, 
+		1, &loop, 
+		(fftwf_complex*)tmp_inout, 
+		(        float*)tmp_inout,
+		fftw_strategy
+	);
+	assert(plan_x_c2r);
+
+	// Y-Transform: (dim_z*exp_x/2+1) x 1d-C2C-FFT (length: exp_y) in x-direction, in-place transform
+	dims.n = exp_y;
+	dims.is = 1;
+	dims.os = 1;
+	
+	loop.n = dim_z*(exp_x/2+1);
+	loop.is = exp_y;
+	loop.os = exp_y;
+
+	plan_y_forw = fftwf_plan_guru_dft(
+		1, &dims,
+		1, &loop,
+		(fftwf_complex*)tmp_inout, // in
+		(fftwf_complex*)tmp_inout, // out (-> in-place transform)
+		FFTW_FORWARD,
+		fftw_strategy
+	);
+	assert(plan_y_forw);
+
+	plan_y_inv = fftwf_plan_guru_dft(
+		1, &dims,
+		1, &loop,
+		(fftwf_complex*)tmp_inout, // in
+		(fftwf_complex*)tmp_inout, // out (-> in-place transform)
+		FFTW_BACKWARD,
+		fftw_strategy
+	);
+	assert(plan_y_inv);
+
+	// Z-Transform: (exp_x/2+1*exp_y) x 1d-C2C-FFT (length: exp_z) in x-direction, in-place transform
+	dims.n = exp_z;
+	dims.is = 1;
+	dims.os = 1;
+	
+	loop.n = (exp_x/2+1)*exp_y;
+	loop.is = exp_z;
+	loop.os = exp_z;
+
+	plan_z_forw = fftwf_plan_guru_dft(
+		1, &dims,
+		1, &loop,
+		(fftwf_complex*)tmp_inout, // in
+		(fftwf_complex*)tmp_inout, // out (-> in-place transform)
+		FFTW_FORWARD,
+		fftw_strategy
+	);
+	assert(plan_z_forw);
+
+	plan_z_inv = fftwf_plan_guru_dft(
+		1, &dims,
+		1, &loop,
+		(fftwf_complex*)tmp_inout, // in
+		(fftwf_complex*)tmp_inout, // out (-> in-place transform)
+		FFTW_BACKWARD,
+		fftw_strategy
+	);
+	assert(plan_z_inv);
+
+	fftwf_free(tmp_inout);
+}
+
+Transformer_CPU32::~Transformer_CPU32()
+{
+	fftwf_destroy_plan(plan_x_r2c);
+	fftwf_destroy_plan(plan_x_c2r);
+	fftwf_destroy_plan(plan_y_forw);
+	fftwf_destroy_plan(plan_y_inv);
+	fftwf_destroy_plan(plan_z_forw);
+	fftwf_destroy_plan(plan_z_inv);
+}
+
+void Transformer_CPU32::transform_forward_x(float *inout)
+{
+	fftwf_execute_dft_r2c(plan_x_r2c, (float*)inout, (fftwf_complex*)inout);
+}
+
+void Transformer_CPU32::transform_forward_y(float *inout)
+{
+	fftwf_execute_dft(plan_y_forw, (fftwf_complex*)inout, (fftwf_complex*)inout);
+}
+
+void Transformer_CPU32::transform_forward_z(float *inout)
+{
+	fftwf_execute_dft(plan_z_forw, (fftwf_complex*)inout, (fftwf_complex*)inout);
+}
+
+void Transformer_CPU32::transform_inverse_z(float *inout)
+{
+	fftwf_execute_dft(plan_z_inv, (fftwf_complex*)inout, (fftwf_complex*)inout);
+}
+
+void Transformer_CPU32::transform_inverse_y(float *inout)
+{
+	fftwf_execute_dft(plan_y_inv, (fftwf_complex*)inout, (fftwf_complex*)inout);
+}
+
+void Transformer_CPU32::transform_inverse_x(float *inout)
+{
+	fftwf_execute_dft_c2r(plan_x_c2r, (fftwf_complex*)inout, (float*)inout);
+}
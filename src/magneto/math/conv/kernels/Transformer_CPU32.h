@@ -0,0 +1,52 @@
+/*
+ * Copyright 2012-2014 by the MicroMagnum Team
+ * Copyright 2014 by the magnum.fd Team
+ *
+ * This file is part of magnum.fd.
+ * magnum.fd is based heavily on MicroMagnum.
+ * (https://github.com/MicroMagnum/MicroMagnum)
+ * 
+ * magnum.fd is free software: you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation, either version 3 of the License, or
+ * (at your option) any later version.
+ * 
+ * magnum.fd is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ * 
+ * You should have received a copy of the GNU General Public License
+ * along with magnum.fd. If not, see <http://www.gnu.org/licenses/>.
+ */
+
+#ifndef TRANSFORMER_CPU32_H
+#define TRANSFORMER_CPU32_H
+
+#include <fftw3.h>
+
+// Single precision version of Transformer_CPU (uses the fftwf_* routines).
+class Transformer_CPU32
+{
+public:
+	Transformer_CPU32(int dim_x, int dim_y, int dim_z, int exp_x, int exp_y, int exp_z);
+	~Transformer_CPU32();
+
+	void transform_forward_x(float *inout);
+	void transform_forward_y(float *inout);
+	void transform_forward_z(float *inout);
+	void transform_inverse_z(float *inout);
+	void transform_inverse_y(float *inout);
+	void transform_inverse_x(float *inout);
+
+private:
+	const int dim_x, dim_y, dim_z;
+	const int exp_x, exp_y, exp_z;
+
+	// FFTW plan handles
+	fftwf_plan plan_x_r2c, plan_x_c2r;
+	fftwf_plan plan_y_forw, plan_y_inv;
+	fftwf_plan plan_z_forw, plan_z_inv;
+};
+
+#endif
@@ -27,6 +27,8 @@
 #include "cpu_transpose_zeropad.h"
 #include "cpu_transpose_unpad.h"
 
+#include "Magneto.h"
+
 Transposer_CPU::Transposer_CPU(int dim_x, int dim_y, int dim_z, int exp_x, int exp_y, int exp_z)
 	: dim_x(dim_x), dim_y(dim_y), dim_z(dim_z), exp_x(exp_x), exp_y(exp_y), exp_z(exp_z)
 {
@@ -68,7 +70,7 @@ void Transposer_CPU::initPlans()
 		(fftw_complex*)in, 
 		(fftw_complex*)out, 
 		FFTW_FORWARD,
-		FFTW_MEASURE
+		getFFTWPlannerFlags()
 	);
 
 	delete [] in;
@@ -159,3 +161,76 @@ void Transposer_CPU::transpose_unpad_xyz(const double *in_x, const double *in_y,
 	fftw_execute_dft(plan_unpad_yzx_xyz, (fftw_complex*)in_z, (fftw_complex*)out_z);*/
 }
 
+void Transposer_CPU::copy_pad(const VectorMatrix &M, float *out_x, float *out_y, float *out_z)
+{
+	VectorMatrix::const_accessor M_acc(M);
+	const double *in_x = M_acc.ptr_x();
+	const double *in_y = M_acc.ptr_y();
+	const double *in_z = M_acc.ptr_z();
+
+	cpu_copy_pad_r2r(
+		dim_x, dim_y, dim_z, 
+		exp_x, 
+		in_x, in_y, in_z,
+		out_x, out_y, out_z
+	);
+}
+
+void Transposer_CPU::copy_unpad(const float *in_x, const float *in_y, const float *in_z, VectorMatrix &H)
+{
+	VectorMatrix::accessor H_acc(H);
+	double *out_x = H_acc.ptr_x();
+	double *out_y = H_acc.ptr_y();
+	double *out_z = H_acc.ptr_z();
+
+	cpu_copy_unpad_r2r(
+		exp_x, dim_y, dim_z, 
+		dim_x, 
+		in_x, in_y, in_z,
+		out_x, out_y, out_z
+	);
+}
+
+void Transposer_CPU::transpose_zeropad_yzx(const float *in_x, const float *in_y, const float *in_z, float *out_x, float *out_y, float *out_z)
+{
+	// xyz->yzx
+	cpu_transpose_zeropad_c2c(
+		exp_x/2+1, dim_y, dim_z, 
+		exp_y, 
+		in_x, in_y, in_z,
+		out_x, out_y, out_z
+	);
+}
+
+void Transposer_CPU::transpose_zeropad_zxy(const float *in_x, const float *in_y, const float *in_z, float *out_x, float *out_y, float *out_z)
+{
+	// yzx->zxy
+	cpu_transpose_zeropad_c2c(
+		exp_y, dim_z, exp_x/2+1,
+		exp_z, 
+		in_x, in_y, in_z,
+		out_x, out_y, out_z
+	);
+}
+
+void Transposer_CPU::transpose_unpad_yzx(const float *in_x, const float *in_y, const float *in_z, float *out_x, float *out_y, float *out_z)
+{
+	// zxy->yzx
+	cpu_transpose_unpad_c2c(
+		exp_z, exp_x/2+1, exp_y,
+		dim_z, 
+		in_x, in_y, in_z,
+		out_x, out_y, out_z
+	);
+}
+
+void Transposer_CPU::transpose_unpad_xyz(const float *in_x, const float *in_y, const float *in_z, float *out_x, float *out_y, float *out_z)
+{
+	// yzx->xyz
+	cpu_transpose_unpad_c2c(
+		exp_y, dim_z, exp_x/2+1,
+		dim_y, 
+		in_x, in_y, in_z,
+		out_x, out_y, out_z
+	);
+}
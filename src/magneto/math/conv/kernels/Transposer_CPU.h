@@ -40,6 +40,14 @@ public:
 	void transpose_unpad_xyz(const double *in_x, const double *in_y, const double *in_z, double *out_x, double *out_y, double *out_z);
 	void copy_unpad(const double *in_x, const double *in_y, const double *in_z, VectorMatrix &H);
 
+	// single precision versions
+	void copy_pad(const VectorMatrix &M, float *out_x, float *out_y, float *out_z);
+	void transpose_zeropad_yzx(const float *in_x, const float *in_y, const float *in_z, float *out_x, float *out_y, float *out_z);
+	void transpose_zeropad_zxy(const float *in_x, const float *in_y, const float *in_z, float *out_x, float *out_y, float *out_z);
+	void transpose_unpad_yzx(const float *in_x, const float *in_y, const float *in_z, float *out_x, float *out_y, float *out_z);
+	void transpose_unpad_xyz(const float *in_x, const float *in_y, const float *in_z, float *out_x, float *out_y, float *out_z);
+	void copy_unpad(const float *in_x, const float *in_y, const float *in_z, VectorMatrix &H);
+
 private:
 	const int dim_x, dim_y, dim_z;
 	const int exp_x, exp_y, exp_z;
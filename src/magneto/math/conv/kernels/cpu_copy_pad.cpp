@@ -63,11 +63,12 @@ void cpu_copy_pad_r2c(
 	cpu_copy_pad_r2c_comp(dim_x, dim_y, dim_z, exp_x, in_z, out_z);
 }
 
+template <typename real>
 static void cpu_copy_pad_r2r_comp(
 	int dim_x, int dim_y, int dim_z,
 	int exp_x,
 	const double *in,  // size: dim_x * dim_y * dim_z
-	      double *out) // size: exp_x * dim_y * dim_z (zero-padded in x-direction from dim_x -> exp_x)
+	        real *out) // size: exp_x * dim_y * dim_z (zero-padded in x-direction from dim_x -> exp_x)
 {
 	const int  in_stride_x = 1 * 1;
 	const int  in_stride_y = 1 * dim_x;
@@ -81,10 +82,10 @@ static void cpu_copy_pad_r2r_comp(
 	for (int z=0; z<dim_z; ++z)
 	for (int y=0; y<dim_y; ++y)
 	for (int x=0; x<exp_x; ++x) {
-		double *dst = out + z*out_stride_z + y*out_stride_y + x*out_stride_x;
+		real *dst = out + z*out_stride_z + y*out_stride_y + x*out_stride_x;
 		if (x < dim_x) {
 			const double *src = in + z*in_stride_z + y*in_stride_y + x*in_stride_x;
-			dst[0] = src[0];
+			dst[0] = real(src[0]);
 		} else {
 			dst[0] = 0.0;
 		}
@@ -102,3 +103,13 @@ void cpu_copy_pad_r2r(
 	cpu_copy_pad_r2r_comp(dim_x, dim_y, dim_z, exp_x, in_z, out_z);
 }
 
+void cpu_copy_pad_r2r(
+	int dim_x, int dim_y, int dim_z,
+	int exp_x,
+	const double *in_x, const double *in_y, const double *in_z,
+	       float *out_x,       float *out_y,       float *out_z)
+{
+	cpu_copy_pad_r2r_comp(dim_x, dim_y, dim_z, exp_x, in_x, out_x);
+	cpu_copy_pad_r2r_comp(dim_x, dim_y, dim_z, exp_x, in_y, out_y);
+	cpu_copy_pad_r2r_comp(dim_x, dim_y, dim_z, exp_x, in_z, out_z);
+}
@@ -45,4 +45,12 @@ void cpu_copy_pad_r2r(
 	      double *out_x,       double *out_y,       double *out_z
 );
 
+// single precision output
+void cpu_copy_pad_r2r(
+	int dim_x, int dim_y, int dim_z,
+	int exp_x,
+	const double * in_x, const double * in_y, const double * in_z,
+	       float *out_x,        float *out_y,        float *out_z
+);
+
 #endif
@@ -66,10 +66,11 @@ void cpu_copy_unpad_c2r(
 	cpu_copy_unpad_c2r_comp(dim_x, dim_y, dim_z, red_x, in_x, out_x);
 }
 
+template <typename real>
 static void cpu_copy_unpad_r2r_comp(
 	int dim_x, int dim_y, int dim_z,
 	int red_x,
-	const double *in,  // size: dim_x * dim_y * dim_z
+	const   real *in,  // size: dim_x * dim_y * dim_z
 	      double *out) // size: red_x * dim_y * dim_z (cut in x-direction from dim_x -> red_x)
 {
 	const int  in_stride_x = 1 * 1;
@@ -84,8 +85,8 @@ static void cpu_copy_unpad_r2r_comp(
 	for (int z=0; z<dim_z; ++z)
 	for (int y=0; y<dim_y; ++y)
 	for (int x=0; x<red_x; ++x) {
-		      double *dst = out + z*out_stride_z + y*out_stride_y + x*out_stride_x;
-		const double *src =  in + z* in_stride_z + y* in_stride_y + x* in_stride_x;
+		    double *dst = out + z*out_stride_z + y*out_stride_y + x*out_stride_x;
+		const real *src =  in + z* in_stride_z + y* in_stride_y + x* in_stride_x;
 		dst[0] = src[0];
 	}
 }
@@ -109,3 +110,14 @@ void cpu_copy_unpad_r2r(
 {
 	cpu_copy_unpad_r2r_comp(dim_x, dim_y, dim_z, red_x, in_x, out_x);
 }
+
+void cpu_copy_unpad_r2r(
+	int dim_x, int dim_y, int dim_z,
+	int red_x,
+	const float *in_x, const float *in_y, const float *in_z,
+	     double *out_x,     double *out_y,     double *out_z)
+{
+	cpu_copy_unpad_r2r_comp(dim_x, dim_y, dim_z, red_x, in_x, out_x);
+	cpu_copy_unpad_r2r_comp(dim_x, dim_y, dim_z, red_x, in_y, out_y);
+	cpu_copy_unpad_r2r_comp(dim_x, dim_y, dim_z, red_x, in_z, out_z);
+}
@@ -36,6 +36,14 @@ void cpu_copy_unpad_r2r(
 	      double *out_x,       double *out_y,       double *out_z
 );
 
+// single precision input
+void cpu_copy_unpad_r2r(
+	int dim_x, int dim_y, int dim_z,
+	int red_x,
+	const  float * in_x, const  float * in_y, const  float * in_z,
+	      double *out_x,       double *out_y,       double *out_z
+);
+
 // scalar version...
 void cpu_copy_unpad_c2r(
 	int dim_x, int dim_y, int dim_z,
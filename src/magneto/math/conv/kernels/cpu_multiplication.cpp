@@ -56,43 +56,163 @@ inline void mul2(
 	res_r += cr*dr - ci*di; res_i += ci*dr + cr*di;
 }
 
-void cpu_multiplication_symmetric(
+template <typename real>
+static void cpu_multiplication_symmetric_impl(
 	int num_elements,
-	const double *Nxxr, const double *Nxyr, const double *Nxzr, const double *Nyyr, const double *Nyzr, const double *Nzzr, /*in*/
-	const double *Nxxi, const double *Nxyi, const double *Nxzi, const double *Nyyi, const double *Nyzi, const double *Nzzi, /*in*/
-	double *Mx, double *My, double *Mz) /*inout*/
+	const real *Nxxr, const real *Nxyr, const real *Nxzr, const real *Nyyr, const real *Nyzr, const real *Nzzr, /*in*/
+	const real *Nxxi, const real *Nxyi, const real *Nxzi, const real *Nyyi, const real *Nyzi, const real *Nzzi, /*in*/
+	real *Mx, real *My, real *Mz) /*inout*/
 {
 	for (int n=0; n<num_elements; ++n) {
 		const int m = n*2;
 
-		const double Nxx_r = Nxxr[n], Nxx_i = Nxxi[n];
-		const double Nxy_r = Nxyr[n], Nxy_i = Nxyi[n];
-		const double Nxz_r = Nxzr[n], Nxz_i = Nxzi[n];
-		const double Nyy_r = Nyyr[n], Nyy_i = Nyyi[n];
-		const double Nyz_r = Nyzr[n], Nyz_i = Nyzi[n];
-		const double Nzz_r = Nzzr[n], Nzz_i = Nzzi[n];
+		const real Nxx_r = Nxxr[n], Nxx_i = Nxxi[n];
+		const real Nxy_r = Nxyr[n], Nxy_i = Nxyi[n];
+		const real Nxz_r = Nxzr[n], Nxz_i = Nxzi[n];
+		const real Nyy_r = Nyyr[n], Nyy_i = Nyyi[n];
+		const real Nyz_r = Nyzr[n], Nyz_i = Nyzi[n];
+		const real Nzz_r = Nzzr[n], Nzz_i = Nzzi[n];
 
-		const double x_r = Mx[m+0], x_i = Mx[m+1];
-		const double y_r = My[m+0], y_i = My[m+1];
-		const double z_r = Mz[m+0], z_i = Mz[m+1];
+		const real x_r = Mx[m+0], x_i = Mx[m+1];
+		const real y_r = My[m+0], y_i = My[m+1];
+		const real z_r = Mz[m+0], z_i = Mz[m+1];
 
-		mul3<double>(Mx[m+0], Mx[m+1], // Hx = 
+		mul3<real>(Mx[m+0], Mx[m+1], // Hx = 
 		     x_r, x_i, Nxx_r, Nxx_i,   //      Nxx*Mx
 		     y_r, y_i, Nxy_r, Nxy_i,   //    + Nxy*My
 		     z_r, z_i, Nxz_r, Nxz_i);  //    + Nxz*Mz
 		     
-		mul3<double>(My[m+0], My[m+1], // Hy = 
+		mul3<real>(My[m+0], My[m+1], // Hy = 
 		     x_r, x_i, Nxy_r, Nxy_i,   //      Nyx*Mx
 		     y_r, y_i, Nyy_r, Nyy_i,   //    + Nyy*My
 		     z_r, z_i, Nyz_r, Nyz_i);  //    + Nyz*Mz
 
-		mul3<double>(Mz[m+0], Mz[m+1], // Hz = 
+		mul3<real>(Mz[m+0], Mz[m+1], // Hz = 
 		     x_r, x_i, Nxz_r, Nxz_i,   //       Nzx*Mx
 		     y_r, y_i, Nyz_r, Nyz_i,   //     + Nzy*My
 		     z_r, z_i, Nzz_r, Nzz_i);  //     + Nzz*Mz
 	}
 }
 
+template <typename real>
+static void cpu_multiplication_symmetric_real_impl(
+	int num_elements,
+	const real *Nxx, const real *Nxy, const real *Nxz, const real *Nyy, const real *Nyz, const real *Nzz, /*in*/
+	real *Mx, real *My, real *Mz) /*inout*/
+{
+	for (int n=0; n<num_elements; ++n) {
+		const int m = n*2;
+
+		const real x_r = Mx[m+0], x_i = Mx[m+1];
+		const real y_r = My[m+0], y_i = My[m+1];
+		const real z_r = Mz[m+0], z_i = Mz[m+1];
+
+		// Hx = Nxx*Mx + Nxy*My + Nxz*Mz
+		Mx[m+0] = Nxx[n]*x_r + Nxy[n]*y_r + Nxz[n]*z_r;
+		Mx[m+1] = Nxx[n]*x_i + Nxy[n]*y_i + Nxz[n]*z_i;
+
+		// Hy = Nyx*Mx + Nyy*My + Nyz*Mz
+		My[m+0] = Nxy[n]*x_r + Nyy[n]*y_r + Nyz[n]*z_r;
+		My[m+1] = Nxy[n]*x_i + Nyy[n]*y_i + Nyz[n]*z_i;
+
+		// Hz = Nzx*Mx + Nzy*My + Nzz*Mz
+		Mz[m+0] = Nxz[n]*x_r + Nyz[n]*y_r + Nzz[n]*z_r;
+		Mz[m+1] = Nxz[n]*x_i + Nyz[n]*y_i + Nzz[n]*z_i;
+	}
+}
+
+void cpu_multiplication_symmetric(
+	int num_elements,
+	const double *Nxxr, const double *Nxyr, const double *Nxzr, const double *Nyyr, const double *Nyzr, const double *Nzzr, /*in*/
+	const double *Nxxi, const double *Nxyi, const double *Nxzi, const double *Nyyi, const double *Nyzi, const double *Nzzi, /*in*/
+	double *Mx, double *My, double *Mz) /*inout*/
+{
+	cpu_multiplication_symmetric_impl(num_elements, Nxxr, Nxyr, Nxzr, Nyyr, Nyzr, Nzzr, Nxxi, Nxyi, Nxzi, Nyyi, Nyzi, Nzzi, Mx, My, Mz);
+}
+
+void cpu_multiplication_symmetric(
+	int num_elements,
+	const float *Nxxr, const float *Nxyr, const float *Nxzr, const float *Nyyr, const float *Nyzr, const float *Nzzr, /*in*/
+	const float *Nxxi, const float *Nxyi, const float *Nxzi, const float *Nyyi, const float *Nyzi, const float *Nzzi, /*in*/
+	float *Mx, float *My, float *Mz) /*inout*/
+{
+	cpu_multiplication_symmetric_impl(num_elements, Nxxr, Nxyr, Nxzr, Nyyr, Nyzr, Nzzr, Nxxi, Nxyi, Nxzi, Nyyi, Nyzi, Nzzi, Mx, My, Mz);
+}
+
+void cpu_multiplication_symmetric_real(
+	int num_elements,
+	const double *Nxx, const double *Nxy, const double *Nxz, const double *Nyy, const double *Nyz, const double *Nzz, /*in*/
+	double *Mx, double *My, double *Mz) /*inout*/
+{
+	cpu_multiplication_symmetric_real_impl(num_elements, Nxx, Nxy, Nxz, Nyy, Nyz, Nzz, Mx, My, Mz);
+}
+
+void cpu_multiplication_symmetric_real(
+	int num_elements,
+	const float *Nxx, const float *Nxy, const float *Nxz, const float *Nyy, const float *Nyz, const float *Nzz, /*in*/
+	float *Mx, float *My, float *Mz) /*inout*/
+{
+	cpu_multiplication_symmetric_real_impl(num_elements, Nxx, Nxy, Nxz, Nyy, Nyz, Nzz, Mx, My, Mz);
+}
+
+void cpu_multiplication_symmetric_many(
+	int num_elements, int num_fields,
+	const double *Nxxr, const double *Nxyr, const double *Nxzr, const double *Nyyr, const double *Nyzr, const double *Nzzr, /*in*/
+	const double *Nxxi, const double *Nxyi, const double *Nxzi, const double *Nyyi, const double *Nyzi, const double *Nzzi, /*in*/
+	double **Mx, double **My, double **Mz) /*inout*/
+{
+	for (int n=0; n<num_elements; ++n) {
+		const int m = n*2;
+
+		const double Nxx_r = Nxxr[n], Nxx_i = Nxxi[n];
+		const double Nxy_r = Nxyr[n], Nxy_i = Nxyi[n];
+		const double Nxz_r = Nxzr[n], Nxz_i = Nxzi[n];
+		const double Nyy_r = Nyyr[n], Nyy_i = Nyyi[n];
+		const double Nyz_r = Nyzr[n], Nyz_i = Nyzi[n];
+		const double Nzz_r = Nzzr[n], Nzz_i = Nzzi[n];
+
+		for (int f=0; f<num_fields; ++f) {
+			double *Hx = Mx[f] + m, *Hy = My[f] + m, *Hz = Mz[f] + m;
+
+			const double x_r = Hx[0], x_i = Hx[1];
+			const double y_r = Hy[0], y_i = Hy[1];
+			const double z_r = Hz[0], z_i = Hz[1];
+
+			mul3<double>(Hx[0], Hx[1], x_r, x_i, Nxx_r, Nxx_i, y_r, y_i, Nxy_r, Nxy_i, z_r, z_i, Nxz_r, Nxz_i);
+			mul3<double>(Hy[0], Hy[1], x_r, x_i, Nxy_r, Nxy_i, y_r, y_i, Nyy_r, Nyy_i, z_r, z_i, Nyz_r, Nyz_i);
+			mul3<double>(Hz[0], Hz[1], x_r, x_i, Nxz_r, Nxz_i, y_r, y_i, Nyz_r, Nyz_i, z_r, z_i, Nzz_r, Nzz_i);
+		}
+	}
+}
+
+void cpu_multiplication_symmetric_real_many(
+	int num_elements, int num_fields,
+	const double *Nxx, const double *Nxy, const double *Nxz, const double *Nyy, const double *Nyz, const double *Nzz, /*in*/
+	double **Mx, double **My, double **Mz) /*inout*/
+{
+	for (int n=0; n<num_elements; ++n) {
+		const int m = n*2;
+
+		const double N_xx = Nxx[n], N_xy = Nxy[n], N_xz = Nxz[n];
+		const double N_yy = Nyy[n], N_yz = Nyz[n], N_zz = Nzz[n];
+
+		for (int f=0; f<num_fields; ++f) {
+			double *Hx = Mx[f] + m, *Hy = My[f] + m, *Hz = Mz[f] + m;
+
+			const double x_r = Hx[0], x_i = Hx[1];
+			const double y_r = Hy[0], y_i = Hy[1];
+			const double z_r = Hz[0], z_i = Hz[1];
+
+			Hx[0] = N_xx*x_r + N_xy*y_r + N_xz*z_r;
+			Hx[1] = N_xx*x_i + N_xy*y_i + N_xz*z_i;
+			Hy[0] = N_xy*x_r + N_yy*y_r + N_yz*z_r;
+			Hy[1] = N_xy*x_i + N_yy*y_i + N_yz*z_i;
+			Hz[0] = N_xz*x_r + N_yz*y_r + N_zz*z_r;
+			Hz[1] = N_xz*x_i + N_yz*y_i + N_zz*z_i;
+		}
+	}
+}
+
 void cpu_multiplication_antisymmetric(
 	int num_elements,
 	const double *Nxyr, const double *Nxzr, const double *Nyzr, /*in*/
@@ -29,6 +29,37 @@ void cpu_multiplication_symmetric(
 	const double *Nxxi, const double *Nxyi, const double *Nxzi, const double *Nyyi, const double *Nyzi, const double *Nzzi, /*in*/
 	double *Mx, double *My, double *Mz); /*inout*/
 
+// Same as cpu_multiplication_symmetric, but for a real-valued tensor.
+void cpu_multiplication_symmetric_real(
+	int num_elements,
+	const double *Nxx, const double *Nxy, const double *Nxz, const double *Nyy, const double *Nyz, const double *Nzz, /*in*/
+	double *Mx, double *My, double *Mz); /*inout*/
+
+// Batched versions: Multiply num_fields fields (Mx[f], My[f], Mz[f]) at once,
+// loading each tensor element only once for all fields.
+void cpu_multiplication_symmetric_many(
+	int num_elements, int num_fields,
+	const double *Nxxr, const double *Nxyr, const double *Nxzr, const double *Nyyr, const double *Nyzr, const double *Nzzr, /*in*/
+	const double *Nxxi, const double *Nxyi, const double *Nxzi, const double *Nyyi, const double *Nyzi, const double *Nzzi, /*in*/
+	double **Mx, double **My, double **Mz); /*inout*/
+
+void cpu_multiplication_symmetric_real_many(
+	int num_elements, int num_fields,
+	const double *Nxx, const double *Nxy, const double *Nxz, const double *Nyy, const double *Nyz, const double *Nzz, /*in*/
+	double **Mx, double **My, double **Mz); /*inout*/
+
+// single precision versions
+void cpu_multiplication_symmetric(
+	int num_elements,
+	const float *Nxxr, const float *Nxyr, const float *Nxzr, const float *Nyyr, const float *Nyzr, const float *Nzzr, /*in*/
+	const float *Nxxi, const float *Nxyi, const float *Nxzi, const float *Nyyi, const float *Nyzi, const float *Nzzi, /*in*/
+	float *Mx, float *My, float *Mz); /*inout*/
+
+void cpu_multiplication_symmetric_real(
+	int num_elements,
+	const float *Nxx, const float *Nxy, const float *Nxz, const float *Nyy, const float *Nyz, const float *Nzz, /*in*/
+	float *Mx, float *My, float *Mz); /*inout*/
+
 void cpu_multiplication_antisymmetric(
 	int num_elements,
 	const double *Nxyr, const double *Nxzr, const double *Nyzr, /*in*/
@@ -22,11 +22,12 @@
 
 #include "cpu_transpose_unpad.h"
 
+template <typename real>
 static void cpu_transpose_unpad_c2c_3d_comp(
 	int dim_x, int dim_y, int dim_z,
 	int red_x,
-	const double *in,  // size: dim_x * dim_y * dim_z
-	      double *out) // size: dim_z * red_x * dim_y (cut in x-direction [of input] from dim_x->red_x)
+	const real *in,  // size: dim_x * dim_y * dim_z
+	      real *out) // size: dim_z * red_x * dim_y (cut in x-direction [of input] from dim_x->red_x)
 {
 	const int in_stride_x = 2 * 1;
 	const int in_stride_y = 2 * dim_x;
@@ -40,18 +41,19 @@ static void cpu_transpose_unpad_c2c_3d_comp(
 	for (int z=0; z<dim_y; ++z)
 	for (int y=0; y<red_x; ++y)
 	for (int x=0; x<dim_z; ++x) {
-		      double *dst = out + z*out_stride_z + y*out_stride_y + x*out_stride_x;
-		const double *src = in  + z* in_stride_y + y* in_stride_x + x* in_stride_z;
+		      real *dst = out + z*out_stride_z + y*out_stride_y + x*out_stride_x;
+		const real *src = in  + z* in_stride_y + y* in_stride_x + x* in_stride_z;
 		dst[0] = src[0];
 		dst[1] = src[1];
 	}
 }
 
+template <typename real>
 static void cpu_transpose_unpad_c2c_2d_comp(
 	int dim_x, int dim_z,
 	int red_x,
-	const double *in,   // size: dim_x * dim_z
-	      double *out)  // size: dim_z * red_x (cut in x-direction [of input] from dim_x->red_x)
+	const real *in,   // size: dim_x * dim_z
+	      real *out)  // size: dim_z * red_x (cut in x-direction [of input] from dim_x->red_x)
 {
 	const int in_stride_x = 2 * 1;
 	const int in_stride_y = 2 * dim_x;
@@ -62,8 +64,8 @@ static void cpu_transpose_unpad_c2c_2d_comp(
 	// (x,y,z) loop through the out matrix indices
 	for (int y=0; y<red_x; ++y)
 	for (int x=0; x<dim_z; ++x) {
-		      double *dst = out + y*out_stride_y + x*out_stride_x;
-		const double *src =  in + y* in_stride_x + x* in_stride_y;
+		      real *dst = out + y*out_stride_y + x*out_stride_x;
+		const real *src =  in + y* in_stride_x + x* in_stride_y;
 		dst[0] = src[0];
 		dst[1] = src[1];
 	}
@@ -87,6 +89,24 @@ void cpu_transpose_unpad_c2c(
 	}
 }
 
+void cpu_transpose_unpad_c2c(
+	int dim_x, int dim_y, int dim_z, // input size
+	int red_x, // red_x <= dim_x
+	const float *in_x, const float *in_y, const float *in_z,  // size: dim_x * dim_y * dim_z
+	      float *out_x,      float *out_y,      float *out_z)  // size: dim_z * red_x * dim_y (cut in x-direction [of input] from dim_x->red_x)
+{
+	const bool is_2d = (dim_y == 1);
+	if (is_2d) {
+		cpu_transpose_unpad_c2c_2d_comp(dim_x,        dim_z, red_x, in_x, out_x);
+		cpu_transpose_unpad_c2c_2d_comp(dim_x,        dim_z, red_x, in_y, out_y);
+		cpu_transpose_unpad_c2c_2d_comp(dim_x,        dim_z, red_x, in_z, out_z);
+	} else {
+		cpu_transpose_unpad_c2c_3d_comp(dim_x, dim_y, dim_z, red_x, in_x, out_x);
+		cpu_transpose_unpad_c2c_3d_comp(dim_x, dim_y, dim_z, red_x, in_y, out_y);
+		cpu_transpose_unpad_c2c_3d_comp(dim_x, dim_y, dim_z, red_x, in_z, out_z);
+	}
+}
+
 void cpu_transpose_unpad_c2c(
 	int dim_x, int dim_y, int dim_z, // input size
 	int red_x, // red_x <= dim_x
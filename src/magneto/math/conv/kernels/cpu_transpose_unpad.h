@@ -29,6 +29,13 @@ void cpu_transpose_unpad_c2c(
 	const double  *in_x, const double  *in_y, const double  *in_z,  // size: dim_x * dim_y * dim_z
 	      double *out_x,      double *out_y,       double *out_z);  // size: dim_z * red_x * dim_y (cut in x-direction [of input] from dim_x->red_x)
 
+// single precision version
+void cpu_transpose_unpad_c2c(
+	int dim_x, int dim_y, int dim_z, // input size
+	int red_x, // red_x <= dim_x
+	const float  *in_x, const float  *in_y, const float  *in_z,  // size: dim_x * dim_y * dim_z
+	      float *out_x,       float *out_y,       float *out_z);  // size: dim_z * red_x * dim_y (cut in x-direction [of input] from dim_x->red_x)
+
 // scalar version...
 void cpu_transpose_unpad_c2c(
 	int dim_x, int dim_y, int dim_z, // input size
@@ -22,11 +22,12 @@
 
 #include "cpu_transpose_zeropad.h"
 
+template <typename real>
 static void cpu_transpose_zeropad_c2c_3d_comp(
 	int dim_x, int dim_y, int dim_z, // input size
 	int exp_y,
-	const double *in,  // size: dim_x * dim_y * dim_z
-	      double *out) // size: exp_y * dim_z * dim_x (zero-padded in x-direction from dim_y -> exp_y)
+	const real *in,  // size: dim_x * dim_y * dim_z
+	      real *out) // size: exp_y * dim_z * dim_x (zero-padded in x-direction from dim_y -> exp_y)
 {
 	const int  in_stride_x = 2 * 1;
 	const int  in_stride_y = 2 * dim_x;
@@ -40,9 +41,9 @@ static void cpu_transpose_zeropad_c2c_3d_comp(
 	for (int z=0; z<dim_x; ++z)
 	for (int y=0; y<dim_z; ++y)
 	for (int x=0; x<exp_y; ++x) {
-		double *dst = out + z*out_stride_z + y*out_stride_y + x*out_stride_x;
+		real *dst = out + z*out_stride_z + y*out_stride_y + x*out_stride_x;
 		if (x < dim_y) { // x in [0..(dim_y-1)]: Transpose
-			const double *src = in + z*in_stride_x + y*in_stride_z + x*in_stride_y;
+			const real *src = in + z*in_stride_x + y*in_stride_z + x*in_stride_y;
 			dst[0] = src[0];
 			dst[1] = src[1];
 		} else { // x in [dim_y..(exp_y-1)]: Zero-pad
@@ -52,11 +53,12 @@ static void cpu_transpose_zeropad_c2c_3d_comp(
 	}
 }
 
+template <typename real>
 static void cpu_transpose_zeropad_c2c_2d_comp(
 	int dim_x, int dim_y, // input size
 	int exp_y,
-	const double *in,  // size: dim_x * dim_y
-	      double *out) // size: exp_y * dim_x (zero-padded in x-direction from dim_y -> exp_y)
+	const real *in,  // size: dim_x * dim_y
+	      real *out) // size: exp_y * dim_x (zero-padded in x-direction from dim_y -> exp_y)
 {
 	const int  in_stride_x = 2 * 1;
 	const int  in_stride_y = 2 * dim_x;
@@ -67,9 +69,9 @@ static void cpu_transpose_zeropad_c2c_2d_comp(
 	// (x,y) loop through the out matrix indices
 	for (int y=0; y<dim_x; ++y)
 	for (int x=0; x<exp_y; ++x) {
-		double *dst = out + y*out_stride_y + x*out_stride_x;
+		real *dst = out + y*out_stride_y + x*out_stride_x;
 		if (x < dim_y) { // x in [0..(dim_y-1)]: Transpose
-			const double *src = in + y*in_stride_x + x*in_stride_y;
+			const real *src = in + y*in_stride_x + x*in_stride_y;
 			dst[0] = src[0];
 			dst[1] = src[1];
 		} else { // x in [dim_y..(exp_y-1)]: Zero-pad
@@ -97,3 +99,20 @@ void cpu_transpose_zeropad_c2c(
 	}
 }
 
+void cpu_transpose_zeropad_c2c(
+	int dim_x, int dim_y, int dim_z,
+	int exp_y,
+	const float  *in_x, const float  *in_y, const float  *in_z, 
+	      float *out_x,       float *out_y,       float *out_z)          
+{
+	const bool is_2d = (dim_z == 1);
+	if (!is_2d) {
+		cpu_transpose_zeropad_c2c_3d_comp(dim_x, dim_y, dim_z, exp_y, in_x, out_x);
+		cpu_transpose_zeropad_c2c_3d_comp(dim_x, dim_y, dim_z, exp_y, in_y, out_y);
+		cpu_transpose_zeropad_c2c_3d_comp(dim_x, dim_y, dim_z, exp_y, in_z, out_z);
+	} else {
+		cpu_transpose_zeropad_c2c_2d_comp(dim_x, dim_y,        exp_y, in_x, out_x);
+		cpu_transpose_zeropad_c2c_2d_comp(dim_x, dim_y,        exp_y, in_y, out_y);
+		cpu_transpose_zeropad_c2c_2d_comp(dim_x, dim_y,        exp_y, in_z, out_z);
+	}
+}
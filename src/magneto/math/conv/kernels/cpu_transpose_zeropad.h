@@ -29,4 +29,11 @@ void cpu_transpose_zeropad_c2c(
 	const double  *in_x, const double  *in_y, const double  *in_z,   // size: dim_x * dim_y * dim_z
 	      double *out_x,       double *out_y,       double *out_z);  // size: exp_y * dim_z * dim_x
 
+// single precision version
+void cpu_transpose_zeropad_c2c(
+	int dim_x, int dim_y, int dim_z, // input size
+	int exp_y, // exp_y >= dim_x
+	const float  *in_x, const float  *in_y, const float  *in_z,   // size: dim_x * dim_y * dim_z
+	      float *out_x,       float *out_y,       float *out_z);  // size: exp_y * dim_z * dim_x
+
 #endif
@@ -207,6 +207,50 @@ void cuda_multiplication_symmetric(
 	CUDA_THREAD_SYNCHRONIZE();
 }
 
+////// SYMMETRIC, REAL TENSOR //////////////////////////////////////////////////////
+
+__global__
+void kernel_multiplication_symmetric_real(
+	const float *Nxx, const float *Nxy, const float *Nxz, const float *Nyy, const float *Nyz, const float *Nzz, /*in*/
+	float2 *Mx, float2 *My, float2 *Mz, /*inout*/
+	int num_elements)
+{
+	const int i = 256 * (blockIdx.x + blockIdx.y*gridDim.x) + threadIdx.x;
+
+	if (i < num_elements) {
+		const float2 x = Mx[i], y = My[i], z = Mz[i];
+
+		Mx[i] = make_float2(Nxx[i]*x.x + Nxy[i]*y.x + Nxz[i]*z.x, Nxx[i]*x.y + Nxy[i]*y.y + Nxz[i]*z.y);
+		My[i] = make_float2(Nxy[i]*x.x + Nyy[i]*y.x + Nyz[i]*z.x, Nxy[i]*x.y + Nyy[i]*y.y + Nyz[i]*z.y);
+		Mz[i] = make_float2(Nxz[i]*x.x + Nyz[i]*y.x + Nzz[i]*z.x, Nxz[i]*x.y + Nyz[i]*y.y + Nzz[i]*z.y);
+	}
+}
+
+void cuda_multiplication_symmetric_real(
+	int num_elements,
+	const float *Nxx, const float *Nxy, const float *Nxz, const float *Nyy, const float *Nyz, const float *Nzz, /*in*/
+	float *Mx, float *My, float *Mz) /*inout*/
+{
+	static const int MAX_GRID_LENGTH = 65535;
+
+	const int num_blocks = (num_elements + 256 - 1) / 256;
+	const int num_blocks_y = (num_blocks + MAX_GRID_LENGTH - 1) / MAX_GRID_LENGTH;
+	const int num_blocks_x = (num_blocks + num_blocks_y - 1) / num_blocks_y;
+
+	const dim3 grid_dim(num_blocks_x, num_blocks_y, 1);
+	const dim3 block_dim(256, 1, 1);
+
+	kernel_multiplication_symmetric_real<<<grid_dim, block_dim>>>(
+		Nxx, Nxy, Nxz, Nyy, Nyz, Nzz,
+		(float2*)Mx, (float2*)My, (float2*)Mz,
+		num_elements
+	);
+	checkCudaLastError("kernel_multiplication_symmetric_real() execution failed");
+
+	// done.
+	CUDA_THREAD_SYNCHRONIZE();
+}
+
 ////// ASYMMETRIC //////////////////////////////////////////////////////////////////
 
 __global__
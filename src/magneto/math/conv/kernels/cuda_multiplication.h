@@ -29,6 +29,12 @@ void cuda_multiplication_symmetric(
 	const float *Nxxi, const float *Nxyi, const float *Nxzi, const float *Nyyi, const float *Nyzi, const float *Nzzi, /*in*/
 	float *Mx, float *My, float *Mz); /*inout*/
 
+// Same as cuda_multiplication_symmetric, but for a real-valued tensor.
+void cuda_multiplication_symmetric_real(
+	int num_elements,
+	const float *Nxx, const float *Nxy, const float *Nxz, const float *Nyy, const float *Nyz, const float *Nzz, /*in*/
+	float *Mx, float *My, float *Mz); /*inout*/
+
 void cuda_multiplication_antisymmetric(
 	int num_elements,
 	const float *Nxyr, const float *Nxzr, const float *Nyzr, /*in*/
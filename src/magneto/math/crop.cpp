@@ -0,0 +1,91 @@
+/*
+ * Copyright 2012-2014 by the MicroMagnum Team
+ * Copyright 2014 by the magnum.fd Team
+ *
+ * This file is part of magnum.fd.
+ * magnum.fd is based heavily on MicroMagnum.
+ * (https://github.com/MicroMagnum/MicroMagnum)
+ * 
+ * magnum.fd is free software: you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation, either version 3 of the License, or
+ * (at your option) any later version.
+ * 
+ * magnum.fd is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ * 
+ * You should have received a copy of the GNU General Public License
+ * along with magnum.fd. If not, see <http://www.gnu.org/licenses/>.
+ */
+
+#include "config.h"
+#include "crop.h"
+
+#include <algorithm>
+#include <cassert>
+
+std::vector<int> nonzero_bounding_box(const Matrix &A)
+{
+	const int dim_x = A.dimX(), dim_y = A.dimY(), dim_z = A.dimZ();
+
+	std::vector<int> box;
+	if (A.isUniform()) {
+		if (A.getUniformValue() != 0.0) {
+			box.push_back(0); box.push_back(0); box.push_back(0);
+			box.push_back(dim_x); box.push_back(dim_y); box.push_back(dim_z);
+		}
+		return box;
+	}
+
+	int x0 = dim_x, y0 = dim_y, z0 = dim_z, x1 = 0, y1 = 0, z1 = 0;
+
+	Matrix::ro_accessor A_acc(A);
+	const double *a = A_acc.ptr();
+	int i = 0;
+	for (int z=0; z<dim_z; ++z)
+	for (int y=0; y<dim_y; ++y)
+	for (int x=0; x<dim_x; ++x) {
+		if (a[i++] != 0.0) {
+			x0 = std::min(x0, x); x1 = std::max(x1, x+1);
+			y0 = std::min(y0, y); y1 = std::max(y1, y+1);
+			z0 = std::min(z0, z); z1 = std::max(z1, z+1);
+		}
+	}
+
+	if (x1 > 0) {
+		box.push_back(x0); box.push_back(y0); box.push_back(z0);
+		box.push_back(x1); box.push_back(y1); box.push_back(z1);
+	}
+	return box;
+}
+
+void copy_box(
+	const VectorMatrix &in, VectorMatrix &out,
+	int in_x, int in_y, int in_z,
+	int out_x, int out_y, int out_z,
+	int size_x, int size_y, int size_z)
+{
+	assert(in_x >= 0 && in_y >= 0 && in_z >= 0 && in_x+size_x <= in.dimX() && in_y+size_y <= in.dimY() && in_z+size_z <= in.dimZ());
+	assert(out_x >= 0 && out_y >= 0 && out_z >= 0 && out_x+size_x <= out.dimX() && out_y+size_y <= out.dimY() && out_z+size_z <= out.dimZ());
+
+	if (in.isUniform() && size_x == out.dimX() && size_y == out.dimY() && size_z == out.dimZ()) {
+		out.fill(in.getUniformValue());
+		return;
+	}
+
+	VectorMatrix::const_accessor in_acc(in);
+	VectorMatrix::accessor out_acc(out);
+	const double *in_x_ptr = in_acc.ptr_x(), *in_y_ptr = in_acc.ptr_y(), *in_z_ptr = in_acc.ptr_z();
+	double *out_x_ptr = out_acc.ptr_x(), *out_y_ptr = out_acc.ptr_y(), *out_z_ptr = out_acc.ptr_z();
+
+	for (int z=0; z<size_z; ++z)
+	for (int y=0; y<size_y; ++y) {
+		const int i = in_x  + in.dimX()  * ((in_y+y)  + in.dimY()  * (in_z+z));
+		const int o = out_x + out.dimX() * ((out_y+y) + out.dimY() * (out_z+z));
+		std::copy(in_x_ptr + i, in_x_ptr + i + size_x, out_x_ptr + o);
+		std::copy(in_y_ptr + i, in_y_ptr + i + size_x, out_y_ptr + o);
+		std::copy(in_z_ptr + i, in_z_ptr + i + size_x, out_z_ptr + o);
+	}
+}
@@ -0,0 +1,51 @@
+/*
+ * Copyright 2012-2014 by the MicroMagnum Team
+ * Copyright 2014 by the magnum.fd Team
+ *
+ * This file is part of magnum.fd.
+ * magnum.fd is based heavily on MicroMagnum.
+ * (https://github.com/MicroMagnum/MicroMagnum)
+ * 
+ * magnum.fd is free software: you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation, either version 3 of the License, or
+ * (at your option) any later version.
+ * 
+ * magnum.fd is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ * 
+ * You should have received a copy of the GNU General Public License
+ * along with magnum.fd. If not, see <http://www.gnu.org/licenses/>.
+ */
+
+
+#ifndef CROP_H
+#define CROP_H
+
+#include "config.h"
+#include "matrix/matty.h"
+
+#include <vector>
+
+/*
+ * Returns the bounding box (x0, y0, z0, x1, y1, z1) of the cells with
+ * A != 0, where the upper bounds are exclusive. Returns an empty vector if
+ * all cells are zero.
+ */
+std::vector<int> nonzero_bounding_box(const Matrix &A);
+
+/*
+ * Copies the box of size_x*size_y*size_z cells that starts at cell
+ * (in_x, in_y, in_z) of 'in' to the box that starts at (out_x, out_y, out_z)
+ * of 'out'. The other cells of 'out' are left unchanged.
+ */
+void copy_box(
+	const VectorMatrix &in, VectorMatrix &out,
+	int in_x, int in_y, int in_z,
+	int out_x, int out_y, int out_z,
+	int size_x, int size_y, int size_z
+);
+
+#endif
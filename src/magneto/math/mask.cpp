@@ -0,0 +1,68 @@
+/*
+ * Copyright 2012-2014 by the MicroMagnum Team
+ * Copyright 2014 by the magnum.fd Team
+ *
+ * This file is part of magnum.fd.
+ * magnum.fd is based heavily on MicroMagnum.
+ * (https://github.com/MicroMagnum/MicroMagnum)
+ * 
+ * magnum.fd is free software: you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation, either version 3 of the License, or
+ * (at your option) any later version.
+ * 
+ * magnum.fd is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ * 
+ * You should have received a copy of the GNU General Public License
+ * along with magnum.fd. If not, see <http://www.gnu.org/licenses/>.
+ */
+
+#include "config.h"
+#include "mask.h"
+
+#include <cassert>
+
+void clear_masked_cells(VectorMatrix &A, const Matrix &mask)
+{
+	assert(A.size() == mask.size());
+
+	if (mask.isUniform()) {
+		if (mask.getUniformValue() != 0.0) A.clear();
+		return;
+	}
+
+	Matrix::ro_accessor mask_acc(mask);
+	VectorMatrix::accessor A_acc(A);
+	const double *m = mask_acc.ptr();
+	double *A_x = A_acc.ptr_x(), *A_y = A_acc.ptr_y(), *A_z = A_acc.ptr_z();
+
+	const int size = A.size();
+	for (int i=0; i<size; ++i) {
+		if (m[i] != 0.0) {
+			A_x[i] = A_y[i] = A_z[i] = 0.0;
+		}
+	}
+}
+
+void clear_masked_cells(Matrix &A, const Matrix &mask)
+{
+	assert(A.size() == mask.size());
+
+	if (mask.isUniform()) {
+		if (mask.getUniformValue() != 0.0) A.clear();
+		return;
+	}
+
+	Matrix::ro_accessor mask_acc(mask);
+	Matrix::rw_accessor A_acc(A);
+	const double *m = mask_acc.ptr();
+	double *a = A_acc.ptr();
+
+	const int size = A.size();
+	for (int i=0; i<size; ++i) {
+		if (m[i] != 0.0) a[i] = 0.0;
+	}
+}
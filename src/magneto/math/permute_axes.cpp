@@ -0,0 +1,62 @@
+/*
+ * Copyright 2012-2014 by the MicroMagnum Team
+ * Copyright 2014 by the magnum.fd Team
+ *
+ * This file is part of magnum.fd.
+ * magnum.fd is based heavily on MicroMagnum.
+ * (https://github.com/MicroMagnum/MicroMagnum)
+ * 
+ * magnum.fd is free software: you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation, either version 3 of the License, or
+ * (at your option) any later version.
+ * 
+ * magnum.fd is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ * 
+ * You should have received a copy of the GNU General Public License
+ * along with magnum.fd. If not, see <http://www.gnu.org/licenses/>.
+ */
+
+#include "config.h"
+#include "permute_axes.h"
+
+#include <cassert>
+
+void permute_axes(const VectorMatrix &in, VectorMatrix &out, int perm_x, int perm_y, int perm_z)
+{
+	const int perm[3] = {perm_x, perm_y, perm_z};
+	const int in_dim[3] = {in.dimX(), in.dimY(), in.dimZ()};
+	assert(perm_x != perm_y && perm_y != perm_z && perm_z != perm_x);
+	assert(out.dimX() == in_dim[perm_x] && out.dimY() == in_dim[perm_y] && out.dimZ() == in_dim[perm_z]);
+
+	if (in.isUniform()) {
+		Vector3d v = in.getUniformValue();
+		out.fill(Vector3d(v[perm_x], v[perm_y], v[perm_z]));
+		return;
+	}
+
+	// Stride in 'in' for a step along each axis of 'out'
+	const int in_stride[3] = {1, in_dim[0], in_dim[0]*in_dim[1]};
+	const int sx = in_stride[perm_x], sy = in_stride[perm_y], sz = in_stride[perm_z];
+
+	VectorMatrix::const_accessor in_acc(in);
+	VectorMatrix::accessor out_acc(out);
+	const double *in_comp[3] = {in_acc.ptr_x(), in_acc.ptr_y(), in_acc.ptr_z()};
+	const double *in_x = in_comp[perm_x], *in_y = in_comp[perm_y], *in_z = in_comp[perm_z];
+	double *out_x = out_acc.ptr_x(), *out_y = out_acc.ptr_y(), *out_z = out_acc.ptr_z();
+
+	const int dim_x = out.dimX(), dim_y = out.dimY(), dim_z = out.dimZ();
+	int o = 0;
+	for (int z=0; z<dim_z; ++z)
+	for (int y=0; y<dim_y; ++y)
+	for (int x=0; x<dim_x; ++x) {
+		const int i = x*sx + y*sy + z*sz;
+		out_x[o] = in_x[i];
+		out_y[o] = in_y[i];
+		out_z[o] = in_z[i];
+		++o;
+	}
+}
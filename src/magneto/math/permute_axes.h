@@ -0,0 +1,36 @@
+/*
+ * Copyright 2012-2014 by the MicroMagnum Team
+ * Copyright 2014 by the magnum.fd Team
+ *
+ * This file is part of magnum.fd.
+ * magnum.fd is based heavily on MicroMagnum.
+ * (https://github.com/MicroMagnum/MicroMagnum)
+ * 
+ * magnum.fd is free software: you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation, either version 3 of the License, or
+ * (at your option) any later version.
+ * 
+ * magnum.fd is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ * 
+ * You should have received a copy of the GNU General Public License
+ * along with magnum.fd. If not, see <http://www.gnu.org/licenses/>.
+ */
+
+#ifndef PERMUTE_AXES_H
+#define PERMUTE_AXES_H
+
+#include "config.h"
+#include "matrix/matty.h"
+
+/*
+ * Permutes the axes of a vector field (both the cell positions and the
+ * vector components): Axis a of 'out' is axis perm_a of 'in', where
+ * 0, 1, 2 stand for x, y, z. 'out' must have the permuted dimensions.
+ */
+void permute_axes(const VectorMatrix &in, VectorMatrix &out, int perm_x, int perm_y, int perm_z);
+
+#endif
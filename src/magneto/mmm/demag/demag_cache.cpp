@@ -0,0 +1,294 @@
+/*
+ * Copyright 2012-2014 by the MicroMagnum Team
+ * Copyright 2014 by the magnum.fd Team
+ *
+ * This file is part of magnum.fd.
+ * magnum.fd is based heavily on MicroMagnum.
+ * (https://github.com/MicroMagnum/MicroMagnum)
+ * 
+ * magnum.fd is free software: you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation, either version 3 of the License, or
+ * (at your option) any later version.
+ * 
+ * magnum.fd is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ * 
+ * You should have received a copy of the GNU General Public License
+ * along with magnum.fd. If not, see <http://www.gnu.org/licenses/>.
+ */
+
+#include "config.h"
+#include "demag_cache.h"
+
+#include <fstream>
+#include <sstream>
+#include <cstring>
+#include <stdint.h>
+
+#include "Logger.h"
+#include "os.h"
+
+// Cache file format (version 2), all integers in native byte order:
+//
+//   char     magic[8]       "MAGNUMDC"
+//   uint32   version        2
+//   uint32   byte_order     0x01020304
+//   uint64   key_length
+//   uint64   num_blocks
+//   uint64   payload_offset (multiple of 64)
+//   uint64   payload_size   (in bytes)
+//   uint64   checksum       (of the payload)
+//   char     key[key_length]
+//   uint64   block_size[num_blocks] (in doubles)
+//   ...padding...
+//   double   payload[]      (all blocks, concatenated)
+
+static const char     CACHE_MAGIC[8]   = {'M', 'A', 'G', 'N', 'U', 'M', 'D', 'C'};
+static const uint32_t CACHE_VERSION    = 2;
+static const uint32_t CACHE_BYTE_ORDER = 0x01020304;
+static const uint64_t CACHE_ALIGNMENT  = 64;
+
+// Seconds to wait for another process that computes the same cache entry.
+// Lock files older than this are considered stale.
+static const double LOCK_TIMEOUT = 3600.0;
+
+struct CacheHeader
+{
+	char     magic[8];
+	uint32_t version;
+	uint32_t byte_order;
+	uint64_t key_length;
+	uint64_t num_blocks;
+	uint64_t payload_offset;
+	uint64_t payload_size;
+	uint64_t checksum;
+};
+
+// 64-bit FNV-1a
+static uint64_t fnv1a(const std::string &str)
+{
+	uint64_t hash = 14695981039346656037ULL;
+	for (size_t i=0; i<str.size(); ++i) {
+		hash ^= (unsigned char)str[i];
+		hash *= 1099511628211ULL;
+	}
+	return hash;
+}
+
+// FNV-1a variant that processes 64-bit words instead of bytes.
+static uint64_t checksum(uint64_t hash, const double *data, size_t n)
+{
+	for (size_t i=0; i<n; ++i) {
+		uint64_t word;
+		std::memcpy(&word, &data[i], sizeof(word));
+		hash ^= word;
+		hash *= 1099511628211ULL;
+	}
+	return hash;
+}
+
+static std::string hex(uint64_t x)
+{
+	std::stringstream ss;
+	ss.width(16); ss.fill('0');
+	ss << std::hex << x;
+	return ss.str();
+}
+
+std::string DemagCache::exact(double x)
+{
+	uint64_t bits;
+	std::memcpy(&bits, &x, sizeof(bits));
+	return hex(bits);
+}
+
+DemagCache::DemagCache(const std::string &cache_dir, const std::string &name, const std::string &key)
+	: key(key), locked(false)
+{
+	path = cache_dir + "/" + name + "--" + hex(fnv1a(key)) + ".dat";
+	lock_path = path + ".lock";
+}
+
+DemagCache::~DemagCache()
+{
+	unlock();
+}
+
+// Read and check the header of a mapped cache file.
+static bool readHeader(const os::MappedFile &file, const std::string &path, const std::string &key, CacheHeader &hdr)
+{
+	const char *data = file.getData();
+	const size_t size = file.getSize();
+
+	if (size < sizeof(hdr)) {
+		LOG_WARN << "Ignoring invalid cache file " << path;
+		return false;
+	}
+	std::memcpy(&hdr, data, sizeof(hdr));
+
+	if (std::memcmp(hdr.magic, CACHE_MAGIC, 8) != 0 || hdr.version != CACHE_VERSION || hdr.byte_order != CACHE_BYTE_ORDER) {
+		LOG_WARN << "Ignoring cache file with unknown format: " << path;
+		return false;
+	}
+
+	const uint64_t meta_size = sizeof(hdr) + hdr.key_length + hdr.num_blocks * sizeof(uint64_t);
+	if (meta_size > hdr.payload_offset || hdr.payload_offset + hdr.payload_size != size) {
+		LOG_WARN << "Ignoring truncated cache file " << path;
+		return false;
+	}
+
+	// Compare the full key (the file name contains only its hash)
+	if (hdr.key_length != key.size() || std::memcmp(data + sizeof(hdr), key.data(), key.size()) != 0) {
+		LOG_DEBUG << "Cache file " << path << " has a different key";
+		return false;
+	}
+	return true;
+}
+
+int DemagCache::getNumBlocks() const
+{
+	os::MappedFile file(path);
+	if (!file.isOpen()) return -1;
+
+	CacheHeader hdr;
+	if (!readHeader(file, path, key, hdr)) return -1;
+	return (int)hdr.num_blocks;
+}
+
+bool DemagCache::load(const std::vector<Matrix*> &blocks)
+{
+	os::MappedFile file(path);
+	if (!file.isOpen()) return false;
+
+	const char *data = file.getData();
+
+	// Check header
+	CacheHeader hdr;
+	if (!readHeader(file, path, key, hdr)) return false;
+
+	// Check block sizes
+	if (hdr.num_blocks != blocks.size()) return false;
+	uint64_t payload_size = 0;
+	for (size_t b=0; b<blocks.size(); ++b) {
+		uint64_t block_size;
+		std::memcpy(&block_size, data + sizeof(hdr) + hdr.key_length + b*sizeof(uint64_t), sizeof(block_size));
+		if (block_size != (uint64_t)blocks[b]->size()) return false;
+		payload_size += block_size * sizeof(double);
+	}
+	if (payload_size != hdr.payload_size) return false;
+
+	// Verify checksum, then copy the mapped payload into the matrices
+	const double *payload = reinterpret_cast<const double*>(data + hdr.payload_offset);
+	if (checksum(fnv1a(key), payload, hdr.payload_size / sizeof(double)) != hdr.checksum) {
+		LOG_WARN << "Removing corrupted cache file " << path;
+		os::removeFile(path);
+		return false;
+	}
+
+	for (size_t b=0; b<blocks.size(); ++b) {
+		Matrix::wo_accessor acc(*blocks[b]);
+		std::memcpy(acc.ptr(), payload, sizeof(double) * blocks[b]->size());
+		payload += blocks[b]->size();
+	}
+	return true;
+}
+
+bool DemagCache::save(const std::vector<Matrix*> &blocks)
+{
+	CacheHeader hdr;
+	std::memcpy(hdr.magic, CACHE_MAGIC, 8);
+	hdr.version = CACHE_VERSION;
+	hdr.byte_order = CACHE_BYTE_ORDER;
+	hdr.key_length = key.size();
+	hdr.num_blocks = blocks.size();
+	hdr.payload_size = 0;
+	hdr.checksum = fnv1a(key);
+	for (size_t b=0; b<blocks.size(); ++b) {
+		Matrix::ro_accessor acc(*blocks[b]);
+		hdr.payload_size += sizeof(double) * blocks[b]->size();
+		hdr.checksum = checksum(hdr.checksum, acc.ptr(), blocks[b]->size());
+	}
+	const uint64_t meta_size = sizeof(hdr) + hdr.key_length + hdr.num_blocks * sizeof(uint64_t);
+	hdr.payload_offset = (meta_size + CACHE_ALIGNMENT - 1) / CACHE_ALIGNMENT * CACHE_ALIGNMENT;
+
+	// Write to a temporary file first, then move it into place.
+	std::stringstream tmp_path;
+	tmp_path << path << ".tmp-" << os::getHostName() << "-" << os::getProcessId();
+
+	bool ok;
+	{
+		std::ofstream out(tmp_path.str().c_str(), std::ios::binary);
+		out.write((const char*)&hdr, sizeof(hdr));
+		out.write(key.data(), key.size());
+		for (size_t b=0; b<blocks.size(); ++b) {
+			const uint64_t block_size = blocks[b]->size();
+			out.write((const char*)&block_size, sizeof(block_size));
+		}
+		const std::string padding(hdr.payload_offset - meta_size, '\0');
+		out.write(padding.data(), padding.size());
+		for (size_t b=0; b<blocks.size(); ++b) {
+			Matrix::ro_accessor acc(*blocks[b]);
+			out.write((const char*)acc.ptr(), sizeof(double) * blocks[b]->size());
+		}
+		out.close();
+		ok = !out.fail();
+	}
+
+	if (!ok || !os::renameFile(tmp_path.str(), path)) {
+		LOG_WARN << "Could not write cache file " << path;
+		os::removeFile(tmp_path.str());
+		return false;
+	}
+	return true;
+}
+
+bool DemagCache::lock()
+{
+	std::stringstream owner;
+	owner << os::getHostName() << " " << os::getProcessId() << "\n";
+
+	if (os::createFileExclusive(lock_path, owner.str())) {
+		locked = true;
+		return true;
+	}
+
+	LOG_INFO << "Waiting for another process to compute " << path;
+	const double t0 = os::getTickCount();
+	while (os::fileExists(lock_path)) {
+		if (isStaleLock()) {
+			LOG_WARN << "Removing stale lock file " << lock_path;
+			os::removeFile(lock_path);
+			break;
+		}
+		if (os::getTickCount() - t0 > LOCK_TIMEOUT * 1000.0) {
+			LOG_WARN << "Timeout while waiting for lock file " << lock_path;
+			break;
+		}
+		os::sleep(1.0);
+	}
+
+	locked = os::createFileExclusive(lock_path, owner.str());
+	return false;
+}
+
+void DemagCache::unlock()
+{
+	if (locked) {
+		os::removeFile(lock_path);
+		locked = false;
+	}
+}
+
+bool DemagCache::isStaleLock() const
+{
+	std::ifstream in(lock_path.c_str());
+	std::string host; int pid = 0;
+	if (in >> host >> pid) {
+		// Lock owned by a process on this host that does not exist anymore?
+		if (host == os::getHostName() && !os::isProcessRunning(pid)) return true;
+	}
+	return os::getFileAge(lock_path) > LOCK_TIMEOUT;
+}
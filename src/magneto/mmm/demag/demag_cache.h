@@ -0,0 +1,77 @@
+/*
+ * Copyright 2012-2014 by the MicroMagnum Team
+ * Copyright 2014 by the magnum.fd Team
+ *
+ * This file is part of magnum.fd.
+ * magnum.fd is based heavily on MicroMagnum.
+ * (https://github.com/MicroMagnum/MicroMagnum)
+ * 
+ * magnum.fd is free software: you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation, either version 3 of the License, or
+ * (at your option) any later version.
+ * 
+ * magnum.fd is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ * 
+ * You should have received a copy of the GNU General Public License
+ * along with magnum.fd. If not, see <http://www.gnu.org/licenses/>.
+ */
+
+#ifndef DEMAG_CACHE_H
+#define DEMAG_CACHE_H
+
+#include "config.h"
+#include "matrix/matty.h"
+
+#include <string>
+#include <vector>
+
+// On-disk cache for demag tensor fields and their transformed kernels.
+//
+// Each cache file is self-describing: a versioned header stores the full cache
+// key (which is compared on load, so hash collisions of the file name are
+// harmless), the sizes of all stored matrices and a checksum of the payload.
+// Files are written to a temporary file which is atomically renamed into place,
+// and a lock file prevents concurrent processes from computing the same entry
+// twice. The cache directory may thus be shared between hosts.
+class DemagCache
+{
+public:
+	DemagCache(const std::string &cache_dir, const std::string &name, const std::string &key);
+	~DemagCache(); // releases the lock
+
+	const std::string &getPath() const { return path; }
+
+	// Load all blocks from the cache file. The block shapes must be already set up.
+	bool load(const std::vector<Matrix*> &blocks);
+
+	// Number of blocks in the cache file, or -1 if there is no valid file for this key.
+	int getNumBlocks() const;
+	bool save(const std::vector<Matrix*> &blocks);
+
+	// Try to acquire the lock for computing this cache entry. If another
+	// process holds the lock, wait until it is released (or stale) and
+	// return false: The caller should then retry to load the entry. In both
+	// cases the lock is held afterwards (if it could be created), and the
+	// caller must save the entry it computes so that waiting processes find it.
+	bool lock();
+	void unlock();
+	bool isLocked() const { return locked; }
+
+	// Exact string representation of a double (its bit pattern), for cache keys.
+	static std::string exact(double x);
+
+private:
+	DemagCache(const DemagCache &);
+	DemagCache &operator=(const DemagCache &);
+
+	bool isStaleLock() const;
+
+	std::string path, lock_path, key;
+	bool locked;
+};
+
+#endif
@@ -0,0 +1,562 @@
+/*
+ * Copyright 2012-2014 by the MicroMagnum Team
+ * Copyright 2014 by the magnum.fd Team
+ *
+ * This file is part of magnum.fd.
+ * magnum.fd is based heavily on MicroMagnum.
+ * (https://github.com/MicroMagnum/MicroMagnum)
+ * 
+ * magnum.fd is free software: you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation, either version 3 of the License, or
+ * (at your option) any later version.
+ * 
+ * magnum.fd is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ * 
+ * You should have received a copy of the GNU General Public License
+ * along with magnum.fd. If not, see <http://www.gnu.org/licenses/>.
+ */
+
+#include "config.h"
+#include "demag_fmm.h"
+#include "demag_tensor.h"
+#include "tensor_round.h"
+
+#include "mmm/constants.h"
+#include "Magneto.h"
+#include "Benchmark.h"
+#include "Logger.h"
+
+#include <algorithm>
+#include <cassert>
+#include <cmath>
+#include <stdexcept>
+
+#ifdef _OPENMP
+#include <omp.h>
+#endif
+
+// Max. number of cells in a leaf box
+static const int LEAF_SIZE = 64;
+
+// Derivatives T[((a*dim)+b)*dim+c] = d^a_x d^b_y d^c_z (1/r) for a+b+c <= max_order,
+// via the same recurrence as in AsymptoticDemagTensor::calculate.
+static void derivatives(double x, double y, double z, int max_order, int dim, double *T)
+{
+	const double r2 = x*x + y*y + z*z, inv_r2 = 1.0 / r2;
+	T[0] = std::sqrt(inv_r2);
+	for (int n = 1; n <= max_order; ++n) {
+		const double scale = inv_r2 / n;
+		for (int a = n; a >= 0; --a)
+		for (int b = n-a; b >= 0; --b) {
+			const int c = n-a-b;
+			double sum1 = 0, sum2 = 0;
+			if (a >= 1) sum1 += a*x*T[((a-1)*dim + b)*dim + c];
+			if (b >= 1) sum1 += b*y*T[(a*dim + (b-1))*dim + c];
+			if (c >= 1) sum1 += c*z*T[(a*dim + b)*dim + (c-1)];
+			if (a >= 2) sum2 += a*(a-1)*T[((a-2)*dim + b)*dim + c];
+			if (b >= 2) sum2 += b*(b-1)*T[(a*dim + (b-2))*dim + c];
+			if (c >= 2) sum2 += c*(c-1)*T[(a*dim + b)*dim + (c-2)];
+			T[(a*dim + b)*dim + c] = -((2*n-1)*sum1 + (n-1)*sum2) * scale;
+		}
+	}
+}
+
+// Orders cells by their coordinate along an axis (for partitioning the tree nodes)
+struct CellBelow
+{
+	CellBelow(int dim_x, int dim_y, int axis, int mid) : dim_x(dim_x), dim_y(dim_y), axis(axis), mid(mid) {}
+	bool operator()(int cell) const
+	{
+		int coord;
+		switch (axis) {
+			case 0: coord = cell % dim_x; break;
+			case 1: coord = (cell / dim_x) % dim_y; break;
+			default: coord = cell / (dim_x*dim_y); break;
+		}
+		return coord <= mid;
+	}
+	int dim_x, dim_y, axis, mid;
+};
+
+DemagFMM::DemagFMM(
+	int dim_x, int dim_y, int dim_z,
+	double delta_x, double delta_y, double delta_z,
+	int order, double tolerance,
+	const char *cache_dir,
+	int num_threads)
+	: dim_x(dim_x), dim_y(dim_y), dim_z(dim_z), delta_x(delta_x), delta_y(delta_y), delta_z(delta_z),
+	  order(order), tolerance(tolerance), cache_dir(cache_dir), num_threads(num_threads), near_origin(0)
+{
+	if (order < 0 || order > 8) throw std::runtime_error("DemagFMM: order must be between 0 and 8");
+	if (!(tolerance > 0.0 && tolerance < 1.0)) throw std::runtime_error("DemagFMM: tolerance must be between 0 and 1");
+
+#ifdef _OPENMP
+	if (this->num_threads < 1) this->num_threads = omp_get_num_procs();
+#else
+	this->num_threads = 1;
+#endif
+
+	theta = std::pow(tolerance, 1.0 / (order+1));
+
+	// Work in units of the largest cell dimension h
+	const double h = std::max(delta_x, std::max(delta_y, delta_z));
+	l[0] = delta_x / h;
+	l[1] = delta_y / h;
+	l[2] = delta_z / h;
+	volume = l[0]*l[1]*l[2];
+
+	// Multi-indices up to order+1, by increasing order
+	const int P = order+1;
+	std::vector<int> term_index((P+1)*(P+1)*(P+1), -1); // (a,b,c) -> term
+	for (int n = 0; n <= P; ++n) {
+		if (n == P) num_terms_field = int(term_a.size());
+		for (int a = n; a >= 0; --a)
+		for (int b = n-a; b >= 0; --b) {
+			const int c = n-a-b;
+			term_index[(a*(P+1) + b)*(P+1) + c] = int(term_a.size());
+			term_a.push_back(a); term_b.push_back(b); term_c.push_back(c);
+		}
+	}
+	num_terms = int(term_a.size());
+
+	for (int k = 0; k < num_terms_field; ++k) {
+		term_up.push_back(term_index[((term_a[k]+1)*(P+1) + term_b[k]  )*(P+1) + term_c[k]  ]);
+		term_up.push_back(term_index[( term_a[k]   *(P+1) + term_b[k]+1)*(P+1) + term_c[k]  ]);
+		term_up.push_back(term_index[( term_a[k]   *(P+1) + term_b[k]  )*(P+1) + term_c[k]+1]);
+	}
+
+	// Pairs l <= k for translating expansions
+	for (int k = 0; k < num_terms; ++k)
+	for (int m = 0; m < num_terms; ++m) {
+		const int a = term_a[k] - term_a[m], b = term_b[k] - term_b[m], c = term_c[k] - term_c[m];
+		if (a < 0 || b < 0 || c < 0) continue;
+		shift_k.push_back(k);
+		shift_l.push_back(m);
+		shift_kl.push_back(term_index[(a*(P+1) + b)*(P+1) + c]);
+	}
+
+	// Derivative indices d^(n+m) for M2L (n, m >= 1, the zeroth terms are not needed)
+	const int dim = 2*P+1;
+	for (int n = 1; n < num_terms; ++n)
+	for (int m = 1; m < num_terms; ++m) {
+		m2l_deriv.push_back(((term_a[n]+term_a[m])*dim + term_b[n]+term_b[m])*dim + term_c[n]+term_c[m]);
+	}
+
+	// Moments E[S^n]/n! of the triangular distribution on [-l,l] (difference of two
+	// points uniformly distributed in the source and target cell): E[S^2m] = l^2m * 2/((2m+1)(2m+2)).
+	for (int d = 0; d < 3; ++d) {
+		smear[d].assign(order+1, 0.0);
+		double pow_l = 1.0, fac = 1.0;
+		for (int n = 0; n <= order; ++n) {
+			if (n > 0) { pow_l *= l[d]; fac *= n; }
+			if (n % 2 == 0) smear[d][n] = pow_l * 2.0 / ((n+1)*(n+2)) / fac;
+		}
+	}
+}
+
+DemagFMM::~DemagFMM()
+{
+}
+
+// mono[k] = u^k/k! for all multi-indices k
+void DemagFMM::monomials(const double u[3], double *mono) const
+{
+	double p[3][10];
+	for (int d = 0; d < 3; ++d) {
+		p[d][0] = 1.0;
+		for (int n = 1; n <= order+1; ++n) p[d][n] = p[d][n-1] * u[d] / n;
+	}
+	for (int k = 0; k < num_terms; ++k) {
+		mono[k] = p[0][term_a[k]] * p[1][term_b[k]] * p[2][term_c[k]];
+	}
+}
+
+void DemagFMM::build(const std::vector<int> &magnetic_cells)
+{
+	cells = magnetic_cells;
+	nodes.clear();
+	leaves.clear();
+	far_list.clear();
+	near_list.clear();
+	if (cells.empty()) return;
+
+	buildNode(0, int(cells.size()));
+
+	const int num_cells = int(cells.size());
+	cell_x.resize(num_cells); cell_y.resize(num_cells); cell_z.resize(num_cells);
+	for (int j = 0; j < num_cells; ++j) {
+		cell_x[j] = cells[j] % dim_x;
+		cell_y[j] = (cells[j] / dim_x) % dim_y;
+		cell_z[j] = cells[j] / (dim_x*dim_y);
+	}
+	Mx.resize(num_cells); My.resize(num_cells); Mz.resize(num_cells);
+
+	for (size_t a = 0; a < nodes.size(); ++a) {
+		if (nodes[a].isLeaf()) leaves.push_back(int(a));
+	}
+
+	// Interaction lists
+	far_list.resize(nodes.size());
+	near_list.resize(nodes.size());
+	interact(0, 0);
+
+	size_t num_far = 0, num_near = 0;
+	for (size_t a = 0; a < nodes.size(); ++a) {
+		num_far += far_list[a].size();
+		num_near += near_list[a].size();
+	}
+
+	LOG_INFO << "Setting up fast multipole stray field calculation";
+	LOG_INFO << "  Magn. cells     : " << num_cells << " of " << dim_x*dim_y*dim_z;
+	LOG_INFO << "  Tree            : " << nodes.size() << " boxes, " << leaves.size() << " leaves";
+	LOG_INFO << "  Order           : " << order << " (tolerance " << tolerance << ", theta " << theta << ")";
+	LOG_INFO << "  Interactions    : " << num_far << " far, " << num_near << " near";
+
+	setupNearFieldTensor();
+
+	D.assign(nodes.size() * num_terms, 0.0);
+	F.assign(nodes.size() * num_terms, 0.0);
+}
+
+int DemagFMM::buildNode(int begin, int end)
+{
+	const int idx = int(nodes.size());
+	nodes.push_back(Node());
+
+	Node node;
+	node.begin = begin;
+	node.end = end;
+	node.child[0] = node.child[1] = -1;
+
+	// Bounding box
+	node.x0 = dim_x; node.x1 = -1;
+	node.y0 = dim_y; node.y1 = -1;
+	node.z0 = dim_z; node.z1 = -1;
+	for (int j = begin; j < end; ++j) {
+		const int x = cells[j] % dim_x, y = (cells[j] / dim_x) % dim_y, z = cells[j] / (dim_x*dim_y);
+		node.x0 = std::min(node.x0, x); node.x1 = std::max(node.x1, x);
+		node.y0 = std::min(node.y0, y); node.y1 = std::max(node.y1, y);
+		node.z0 = std::min(node.z0, z); node.z1 = std::max(node.z1, z);
+	}
+	node.center[0] = 0.5 * (node.x0 + node.x1 + 1) * l[0];
+	node.center[1] = 0.5 * (node.y0 + node.y1 + 1) * l[1];
+	node.center[2] = 0.5 * (node.z0 + node.z1 + 1) * l[2];
+
+	double r2 = 0.0;
+	for (int j = begin; j < end; ++j) {
+		const int x = cells[j] % dim_x, y = (cells[j] / dim_x) % dim_y, z = cells[j] / (dim_x*dim_y);
+		const double dx = (x+0.5)*l[0] - node.center[0];
+		const double dy = (y+0.5)*l[1] - node.center[1];
+		const double dz = (z+0.5)*l[2] - node.center[2];
+		r2 = std::max(r2, dx*dx + dy*dy + dz*dz);
+	}
+	node.radius_tgt = std::sqrt(r2);
+	node.radius_src = node.radius_tgt + std::sqrt(l[0]*l[0] + l[1]*l[1] + l[2]*l[2]);
+
+	// Split along the longest side of the bounding box
+	if (end - begin > LEAF_SIZE) {
+		const double ext[3] = {(node.x1-node.x0)*l[0], (node.y1-node.y0)*l[1], (node.z1-node.z0)*l[2]};
+		const int axis = (ext[0] >= ext[1] && ext[0] >= ext[2]) ? 0 : (ext[1] >= ext[2] ? 1 : 2);
+		const int mid = (axis == 0) ? (node.x0+node.x1)/2 : (axis == 1) ? (node.y0+node.y1)/2 : (node.z0+node.z1)/2;
+
+		const int split = int(std::partition(cells.begin() + begin, cells.begin() + end, CellBelow(dim_x, dim_y, axis, mid)) - cells.begin());
+		assert(split > begin && split < end);
+		node.child[0] = buildNode(begin, split);
+		node.child[1] = buildNode(split, end);
+	}
+
+	nodes[idx] = node;
+	return idx;
+}
+
+void DemagFMM::interact(int a, int b)
+{
+	const Node &A = nodes[a], &B = nodes[b];
+
+	const double dx = A.center[0] - B.center[0];
+	const double dy = A.center[1] - B.center[1];
+	const double dz = A.center[2] - B.center[2];
+	const double dist = std::sqrt(dx*dx + dy*dy + dz*dz);
+
+	if (A.radius_tgt + B.radius_src < theta * dist) {
+		far_list[a].push_back(b);
+	} else if (A.isLeaf() && B.isLeaf()) {
+		near_list[a].push_back(b);
+	} else if (B.isLeaf() || (!A.isLeaf() && A.radius_tgt >= B.radius_src)) {
+		interact(A.child[0], b);
+		interact(A.child[1], b);
+	} else {
+		interact(a, B.child[0]);
+		interact(a, B.child[1]);
+	}
+}
+
+void DemagFMM::setupNearFieldTensor()
+{
+	// Largest cell offset in the near field
+	int ox = 0, oy = 0, oz = 0;
+	for (size_t i = 0; i < leaves.size(); ++i) {
+		const Node &A = nodes[leaves[i]];
+		for (size_t j = 0; j < near_list[leaves[i]].size(); ++j) {
+			const Node &B = nodes[near_list[leaves[i]][j]];
+			ox = std::max(ox, std::max(A.x1, B.x1) - std::min(A.x0, B.x0));
+			oy = std::max(oy, std::max(A.y1, B.y1) - std::min(A.y0, B.y0));
+			oz = std::max(oz, std::max(A.z1, B.z1) - std::min(A.z0, B.z0));
+		}
+	}
+
+	LOG_INFO << "  Near field      : offsets up to " << ox << "x" << oy << "x" << oz << " cells";
+	const Matrix N = GenerateDemagTensor(ox+1, oy+1, oz+1, delta_x, delta_y, delta_z, false, false, false, 1, PADDING_DISABLE, cache_dir.c_str(), num_threads);
+	const int exp_x = N.getShape().getDim(1), exp_y = N.getShape().getDim(2), exp_z = N.getShape().getDim(3);
+
+	// Rearrange the tensor for offsets -o..o in each direction, so that the
+	// index of an offset is a difference of cell indices.
+	const int wx = 2*ox+1, wy = 2*oy+1, wz = 2*oz+1;
+	near_tensor.resize(6 * wx*wy*wz);
+	near_origin = ox + wx*(oy + wy*oz);
+	{
+		Matrix::ro_accessor N_acc(N);
+		for (int z = -oz; z <= oz; ++z)
+		for (int y = -oy; y <= oy; ++y)
+		for (int x = -ox; x <= ox; ++x) {
+			const int idx = near_origin + x + wx*(y + wy*z);
+			for (int e = 0; e < 6; ++e) {
+				near_tensor[6*idx+e] = N_acc.at(e, (x+exp_x) % exp_x, (y+exp_y) % exp_y, (z+exp_z) % exp_z);
+			}
+		}
+	}
+
+	cell_near.resize(cells.size());
+	for (size_t j = 0; j < cells.size(); ++j) {
+		cell_near[j] = cell_x[j] + wx*(cell_y[j] + wy*cell_z[j]);
+	}
+}
+
+void DemagFMM::execute(const VectorMatrix &rhs, VectorMatrix &res)
+{
+	assert(rhs.dimX() == dim_x && rhs.dimY() == dim_y && rhs.dimZ() == dim_z);
+	assert(res.dimX() == dim_x && res.dimY() == dim_y && res.dimZ() == dim_z);
+
+	// (Re-)build the tree if the set of magnetic cells has changed.
+	{
+		const int num_cells = dim_x * dim_y * dim_z;
+		VectorMatrix::const_accessor M_acc(rhs);
+		const double *M_x = M_acc.ptr_x(), *M_y = M_acc.ptr_y(), *M_z = M_acc.ptr_z();
+
+		std::vector<bool> new_mask(num_cells);
+		std::vector<int> magnetic_cells;
+		for (int i = 0; i < num_cells; ++i) {
+			new_mask[i] = (M_x[i] != 0.0 || M_y[i] != 0.0 || M_z[i] != 0.0);
+			if (new_mask[i]) magnetic_cells.push_back(i);
+		}
+
+		if (new_mask != mask) {
+			mask.swap(new_mask);
+			build(magnetic_cells);
+		}
+	}
+
+	res.clear();
+	if (cells.empty()) return;
+
+	TIC("fmm");
+		TIC("fmm.upward");
+		upward(rhs);
+		TOC("fmm.upward");
+
+		TIC("fmm.m2l");
+		#pragma omp parallel for schedule(dynamic) num_threads(num_threads)
+		for (int a = 0; a < int(nodes.size()); ++a) {
+			multipoleToLocal(a);
+		}
+		TOC("fmm.m2l");
+
+		TIC("fmm.downward");
+		downward();
+		TOC("fmm.downward");
+
+		TIC("fmm.evaluate");
+		{
+			VectorMatrix::accessor H_acc(res);
+			double *H_x = H_acc.ptr_x(), *H_y = H_acc.ptr_y(), *H_z = H_acc.ptr_z();
+
+			#pragma omp parallel for schedule(dynamic) num_threads(num_threads)
+			for (int i = 0; i < int(leaves.size()); ++i) {
+				evaluate(leaves[i], H_x, H_y, H_z);
+			}
+		}
+		TOC("fmm.evaluate");
+	TOC("fmm");
+}
+
+// Multipole expansions of chi around the box centers C:
+//   D[m] = sum_b Q[b][m-e_b],  Q[b][k] = V/(4*pi) * sum_j M_j,b * E[(C - r_j - S)^k]/k!
+// (the cell positions r_j are smeared by S).
+void DemagFMM::upward(const VectorMatrix &rhs)
+{
+	{
+		VectorMatrix::const_accessor M_acc(rhs);
+		const double *M_x = M_acc.ptr_x(), *M_y = M_acc.ptr_y(), *M_z = M_acc.ptr_z();
+		for (size_t j = 0; j < cells.size(); ++j) {
+			Mx[j] = M_x[cells[j]];
+			My[j] = M_y[cells[j]];
+			Mz[j] = M_z[cells[j]];
+		}
+	}
+
+	std::fill(D.begin(), D.end(), 0.0);
+	const double prefactor = volume / (4.0*MY_PI);
+
+	// Leaves: from the cells
+	#pragma omp parallel for schedule(dynamic) num_threads(num_threads)
+	for (int i = 0; i < int(leaves.size()); ++i) {
+		const Node &A = nodes[leaves[i]];
+		double *DA = &D[leaves[i]*num_terms];
+
+		std::vector<double> e[3];
+		for (int d = 0; d < 3; ++d) e[d].resize(order+1);
+
+		for (int j = A.begin; j < A.end; ++j) {
+			const double c[3] = {
+				A.center[0] - (cell_x[j]+0.5)*l[0],
+				A.center[1] - (cell_y[j]+0.5)*l[1],
+				A.center[2] - (cell_z[j]+0.5)*l[2]
+			};
+
+			// e[d][n] = E[(c_d - S_d)^n]/n! = sum_m c_d^(n-m)/(n-m)! * E[S_d^m]/m!
+			for (int d = 0; d < 3; ++d) {
+				for (int n = 0; n <= order; ++n) {
+					double sum = 0.0, p = 1.0;
+					for (int m = n; m >= 0; --m) {
+						sum += p * smear[d][m];
+						p *= c[d] / (n-m+1);
+					}
+					e[d][n] = sum;
+				}
+			}
+
+			for (int k = 0; k < num_terms_field; ++k) {
+				const double w = prefactor * e[0][term_a[k]] * e[1][term_b[k]] * e[2][term_c[k]];
+				DA[term_up[k*3+0]] += w * Mx[j];
+				DA[term_up[k*3+1]] += w * My[j];
+				DA[term_up[k*3+2]] += w * Mz[j];
+			}
+		}
+	}
+
+	// Inner nodes: translate the expansions of the children (children have higher indices than their parents)
+	std::vector<double> mono(num_terms);
+	for (int a = int(nodes.size())-1; a >= 0; --a) {
+		const Node &A = nodes[a];
+		if (A.isLeaf()) continue;
+		for (int i = 0; i < 2; ++i) {
+			const Node &C = nodes[A.child[i]];
+			// D_A[k] += sum_{l<=k} (c_A - c_C)^(k-l)/(k-l)! * D_C[l]
+			const double delta[3] = {A.center[0] - C.center[0], A.center[1] - C.center[1], A.center[2] - C.center[2]};
+			monomials(delta, &mono[0]);
+
+			double *DA = &D[a*num_terms];
+			const double *DC = &D[A.child[i]*num_terms];
+			for (size_t s = 0; s < shift_k.size(); ++s) {
+				DA[shift_k[s]] += mono[shift_kl[s]] * DC[shift_l[s]];
+			}
+		}
+	}
+}
+
+// Local expansions chi(c_A + u) = sum_n F[n] * u^n/n! of the far boxes B:
+//   F[n] = sum_B sum_m D_B[m] * d^(n+m) (1/r) at r = c_A - c_B.
+void DemagFMM::multipoleToLocal(int a)
+{
+	double *FA = &F[a*num_terms];
+	std::fill(FA, FA + num_terms, 0.0);
+	if (far_list[a].empty()) return;
+
+	const int dim = 2*order+3;
+	std::vector<double> T(dim*dim*dim);
+
+	const Node &A = nodes[a];
+	for (size_t i = 0; i < far_list[a].size(); ++i) {
+		const int b = far_list[a][i];
+		const Node &B = nodes[b];
+		derivatives(A.center[0] - B.center[0], A.center[1] - B.center[1], A.center[2] - B.center[2], 2*order+2, dim, &T[0]);
+
+		const double *DB = &D[b*num_terms];
+		const int *d = &m2l_deriv[0];
+		for (int n = 1; n < num_terms; ++n) {
+			double sum = 0.0;
+			for (int m = 1; m < num_terms; ++m) {
+				sum += T[*d++] * DB[m];
+			}
+			FA[n] += sum;
+		}
+	}
+}
+
+// Translate the local expansions down the tree (parents have lower indices than their children)
+void DemagFMM::downward()
+{
+	std::vector<double> mono(num_terms);
+	for (int a = 0; a < int(nodes.size()); ++a) {
+		const Node &A = nodes[a];
+		if (A.isLeaf()) continue;
+		for (int i = 0; i < 2; ++i) {
+			const Node &C = nodes[A.child[i]];
+			// F_C[l] += sum_{k>=l} (c_C - c_A)^(k-l)/(k-l)! * F_A[k]
+			const double delta[3] = {C.center[0] - A.center[0], C.center[1] - A.center[1], C.center[2] - A.center[2]};
+			monomials(delta, &mono[0]);
+
+			const double *FA = &F[a*num_terms];
+			double *FC = &F[A.child[i]*num_terms];
+			for (size_t s = 0; s < shift_k.size(); ++s) {
+				FC[shift_l[s]] += mono[shift_kl[s]] * FA[shift_k[s]];
+			}
+		}
+	}
+}
+
+// Field in the cells of leaf a: local expansion (far field, H_a = d_a chi) plus exact near field.
+void DemagFMM::evaluate(int a, double *H_x, double *H_y, double *H_z)
+{
+	const Node &A = nodes[a];
+	const double *FA = &F[a*num_terms];
+
+	std::vector<double> mono(num_terms);
+
+	for (int i = A.begin; i < A.end; ++i) {
+		// Far field
+		const double u[3] = {
+			(cell_x[i]+0.5)*l[0] - A.center[0],
+			(cell_y[i]+0.5)*l[1] - A.center[1],
+			(cell_z[i]+0.5)*l[2] - A.center[2]
+		};
+		monomials(u, &mono[0]);
+
+		double Hx = 0.0, Hy = 0.0, Hz = 0.0;
+		for (int n = 0; n < num_terms_field; ++n) {
+			Hx += mono[n] * FA[term_up[n*3+0]];
+			Hy += mono[n] * FA[term_up[n*3+1]];
+			Hz += mono[n] * FA[term_up[n*3+2]];
+		}
+
+		// Near field
+		const double *N_i = &near_tensor[6*(cell_near[i] + near_origin)];
+		for (size_t s = 0; s < near_list[a].size(); ++s) {
+			const Node &B = nodes[near_list[a][s]];
+			for (int j = B.begin; j < B.end; ++j) {
+				const double *n = N_i - 6*cell_near[j];
+				Hx += n[0]*Mx[j] + n[1]*My[j] + n[2]*Mz[j];
+				Hy += n[1]*Mx[j] + n[3]*My[j] + n[4]*Mz[j];
+				Hz += n[2]*Mx[j] + n[4]*My[j] + n[5]*Mz[j];
+			}
+		}
+
+		H_x[cells[i]] = Hx;
+		H_y[cells[i]] = Hy;
+		H_z[cells[i]] = Hz;
+	}
+}
@@ -0,0 +1,135 @@
+/*
+ * Copyright 2012-2014 by the MicroMagnum Team
+ * Copyright 2014 by the magnum.fd Team
+ *
+ * This file is part of magnum.fd.
+ * magnum.fd is based heavily on MicroMagnum.
+ * (https://github.com/MicroMagnum/MicroMagnum)
+ * 
+ * magnum.fd is free software: you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation, either version 3 of the License, or
+ * (at your option) any later version.
+ * 
+ * magnum.fd is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ * 
+ * You should have received a copy of the GNU General Public License
+ * along with magnum.fd. If not, see <http://www.gnu.org/licenses/>.
+ */
+
+#ifndef DEMAG_FMM_H
+#define DEMAG_FMM_H
+
+#include "config.h"
+#include "matrix/matty.h"
+
+#include <string>
+#include <vector>
+
+// Fast multipole stray field calculation for sparse geometries (e.g. arrays of
+// small elements that fill only a small part of the mesh). Only the magnetic
+// cells (M != 0) take part: They are sorted into a binary tree of boxes, and
+// the field is computed as
+//
+//   - near field: exact demag tensor for all cell pairs in neighbouring leaf
+//     boxes (the tensor is generated for the largest offset that occurs),
+//   - far field: multipole expansions of the source boxes (up to the given
+//     order), translated into local expansions of the target boxes.
+//
+// The far field H = grad chi is the gradient of the scalar field
+// chi = div psi, psi_b(r) = V/(4*pi) * sum_j M_j,b / |r - r_j|, where the cell
+// positions r_j are smeared over the source and the target cell as in
+// AsymptoticDemagTensor. The far field is thus the expansion of the exact
+// tensor, and its error is only due to the truncation of the expansions: Box
+// pairs are well separated if (r_A + r_B) < theta * d, where r_A, r_B are the
+// box radii and d is the distance of their centers, and the truncation error of
+// a single box pair interaction is of the order theta^(order+1). theta is
+// chosen as tolerance^(1/(order+1)).
+//
+// The cost scales with the number of magnetic cells instead of the size of
+// the (padded) mesh. The field is only computed in the magnetic cells, it is
+// zero elsewhere. Open boundaries only, CPU only.
+class DemagFMM
+{
+public:
+	DemagFMM(
+		int dim_x, int dim_y, int dim_z,
+		double delta_x, double delta_y, double delta_z,
+		int order, double tolerance,
+		const char *cache_dir,
+		int num_threads = 1
+	);
+	virtual ~DemagFMM();
+
+	virtual void execute(const VectorMatrix &rhs, VectorMatrix &res);
+
+	int getOrder() const { return order; }
+	double getTolerance() const { return tolerance; }
+	int getNumMagneticCells() const { return int(cells.size()); }
+
+private:
+	struct Node
+	{
+		int begin, end;         // range in 'cells'
+		int child[2];           // -1 for leaves
+		double center[3];       // in units of h
+		double radius_src;      // max. distance of the cells (incl. their smear) from the center
+		double radius_tgt;      // max. distance of the cell centers from the center
+		int x0, x1, y0, y1, z0, z1; // bounding box of the cells (cell indices, inclusive)
+		bool isLeaf() const { return child[0] < 0; }
+	};
+
+	void build(const std::vector<int> &magnetic_cells);
+	int buildNode(int begin, int end);
+	void interact(int a, int b);
+	void setupNearFieldTensor();
+
+	void upward(const VectorMatrix &rhs);
+	void multipoleToLocal(int a);
+	void downward();
+	void evaluate(int a, double *H_x, double *H_y, double *H_z);
+	void monomials(const double u[3], double *mono) const;
+
+	// Problem size, cell size in units of h (the largest cell dimension)
+	int dim_x, dim_y, dim_z;
+	double delta_x, delta_y, delta_z;
+	double l[3], volume;
+
+	int order;
+	double tolerance, theta;
+	std::string cache_dir;
+	int num_threads;
+
+	// Multi-indices k=(a,b,c) with |k| <= order+1 (sorted by |k|), and index tables
+	int num_terms, num_terms_field; // number of multi-indices with |k| <= order+1 and |k| <= order
+	std::vector<int> term_a, term_b, term_c;
+	std::vector<int> term_up;   // term of k+e_b at [k*3+b], for |k| <= order
+	std::vector<int> shift_k, shift_l, shift_kl; // all pairs l <= k (componentwise), and the term of k-l
+	std::vector<int> m2l_deriv; // derivative indices for M2L, see multipoleToLocal
+	std::vector<double> smear[3]; // moments E[S^n]/n! of the cell smear S (per axis)
+
+	// Tree
+	std::vector<int> cells;   // magnetic cells (linear indices), sorted by tree node
+	std::vector<int> cell_x, cell_y, cell_z; // their cell coordinates
+	std::vector<int> cell_near; // their index in the near field tensor
+	std::vector<double> Mx, My, Mz; // their magnetization (gathered by upward)
+	std::vector<bool> mask;   // magnetic cells of the mesh
+	std::vector<Node> nodes;  // nodes[0] is the root (if there are magnetic cells)
+	std::vector<int> leaves;
+	std::vector<std::vector<int> > far_list, near_list; // source nodes per target node
+
+	// Expansion coefficients per node (num_terms each): multipole
+	// expansions D and local expansions F of the scalar field chi
+	std::vector<double> D, F;
+
+	// Exact tensor for the near field (components xx, xy, xz, yy, yz, zz) for
+	// all cell offsets up to the largest near field offset: The entry for the
+	// target cell i and the source cell j is at 6*(cell_near[i] + near_origin - cell_near[j]).
+	std::vector<double> near_tensor;
+	int near_origin;
+};
+
+#endif
@@ -24,15 +24,21 @@
 #include "demag_tensor.h"
 
 #include <fstream>
+#include <sstream>
+#include <memory>
+#include <algorithm>
 #include <cstdlib> // std::getenv
 
 #include "Logger.h"
 
 #include "tensor.h"
 #include "tensor_round.h"
+#include "demag_cache.h"
 
 #include "os.h"
 
+#include "math/conv/SymmetricMatrixVectorConvolution_FFT.h"
+
 //#define USE_OLD_CODE 1
 #ifdef USE_OLD_CODE
 #include "old/demag_old.h"
@@ -46,23 +52,23 @@ struct DemagTensorInfo {
 	bool periodic_x, periodic_y, periodic_z; 
 	int periodic_repeat;
 	int padding;
+	double asymptotic_radius;
+	bool lattice_sum;
 	const char *cache_dir;
 };
 
 // CACHING //////////////////////////////////////////////////////////////////////////
 
-// Return the cache file name for a demag tensor field configuration.
-static std::string cacheFile(const DemagTensorInfo &info)
+// Return a readable cache file name for a demag tensor field configuration.
+// The prefix distinguishes the real-space tensor ("Demag") from its transformed kernels.
+static std::string cacheName(const DemagTensorInfo &info, const char *prefix)
 {
 	std::stringstream ss;
-	ss << info.cache_dir << "/";
-	ss << "Demag";
+	ss << prefix;
 	ss << "--";
 	ss << info.dim_x << "-" << info.dim_y << "-" << info.dim_z;
 	ss << "--";
 	ss << info.exp_x << "-" << info.exp_y << "-" << info.exp_z;
-	ss << "--";
-	ss << int(info.delta_x*1e12) << "-" << int(info.delta_y*1e12) << "-" << int(info.delta_z*1e12);
 	if (info.periodic_x || info.periodic_y || info.periodic_z) {
 		ss << "--";
 		ss << "p-";
@@ -70,58 +76,179 @@ static std::string cacheFile(const DemagTensorInfo &info)
 		ss << (info.periodic_y ? "y" : "");
 		ss << (info.periodic_z ? "z" : "");
 		ss << "-" << info.periodic_repeat;
+		if (info.lattice_sum) ss << "-lattice";
 	}
-	ss << ".dat";
 	return ss.str();
 }
 
-static void saveDemagTensor(const DemagTensorInfo &info, const std::string &path, Matrix &mat)
+// Return the exact cache key for a demag tensor field configuration.
+static std::string cacheKey(const DemagTensorInfo &info, const char *prefix)
 {
-	LOG_INFO << "Saving demagnetization tensor field to cache.";
-	Matrix::ro_accessor acc(mat);
-	std::ofstream out(path.c_str());
-	out.write((const char*)acc.ptr(), sizeof(double) * mat.size());
-	LOG_DEBUG << "Done.";
+	const bool periodic = info.periodic_x || info.periodic_y || info.periodic_z;
+
+	std::stringstream ss;
+	ss << prefix;
+	ss << " dim=" << info.dim_x << "," << info.dim_y << "," << info.dim_z;
+	ss << " exp=" << info.exp_x << "," << info.exp_y << "," << info.exp_z;
+	ss << " delta=" << DemagCache::exact(info.delta_x) << "," << DemagCache::exact(info.delta_y) << "," << DemagCache::exact(info.delta_z);
+	ss << " pbc=" << info.periodic_x << info.periodic_y << info.periodic_z << "," << (periodic ? info.periodic_repeat : 0);
+	ss << " asymptotic=" << DemagCache::exact(info.asymptotic_radius > 0.0 ? info.asymptotic_radius : 0.0);
+	if (periodic && info.lattice_sum) ss << " lattice_sum";
+	return ss.str();
+}
+
+static bool loadDemagTensor(DemagCache &cache, Matrix &N)
+{
+	std::vector<Matrix*> blocks(1, &N);
+	if (!cache.load(blocks)) return false;
+	LOG_INFO << "Loaded demagnetization tensor field from cache.";
+	return true;
 }
 
-Matrix loadDemagTensor(const DemagTensorInfo &info, const std::string &path, bool &success /*out*/)
+// The cache index lists all cached non-periodic tensor fields, one per line:
+//   <class> <dim_x> <dim_y> <dim_z> <exp_x> <exp_y> <exp_z>
+// where <class> identifies the cell size and asymptotic radius. Without periodic
+// boundary conditions, the tensor entry for a cell offset does not depend on the
+// mesh size, so any cached field of the same class with larger dimensions
+// contains the requested field.
+static std::string cacheIndexFile(const DemagTensorInfo &info)
 {
-	std::ifstream in(path.c_str());
-	if (in.is_open()) {
-		LOG_INFO << "Loading demagnetization tensor field from cache.";
+	return std::string(info.cache_dir) + "/DemagIndex.txt";
+}
+
+static std::string cacheIndexClass(const DemagTensorInfo &info)
+{
+	std::stringstream ss;
+	ss << DemagCache::exact(info.delta_x) << "-" << DemagCache::exact(info.delta_y) << "-" << DemagCache::exact(info.delta_z);
+	ss << "-" << DemagCache::exact(info.asymptotic_radius > 0.0 ? info.asymptotic_radius : 0.0);
+	return ss.str();
+}
 
-		Matrix N(Shape(6, info.exp_x, info.exp_y, info.exp_z));
+static void addToCacheIndex(const DemagTensorInfo &info)
+{
+	if (info.periodic_x || info.periodic_y || info.periodic_z) return;
 
-		const size_t bytes_to_read = sizeof(double) * N.size(); 
-		{
-			Matrix::wo_accessor N_acc(N);
-			in.read((char*)N_acc.ptr(), bytes_to_read);
-		}
-		const size_t bytes_read = in.gcount();
-
-		if (bytes_read == bytes_to_read) {
-			LOG_DEBUG << "Done.";
-			success = true;
-			return N;
-		} else {
-			LOG_ERROR << "Read error.";
-			success = false;
-			return Matrix(Shape());
+	std::stringstream line;
+	line << cacheIndexClass(info) << " " << info.dim_x << " " << info.dim_y << " " << info.dim_z << " " << info.exp_x << " " << info.exp_y << " " << info.exp_z << "\n";
+
+	// Single write in append mode, so that concurrent writers don't interleave lines.
+	std::ofstream out(cacheIndexFile(info).c_str(), std::ios::app);
+	out << line.str() << std::flush;
+}
+
+static bool compareFirst(const std::pair<double, DemagTensorInfo> &a, const std::pair<double, DemagTensorInfo> &b)
+{
+	return a.first < b.first;
+}
+
+// Find cached non-periodic tensor fields that contain the requested one, smallest first.
+static std::vector<DemagTensorInfo> findCoveringCacheEntries(const DemagTensorInfo &info)
+{
+	std::vector<std::pair<double, DemagTensorInfo> > found;
+	if (info.periodic_x || info.periodic_y || info.periodic_z) return std::vector<DemagTensorInfo>();
+
+	const std::string cls = cacheIndexClass(info);
+	std::ifstream in(cacheIndexFile(info).c_str());
+	std::string line;
+	while (std::getline(in, line)) {
+		std::stringstream ss(line);
+		std::string c; DemagTensorInfo src = info;
+		if (!(ss >> c >> src.dim_x >> src.dim_y >> src.dim_z >> src.exp_x >> src.exp_y >> src.exp_z)) continue;
+		if (c != cls) continue;
+		if (src.dim_x < info.dim_x || src.dim_y < info.dim_y || src.dim_z < info.dim_z) continue;
+		if (src.dim_x == info.dim_x && src.dim_y == info.dim_y && src.dim_z == info.dim_z && src.exp_x == info.exp_x && src.exp_y == info.exp_y && src.exp_z == info.exp_z) continue; // exact hit, already tried
+		found.push_back(std::make_pair(double(src.exp_x) * src.exp_y * src.exp_z, src));
+	}
+
+	std::vector<DemagTensorInfo> result;
+	std::sort(found.begin(), found.end(), compareFirst);
+	for (size_t n=0; n<found.size(); ++n) result.push_back(found[n].second);
+	return result;
+}
+
+// Map the field index I (in an expanded dimension of size exp for a mesh of size dim)
+// to the field index in an expanded dimension of size src_exp. Returns -1 for the
+// zero padding between positive and negative cell offsets.
+static int sliceIndex(int I, int dim, int exp, int src_exp)
+{
+	if (I < dim) return I; // offset I >= 0
+	if (I > exp - dim) return src_exp - (exp - I); // offset I-exp < 0
+	return -1;
+}
+
+// Try to extract the requested tensor field from a larger cached one.
+static bool loadDemagTensorSlice(const DemagTensorInfo &info, Matrix &N)
+{
+	const std::vector<DemagTensorInfo> sources = findCoveringCacheEntries(info);
+	for (size_t n=0; n<sources.size(); ++n) {
+		const DemagTensorInfo &src = sources[n];
+		DemagCache cache(src.cache_dir, cacheName(src, "Demag"), cacheKey(src, "Demag"));
+
+		Matrix N_src(Shape(6, src.exp_x, src.exp_y, src.exp_z));
+		std::vector<Matrix*> blocks(1, &N_src);
+		if (!cache.load(blocks)) continue; // stale index entry
+
+		Matrix::ro_accessor src_acc(N_src);
+		Matrix::wo_accessor acc(N);
+		for (int K=0; K<info.exp_z; ++K)
+		for (int J=0; J<info.exp_y; ++J)
+		for (int I=0; I<info.exp_x; ++I) {
+			const int I0 = sliceIndex(I, info.dim_x, info.exp_x, src.exp_x);
+			const int J0 = sliceIndex(J, info.dim_y, info.exp_y, src.exp_y);
+			const int K0 = sliceIndex(K, info.dim_z, info.exp_z, src.exp_z);
+			for (int e=0; e<6; ++e) {
+				acc.at(e, I, J, K) = (I0 < 0 || J0 < 0 || K0 < 0) ? 0.0 : src_acc.at(e, I0, J0, K0);
+			}
 		}
-	} else {
-		success = false;
-		return Matrix(Shape());
+
+		LOG_INFO << "Extracted demagnetization tensor field from cached field for " << src.dim_x << "x" << src.dim_y << "x" << src.dim_z << " cells.";
+		return true;
 	}
+	return false;
+}
+
+static void saveDemagTensor(const DemagTensorInfo &info, DemagCache &cache, Matrix &N)
+{
+	LOG_INFO << "Saving demagnetization tensor field to cache.";
+	std::vector<Matrix*> blocks(1, &N);
+	if (cache.save(blocks)) {
+		addToCacheIndex(info);
+	}
+	LOG_DEBUG << "Done.";
+}
+
+static SymmetricMatrixVectorConvolution_FFT *loadDemagKernel(const DemagTensorInfo &info, DemagCache &cache)
+{
+	// The cached kernel is either real (6 blocks) or complex (12 blocks). The
+	// layout is read from the file first, since setting up a convolution is
+	// expensive (buffers and FFTW plans).
+	const int num_blocks = cache.getNumBlocks();
+	if (num_blocks != 6 && num_blocks != 12) return 0;
+
+	std::auto_ptr<SymmetricMatrixVectorConvolution_FFT> conv(new SymmetricMatrixVectorConvolution_FFT(info.dim_x, info.dim_y, info.dim_z, info.exp_x, info.exp_y, info.exp_z, num_blocks == 6));
+	if (!cache.load(conv->getKernel())) return 0;
+
+	LOG_INFO << "Loaded transformed demagnetization tensor field from cache.";
+	return conv.release();
+}
+
+static void saveDemagKernel(DemagCache &cache, SymmetricMatrixVectorConvolution_FFT &conv)
+{
+	LOG_INFO << "Saving transformed demagnetization tensor field to cache.";
+	cache.save(conv.getKernel());
+	LOG_DEBUG << "Done.";
 }
 
 // FIELD GENERATION ////////////////////////////////////////////////////////////////////
 
-Matrix GenerateDemagTensor(
+static DemagTensorInfo makeDemagTensorInfo(
 	int dim_x, int dim_y, int dim_z, 
 	double delta_x, double delta_y, double delta_z, 
 	bool periodic_x, bool periodic_y, bool periodic_z, int periodic_repeat,
 	int padding,
-	const char *cache_dir)
+	const char *cache_dir,
+	double asymptotic_radius,
+	bool lattice_sum)
 {
 	DemagTensorInfo info;
 	info.dim_x           = dim_x; 
@@ -135,18 +262,41 @@ Matrix GenerateDemagTensor(
 	info.periodic_z      = periodic_z;
 	info.periodic_repeat = periodic_repeat;
 	info.padding         = padding;
+	info.asymptotic_radius = asymptotic_radius;
+	info.lattice_sum     = lattice_sum && (periodic_x || periodic_y || periodic_z);
 	info.cache_dir       = cache_dir;
-	const int exp_x      = info.exp_x = round_tensor_dimension(dim_x, periodic_x, padding);
-	const int exp_y      = info.exp_y = round_tensor_dimension(dim_y, periodic_y, padding);
-	const int exp_z      = info.exp_z = round_tensor_dimension(dim_z, periodic_z, padding);
+	info.exp_x           = round_tensor_dimension(dim_x, periodic_x, padding);
+	info.exp_y           = round_tensor_dimension(dim_y, periodic_y, padding);
+	info.exp_z           = round_tensor_dimension(dim_z, periodic_z, padding);
+	return info;
+}
 
-	const std::string cache_path = cacheFile(info);
+Matrix GenerateDemagTensor(
+	int dim_x, int dim_y, int dim_z, 
+	double delta_x, double delta_y, double delta_z, 
+	bool periodic_x, bool periodic_y, bool periodic_z, int periodic_repeat,
+	int padding,
+	const char *cache_dir,
+	int num_threads,
+	double asymptotic_radius,
+	bool lattice_sum)
+{
+	const DemagTensorInfo info = makeDemagTensorInfo(dim_x, dim_y, dim_z, delta_x, delta_y, delta_z, periodic_x, periodic_y, periodic_z, periodic_repeat, padding, cache_dir, asymptotic_radius, lattice_sum);
+	const int exp_x = info.exp_x, exp_y = info.exp_y, exp_z = info.exp_z;
+
+	DemagCache cache(info.cache_dir, cacheName(info, "Demag"), cacheKey(info, "Demag"));
 
 	LOG_INFO << "Setting up demagnetization tensor field";
 	LOG_INFO << "  Magn. size      : " << dim_x << "x" << dim_y << "x" << dim_z << " cells";
 	LOG_INFO << "  FFT size        : " << exp_x << "x" << exp_y << "x" << exp_z;
 	LOG_INFO << "  PBC dimensions  : " << (periodic_x ? "x" : "") << (periodic_y ? "y" : "") << (periodic_z ? "z" : "") << (!periodic_x && !periodic_y && !periodic_z ? "none" : "") << "  (" << periodic_repeat << " repetitions)";
-	LOG_INFO << "  Cache file      : " << cache_path;
+	if (asymptotic_radius > 0.0) {
+		LOG_INFO << "  Far field       : asymptotic beyond " << asymptotic_radius << " cells";
+	}
+	if (info.lattice_sum) {
+		LOG_INFO << "  PBC images      : lattice sum (asymptotic far images, tail correction)";
+	}
+	LOG_INFO << "  Cache file      : " << cache.getPath();
 
 	// Skip computation?
 	if (std::getenv("MAGNUM_DEMAG_GARBAGE")) {
@@ -154,11 +304,12 @@ Matrix GenerateDemagTensor(
 		return Matrix(Shape(6, exp_x, exp_y, exp_z));
 	}
 
-	// Demag tensor field cached?
+	// Demag tensor field cached? (If another process is computing it, wait for it.)
 	{
-		bool success = false;
-		Matrix N_cached = loadDemagTensor(info, cache_path, success);
-		if (success) return N_cached;
+		Matrix N_cached(Shape(6, exp_x, exp_y, exp_z));
+		if (loadDemagTensor(cache, N_cached)) return N_cached;
+		if (loadDemagTensorSlice(info, N_cached)) return N_cached;
+		if (!cache.lock() && loadDemagTensor(cache, N_cached)) return N_cached;
 	}
 
 	// periodic bc setup
@@ -172,18 +323,58 @@ Matrix GenerateDemagTensor(
 	Matrix N = calculateDemagTensor_old(delta_x, delta_y, delta_z, dim_x, dim_y, dim_z, exp_x, exp_y, exp_z, repeat_x, repeat_y, repeat_z);
 #else
 	// New implementation (in ./tensor.cpp)
-	Matrix N = calculateDemagTensor(delta_x, delta_y, delta_z, dim_x, dim_y, dim_z, exp_x, exp_y, exp_z, repeat_x, repeat_y, repeat_z);
+	Matrix N = calculateDemagTensor(delta_x, delta_y, delta_z, dim_x, dim_y, dim_z, exp_x, exp_y, exp_z, repeat_x, repeat_y, repeat_z, num_threads, asymptotic_radius, info.lattice_sum);
 #endif
 	const double t1 = os::getTickCount();
 
 	// we actually compute -N because H = -(N x M) = (-N) x M
 	N.scale(-1);
 
-	// Save tensor field to cache (if the computation took longer than 30 secs)
-	if (t1-t0 > 30000.0) {
-		saveDemagTensor(info, cache_path, N);
+	// Save tensor field to cache (if other processes may wait for it, or if the computation took longer than 30 secs)
+	if (cache.isLocked() || t1-t0 > 30000.0) {
+		saveDemagTensor(info, cache, N);
 	}
 
 	// done
 	return N;
 }
+
+SymmetricMatrixVectorConvolution_FFT *GenerateDemagTensorConvolution(
+	int dim_x, int dim_y, int dim_z, 
+	double delta_x, double delta_y, double delta_z, 
+	bool periodic_x, bool periodic_y, bool periodic_z, int periodic_repeat,
+	int padding,
+	const char *cache_dir,
+	int num_threads,
+	double asymptotic_radius,
+	bool lattice_sum)
+{
+	const DemagTensorInfo info = makeDemagTensorInfo(dim_x, dim_y, dim_z, delta_x, delta_y, delta_z, periodic_x, periodic_y, periodic_z, periodic_repeat, padding, cache_dir, asymptotic_radius, lattice_sum);
+
+	// The layout of the transformed kernel depends on whether the convolution is 2D or 3D.
+	const bool is_2d = (dim_z == 1) && (info.exp_z == 1);
+	const char *prefix = is_2d ? "DemagKernel2D" : "DemagKernel3D";
+	std::string key = cacheKey(info, prefix);
+	if (std::getenv("MAGNUM_CONV_NO_REAL_KERNEL")) key += " no_real_kernel"; // (see SymmetricMatrixVectorConvolution_FFT)
+	DemagCache cache(info.cache_dir, cacheName(info, prefix), key);
+	const bool garbage = (std::getenv("MAGNUM_DEMAG_GARBAGE") != 0);
+
+	// Transformed kernel cached?
+	if (!garbage) {
+		SymmetricMatrixVectorConvolution_FFT *conv = loadDemagKernel(info, cache);
+		if (!conv && !cache.lock()) conv = loadDemagKernel(info, cache);
+		if (conv) return conv;
+	}
+
+	const double t0 = os::getTickCount();
+	Matrix N = GenerateDemagTensor(dim_x, dim_y, dim_z, delta_x, delta_y, delta_z, periodic_x, periodic_y, periodic_z, periodic_repeat, padding, cache_dir, num_threads, asymptotic_radius, lattice_sum);
+	std::auto_ptr<SymmetricMatrixVectorConvolution_FFT> conv(new SymmetricMatrixVectorConvolution_FFT(N, dim_x, dim_y, dim_z));
+	const double t1 = os::getTickCount();
+
+	// Save transformed kernel to cache (if other processes may wait for it, or if the setup took longer than 1 sec)
+	if (!garbage && (cache.isLocked() || t1-t0 > 1000.0)) {
+		saveDemagKernel(cache, *conv);
+	}
+
+	return conv.release();
+}
@@ -26,6 +26,8 @@
 #include "config.h"
 #include "matrix/matty.h"
 
+class SymmetricMatrixVectorConvolution_FFT;
+
 // This function is exported to the Python code.
 // Result: field of dimensions (6, exp_x, exp_y, exp_z)
 Matrix GenerateDemagTensor(
@@ -33,7 +35,23 @@ Matrix GenerateDemagTensor(
 	double delta_x, double delta_y, double delta_z, 
 	bool periodic_x, bool periodic_y, bool periodic_z, int periodic_repeat,
 	int padding,
-	const char *cache_dir
+	const char *cache_dir,
+	int num_threads = 1,
+	double asymptotic_radius = 0.0,
+	bool lattice_sum = false
+);
+
+// Like GenerateDemagTensor, but returns the FFT convolution with the
+// transformed tensor field. The transformed field is cached as well.
+SymmetricMatrixVectorConvolution_FFT *GenerateDemagTensorConvolution(
+	int dim_x, int dim_y, int dim_z, 
+	double delta_x, double delta_y, double delta_z, 
+	bool periodic_x, bool periodic_y, bool periodic_z, int periodic_repeat,
+	int padding,
+	const char *cache_dir,
+	int num_threads = 1,
+	double asymptotic_radius = 0.0,
+	bool lattice_sum = false
 );
 
 #endif
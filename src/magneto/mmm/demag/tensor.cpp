@@ -27,167 +27,269 @@
 #include "config.h"
 #include "tensor.h"
 #include "tensor_integrals.h"
+#include "tensor_asymptotic.h"
 
 #include <cfloat>
 #include <cstdlib>
+#include <vector>
+#include <memory>
+#include <algorithm>
+
+#ifdef _OPENMP
+#include <omp.h>
+#endif
 
 #include "Logger.h"
 
 using namespace tensor_integrals;
 
-Matrix calculateDemagTensor(long double lx, long double ly, long double lz, int nx, int ny, int nz, int ex, int ey, int ez, int repeat_x, int repeat_y, int repeat_z)
+// Distance (in units of the largest cell dimension) beyond which the lattice sum mode evaluates periodic images
+// with the asymptotic expansion. Its relative error there is far below the rounding error of the exact integrals.
+static const double LATTICE_SUM_ASYMPTOTIC_RADIUS = 16.0;
+
+struct TensorEntry
+{
+	double Nxx, Nxy, Nxz, Nyy, Nyz, Nzz;
+};
+
+// Calculates the (unscattered) tensor entries of cell (i,j,k), including all periodic repetitions.
+// Cell pairs farther apart than sqrt(asymptotic_r2) use the asymptotic expansion (if given), periodic
+// images farther apart than sqrt(image_r2) as well. With lattice_sum, the 3D PBC tail is corrected, too.
+static void calculateTensorEntry(long double lx, long double ly, long double lz, int nx, int ny, int nz, int repeat_x, int repeat_y, int repeat_z, bool no_infinity_correction, bool lattice_sum, const AsymptoticDemagTensor *asymptotic, double asymptotic_r2, double image_r2, int i, int j, int k, TensorEntry &entry)
+{
+	double Nxx = 0, Nyy = 0, Nzz = 0, Nxy = 0, Nyz = 0, Nxz = 0;
+	for (int rx = 0; rx < repeat_x; ++rx)
+	for (int ry = 0; ry < repeat_y; ++ry)
+	for (int rz = 0; rz < repeat_z; ++rz) {
+		int mcs = 1;
+		if (i+rx*nx == 0) mcs *= 2;
+		if (j+ry*ny == 0) mcs *= 2;
+		if (k+rz*nz == 0) mcs *= 2;
+		if (asymptotic) {
+			const double x = (i+rx*nx)*lx, y = (j+ry*ny)*ly, z = (k+rz*nz)*lz;
+			const bool image = (rx != 0 || ry != 0 || rz != 0);
+			if (x*x + y*y + z*z >= (image ? image_r2 : asymptotic_r2)) {
+				double N[6];
+				asymptotic->calculate(x, y, z, N);
+				Nxx += -N[0]/mcs; Nxy += -N[1]/mcs; Nxz += -N[2]/mcs;
+				Nyy += -N[3]/mcs; Nyz += -N[4]/mcs; Nzz += -N[5]/mcs;
+				continue;
+			}
+		}
+		Nxx += -I_T(2, 0, 0, lx, ly, lz, i+rx*nx, j+ry*ny, k+rz*nz)/mcs;
+		Nyy += -I_T(0, 2, 0, lx, ly, lz, i+rx*nx, j+ry*ny, k+rz*nz)/mcs;
+		Nzz += -I_T(0, 0, 2, lx, ly, lz, i+rx*nx, j+ry*ny, k+rz*nz)/mcs;
+		Nxy += -I_T(1, 1, 0, lx, ly, lz, i+rx*nx, j+ry*ny, k+rz*nz)/mcs;
+		Nyz += -I_T(0, 1, 1, lx, ly, lz, i+rx*nx, j+ry*ny, k+rz*nz)/mcs;
+		Nxz += -I_T(1, 0, 1, lx, ly, lz, i+rx*nx, j+ry*ny, k+rz*nz)/mcs;
+	}
+
+	if (!no_infinity_correction) {
+
+		if (repeat_x > 1)
+		{
+			const double scale = -lx*ly*lz/(4.0*MY_PI);
+			for (int ry = 0; ry < repeat_y; ++ry)
+			for (int rz = 0; rz < repeat_z; ++rz) {
+				int mcs = 1;
+				if (j+ry*ny == 0) mcs *= 2;
+				if (k+rz*nz == 0) mcs *= 2;
+				Nxx += scale*PBC_Demag_1D(2, 0, 0, lx, ly, lz, i+repeat_x*nx, j+ry*ny, k+rz*nz, nx)/mcs;
+				Nyy += scale*PBC_Demag_1D(0, 2, 0, lx, ly, lz, i+repeat_x*nx, j+ry*ny, k+rz*nz, nx)/mcs;
+				Nzz += scale*PBC_Demag_1D(0, 0, 2, lx, ly, lz, i+repeat_x*nx, j+ry*ny, k+rz*nz, nx)/mcs;
+				Nxy += scale*PBC_Demag_1D(1, 1, 0, lx, ly, lz, i+repeat_x*nx, j+ry*ny, k+rz*nz, nx)/mcs;
+				Nyz += scale*PBC_Demag_1D(0, 1, 1, lx, ly, lz, i+repeat_x*nx, j+ry*ny, k+rz*nz, nx)/mcs;
+				Nxz += scale*PBC_Demag_1D(1, 0, 1, lx, ly, lz, i+repeat_x*nx, j+ry*ny, k+rz*nz, nx)/mcs;
+			}
+		}
+
+		if (repeat_y > 1)
+		{
+			const double scale = -lx*ly*lz/(4.0*MY_PI);
+			for (int rx = 0; rx < repeat_x; ++rx)
+			for (int rz = 0; rz < repeat_z; ++rz) {
+				int mcs = 1;
+				if (i+rx*nx == 0) mcs *= 2;
+				if (k+rz*nz == 0) mcs *= 2;
+				Nxx += scale*PBC_Demag_1D(0, 2, 0, ly, lx, lz, j+repeat_y*ny, i+rx*nx, k+rz*nz, ny)/mcs;
+				Nyy += scale*PBC_Demag_1D(2, 0, 0, ly, lx, lz, j+repeat_y*ny, i+rx*nx, k+rz*nz, ny)/mcs;
+				Nzz += scale*PBC_Demag_1D(0, 0, 2, ly, lx, lz, j+repeat_y*ny, i+rx*nx, k+rz*nz, ny)/mcs;
+				Nxy += scale*PBC_Demag_1D(1, 1, 0, ly, lx, lz, j+repeat_y*ny, i+rx*nx, k+rz*nz, ny)/mcs;
+				Nyz += scale*PBC_Demag_1D(1, 0, 1, ly, lx, lz, j+repeat_y*ny, i+rx*nx, k+rz*nz, ny)/mcs;
+				Nxz += scale*PBC_Demag_1D(0, 1, 1, ly, lx, lz, j+repeat_y*ny, i+rx*nx, k+rz*nz, ny)/mcs;
+			}
+		}
+
+		if (repeat_z > 1)
+		{
+			const double scale = -lx*ly*lz/(4.0*MY_PI);
+			for (int rx = 0; rx < repeat_x; ++rx)
+			for (int ry = 0; ry < repeat_y; ++ry) {
+				int mcs = 1;
+				if (i+rx*nx == 0) mcs *= 2;
+				if (j+ry*ny == 0) mcs *= 2;
+				Nxx += scale*PBC_Demag_1D(0, 0, 2, lz, ly, lx, k+repeat_z*nz, j+ry*ny, i+rx*nx, nz)/mcs;
+				Nyy += scale*PBC_Demag_1D(0, 2, 0, lz, ly, lx, k+repeat_z*nz, j+ry*ny, i+rx*nx, nz)/mcs;
+				Nzz += scale*PBC_Demag_1D(2, 0, 0, lz, ly, lx, k+repeat_z*nz, j+ry*ny, i+rx*nx, nz)/mcs;
+				Nxy += scale*PBC_Demag_1D(0, 1, 1, lz, ly, lx, k+repeat_z*nz, j+ry*ny, i+rx*nx, nz)/mcs;
+				Nyz += scale*PBC_Demag_1D(1, 1, 0, lz, ly, lx, k+repeat_z*nz, j+ry*ny, i+rx*nx, nz)/mcs;
+				Nxz += scale*PBC_Demag_1D(1, 0, 1, lz, ly, lx, k+repeat_z*nz, j+ry*ny, i+rx*nx, nz)/mcs;
+			}
+		}
+
+		if (repeat_x > 1 && repeat_y > 1)
+		{
+			const double scale = -lx*ly*lz/(4.0*MY_PI);
+			for (int rz = 0; rz < repeat_z; ++rz) {
+				int mcs = 1;
+				if (k+rz*nz == 0) mcs *= 2;
+				Nxx += scale*PBC_Demag_2D(2, 0, 0, lx, ly, lz, i+repeat_x*nx, j+repeat_y*ny, k+rz*nz, nx, ny)/mcs;
+				Nyy += scale*PBC_Demag_2D(0, 2, 0, lx, ly, lz, i+repeat_x*nx, j+repeat_y*ny, k+rz*nz, nx, ny)/mcs;
+				Nzz += scale*PBC_Demag_2D(0, 0, 2, lx, ly, lz, i+repeat_x*nx, j+repeat_y*ny, k+rz*nz, nx, ny)/mcs;
+				Nxy += scale*PBC_Demag_2D(1, 1, 0, lx, ly, lz, i+repeat_x*nx, j+repeat_y*ny, k+rz*nz, nx, ny)/mcs;
+				Nyz += scale*PBC_Demag_2D(0, 1, 1, lx, ly, lz, i+repeat_x*nx, j+repeat_y*ny, k+rz*nz, nx, ny)/mcs;
+				Nxz += scale*PBC_Demag_2D(1, 0, 1, lx, ly, lz, i+repeat_x*nx, j+repeat_y*ny, k+rz*nz, nx, ny)/mcs;
+			}
+		}
+
+		if (repeat_x > 1 && repeat_z > 1)
+		{
+			const double scale = -lx*ly*lz/(4.0*MY_PI);
+			for (int ry = 0; ry < repeat_y; ++ry) {
+				int mcs = 1;
+				if (j+ry*ny == 0) mcs *= 2;
+				Nxx += scale*PBC_Demag_2D(2, 0, 0, lx, lz, ly, i+repeat_x*nx, k+repeat_z*nz, j+ry*ny, nx, nz)/mcs;
+				Nyy += scale*PBC_Demag_2D(0, 0, 2, lx, lz, ly, i+repeat_x*nx, k+repeat_z*nz, j+ry*ny, nx, nz)/mcs;
+				Nzz += scale*PBC_Demag_2D(0, 2, 0, lx, lz, ly, i+repeat_x*nx, k+repeat_z*nz, j+ry*ny, nx, nz)/mcs;
+				Nxy += scale*PBC_Demag_2D(1, 0, 1, lx, lz, ly, i+repeat_x*nx, k+repeat_z*nz, j+ry*ny, nx, nz)/mcs;
+				Nyz += scale*PBC_Demag_2D(0, 1, 1, lx, lz, ly, i+repeat_x*nx, k+repeat_z*nz, j+ry*ny, nx, nz)/mcs;
+				Nxz += scale*PBC_Demag_2D(1, 1, 0, lx, lz, ly, i+repeat_x*nx, k+repeat_z*nz, j+ry*ny, nx, nz)/mcs;
+			}
+		}
+
+		if (repeat_y > 1 && repeat_z > 1)
+		{
+			const double scale = -lx*ly*lz/(4.0*MY_PI);
+			for (int rx = 0; rx < repeat_x; ++rx) {
+				int mcs = 1;
+				if (i+rx*nx == 0) mcs *= 2;
+				Nxx += scale*PBC_Demag_2D(0, 0, 2, lz, ly, lx, k+repeat_z*nz, j+repeat_y*ny, i+rx*nx, nz, ny)/mcs;
+				Nyy += scale*PBC_Demag_2D(0, 2, 0, lz, ly, lx, k+repeat_z*nz, j+repeat_y*ny, i+rx*nx, nz, ny)/mcs;
+				Nzz += scale*PBC_Demag_2D(2, 0, 0, lz, ly, lx, k+repeat_z*nz, j+repeat_y*ny, i+rx*nx, nz, ny)/mcs;
+				Nxy += scale*PBC_Demag_2D(0, 1, 1, lz, ly, lx, k+repeat_z*nz, j+repeat_y*ny, i+rx*nx, nz, ny)/mcs;
+				Nyz += scale*PBC_Demag_2D(1, 1, 0, lz, ly, lx, k+repeat_z*nz, j+repeat_y*ny, i+rx*nx, nz, ny)/mcs;
+				Nxz += scale*PBC_Demag_2D(1, 0, 1, lz, ly, lx, k+repeat_z*nz, j+repeat_y*ny, i+rx*nx, nz, ny)/mcs;
+			}
+		}
+
+		if (lattice_sum && repeat_x > 1 && repeat_y > 1 && repeat_z > 1)
+		{
+			const double scale = -lx*ly*lz/(4.0*MY_PI);
+			Nxx += scale*PBC_Demag_3D(2, 0, 0, lx, ly, lz, i+repeat_x*nx, j+repeat_y*ny, k+repeat_z*nz, nx, ny, nz);
+			Nyy += scale*PBC_Demag_3D(0, 2, 0, lx, ly, lz, i+repeat_x*nx, j+repeat_y*ny, k+repeat_z*nz, nx, ny, nz);
+			Nzz += scale*PBC_Demag_3D(0, 0, 2, lx, ly, lz, i+repeat_x*nx, j+repeat_y*ny, k+repeat_z*nz, nx, ny, nz);
+			Nxy += scale*PBC_Demag_3D(1, 1, 0, lx, ly, lz, i+repeat_x*nx, j+repeat_y*ny, k+repeat_z*nz, nx, ny, nz);
+			Nyz += scale*PBC_Demag_3D(0, 1, 1, lx, ly, lz, i+repeat_x*nx, j+repeat_y*ny, k+repeat_z*nz, nx, ny, nz);
+			Nxz += scale*PBC_Demag_3D(1, 0, 1, lx, ly, lz, i+repeat_x*nx, j+repeat_y*ny, k+repeat_z*nz, nx, ny, nz);
+		}
+	} // if (!no_infinity_correction)
+
+	entry.Nxx = Nxx; entry.Nxy = Nxy; entry.Nxz = Nxz;
+	entry.Nyy = Nyy; entry.Nyz = Nyz; entry.Nzz = Nzz;
+}
+
+Matrix calculateDemagTensor(long double lx, long double ly, long double lz, int nx, int ny, int nz, int ex, int ey, int ez, int repeat_x, int repeat_y, int repeat_z, int num_threads, double asymptotic_radius, bool lattice_sum)
 {
 	LOG_DEBUG << "calculateDemagTensor: calculating with " << LDBL_MANT_DIG << " bit working precision.";
 	if (LDBL_MANT_DIG < 64) LOG_WARN << "calculateDemagTensor: Your working precision is below 64 bit. This might result in too low accuracy.";
 
-	Matrix N_matrix = zeros(Shape(6, ex, ey, ez)); 
+#ifdef _OPENMP
+	if (num_threads < 1) num_threads = omp_get_num_procs();
+	LOG_DEBUG << "calculateDemagTensor: using " << num_threads << " thread(s).";
+#else
+	if (num_threads > 1) LOG_WARN << "calculateDemagTensor: Compiled without OpenMP support, ignoring request for " << num_threads << " threads.";
+	num_threads = 1;
+#endif
+
+	const bool no_infinity_correction = (std::getenv("MAGNUM_DEMAG_NO_INFINITY_CORRECTION") != 0);
+
+	// Far field approximation beyond asymptotic_radius (in units of the largest cell dimension)
+	std::auto_ptr<AsymptoticDemagTensor> asymptotic;
+	double asymptotic_r2 = DBL_MAX, image_r2 = DBL_MAX;
+	const double h = std::max(lx, std::max(ly, lz));
+	if (asymptotic_radius > 0.0) {
+		asymptotic.reset(new AsymptoticDemagTensor(lx, ly, lz));
+		asymptotic_r2 = image_r2 = (asymptotic_radius*h) * (asymptotic_radius*h);
+		LOG_DEBUG << "calculateDemagTensor: using asymptotic expansion beyond " << asymptotic_radius << " cells.";
+	}
+
+	// Lattice sum mode: Far periodic images use the asymptotic expansion, which is more accurate there than
+	// the closed-form integrals and much cheaper, and the 3D PBC tail beyond the repetitions is added.
+	const bool periodic = (repeat_x > 1 || repeat_y > 1 || repeat_z > 1);
+	if (lattice_sum && periodic) {
+		if (!asymptotic.get()) asymptotic.reset(new AsymptoticDemagTensor(lx, ly, lz));
+		image_r2 = std::min(image_r2, (LATTICE_SUM_ASYMPTOTIC_RADIUS*h) * (LATTICE_SUM_ASYMPTOTIC_RADIUS*h));
+		LOG_DEBUG << "calculateDemagTensor: lattice sum mode, asymptotic expansion for periodic images beyond " << LATTICE_SUM_ASYMPTOTIC_RADIUS << " cells.";
+	}
+
+	// 1. Calculate the tensor entries of all cells. Each (i,j)-row of cells is an independent work item.
+	std::vector<TensorEntry> entries(size_t(nx) * ny * nz);
 	{
-		Matrix::rw_accessor N_acc(N_matrix);
+		const int num_rows = nx * ny;
+		int rows_done = 0, percent = 0;
 
-		const bool no_infinity_correction = (std::getenv("MAGNUM_DEMAG_NO_INFINITY_CORRECTION") != 0);
-
-		int percent = 0;
-
-		for (int i = 0; i < nx; i++) {
-			for (int j = 0; j < ny; j++)
-			for (int k = 0; k < nz; k++)
-			{
-				double Nxx = 0, Nyy = 0, Nzz = 0, Nxy = 0, Nyz = 0, Nxz = 0;
-				for (int rx = 0; rx < repeat_x; ++rx)
-				for (int ry = 0; ry < repeat_y; ++ry)
-				for (int rz = 0; rz < repeat_z; ++rz) {
-					int mcs = 1;
-					if (i+rx*nx == 0) mcs *= 2;
-					if (j+ry*ny == 0) mcs *= 2;
-					if (k+rz*nz == 0) mcs *= 2;
-					Nxx += -I_T(2, 0, 0, lx, ly, lz, i+rx*nx, j+ry*ny, k+rz*nz)/mcs;
-					Nyy += -I_T(0, 2, 0, lx, ly, lz, i+rx*nx, j+ry*ny, k+rz*nz)/mcs;
-					Nzz += -I_T(0, 0, 2, lx, ly, lz, i+rx*nx, j+ry*ny, k+rz*nz)/mcs;
-					Nxy += -I_T(1, 1, 0, lx, ly, lz, i+rx*nx, j+ry*ny, k+rz*nz)/mcs;
-		 			Nyz += -I_T(0, 1, 1, lx, ly, lz, i+rx*nx, j+ry*ny, k+rz*nz)/mcs;
-					Nxz += -I_T(1, 0, 1, lx, ly, lz, i+rx*nx, j+ry*ny, k+rz*nz)/mcs;
-				}
-
-				if (!no_infinity_correction) {
-
-					if (repeat_x > 1)
-					{
-						const double scale = -lx*ly*lz/(4.0*MY_PI);
-						for (int ry = 0; ry < repeat_y; ++ry)
-						for (int rz = 0; rz < repeat_z; ++rz) {
-							int mcs = 1;
-							if (j+ry*ny == 0) mcs *= 2;
-							if (k+rz*nz == 0) mcs *= 2;
-							Nxx += scale*PBC_Demag_1D(2, 0, 0, lx, ly, lz, i+repeat_x*nx, j+ry*ny, k+rz*nz, nx)/mcs;
-							Nyy += scale*PBC_Demag_1D(0, 2, 0, lx, ly, lz, i+repeat_x*nx, j+ry*ny, k+rz*nz, nx)/mcs;
-							Nzz += scale*PBC_Demag_1D(0, 0, 2, lx, ly, lz, i+repeat_x*nx, j+ry*ny, k+rz*nz, nx)/mcs;
-							Nxy += scale*PBC_Demag_1D(1, 1, 0, lx, ly, lz, i+repeat_x*nx, j+ry*ny, k+rz*nz, nx)/mcs;
-							Nyz += scale*PBC_Demag_1D(0, 1, 1, lx, ly, lz, i+repeat_x*nx, j+ry*ny, k+rz*nz, nx)/mcs;
-							Nxz += scale*PBC_Demag_1D(1, 0, 1, lx, ly, lz, i+repeat_x*nx, j+ry*ny, k+rz*nz, nx)/mcs;
-						}
-					}
-
-					if (repeat_y > 1)
-					{
-						const double scale = -lx*ly*lz/(4.0*MY_PI);
-						for (int rx = 0; rx < repeat_x; ++rx)
-						for (int rz = 0; rz < repeat_z; ++rz) {
-							int mcs = 1;
-							if (i+rx*nx == 0) mcs *= 2;
-							if (k+rz*nz == 0) mcs *= 2;
-							Nxx += scale*PBC_Demag_1D(0, 2, 0, ly, lx, lz, j+repeat_y*ny, i+rx*nx, k+rz*nz, ny)/mcs;
-							Nyy += scale*PBC_Demag_1D(2, 0, 0, ly, lx, lz, j+repeat_y*ny, i+rx*nx, k+rz*nz, ny)/mcs;
-							Nzz += scale*PBC_Demag_1D(0, 0, 2, ly, lx, lz, j+repeat_y*ny, i+rx*nx, k+rz*nz, ny)/mcs;
-							Nxy += scale*PBC_Demag_1D(1, 1, 0, ly, lx, lz, j+repeat_y*ny, i+rx*nx, k+rz*nz, ny)/mcs;
-							Nyz += scale*PBC_Demag_1D(1, 0, 1, ly, lx, lz, j+repeat_y*ny, i+rx*nx, k+rz*nz, ny)/mcs;
-							Nxz += scale*PBC_Demag_1D(0, 1, 1, ly, lx, lz, j+repeat_y*ny, i+rx*nx, k+rz*nz, ny)/mcs;
-						}
-					}
-
-					if (repeat_z > 1)
-					{
-						const double scale = -lx*ly*lz/(4.0*MY_PI);
-						for (int rx = 0; rx < repeat_x; ++rx)
-						for (int ry = 0; ry < repeat_y; ++ry) {
-							int mcs = 1;
-							if (i+rx*nx == 0) mcs *= 2;
-							if (j+ry*ny == 0) mcs *= 2;
-							Nxx += scale*PBC_Demag_1D(0, 0, 2, lz, ly, lx, k+repeat_z*nz, j+ry*ny, i+rx*nx, nz)/mcs;
-							Nyy += scale*PBC_Demag_1D(0, 2, 0, lz, ly, lx, k+repeat_z*nz, j+ry*ny, i+rx*nx, nz)/mcs;
-							Nzz += scale*PBC_Demag_1D(2, 0, 0, lz, ly, lx, k+repeat_z*nz, j+ry*ny, i+rx*nx, nz)/mcs;
-							Nxy += scale*PBC_Demag_1D(0, 1, 1, lz, ly, lx, k+repeat_z*nz, j+ry*ny, i+rx*nx, nz)/mcs;
-							Nyz += scale*PBC_Demag_1D(1, 1, 0, lz, ly, lx, k+repeat_z*nz, j+ry*ny, i+rx*nx, nz)/mcs;
-							Nxz += scale*PBC_Demag_1D(1, 0, 1, lz, ly, lx, k+repeat_z*nz, j+ry*ny, i+rx*nx, nz)/mcs;
-						}
-					}
-
-					if (repeat_x > 1 && repeat_y > 1)
-					{
-						const double scale = -lx*ly*lz/(4.0*MY_PI);
-						for (int rz = 0; rz < repeat_z; ++rz) {
-							int mcs = 1;
-							if (k+rz*nz == 0) mcs *= 2;
-							Nxx += scale*PBC_Demag_2D(2, 0, 0, lx, ly, lz, i+repeat_x*nx, j+repeat_y*ny, k+rz*nz, nx, ny)/mcs;
-							Nyy += scale*PBC_Demag_2D(0, 2, 0, lx, ly, lz, i+repeat_x*nx, j+repeat_y*ny, k+rz*nz, nx, ny)/mcs;
-							Nzz += scale*PBC_Demag_2D(0, 0, 2, lx, ly, lz, i+repeat_x*nx, j+repeat_y*ny, k+rz*nz, nx, ny)/mcs;
-							Nxy += scale*PBC_Demag_2D(1, 1, 0, lx, ly, lz, i+repeat_x*nx, j+repeat_y*ny, k+rz*nz, nx, ny)/mcs;
-							Nyz += scale*PBC_Demag_2D(0, 1, 1, lx, ly, lz, i+repeat_x*nx, j+repeat_y*ny, k+rz*nz, nx, ny)/mcs;
-							Nxz += scale*PBC_Demag_2D(1, 0, 1, lx, ly, lz, i+repeat_x*nx, j+repeat_y*ny, k+rz*nz, nx, ny)/mcs;
-						}
-					}
-
-					if (repeat_x > 1 && repeat_z > 1)
-					{
-						const double scale = -lx*ly*lz/(4.0*MY_PI);
-						for (int ry = 0; ry < repeat_y; ++ry) {
-							int mcs = 1;
-							if (j+ry*ny == 0) mcs *= 2;
-							Nxx += scale*PBC_Demag_2D(2, 0, 0, lx, lz, ly, i+repeat_x*nx, k+repeat_z*nz, j+ry*ny, nx, nz)/mcs;
-							Nyy += scale*PBC_Demag_2D(0, 0, 2, lx, lz, ly, i+repeat_x*nx, k+repeat_z*nz, j+ry*ny, nx, nz)/mcs;
-							Nzz += scale*PBC_Demag_2D(0, 2, 0, lx, lz, ly, i+repeat_x*nx, k+repeat_z*nz, j+ry*ny, nx, nz)/mcs;
-							Nxy += scale*PBC_Demag_2D(1, 0, 1, lx, lz, ly, i+repeat_x*nx, k+repeat_z*nz, j+ry*ny, nx, nz)/mcs;
-							Nyz += scale*PBC_Demag_2D(0, 1, 1, lx, lz, ly, i+repeat_x*nx, k+repeat_z*nz, j+ry*ny, nx, nz)/mcs;
-							Nxz += scale*PBC_Demag_2D(1, 1, 0, lx, lz, ly, i+repeat_x*nx, k+repeat_z*nz, j+ry*ny, nx, nz)/mcs;
-						}
-					}
-
-					if (repeat_y > 1 && repeat_z > 1)
-					{
-						const double scale = -lx*ly*lz/(4.0*MY_PI);
-						for (int rx = 0; rx < repeat_x; ++rx) {
-							int mcs = 1;
-							if (i+rx*nx == 0) mcs *= 2;
-							Nxx += scale*PBC_Demag_2D(0, 0, 2, lz, ly, lx, k+repeat_z*nz, j+repeat_y*ny, i+rx*nx, nz, ny)/mcs;
-							Nyy += scale*PBC_Demag_2D(0, 2, 0, lz, ly, lx, k+repeat_z*nz, j+repeat_y*ny, i+rx*nx, nz, ny)/mcs;
-							Nzz += scale*PBC_Demag_2D(2, 0, 0, lz, ly, lx, k+repeat_z*nz, j+repeat_y*ny, i+rx*nx, nz, ny)/mcs;
-							Nxy += scale*PBC_Demag_2D(0, 1, 1, lz, ly, lx, k+repeat_z*nz, j+repeat_y*ny, i+rx*nx, nz, ny)/mcs;
-							Nyz += scale*PBC_Demag_2D(1, 1, 0, lz, ly, lx, k+repeat_z*nz, j+repeat_y*ny, i+rx*nx, nz, ny)/mcs;
-							Nxz += scale*PBC_Demag_2D(1, 0, 1, lz, ly, lx, k+repeat_z*nz, j+repeat_y*ny, i+rx*nx, nz, ny)/mcs;
-						}
-					}
-				} // if (!no_infinity_correction)
-
-				for (int o = -1; o <= 1; o += 2)
-				for (int p = -1; p <= 1; p += 2)
-				for (int q = -1; q <= 1; q += 2) {
-					// (I,J,K): Coordinates in K matrix for octant (o,p,q).
-					const int I = (o*i+ex) % ex;
-					const int J = (p*j+ey) % ey;
-					const int K = (q*k+ez) % ez;
-					N_acc.at(0, I, J, K) +=     Nxx;
-					N_acc.at(1, I, J, K) += o*p*Nxy;
-					N_acc.at(2, I, J, K) += o*q*Nxz;
-					N_acc.at(3, I, J, K) +=     Nyy;
-					N_acc.at(4, I, J, K) += p*q*Nyz;
-					N_acc.at(5, I, J, K) +=     Nzz;
-				}
+		#pragma omp parallel for schedule(dynamic) num_threads(num_threads)
+		for (int row = 0; row < num_rows; ++row) {
+			const int i = row / ny, j = row % ny;
+			for (int k = 0; k < nz; ++k) {
+				calculateTensorEntry(lx, ly, lz, nx, ny, nz, repeat_x, repeat_y, repeat_z, no_infinity_correction, lattice_sum, asymptotic.get(), asymptotic_r2, image_r2, i, j, k, entries[size_t(row) * nz + k]);
 			}
 
-			while (100.0 * (i+1) / nx >= percent) {
+			int done;
+			#pragma omp atomic capture
+			done = ++rows_done;
+
+			// Only the master thread may log (the logger calls back into Python).
+#ifdef _OPENMP
+			if (omp_get_thread_num() != 0) continue;
+#endif
+			while (100.0 * done / num_rows >= percent) {
 				LOG_INFO << "  " << percent << "%";
 				percent += 5;
 			}
 		}
+
+		while (percent <= 100) {
+			LOG_INFO << "  " << percent << "%";
+			percent += 5;
+		}
+	}
+
+	// 2. Scatter the entries into all eight octants of the tensor field. This is done serially and in the
+	//    original cell order because with periodic boundaries, several cells contribute to the same element.
+	Matrix N_matrix = zeros(Shape(6, ex, ey, ez)); 
+	{
+		Matrix::rw_accessor N_acc(N_matrix);
+
+		for (int i = 0; i < nx; i++)
+		for (int j = 0; j < ny; j++)
+		for (int k = 0; k < nz; k++) {
+			const TensorEntry &e = entries[(size_t(i) * ny + j) * nz + k];
+			for (int o = -1; o <= 1; o += 2)
+			for (int p = -1; p <= 1; p += 2)
+			for (int q = -1; q <= 1; q += 2) {
+				// (I,J,K): Coordinates in K matrix for octant (o,p,q).
+				const int I = (o*i+ex) % ex;
+				const int J = (p*j+ey) % ey;
+				const int K = (q*k+ez) % ez;
+				N_acc.at(0, I, J, K) +=     e.Nxx;
+				N_acc.at(1, I, J, K) += o*p*e.Nxy;
+				N_acc.at(2, I, J, K) += o*q*e.Nxz;
+				N_acc.at(3, I, J, K) +=     e.Nyy;
+				N_acc.at(4, I, J, K) += p*q*e.Nyz;
+				N_acc.at(5, I, J, K) +=     e.Nzz;
+			}
+		}
 	}
 
 	return N_matrix;
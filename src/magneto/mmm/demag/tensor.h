@@ -26,6 +26,6 @@
 #include "config.h"
 #include "matrix/matty.h"
 
-Matrix calculateDemagTensor(long double lx, long double ly, long double lz, int nx, int ny, int nz, int ex, int ey, int ez, int repeat_x, int repeat_y, int repeat_z);
+Matrix calculateDemagTensor(long double lx, long double ly, long double lz, int nx, int ny, int nz, int ex, int ey, int ez, int repeat_x, int repeat_y, int repeat_z, int num_threads = 1, double asymptotic_radius = 0.0, bool lattice_sum = false);
 
 #endif
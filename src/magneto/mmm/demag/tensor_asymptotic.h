@@ -0,0 +1,127 @@
+/*
+ * Copyright 2012-2014 by the MicroMagnum Team
+ * Copyright 2014 by the magnum.fd Team
+ *
+ * This file is part of magnum.fd.
+ * magnum.fd is based heavily on MicroMagnum.
+ * (https://github.com/MicroMagnum/MicroMagnum)
+ * 
+ * magnum.fd is free software: you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation, either version 3 of the License, or
+ * (at your option) any later version.
+ * 
+ * magnum.fd is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ * 
+ * You should have received a copy of the GNU General Public License
+ * along with magnum.fd. If not, see <http://www.gnu.org/licenses/>.
+ */
+
+#ifndef TENSOR_ASYMPTOTIC_H
+#define TENSOR_ASYMPTOTIC_H
+
+#include "config.h"
+
+#include <cmath>
+#include <vector>
+
+#include "mmm/constants.h"
+
+// Far field (asymptotic) approximation of the demag tensor entries between
+// two cuboid cells of size lx*ly*lz whose centers are separated by (x,y,z).
+//
+// The exact tensor entry is the dipole kernel d_a d_b (1/r) averaged over the
+// source and the target cell. Expanding this average in a Taylor series around
+// the center distance gives
+//
+//   N_ab(r) ~ V/(4*pi) * sum_k  E[D^k]/k! * d^k d_a d_b (1/r),
+//
+// where D is the difference of two points uniformly distributed in the cell
+// (only even moments E[D^k] are nonzero). All moments up to order 6 are used,
+// so the relative error decays like (h/r)^8 with h the largest cell dimension.
+class AsymptoticDemagTensor
+{
+public:
+	AsymptoticDemagTensor(double lx, double ly, double lz);
+
+	// Returns the entries in the same form as tensor_integrals::I_T(o, p, q, ...),
+	// in the order xx, xy, xz, yy, yz, zz.
+	void calculate(double x, double y, double z, double N[6]) const;
+
+private:
+	enum { MAX_ORDER = 8, DIM = MAX_ORDER + 1 };
+
+	// Index of the derivative d^a_x d^b_y d^c_z (1/r) in the flat coefficient array.
+	static int index(int a, int b, int c) { return (a*DIM + b)*DIM + c; }
+
+	// Each tensor component is a weighted sum of derivatives of 1/r.
+	struct Term { int idx; double weight; };
+	std::vector<Term> terms[6];
+};
+
+inline AsymptoticDemagTensor::AsymptoticDemagTensor(double lx, double ly, double lz)
+{
+	// Even moments E[D^k] of the triangular distribution on [-l,l] (difference of two uniform variables)
+	const double l[3] = {lx, ly, lz};
+	double moment[3][7];
+	for (int d = 0; d < 3; ++d) {
+		const double l2 = l[d]*l[d];
+		moment[d][0] = 1.0;
+		moment[d][2] = l2 / 6.0;
+		moment[d][4] = l2*l2 / 15.0;
+		moment[d][6] = l2*l2*l2 / 28.0;
+	}
+
+	static const double factorial[7] = {1, 1, 2, 6, 24, 120, 720};
+	static const int comp[6][3] = {{2,0,0}, {1,1,0}, {1,0,1}, {0,2,0}, {0,1,1}, {0,0,2}};
+
+	const double prefactor = lx*ly*lz / (4.0*MY_PI);
+	for (int n = 0; n < 6; ++n)
+	for (int a = 0; a <= 6; a += 2)
+	for (int b = 0; a+b <= 6; b += 2)
+	for (int c = 0; a+b+c <= 6; c += 2) {
+		Term t;
+		t.idx = index(a+comp[n][0], b+comp[n][1], c+comp[n][2]);
+		t.weight = prefactor * moment[0][a] * moment[1][b] * moment[2][c] / (factorial[a] * factorial[b] * factorial[c]);
+		terms[n].push_back(t);
+	}
+}
+
+inline void AsymptoticDemagTensor::calculate(double x, double y, double z, double N[6]) const
+{
+	// Derivatives D[a][b][c] = d^a_x d^b_y d^c_z (1/r) via the recurrence (n = a+b+c)
+	//   n*r^2*D[a][b][c] = -(2n-1)*(a*x*D[a-1][b][c] + ...) - (n-1)*(a*(a-1)*D[a-2][b][c] + ...),
+	// obtained from the recurrence for the Taylor coefficients of 1/r.
+	double D[DIM*DIM*DIM];
+
+	const double r2 = x*x + y*y + z*z, inv_r2 = 1.0 / r2;
+	D[0] = std::sqrt(inv_r2);
+	for (int n = 1; n <= MAX_ORDER; ++n) {
+		const double scale = inv_r2 / n;
+		for (int a = n; a >= 0; --a)
+		for (int b = n-a; b >= 0; --b) {
+			const int c = n-a-b;
+			double sum1 = 0, sum2 = 0;
+			if (a >= 1) sum1 += a*x*D[index(a-1, b, c)];
+			if (b >= 1) sum1 += b*y*D[index(a, b-1, c)];
+			if (c >= 1) sum1 += c*z*D[index(a, b, c-1)];
+			if (a >= 2) sum2 += a*(a-1)*D[index(a-2, b, c)];
+			if (b >= 2) sum2 += b*(b-1)*D[index(a, b-2, c)];
+			if (c >= 2) sum2 += c*(c-1)*D[index(a, b, c-2)];
+			D[index(a, b, c)] = -((2*n-1)*sum1 + (n-1)*sum2) * scale;
+		}
+	}
+
+	for (int n = 0; n < 6; ++n) {
+		double sum = 0;
+		for (size_t m = 0; m < terms[n].size(); ++m) {
+			sum += terms[n][m].weight * D[terms[n][m].idx];
+		}
+		N[n] = sum;
+	}
+}
+
+#endif
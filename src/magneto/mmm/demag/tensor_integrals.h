@@ -521,6 +521,38 @@ namespace tensor_integrals
 		return 0;
 	}
 
+	// Continuum limit of the periodic images in the octant beyond cell (i,j,k) (3D PBC).
+	// The octant sum is only conditionally convergent. The diagonal entries are taken in
+	// the limit of a growing box of images with the aspect ratio of the simulation volume;
+	// the off-diagonal entries diverge by a constant that cancels between the mirrored octants.
+	inline double PBC_Demag_3D(int a, int b, int c, double lx, double ly, double lz, int i, int j, int k, int nx, int ny, int nz)
+	{
+		if (b == 2) return PBC_Demag_3D(b, a, c, ly, lx, lz, j, i, k, ny, nx, nz);
+		if (c == 2) return PBC_Demag_3D(c, b, a, lz, ly, lx, k, j, i, nz, ny, nx);
+
+		const double Lx = lx*nx;
+		const double Ly = ly*ny;
+		const double Lz = lz*nz;
+		const double x = i*lx-0.5*Lx;
+		const double y = j*ly-0.5*Ly;
+		const double z = k*lz-0.5*Lz;
+		const double R = std::sqrt(x*x+y*y+z*z);
+		const double L = std::sqrt(Lx*Lx+Ly*Ly+Lz*Lz);
+
+		if (a == 2) {
+			return (0.5*MY_PI - std::atan(y/x) - std::atan(z/x) + std::atan(y*z/(x*R)) - std::atan(Ly*Lz/(Lx*L))) / (Lx*Ly*Lz);
+		} else if (a == 1 && b == 1) {
+			return -std::log(z+R) / (Lx*Ly*Lz);
+		} else if (a == 1 && c == 1) {
+			return -std::log(y+R) / (Lx*Ly*Lz);
+		} else if (b == 1 && c == 1) {
+			return -std::log(x+R) / (Lx*Ly*Lz);
+		}
+
+		assert(0);
+		return 0;
+	}
+
 	template <class T>
 	inline T I_T_subsample(int o, int p, int q, T ly, T lz, int i, int j, int k, int sub_y, int sub_z)
 	{
@@ -0,0 +1,219 @@
+/*
+ * Copyright 2012-2014 by the MicroMagnum Team
+ * Copyright 2014 by the magnum.fd Team
+ *
+ * This file is part of magnum.fd.
+ * magnum.fd is based heavily on MicroMagnum.
+ * (https://github.com/MicroMagnum/MicroMagnum)
+ * 
+ * magnum.fd is free software: you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation, either version 3 of the License, or
+ * (at your option) any later version.
+ * 
+ * magnum.fd is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ * 
+ * You should have received a copy of the GNU General Public License
+ * along with magnum.fd. If not, see <http://www.gnu.org/licenses/>.
+ */
+
+#include "config.h"
+#include "exchange_implicit.h"
+#include "exchange.h"
+#include "mmm/llge/llge.h"
+#include "mmm/constants.h"
+
+#include "Magneto.h"
+#include "Benchmark.h"
+#include "Logger.h"
+
+#include <cmath>
+
+ImplicitExchangeSolver::ImplicitExchangeSolver(const RectangularMesh &mesh)
+	: mesh(mesh),
+	  r(mesh), r0(mesh), p(mesh), v(mesh), s(mesh), t(mesh), p_hat(mesh), s_hat(mesh), H(mesh),
+	  pre_p(Shape(mesh.nx, mesh.ny, mesh.nz)), pre_q(Shape(mesh.nx, mesh.ny, mesh.nz)), pre_n(mesh)
+{
+}
+
+ImplicitExchangeSolver::~ImplicitExchangeSolver()
+{
+}
+
+void ImplicitExchangeSolver::apply(const Field &Ms, const Field &A, const Matrix &f1, const Matrix &f2, const VectorField &M, const VectorField &X, VectorField &Y)
+{
+	exchange(Ms, A, X, H);
+	llge(f1, f2, M, H, Y);
+}
+
+void ImplicitExchangeSolver::applySystem(const Field &Ms, const Field &A, const Matrix &f1, const Matrix &f2, const VectorField &M, double h, const VectorField &X, VectorField &Y)
+{
+	// Y = X - h*L(X)
+	apply(Ms, A, f1, f2, M, X, Y);
+	Y.scale(-h);
+	Y.add(X);
+}
+
+void ImplicitExchangeSolver::setupPreconditioner(const Field &Ms, const Field &A, const Matrix &f1, const Matrix &f2, const VectorMatrix &M, double h)
+{
+	// The diagonal block of the system for cell i is
+	//
+	//   S_ii = I + h*d_i*(f1*[M_i x] + f2*[M_i x]^2) = I + p*K + q*K^2,
+	//
+	// where H_exch,i = -d_i*M_i + (terms of the neighbours), K = [n x] with
+	// n = M_i/|M_i|, p = h*d_i*f1*|M_i| and q = h*d_i*f2*|M_i|^2. S_ii is the
+	// identity along n and (1-q)*I + p*K in the plane normal to n, where
+	// K^2 = -I.
+	const int dim_x = mesh.nx, dim_y = mesh.ny, dim_z = mesh.nz;
+	const int dim_xy = dim_x * dim_y;
+	const double wx = 1.0 / (mesh.dx * mesh.dx);
+	const double wy = 1.0 / (mesh.dy * mesh.dy);
+	const double wz = 1.0 / (mesh.dz * mesh.dz);
+	const bool px = mesh.pbc.find("x") != std::string::npos;
+	const bool py = mesh.pbc.find("y") != std::string::npos;
+	const bool pz = mesh.pbc.find("z") != std::string::npos;
+
+	Matrix::ro_accessor Ms_acc(Ms), A_acc(A), f1_acc(f1), f2_acc(f2);
+	VectorMatrix::const_accessor M_acc(M);
+	Matrix::rw_accessor p_acc(pre_p), q_acc(pre_q);
+	VectorMatrix::accessor n_acc(pre_n);
+
+	for (int z=0; z<dim_z; ++z) {
+		for (int y=0; y<dim_y; ++y) {
+			for (int x=0; x<dim_x; ++x) {
+				const int i = z*dim_xy + y*dim_x + x;
+				const double Ms_i = Ms_acc.at(i);
+				const Vector3d M_i = M_acc.get(i);
+				const double len = M_i.abs();
+				if (Ms_i == 0.0 || len == 0.0) {
+					p_acc.at(i) = 0.0; q_acc.at(i) = 0.0; n_acc.set(i, Vector3d(0.0, 0.0, 0.0));
+					continue;
+				}
+
+				// sum of the weights of the magnetic neighbours (a neighbour
+				// that is the cell itself doesn't contribute)
+				double w = 0.0;
+				const int nb_x[2] = {x > 0 ? i-1 : (px && dim_x > 1 ? i+dim_x-1 : -1), x < dim_x-1 ? i+1 : (px && dim_x > 1 ? i-dim_x+1 : -1)};
+				const int nb_y[2] = {y > 0 ? i-dim_x : (py && dim_y > 1 ? i+dim_xy-dim_x : -1), y < dim_y-1 ? i+dim_x : (py && dim_y > 1 ? i-dim_xy+dim_x : -1)};
+				const int nb_z[2] = {z > 0 ? i-dim_xy : (pz && dim_z > 1 ? i+dim_xy*(dim_z-1) : -1), z < dim_z-1 ? i+dim_xy : (pz && dim_z > 1 ? i-dim_xy*(dim_z-1) : -1)};
+				for (int k=0; k<2; ++k) {
+					if (nb_x[k] >= 0 && Ms_acc.at(nb_x[k]) != 0.0) w += wx;
+					if (nb_y[k] >= 0 && Ms_acc.at(nb_y[k]) != 0.0) w += wy;
+					if (nb_z[k] >= 0 && Ms_acc.at(nb_z[k]) != 0.0) w += wz;
+				}
+
+				const double d = (2/MU0) * A_acc.at(i) * w / (Ms_i * Ms_i);
+				p_acc.at(i) = h * d * f1_acc.at(i) * len;
+				q_acc.at(i) = h * d * f2_acc.at(i) * len * len;
+				n_acc.set(i, M_i / len);
+			}
+		}
+	}
+}
+
+void ImplicitExchangeSolver::precondition(const VectorMatrix &X, VectorMatrix &Y)
+{
+	// Y = S_ii^-1 X_i for each cell i (see setupPreconditioner)
+	const int N = X.size();
+
+	Matrix::ro_accessor p_acc(pre_p), q_acc(pre_q);
+	VectorMatrix::const_accessor n_acc(pre_n), X_acc(X);
+	VectorMatrix::accessor Y_acc(Y);
+
+	for (int i=0; i<N; ++i) {
+		const Vector3d n = n_acc.get(i), v = X_acc.get(i);
+		const double p = p_acc.at(i), a = 1.0 - q_acc.at(i);
+		const Vector3d v_n = n * dot(n, v);
+		Y_acc.set(i, v_n + (a * (v - v_n) - p * cross(n, v)) / (a*a + p*p));
+	}
+}
+
+int ImplicitExchangeSolver::solve(
+	const Field &Ms, const Field &A,
+	const Matrix &f1, const Matrix &f2,
+	const VectorField &M,
+	double h,
+	const VectorField &rhs,
+	VectorField &X,
+	double tol,
+	int max_iter)
+{
+	TIC("exchange_implicit");
+
+	setupPreconditioner(Ms, A, f1, f2, M, h);
+
+	const double rhs_norm = std::sqrt(rhs.dotSum(rhs));
+	const double eps = tol * rhs_norm;
+
+	// r = rhs - S(X)
+	applySystem(Ms, A, f1, f2, M, h, X, r);
+	r.scale(-1.0);
+	r.add(rhs);
+	r0.assign(r);
+	p.clear();
+	v.clear();
+
+	double rho = 1.0, alpha = 1.0, omega = 1.0;
+	int iter = 0;
+	bool converged = false;
+	while (true) {
+		if (std::sqrt(r.dotSum(r)) <= eps) {
+			converged = true;
+			break;
+		}
+		if (iter == max_iter) {
+			TOC("exchange_implicit");
+			LOG_WARN << "ImplicitExchangeSolver: no convergence after " << max_iter << " iterations.";
+			return -1;
+		}
+		++iter;
+
+		const double rho_new = r0.dotSum(r);
+		if (rho_new == 0.0) break; // breakdown
+		const double beta = (rho_new / rho) * (alpha / omega);
+		rho = rho_new;
+
+		// p = r + beta*(p - omega*v)
+		p.add(v, -omega);
+		p.scale(beta);
+		p.add(r);
+
+		precondition(p, p_hat);
+		applySystem(Ms, A, f1, f2, M, h, p_hat, v);
+		const double r0_v = r0.dotSum(v);
+		if (r0_v == 0.0) break; // breakdown
+		alpha = rho / r0_v;
+
+		// s = r - alpha*v
+		s.assign(r);
+		s.add(v, -alpha);
+		X.add(p_hat, alpha);
+		if (std::sqrt(s.dotSum(s)) <= eps) {
+			converged = true;
+			break;
+		}
+
+		precondition(s, s_hat);
+		applySystem(Ms, A, f1, f2, M, h, s_hat, t);
+		const double tt = t.dotSum(t);
+		omega = tt > 0.0 ? t.dotSum(s) / tt : 0.0;
+
+		X.add(s_hat, omega);
+		r.assign(s);
+		r.add(t, -omega);
+		if (omega == 0.0) { // breakdown, unless r is small enough
+			converged = std::sqrt(r.dotSum(r)) <= eps;
+			break;
+		}
+	}
+
+	TOC("exchange_implicit");
+	if (!converged) {
+		LOG_WARN << "ImplicitExchangeSolver: breakdown after " << iter << " iterations.";
+		return -1;
+	}
+	return iter;
+}
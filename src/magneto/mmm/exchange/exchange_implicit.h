@@ -0,0 +1,91 @@
+/*
+ * Copyright 2012-2014 by the MicroMagnum Team
+ * Copyright 2014 by the magnum.fd Team
+ *
+ * This file is part of magnum.fd.
+ * magnum.fd is based heavily on MicroMagnum.
+ * (https://github.com/MicroMagnum/MicroMagnum)
+ * 
+ * magnum.fd is free software: you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation, either version 3 of the License, or
+ * (at your option) any later version.
+ * 
+ * magnum.fd is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ * 
+ * You should have received a copy of the GNU General Public License
+ * along with magnum.fd. If not, see <http://www.gnu.org/licenses/>.
+ */
+
+#ifndef EXCHANGE_IMPLICIT_H
+#define EXCHANGE_IMPLICIT_H
+
+#include "config.h"
+#include "matrix/matty.h"
+#include "mesh/VectorField.h"
+#include "mesh/Field.h"
+
+// Solves the linear system
+//
+//   X - h * L(X) = rhs,   L(X) = f1*M x H_exch(X) + f2*M x (M x H_exch(X))
+//
+// for X, i.e. an implicit Euler stage for the exchange term of the LLG
+// equation, linearized about the magnetization M (the llge factors f1, f2
+// and H_exch(X) = exchange(Ms, A, X) are as in the llge and exchange
+// functions).
+//
+// The operator is not symmetric (because of the precession term), so the
+// solver is BiCGStab, right-preconditioned with the exact inverse of the
+// 3x3 diagonal blocks of the operator (i.e. of the coupling of each cell
+// with itself). The work vectors are kept between calls.
+//
+// The preconditioner is computed on the CPU.
+class ImplicitExchangeSolver
+{
+public:
+	ImplicitExchangeSolver(const RectangularMesh &mesh);
+	virtual ~ImplicitExchangeSolver();
+
+	// Returns the number of iterations, or -1 if the residual did not drop
+	// below tol*|rhs| within max_iter iterations or BiCGStab broke down (X is
+	// the last iterate then).
+	// X is used as the initial guess.
+	int solve(
+		const Field &Ms, const Field &A,
+		const Matrix &f1, const Matrix &f2,
+		const VectorField &M,
+		double h,
+		const VectorField &rhs,
+		VectorField &X,
+		double tol = 1e-8,
+		int max_iter = 100
+	);
+
+	// Y = L(X)
+	void apply(
+		const Field &Ms, const Field &A,
+		const Matrix &f1, const Matrix &f2,
+		const VectorField &M,
+		const VectorField &X,
+		VectorField &Y
+	);
+
+	// Preconditioner of the system X - h*L(X): setupPreconditioner computes
+	// the 3x3 diagonal blocks of the system, precondition applies their
+	// inverses (Y_i = S_ii^-1 X_i). Also used by the Cvode evolver.
+	void setupPreconditioner(const Field &Ms, const Field &A, const Matrix &f1, const Matrix &f2, const VectorMatrix &M, double h);
+	void precondition(const VectorMatrix &X, VectorMatrix &Y);
+
+private:
+	void applySystem(const Field &Ms, const Field &A, const Matrix &f1, const Matrix &f2, const VectorField &M, double h, const VectorField &X, VectorField &Y);
+
+	const RectangularMesh mesh;
+	VectorField r, r0, p, v, s, t, p_hat, s_hat, H;
+	Matrix pre_p, pre_q; // preconditioner: parameters of the diagonal blocks
+	VectorField pre_n;   // preconditioner: magnetization directions
+};
+
+#endif
@@ -25,6 +25,7 @@
 
 #include "config.h"
 #include <string>
+#include <cstddef>
 
 namespace os
 {
@@ -35,6 +36,39 @@ namespace os
 	// FFTW crashes on 32 bit Windows when SSE is enabled.
 	// see http://fftw.org/install/windows.html
 	bool disable_SSE_for_FFTW();
+
+	// File system helpers (used by the demag tensor cache)
+	bool fileExists(const std::string &path);
+	double getFileAge(const std::string &path); // in seconds since last modification, negative if the file does not exist
+	bool removeFile(const std::string &path);
+	bool renameFile(const std::string &from, const std::string &to); // atomically replaces 'to'
+	bool createFileExclusive(const std::string &path, const std::string &content); // fails if the file exists
+
+	std::string getHostName();
+	int getProcessId();
+	bool isProcessRunning(int pid); // on this host
+
+	void sleep(double secs);
+
+	// Read-only memory mapping of a whole file.
+	class MappedFile
+	{
+	public:
+		MappedFile(const std::string &path);
+		~MappedFile();
+
+		bool isOpen() const { return data != 0; }
+		const char *getData() const { return data; }
+		size_t getSize() const { return size; }
+
+	private:
+		MappedFile(const MappedFile &);
+		MappedFile &operator=(const MappedFile &);
+
+		const char *data;
+		size_t size;
+		void *handle;
+	};
 }
 
 #endif
@@ -26,8 +26,15 @@
 #include <sys/stat.h>
 #include <sys/time.h>
 #include <unistd.h>
+#include <fcntl.h>
+#include <signal.h>
+#include <errno.h>
+#include <stdio.h>
+#include <time.h>
+#include <sys/mman.h>
 
 #include "Logger.h"
+#include "os.h"
 
 namespace os {
 
@@ -71,4 +78,80 @@ bool disable_SSE_for_FFTW()
 	return false;
 }
 
+bool fileExists(const std::string &path)
+{
+	struct stat st;
+	return stat(path.c_str(), &st) == 0;
+}
+
+double getFileAge(const std::string &path)
+{
+	struct stat st;
+	if (stat(path.c_str(), &st) != 0) return -1.0;
+	return difftime(time(0), st.st_mtime);
+}
+
+bool removeFile(const std::string &path)
+{
+	return unlink(path.c_str()) == 0;
+}
+
+bool renameFile(const std::string &from, const std::string &to)
+{
+	return rename(from.c_str(), to.c_str()) == 0;
+}
+
+bool createFileExclusive(const std::string &path, const std::string &content)
+{
+	const int fd = open(path.c_str(), O_WRONLY | O_CREAT | O_EXCL, 0644);
+	if (fd < 0) return false;
+	const bool ok = write(fd, content.data(), content.size()) == (ssize_t)content.size();
+	close(fd);
+	return ok;
+}
+
+std::string getHostName()
+{
+	char name[256] = {0};
+	if (gethostname(name, sizeof(name)-1) != 0) return "unknown";
+	return name;
+}
+
+int getProcessId()
+{
+	return getpid();
+}
+
+bool isProcessRunning(int pid)
+{
+	return kill(pid, 0) == 0 || errno == EPERM;
+}
+
+void sleep(double secs)
+{
+	usleep(static_cast<useconds_t>(secs * 1e6));
+}
+
+MappedFile::MappedFile(const std::string &path)
+	: data(0), size(0), handle(0)
+{
+	const int fd = open(path.c_str(), O_RDONLY);
+	if (fd < 0) return;
+
+	struct stat st;
+	if (fstat(fd, &st) == 0 && st.st_size > 0) {
+		void *ptr = mmap(0, st.st_size, PROT_READ, MAP_SHARED, fd, 0);
+		if (ptr != MAP_FAILED) {
+			data = static_cast<const char*>(ptr);
+			size = st.st_size;
+		}
+	}
+	close(fd); // the mapping stays valid
+}
+
+MappedFile::~MappedFile()
+{
+	if (data) munmap(const_cast<char*>(data), size);
+}
+
 } // namespace os
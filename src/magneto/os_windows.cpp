@@ -22,8 +22,11 @@
 
 #include "config.h"
 #include <windows.h>
+#include <process.h>
+#include <time.h>
 
 #include "Logger.h"
+#include "os.h"
 
 namespace os {
 
@@ -57,4 +60,99 @@ bool disable_SSE_for_FFTW()
 #endif
 }
 
+bool fileExists(const std::string &path)
+{
+	return GetFileAttributesA(path.c_str()) != INVALID_FILE_ATTRIBUTES;
+}
+
+double getFileAge(const std::string &path)
+{
+	WIN32_FILE_ATTRIBUTE_DATA attr;
+	if (!GetFileAttributesExA(path.c_str(), GetFileExInfoStandard, &attr)) return -1.0;
+
+	FILETIME now;
+	GetSystemTimeAsFileTime(&now);
+
+	ULARGE_INTEGER t0, t1; // unit: 1e-7 seconds
+	t0.LowPart = attr.ftLastWriteTime.dwLowDateTime; t0.HighPart = attr.ftLastWriteTime.dwHighDateTime;
+	t1.LowPart = now.dwLowDateTime; t1.HighPart = now.dwHighDateTime;
+	return static_cast<double>(t1.QuadPart - t0.QuadPart) * 1e-7;
+}
+
+bool removeFile(const std::string &path)
+{
+	return DeleteFileA(path.c_str()) != 0;
+}
+
+bool renameFile(const std::string &from, const std::string &to)
+{
+	return MoveFileExA(from.c_str(), to.c_str(), MOVEFILE_REPLACE_EXISTING) != 0;
+}
+
+bool createFileExclusive(const std::string &path, const std::string &content)
+{
+	HANDLE file = CreateFileA(path.c_str(), GENERIC_WRITE, 0, 0, CREATE_NEW, FILE_ATTRIBUTE_NORMAL, 0);
+	if (file == INVALID_HANDLE_VALUE) return false;
+	DWORD written = 0;
+	const bool ok = WriteFile(file, content.data(), (DWORD)content.size(), &written, 0) && written == content.size();
+	CloseHandle(file);
+	return ok;
+}
+
+std::string getHostName()
+{
+	char name[MAX_COMPUTERNAME_LENGTH+1] = {0};
+	DWORD len = sizeof(name);
+	if (!GetComputerNameA(name, &len)) return "unknown";
+	return name;
+}
+
+int getProcessId()
+{
+	return _getpid();
+}
+
+bool isProcessRunning(int pid)
+{
+	HANDLE process = OpenProcess(SYNCHRONIZE, FALSE, pid);
+	if (!process) return false;
+	const bool running = WaitForSingleObject(process, 0) == WAIT_TIMEOUT;
+	CloseHandle(process);
+	return running;
+}
+
+void sleep(double secs)
+{
+	Sleep(static_cast<DWORD>(secs * 1e3));
+}
+
+MappedFile::MappedFile(const std::string &path)
+	: data(0), size(0), handle(0)
+{
+	HANDLE file = CreateFileA(path.c_str(), GENERIC_READ, FILE_SHARE_READ, 0, OPEN_EXISTING, FILE_ATTRIBUTE_NORMAL, 0);
+	if (file == INVALID_HANDLE_VALUE) return;
+
+	LARGE_INTEGER file_size;
+	if (GetFileSizeEx(file, &file_size) && file_size.QuadPart > 0) {
+		HANDLE mapping = CreateFileMappingA(file, 0, PAGE_READONLY, 0, 0, 0);
+		if (mapping) {
+			void *ptr = MapViewOfFile(mapping, FILE_MAP_READ, 0, 0, 0);
+			if (ptr) {
+				data = static_cast<const char*>(ptr);
+				size = static_cast<size_t>(file_size.QuadPart);
+				handle = mapping;
+			} else {
+				CloseHandle(mapping);
+			}
+		}
+	}
+	CloseHandle(file); // the mapping stays valid
+}
+
+MappedFile::~MappedFile()
+{
+	if (data) UnmapViewOfFile(data);
+	if (handle) CloseHandle(handle);
+}
+
 } // namespace os
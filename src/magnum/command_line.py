@@ -68,7 +68,45 @@ def parse(argv, version):
         metavar="NUM_THREADS",
         dest="num_fftw_threads",
         type="int",
-        default=1,
+        default=None,
+    )
+
+    hw_group.add_option(
+        "--fftw-planner",
+        help="Planning effort for the CPU fast Fourier transforms, one of "
+             "estimate, measure (default), patient, exhaustive. Higher "
+             "efforts take longer to plan but may yield faster transforms. "
+             "Plans are remembered in the cache directory ('FFTW wisdom'), "
+             "so the planning cost is paid only once per machine and "
+             "problem size.",
+        metavar="EFFORT",
+        dest="fftw_planner",
+        type="choice",
+        choices=["estimate", "measure", "patient", "exhaustive"],
+        default="measure",
+    )
+
+    hw_group.add_option(
+        "--autotune",
+        help="Select the fastest stray field convolution (algorithm, "
+             "padding and, unless -t is given, number of FFTW threads) by "
+             "timing short trial runs. The result is cached per machine and "
+             "mesh size, so only the first run pays for the tuning.",
+        dest="autotune",
+        action="store_true",
+        default=False,
+    )
+
+    hw_group.add_option(
+        "--tensor-threads",
+        help="Use NUM_THREADS threads for generating the demagnetization "
+             "tensor field when it is not found in the cache. The result does "
+             "not depend on the number of threads. If NUM_THREADS is 0 "
+             "(default), one thread per CPU core is used.",
+        metavar="NUM_THREADS",
+        dest="num_tensor_threads",
+        type="int",
+        default=0,
     )
 
     log_group = optparse.OptionGroup(
@@ -178,6 +216,17 @@ def parse(argv, version):
         default=0
     )
 
+    misc_group.add_option(
+        "--cache-dir",
+        type="string",
+        help="Directory for cached demagnetization tensor fields. It may "
+             "be shared between hosts. Defaults to $MAGNUM_CACHE_DIR if set, "
+             "else ~/.cache/magnum.",
+        metavar="DIR",
+        dest="cache_dir",
+        default=None
+    )
+
     parser.add_option_group(hw_group)
     parser.add_option_group(log_group)
     parser.add_option_group(ctrl_group)
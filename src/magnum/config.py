@@ -31,9 +31,11 @@ import magnum.nvidia_smi as nvidia_smi
 class Configuration(object):
 
     def initialize(self, argv):
-        magneto.initialize(self.cache_directory)
-
         self.options, rest_args = command_line.parse(argv, self.version)
+        if self.options.cache_dir:
+            self.setCacheDirectory(self.options.cache_dir)
+
+        magneto.initialize(self.cache_directory)
         self.processCommandLine(self.options)
 
     def deinitialize(self):
@@ -42,9 +44,15 @@ class Configuration(object):
 
         magneto.deinitialize(self.cache_directory)
 
+    def setCacheDirectory(self, path):
+        self.cache_dir = path
+
     @property
     def global_cache_directory(self):
-        global_cache_dir = os.path.expanduser("~/.cache/magnum")
+        # Precedence: --cache-dir, $MAGNUM_CACHE_DIR, ~/.cache/magnum
+        # The directory may be shared between hosts (e.g. on a cluster file system).
+        global_cache_dir = getattr(self, "cache_dir", None) or os.environ.get("MAGNUM_CACHE_DIR") or "~/.cache/magnum"
+        global_cache_dir = os.path.expanduser(global_cache_dir)
         tools.makedirs(global_cache_dir)
         return global_cache_dir
 
@@ -93,8 +101,52 @@ class Configuration(object):
     def haveFFTWThreads(self):
         return magneto.haveFFTWThreads()
 
-    def setFFTWThreads(self, num_threads):
+    def setFFTWThreads(self, num_threads, fixed=True):
+        # fixed=False: the stray field autotuner may choose a different number.
         magneto.setFFTWThreads(num_threads)
+        self.num_fftw_threads = num_threads
+        self.fftw_threads_fixed = fixed
+
+    def getFFTWThreads(self):
+        return getattr(self, "num_fftw_threads", 1)
+
+    def isFFTWThreadsFixed(self):
+        return getattr(self, "fftw_threads_fixed", False)
+
+    def enableAutotune(self, yes=True):
+        self.autotune = yes
+
+    def isAutotuneEnabled(self):
+        return getattr(self, "autotune", False)
+
+    FFTW_PLANNERS = {
+        "estimate": magneto.FFTW_PLANNER_ESTIMATE,
+        "measure": magneto.FFTW_PLANNER_MEASURE,
+        "patient": magneto.FFTW_PLANNER_PATIENT,
+        "exhaustive": magneto.FFTW_PLANNER_EXHAUSTIVE,
+    }
+
+    def setFFTWPlanner(self, effort):
+        # Only affects FFT plans created afterwards.
+        magneto.setFFTWPlanner(self.FFTW_PLANNERS[effort])
+
+    def getFFTWPlanner(self):
+        planner = magneto.getFFTWPlanner()
+        return [name for name, p in self.FFTW_PLANNERS.items() if p == planner][0]
+
+    def setTensorThreads(self, num_threads):
+        self.num_tensor_threads = num_threads
+
+    def getTensorThreads(self):
+        return getattr(self, "num_tensor_threads", 0)
+
+    def setConvolutionCacheSize(self, num_bytes):
+        # Memory limit of the in-process cache of stray field convolutions
+        # (see StrayFieldCalculator). 0 disables the cache.
+        self.convolution_cache_size = num_bytes
+
+    def getConvolutionCacheSize(self):
+        return getattr(self, "convolution_cache_size", 1 << 30)
 
     def processCommandLine(self, options):
         # Not processed here:
@@ -113,9 +165,21 @@ class Configuration(object):
             logger.info("Profiling enabled")
 
         # Number of fftw threads: -t
-        if options.num_fftw_threads != 1:
+        if options.num_fftw_threads is not None:
             self.setFFTWThreads(options.num_fftw_threads)
 
+        # FFTW planning effort: --fftw-planner
+        if options.fftw_planner != "measure":
+            self.setFFTWPlanner(options.fftw_planner)
+            logger.info("FFTW planning effort: %s" % options.fftw_planner)
+
+        # Stray field autotuning: --autotune
+        if options.autotune:
+            self.enableAutotune(True)
+
+        # Number of demag tensor threads: --tensor-threads
+        self.setTensorThreads(options.num_tensor_threads)
+
         # GPU enable: -g, -G
         if options.gpu32 and options.gpu64:
             logger.warn("Ignoring -g because -G was given")
@@ -22,6 +22,7 @@ from magnum.evolver.evolver import Evolver
 from magnum.evolver.euler import Euler
 from magnum.evolver.runge_kutta import RungeKutta
 from magnum.evolver.runge_kutta_4 import RungeKutta4
+from magnum.evolver.imex import ImexRungeKutta
 from magnum.evolver.stepsize_controller import StepSizeController, NRStepSizeController, FixedStepSizeController
 from magnum.evolver.state import State  # evolver state class
 
@@ -34,7 +35,7 @@ except AttributeError: # cvode raises an AttributeError.
   have_cvode = False
 
 __all__ = [
-    "Evolver", "Euler", "RungeKutta", "RungeKutta4",
+    "Evolver", "Euler", "RungeKutta", "RungeKutta4", "ImexRungeKutta",
     "StepSizeController", "NRStepSizeController", "FixedStepSizeController",
     "State"
 ]
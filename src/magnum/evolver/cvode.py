@@ -18,6 +18,7 @@
 # along with magnum.fd. If not, see <http://www.gnu.org/licenses/>.
 
 from magnum.mesh import VectorField
+from magnum.logger import logger
 
 from .evolver import Evolver
 from magnum.llgDiffEq import *
@@ -25,23 +26,46 @@ from magnum.llgDiffEq import *
 import magnum.magneto as m
 
 class Cvode(Evolver):
-  def __init__(self, mesh, eps_abs, eps_rel, step_size, newton_method):
+  LINEAR_SOLVERS = {"spgmr": m.CVODE_SPGMR, "spbcg": m.CVODE_SPBCG}
+
+  def __init__(self, mesh, eps_abs, eps_rel, step_size, newton_method, linear_solver="spgmr", preconditioner=False, native_rhs=False):
     super(Cvode, self).__init__(mesh)
     self.eps_abs = eps_abs
     self.eps_rel = eps_rel
     self.step_size = step_size
     self.initialized = False
     self.newton_method = newton_method
+    if linear_solver not in self.LINEAR_SOLVERS:
+      raise ValueError("Invalid CVode linear solver specified: %s (valid choices: 'spgmr', 'spbcg')" % linear_solver)
+    self.linear_solver = linear_solver
+    self.preconditioner = preconditioner
+    self.native_rhs = native_rhs
 
   def initialize(self, state):
-    self.llg = LlgDiffEq(state)
-    self.cvode = m.Cvode(self.llg, self.eps_abs, self.eps_rel, self.newton_method)
+    self.llg = None
+    if self.native_rhs:
+      # A new native right-hand side is created whenever a parameter changes
+      # (see evolve).
+      self.llg = self.native_llg = state.native_diffeq
+      if self.llg is None:
+        logger.warn("CVode: Some terms of dM/dt have no native implementation, using the Python right-hand side.")
+    if self.llg is None:
+      self.llg = LlgDiffEq(state)
+    self.cvode = m.Cvode(self.llg, self.eps_abs, self.eps_rel, self.newton_method, self.LINEAR_SOLVERS[self.linear_solver], state.t)
+    if self.preconditioner:
+      # Block-diagonal exchange preconditioner for the Newton iteration (the
+      # fields are kept alive by self.implicit_part).
+      self.implicit_part = p = state.implicit_part
+      self.cvode.setExchangePreconditioner(p.solver, p.Ms, p.A, p.f1, p.f2)
     state.h = self.step_size
     self.initialized = True
 
   def evolve(self, state, t_max):
     if not self.initialized:
       self.initialize(state)
+    elif self.native_rhs and state.native_diffeq is not self.native_llg:
+      # Parameters have changed: Restart with the new right-hand side.
+      self.initialize(state)
 
     # But: Don't overshoot past t_max!
     if state.t + state.h > t_max:
@@ -53,6 +77,8 @@ class Cvode(Evolver):
     t = state.t
 
     # call cvode
+    if isinstance(self.llg, NativeLlgDiffEq):
+      self.llg.update(state)
     self.cvode.evolve(state.t, t_max)
 
     state.t = t_max
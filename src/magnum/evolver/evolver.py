@@ -22,6 +22,14 @@
 class Evolver(object):
     def __init__(self, mesh):
         self.mesh = mesh
+        self.dense_output = False
 
     def evolve(self, state, t_max):
         raise NotImplementedError("Evolver.evolve")
+
+    def interpolate(self, state, t):
+        """
+        Returns a new state at time t within the last step (state.t - state.h
+        <= t <= state.t). Only available if self.dense_output is True.
+        """
+        raise NotImplementedError("Evolver.interpolate")
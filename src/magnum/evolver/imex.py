@@ -0,0 +1,194 @@
+# Copyright 2012-2014 by the MicroMagnum Team
+# Copyright 2014 by the magnum.fd Team
+#
+# This file is part of magnum.fd.
+# magnum.fd is based heavily on MicroMagnum.
+# (https://github.com/MicroMagnum/MicroMagnum)
+#
+# magnum.fd is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# magnum.fd is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with magnum.fd. If not, see <http://www.gnu.org/licenses/>.
+
+import math
+
+from magnum.mesh import VectorField
+from magnum.logger import logger
+
+from magnum.evolver.evolver import Evolver
+
+
+class ImexRungeKutta(Evolver):
+    """
+    Implicit-explicit Runge-Kutta evolver for stiff problems: The
+    right-hand side is split into dy/dt = L(y) + N(y), where the stiff
+    part L is integrated implicitly and the rest N = dy/dt - L explicitly.
+    The step size is thus limited by accuracy instead of the stability
+    bound of L.
+
+    The state provides L as 'state.implicit_part', linearized about the
+    state at the beginning of the step, with the methods apply(X, Y)
+    (Y = L(X)) and solve(h, rhs, X) (solve X - h*L(X) = rhs, returns the
+    number of iterations or a negative number if the solver failed). For
+    micromagnetics, L is the exchange term of the LLG equation.
+
+    The method is the second-order L-stable ARS(2,2,2) scheme (Ascher,
+    Ruuth, Spiteri 1997); the error estimate is the difference to a
+    first-order solution from the same stages, filtered with the inverse of
+    the implicit stage operator.
+    """
+
+    GAMMA = 1.0 - 1.0 / math.sqrt(2.0)
+    DELTA = 1.0 - 1.0 / (2.0 * GAMMA)
+
+    def __init__(self, mesh, stepsize_controller):
+        super(ImexRungeKutta, self).__init__(mesh)
+        self.controller = stepsize_controller
+
+        self.y0 = VectorField(mesh)
+        self.y_err = VectorField(mesh)
+        self.N1 = VectorField(mesh)   # explicit part at stage 1
+        self.N2 = VectorField(mesh)   # explicit part at stage 2
+        self.LY2 = VectorField(mesh)  # implicit part at stage 2
+        self.LY3 = VectorField(mesh)  # implicit part at stage 3
+        self.Y2 = VectorField(mesh)
+        self.Y3 = VectorField(mesh)
+        self.rhs = VectorField(mesh)
+
+        self.reset_statistics()
+
+        logger.info("IMEX Runge Kutta evolver: method is ARS(2,2,2), step size controller is %s.", self.controller)
+
+    def evolve(self, state, t_max):
+        y, y0 = state.y, self.y0
+        y0.assign(y)
+
+        # Get time step to try.
+        try:
+            h_try = state.__imex_next_h
+        except AttributeError:
+            h_try = state.h
+
+        # The explicit part at the beginning of the step doesn't depend on h.
+        L = state.implicit_part
+        dydt = state.differentiate()
+        L.apply(y0, self.N1)
+        self.N1.scale(-1.0)
+        self.N1.add(dydt)
+        self.num_rhs_evaluations += 1
+
+        while True:
+            if not self.apply(state, L, h_try):
+                # The linear solver failed, try again with a smaller step.
+                self.num_rejected_steps += 1
+                h_try *= 0.5
+                continue
+
+            accept, h_new = self.controller.adjust_stepsize(state, h_try, 1, self.Y3, self.y_err, dydt)
+            if accept:
+                self.num_accepted_steps += 1
+                break
+            else:
+                self.num_rejected_steps += 1
+                h_try = h_new
+
+        # But: Don't overshoot past t_max!
+        if state.t + h_try > t_max:
+            h_try = t_max - state.t
+            while not self.apply(state, L, h_try):  # assume that a smaller step size is o.k.
+                # The linear solver failed, t_max is reached in a later step.
+                self.num_rejected_steps += 1
+                h_try *= 0.5
+
+        # Update state
+        y.assign(self.Y3)
+        state.t += h_try
+        state.h = h_try
+        state.__imex_next_h = h_new
+        state.step += 1
+        state.flush_cache()
+        state.finish_step()
+        return state
+
+    def apply(self, state, L, h):
+        # One ARS(2,2,2) step from y0 to Y3 (L is linearized about y0). The
+        # implicit parts of the stages follow from the stage equations
+        # Y = rhs + h*gamma*L(Y).
+        g, d = self.GAMMA, self.DELTA
+        y0, N1, N2, LY2, LY3, Y2, Y3, rhs = self.y0, self.N1, self.N2, self.LY2, self.LY3, self.Y2, self.Y3, self.rhs
+
+        # Stage 2: Y2 = y0 + h*g*(N1 + L(Y2))
+        rhs.assign(y0)
+        rhs.add(N1, h * g)
+        Y2.assign(rhs)
+        if not self.solve(L, h * g, rhs, Y2): return False
+        LY2.assign(Y2)
+        LY2.add(rhs, -1.0)
+        LY2.scale(1.0 / (h * g))
+
+        state2 = state.clone(Y2)
+        state2.t = state.t + h * g
+        N2.assign(state2.differentiate())
+        N2.add(LY2, -1.0)
+        state2.flush_cache()
+        self.num_rhs_evaluations += 1
+
+        # Stage 3: Y3 = y0 + h*(d*N1 + (1-d)*N2 + (1-g)*L(Y2) + g*L(Y3))
+        rhs.assign(y0)
+        rhs.add(N1, h * d)
+        rhs.add(N2, h * (1.0 - d))
+        rhs.add(LY2, h * (1.0 - g))
+        Y3.assign(Y2)
+        if not self.solve(L, h * g, rhs, Y3): return False
+        LY3.assign(Y3)
+        LY3.add(rhs, -1.0)
+        LY3.scale(1.0 / (h * g))
+
+        # Error estimate: Y3 minus the first-order solution y0 + h*(N1 + L(Y3))
+        y_err = self.y_err
+        y_err.assign(N2)
+        y_err.add(N1, -1.0)
+        y_err.scale(h * (1.0 - d))
+        y_err.add(LY2, h * (1.0 - g))
+        y_err.add(LY3, -h * (1.0 - g))
+
+        # The estimate is O(1) for the stiff components; filter it with the
+        # implicit stage operator (Hairer, Wanner: Solving ODEs II, IV.8).
+        rhs.assign(y_err)
+        return self.solve(L, h * g, rhs, y_err)
+
+    def solve(self, L, h, rhs, X):
+        num_iterations = L.solve(h, rhs, X)
+        if num_iterations < 0:
+            logger.warn("IMEX Runge Kutta evolver: Implicit solver failed, reducing step size.")
+            return False
+        self.num_linear_iterations += num_iterations
+        return True
+
+    def reset_statistics(self):
+        self.num_accepted_steps = 0
+        self.num_rejected_steps = 0
+        self.num_rhs_evaluations = 0
+        self.num_linear_iterations = 0
+
+    def statistics(self):
+        """
+        Returns the number of accepted and rejected steps, the number of
+        right-hand side evaluations and of linear solver iterations, and
+        the evaluations per accepted step (see RungeKutta.statistics).
+        """
+        return {
+            'accepted_steps': self.num_accepted_steps,
+            'rejected_steps': self.num_rejected_steps,
+            'rhs_evaluations': self.num_rhs_evaluations,
+            'rhs_evaluations_per_step': float(self.num_rhs_evaluations) / max(self.num_accepted_steps, 1),
+            'linear_iterations': self.num_linear_iterations,
+        }
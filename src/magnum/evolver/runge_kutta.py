@@ -35,18 +35,21 @@ class RungeKutta(Evolver):
         'rk23': rk23,    # Bogacki-Shampine
     }
 
-    def __init__(self, mesh, method, stepsize_controller):
+    def __init__(self, mesh, method, stepsize_controller, dense_output=False):
         super(RungeKutta, self).__init__(mesh)
 
         self.tab = RungeKutta.TABLES[method]()
         self.controller = stepsize_controller
+        self.dense_output = dense_output
 
         self.y0 = VectorField(mesh)
         self.y_err = VectorField(mesh)
         self.y_tmp = VectorField(mesh)
         self.k = [None] * self.tab.getNumSteps()
 
-        logger.info("Runge Kutta evolver: method is %s, step size controller is %s.", method, self.controller)
+        self.reset_statistics()
+
+        logger.info("Runge Kutta evolver: method is %s, step size controller is %s%s.", method, self.controller, ", dense output" if dense_output else "")
 
     def evolve(self, state, t_max):
         # shortcuts
@@ -61,6 +64,10 @@ class RungeKutta(Evolver):
         except AttributeError:
             h_try = state.h
 
+        # dydt at state.t is evaluated once per step (unless known from the last step)
+        if not (self.tab.fsal and getattr(state, "dydt_in", None)):
+            self.num_rhs_evaluations += 1
+
         while True:
             # Try a step from state.t to state.t+h_try
             dydt = self.apply(state, h_try)
@@ -70,9 +77,11 @@ class RungeKutta(Evolver):
             accept, h_new = self.controller.adjust_stepsize(state, h_try, self.tab.order, y, y_err, dydt)
             if accept:
                 # done -> exit loop
+                self.num_accepted_steps += 1
                 break
             else:
                 # oh, tried step size was too large.
+                self.num_rejected_steps += 1
                 y.assign(y0)  # reverse last step
                 h_try = h_new  # try again with new (smaller) h.
                 continue  # need to retry -> redo loop
@@ -83,6 +92,10 @@ class RungeKutta(Evolver):
             y.assign(y0)              # reverse last step
             self.apply(state, h_try)  # assume that a smaller step size is o.k.
 
+        # Exploit fsal property? (only for the accepted step)
+        if self.tab.fsal:
+            state.dydt_in = self.k[-1]  # save last dydt for next step
+
         # Update state
         state.t += h_try
         state.h = h_try
@@ -108,34 +121,63 @@ class RungeKutta(Evolver):
 
         # step vectors 1 to (num_steps-1)
         for step in range(1, num_steps):
-            # calculate ytmp...
-            if num_steps != 6:
-                # High-level version for num_steps != 6
-                y_tmp.assign(y)
-                for j in range(0, step):
-                    y_tmp.add(k[j], h * tab.getB(step, j))
-            else:
-                # C++ version for num_steps==6 (rkf45,cc45)
-                rk_prepare_step(step, h, tab, k[0], k[1] or k[0], k[2] or k[0], k[3] or k[0], k[4] or k[0], k[5] or k[0], y, y_tmp)
+            # y_tmp = y + h * sum_j b[step][j] * k[j]
+            rk_prepare_step(step, h, tab, k[0:step], y, y_tmp)
 
             state1 = state0.clone(y_tmp)
             state1.t = state0.t + h * tab.getA(step)
             k[step] = state1.differentiate()
+            state1.flush_cache()  # recycle the fields of the stage (k[step] stays in use)
+        self.num_rhs_evaluations += num_steps - 1
 
         # II. Linear-combine step vectors, add them to y, calculate error y_err
-        if num_steps == 6:
-            rk_combine_result(h, tab, k[0], k[1], k[2], k[3], k[4], k[5], y, y_err)
-        elif num_steps == 3:
-            rk_combine_result(h, tab, k[0], k[1], k[2], y, y_err)
-        else:
-            y_err.clear()
-            for step in range(0, num_steps):
-                y.add(k[step], h * tab.getC(step))
-                y_err.add(k[step], h * tab.getEC(step))
-
-        # III. Exploit fsal property?
-        if tab.fsal:
-            state.dydt_in = k[num_steps - 1]  # save last dydt for next step
+        rk_combine_result(h, tab, k, y, y_err)
 
         # Also, return dydt (which is k[0])
         return k[0]
+
+    def reset_statistics(self):
+        self.num_accepted_steps = 0
+        self.num_rejected_steps = 0
+        self.num_rhs_evaluations = 0
+
+    def statistics(self):
+        """
+        Returns the number of accepted and rejected steps, the number of
+        right-hand side evaluations (dy/dt) and the evaluations per accepted
+        step since the creation of the evolver or the last reset_statistics().
+        """
+        return {
+            'accepted_steps': self.num_accepted_steps,
+            'rejected_steps': self.num_rejected_steps,
+            'rhs_evaluations': self.num_rhs_evaluations,
+            'rhs_evaluations_per_step': float(self.num_rhs_evaluations) / max(self.num_accepted_steps, 1),
+        }
+
+    def interpolate(self, state, t):
+        # The last step went from y0 at t0 = state.t - state.h to state.y at state.t.
+        tab, y0, k, h = self.tab, self.y0, self.k, state.h
+        theta = (t - (state.t - h)) / h
+
+        y = VectorField(self.mesh)
+        if tab.dense:
+            # continuous extension of the method: y0 + h * sum_i b_i(theta) * k[i]
+            y.assign(y0)
+            for i, coeffs in enumerate(tab.dense):
+                b_i = sum(c * theta**(p+1) for p, c in enumerate(coeffs))
+                if b_i != 0.0:
+                    y.add(k[i], h * b_i)
+        else:
+            # cubic Hermite interpolation between the end points of the step
+            # (dydt at the end point is needed by the next step anyway)
+            dydt1 = state.differentiate()
+            y.assign(y0)
+            y.scale(2*theta**3 - 3*theta**2 + 1)
+            y.add(state.y, -2*theta**3 + 3*theta**2)
+            y.add(k[0], h * (theta**3 - 2*theta**2 + theta))
+            y.add(dydt1, h * (theta**3 - theta**2))
+
+        state1 = state.clone(y)
+        state1.t = t
+        state1.finish_step()
+        return state1
@@ -19,13 +19,31 @@
 # along with magnum.fd. If not, see <http://www.gnu.org/licenses/>.
 
 from magnum.mesh import VectorField
+from magnum.mesh.field_pool import field_pool
 
 from copy import copy
 
 
 class State(object):
     class Cache(object):
-        pass
+        def __init__(self):
+            self._pooled = []
+
+        def vector_field(self, mesh):
+            # A temporary field that is returned to the field pool when the cache is flushed.
+            field = field_pool.vector_field(mesh)
+            self._pooled.append(field)
+            return field
+
+        def field(self, mesh):
+            field = field_pool.field(mesh)
+            self._pooled.append(field)
+            return field
+
+        def release(self):
+            for field in self._pooled:
+                field_pool.release(field)
+            self._pooled = []
 
     def __init__(self, mesh):
         self.t = 0
@@ -39,6 +57,8 @@ class State(object):
         raise NotImplementedError("State.differentiate")
 
     def flush_cache(self):
+        cache = getattr(self, "cache", None)
+        if cache is not None: cache.release()
         self.cache = State.Cache()
 
     def finish_step(self):
@@ -47,5 +67,5 @@ class State(object):
     def clone(self, y_replacement):
         state = copy(self)
         state.y = y_replacement
-        state.flush_cache()
+        state.cache = State.Cache()  # (don't release our cache)
         return state
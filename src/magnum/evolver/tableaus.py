@@ -82,6 +82,7 @@ def rkf45(): # Runge-Kutta-Fehlberg
     tab = __assemble_butcher_tableau(6, tab_a, tab_b, tab_c, tab_ec)
     tab.fsal = False
     tab.order = 4
+    tab.dense = None
     return tab
 
 def cc45(): # Cash'n'Karp
@@ -101,6 +102,7 @@ def cc45(): # Cash'n'Karp
     tab = __assemble_butcher_tableau(6, tab_a, tab_b, tab_c, tab_ec)
     tab.fsal = False
     tab.order = 4
+    tab.dense = None
     return tab
 
 def dp54(): # Dormand-Prince
@@ -118,9 +120,20 @@ def dp54(): # Dormand-Prince
     tab_c  = tab_c5 # Advance with fifth-order method
     tab_ec = [tab_c4[i] - tab_c5[i] for i in range(7)]
 
+    # Dense output: fourth-order continuous extension (Shampine 1986),
+    # coefficients of theta, theta^2, theta^3, theta^4 for each stage.
+    tab_d = [[1.0, -8048581381.0/2820520608.0, 8663915743.0/2820520608.0, -12715105075.0/11282082432.0],
+             [],
+             [0.0, 131558114200.0/32700410799.0, -68118460800.0/10900136933.0, 87487479700.0/32700410799.0],
+             [0.0, -1754552775.0/470086768.0, 14199869525.0/1410260304.0, -10690763975.0/1880347072.0],
+             [0.0, 127303824393.0/49829197408.0, -318862633887.0/49829197408.0, 701980252875.0/199316789632.0],
+             [0.0, -282668133.0/205662961.0, 2019193451.0/616988883.0, -1453857185.0/822651844.0],
+             [0.0, 40617522.0/29380423.0, -110615467.0/29380423.0, 69997945.0/29380423.0]]
+
     tab = __assemble_butcher_tableau(7, tab_a, tab_b, tab_c, tab_ec)
     tab.fsal = True
     tab.order = 5
+    tab.dense = tab_d
     return tab
 
 def rk23(): # Bogacki-Shampine
@@ -136,7 +149,15 @@ def rk23(): # Bogacki-Shampine
     tab_c  = tab_c3 # advance with third-order method
     tab_ec = [tab_c2[i] - tab_c3[i] for i in range(4)]
 
+    # Dense output: cubic Hermite interpolation (the last stage is dy/dt at
+    # the end of the step), coefficients of theta, theta^2, theta^3.
+    tab_d = [[1.0, -4.0/3.0, 5.0/9.0],
+             [0.0, 1.0, -2.0/3.0],
+             [0.0, 4.0/3.0, -8.0/9.0],
+             [0.0, -1.0, 1.0]]
+
     tab = __assemble_butcher_tableau(4, tab_a, tab_b, tab_c, tab_ec)
     tab.fsal = True
     tab.order = 3
+    tab.dense = tab_d
     return tab
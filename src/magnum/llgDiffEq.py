@@ -55,3 +55,43 @@ class LlgDiffEq(m.DiffEq):
 
     def substep(self):
         self.state.substep += 1
+
+
+class NativeLlgDiffEq(m.NativeLlgDiffEq):
+    """
+    Right-hand side of the LLG equation for the Cvode evolver, computed
+    without calling back into Python (see magneto.NativeLlgDiffEq). Created
+    by the LandauLifshitzGilbert module (state.native_diffeq).
+
+    The static fields (e.g. H_ext) can be changed between steps, so their
+    sum is updated by update() before each call to Cvode.evolve.
+    """
+    def __init__(self, state, Ms, f1, f2, static_field_ids):
+        super(NativeLlgDiffEq, self).__init__(state.y, Ms, f1, f2)
+        self.refs = [state.y, Ms, f1, f2]  # keep the arguments alive
+        self.static_field_ids = static_field_ids
+        if static_field_ids:
+            self.H_static = VectorField(state.mesh)
+            self.setStaticField(self.H_static)
+
+    def setExchange(self, A):
+        self.refs.append(A)
+        super(NativeLlgDiffEq, self).setExchange(A)
+
+    def setUniaxialAnisotropy(self, axis, k):
+        self.refs += [axis, k]
+        super(NativeLlgDiffEq, self).setUniaxialAnisotropy(axis, k)
+
+    def setCubicAnisotropy(self, axis1, axis2, k):
+        self.refs += [axis1, axis2, k]
+        super(NativeLlgDiffEq, self).setCubicAnisotropy(axis1, axis2, k)
+
+    def setStrayField(self, conv):
+        self.refs.append(conv)
+        super(NativeLlgDiffEq, self).setStrayField(conv)
+
+    def update(self, state):
+        if self.static_field_ids:
+            self.H_static.fill((0.0, 0.0, 0.0))
+            for H_id in self.static_field_ids:
+                self.H_static.add(getattr(state, H_id))
@@ -0,0 +1,104 @@
+# Copyright 2012-2014 by the MicroMagnum Team
+# Copyright 2014 by the magnum.fd Team
+#
+# This file is part of magnum.fd.
+# magnum.fd is based heavily on MicroMagnum.
+# (https://github.com/MicroMagnum/MicroMagnum)
+#
+# magnum.fd is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# magnum.fd is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with magnum.fd. If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+import collections
+
+from magnum.mesh.field import Field
+from magnum.mesh.vector_field import VectorField
+
+
+class FieldPool(object):
+    """
+    Recycles the temporary fields of the simulation loop (the effective
+    field terms, dM/dt, ...), so that a simulation step doesn't need to
+    allocate and free full-mesh fields.
+
+    Fields are returned to the pool by release() (e.g. by State.flush_cache)
+    and kept in a free list per field type and mesh. acquire() hands out a
+    field from the free list only if nothing outside of the pool refers to
+    it anymore, so a field that is released while it is still in use (e.g.
+    a Runge-Kutta step vector) is not overwritten. The contents of an
+    acquired field are undefined, like those of a new field.
+
+    The pool is bounded: A free list holds at most MAX_FREE fields (when it
+    is full, the fields that are still in use elsewhere are dropped from it
+    first), and only the free lists of the MAX_KEYS most recently used field
+    types and meshes are kept (e.g. not those of earlier solvers on other
+    meshes).
+    """
+
+    MAX_FREE = 32  # per field type and mesh (a Runge-Kutta step uses fewer)
+    MAX_KEYS = 8
+
+    def __init__(self):
+        self.__free = collections.OrderedDict()  # (type, mesh) -> list of released fields, least recently used first
+        self.reset_statistics()
+
+    def acquire(self, cls, mesh):
+        free = self.freeList(self.key(cls, mesh))
+        for i in range(len(free)):
+            # Only referenced by the free list (and getrefcount's argument)?
+            if sys.getrefcount(free[i]) == 2:
+                self.num_reused += 1
+                return free.pop(i)
+        self.num_allocated += 1
+        return cls(mesh)
+
+    def release(self, field):
+        free = self.freeList(self.key(type(field), field.mesh))
+        if len(free) >= self.MAX_FREE:
+            free[:] = [free[i] for i in range(len(free)) if sys.getrefcount(free[i]) == 2]
+            if len(free) >= self.MAX_FREE:
+                return  # drop the field
+        free.append(field)
+
+    def freeList(self, key):
+        # Marks the free list of key as most recently used.
+        free = self.__free.pop(key, None)
+        if free is None:
+            free = []
+        self.__free[key] = free
+        while len(self.__free) > self.MAX_KEYS:
+            self.__free.popitem(last=False)
+        return free
+
+    def vector_field(self, mesh):
+        return self.acquire(VectorField, mesh)
+
+    def field(self, mesh):
+        return self.acquire(Field, mesh)
+
+    def clear(self):
+        self.__free = collections.OrderedDict()
+
+    def reset_statistics(self):
+        self.num_allocated = 0
+        self.num_reused = 0
+
+    def key(self, cls, mesh):
+        return (cls, mesh.num_nodes, mesh.delta, mesh.periodic_bc)
+
+    def __len__(self):
+        return sum(len(free) for free in self.__free.values())
+
+
+# The pool used by the simulation state caches.
+field_pool = FieldPool()
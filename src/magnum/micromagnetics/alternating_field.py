@@ -82,7 +82,7 @@ class AlternatingField(module.Module):
 
             # Convert 3-vector to VectorField if necessary.
             if isinstance(A, tuple):
-                tmp = A; A = VectorField(self.system.mesh); A.fill(tmp)
+                tmp = A; A = state.cache.vector_field(self.system.mesh); A.fill(tmp)
 
             # Return field 'A'
             return A
@@ -60,7 +60,7 @@ class AnisotropyField(module.Module):
                 return magneto.cubic_anisotropy(axis1, axis2, k_cub, Ms, state.M, H_aniso)
 
             def compute_uniaxial_and_cubic(state, H_aniso):
-                tmp = VectorField(self.system.mesh)
+                tmp = state.cache.vector_field(self.system.mesh)
                 E0 = magneto.uniaxial_anisotropy(axis1, k_uni, Ms, state.M, tmp)
                 E1 = magneto.cubic_anisotropy(axis1, axis2, k_cub, Ms, state.M, H_aniso)
                 state.cache.E_aniso_sum = E0 + E1
@@ -79,7 +79,7 @@ class AnisotropyField(module.Module):
         cache = state.cache
         if id == "H_aniso":
             if hasattr(cache, "H_aniso"): return cache.H_aniso
-            H_aniso = cache.H_aniso = VectorField(self.system.mesh)
+            H_aniso = cache.H_aniso = cache.vector_field(self.system.mesh)
             cache.E_aniso_sum = self.__compute_fn(state, H_aniso)
             return H_aniso
 
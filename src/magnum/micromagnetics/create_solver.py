@@ -22,7 +22,7 @@ import numbers
 
 from magnum.micromagnetics.micro_magnetics import MicroMagnetics
 from magnum.micromagnetics.micro_magnetics_solver import MicroMagneticsSolver
-from magnum.micromagnetics.micro_magnetics_stepsize_controller import MicroMagneticsStepSizeController
+from magnum.micromagnetics.micro_magnetics_stepsize_controller import MicroMagneticsStepSizeController, MicroMagneticsPIStepSizeController, MicroMagneticsPIDStepSizeController
 from magnum.micromagnetics.landau_lifshitz_gilbert import LandauLifshitzGilbert
 from magnum.micromagnetics.stephandler import ScreenLog
 
@@ -55,6 +55,7 @@ def create_solver(world, module_list, **kwargs):
             if abs(value) >= 1e3 or abs(value) <= 1e-3: return "%g" % value
         return str(value)
 
+    have_frozen = False
     for body in world.bodies:
         mat   = body.material
         cells = body.shape.getCellIndices(world.mesh)
@@ -66,6 +67,14 @@ def create_solver(world, module_list, **kwargs):
                 sys.set_param(param, val, mask=cells)
                 used_param_list.append("'%s=%s'" % (param, format_parameter_value(val)))
 
+        # Like the material parameters, a later body overrides 'frozen' of an
+        # earlier one (only set once some body is frozen, so that it stays uniform otherwise).
+        if body.frozen or have_frozen:
+            sys.set_param("frozen", 1.0 if body.frozen else 0.0, mask=cells)
+        if body.frozen:
+            have_frozen = True
+            used_param_list.append("'frozen'")
+
         logger.info("  body id='%s', volume=%s%%, params: %s",
           body.id,
           round(1000.0 * len(cells) / sys.mesh.total_nodes) / 10,
@@ -77,7 +86,20 @@ def create_solver(world, module_list, **kwargs):
     if evolver_id in ["rkf45", "rk23", "cc45", "dp54"]:
         eps_rel = kwargs.pop("eps_rel", 1e-4)
         eps_abs = kwargs.pop("eps_abs", 1e-3)
-        evo = evolver.RungeKutta(sys.mesh, evolver_id, MicroMagneticsStepSizeController(eps_abs, eps_rel))
+        dense_output = kwargs.pop("dense_output", False)
+        controller_id = kwargs.pop("controller", "i")
+        controllers = {
+            "i": MicroMagneticsStepSizeController,
+            "pi": MicroMagneticsPIStepSizeController,
+            "pid": MicroMagneticsPIDStepSizeController,
+        }
+        if controller_id not in controllers:
+            raise ValueError("Invalid step size controller specified: %s (valid choices: 'i', 'pi', 'pid'; default is 'i')" % controller_id)
+        evo = evolver.RungeKutta(sys.mesh, evolver_id, controllers[controller_id](eps_abs, eps_rel), dense_output)
+    elif evolver_id in ["imex"]:
+        eps_rel = kwargs.pop("eps_rel", 1e-4)
+        eps_abs = kwargs.pop("eps_abs", 1e-3)
+        evo = evolver.ImexRungeKutta(sys.mesh, MicroMagneticsStepSizeController(eps_abs, eps_rel))
     elif evolver_id in ["rkf45x", "rk23x", "cc45x", "dp54x"]:
         eps_rel = kwargs.pop("eps_rel", 1e-4)
         eps_abs = kwargs.pop("eps_abs", 1e-3)
@@ -93,9 +115,12 @@ def create_solver(world, module_list, **kwargs):
         eps_abs = kwargs.pop("eps_abs", 1e-3)
         newton_method = kwargs.pop("newton_method", False)
         step_size = kwargs.pop("step_size", 1e-12)
-        evo = evolver.Cvode(sys.mesh, eps_abs, eps_rel, step_size, newton_method)
+        linear_solver = kwargs.pop("linear_solver", "spgmr")
+        preconditioner = kwargs.pop("preconditioner", False)
+        native_rhs = kwargs.pop("native_rhs", False)
+        evo = evolver.Cvode(sys.mesh, eps_abs, eps_rel, step_size, newton_method, linear_solver, preconditioner, native_rhs)
     else:
-        raise ValueError("Invalid evolver type specified: %s (valid choices: 'rk23','rkf45','dp54','euler','cvode'; default is 'rkf45')" % evolver_id)
+        raise ValueError("Invalid evolver type specified: %s (valid choices: 'rk23','rkf45','dp54','imex','euler','cvode'; default is 'rkf45')" % evolver_id)
 
     ###### IV. Create Solver from Evolver and module system ######
     solver = MicroMagneticsSolver(sys, evo, world)
@@ -46,7 +46,7 @@ class ExchangeField(module.Module):
 
         if id == "H_exch":
             if hasattr(cache, "H_exch"): return cache.H_exch
-            H_exch = cache.H_exch = VectorField(self.system.mesh)
+            H_exch = cache.H_exch = cache.vector_field(self.system.mesh)
 
             magneto.exchange(state.Ms, state.A, state.M, H_exch)
             return H_exch
@@ -35,23 +35,28 @@ class LandauLifshitzGilbert(module.Module):
         self.__valid_factors = False
 
     def calculates(self):
-        return ["dMdt", "M", "H_tot", "E_tot", "E_minimize_BB", "deg_per_ns", "minimizer_M", "minimizer_dM", "minimizer_dM_minimize_BB"]
+        return ["dMdt", "M", "H_tot", "E_tot", "E_minimize_BB", "deg_per_ns", "minimizer_M", "minimizer_dM", "minimizer_dM_minimize_BB", "implicit_part", "native_diffeq"]
 
     def updates(self):
         return ["M"]
 
     def params(self):
-        return ["Ms", "alpha"]
+        return ["Ms", "alpha", "frozen"]
 
     def on_param_update(self, id):
         if id in self.params():
             self.__valid_factors = False
+        self.__valid_native_diffeq = False  # any parameter may change the native right-hand side
 
     def initialize(self, system):
         self.system = system
         self.Ms = Field(system.mesh); self.Ms.fill(0.0)
         self.alpha = Field(system.mesh); self.alpha.fill(0.0)
+        self.frozen = Field(system.mesh); self.frozen.fill(0.0)  # != 0: magnetization does not evolve (see Body)
+        self.__f1 = self.__f2 = None
         self.__valid_factors = False
+        self.__implicit_solver = None
+        self.__valid_native_diffeq = False
 
         # Find other active modules
         self.field_terms = []
@@ -89,6 +94,10 @@ class LandauLifshitzGilbert(module.Module):
             return self.calculate_minimizer_dM(state)
         elif id == "minimizer_dM_minimize_BB":
             return self.calculate_minimizer_dM_minimize_BB(state)
+        elif id == "implicit_part":
+            return self.calculate_implicit_part(state)
+        elif id == "native_diffeq":
+            return self.calculate_native_diffeq(state)
         else:
             raise KeyError(id)
 
@@ -103,7 +112,7 @@ class LandauLifshitzGilbert(module.Module):
 
     def calculate_H_tot(self, state):
         if hasattr(state.cache, "H_tot"): return state.cache.H_tot
-        H_tot = state.cache.H_tot = VectorField(self.system.mesh)
+        H_tot = state.cache.H_tot = state.cache.vector_field(self.system.mesh)
 
         H_tot.fill((0.0, 0.0, 0.0))
         for H_id in self.field_terms:
@@ -127,7 +136,7 @@ class LandauLifshitzGilbert(module.Module):
             self.__initFactors()
 
         if hasattr(state.cache, "dMdt"): return state.cache.dMdt
-        dMdt = state.cache.dMdt = VectorField(self.system.mesh)
+        dMdt = state.cache.dMdt = state.cache.vector_field(self.system.mesh)
 
         # Get effective field
         H_tot = self.calculate_H_tot(state)
@@ -140,6 +149,10 @@ class LandauLifshitzGilbert(module.Module):
             dMdt_i = getattr(state, dMdt_id)
             dMdt.add(dMdt_i)
 
+        # No evolution in frozen cells (the llge factors are already zero there)
+        if self.llge_terms and self.__have_frozen:
+            magneto.clear_masked_cells(dMdt, self.frozen)
+
         return dMdt
 
     def calculate_minimizer_dM(self, state):
@@ -178,6 +191,10 @@ class LandauLifshitzGilbert(module.Module):
         factor = Field(self.system.mesh)
         factor.fill(1.)
         magneto.llge(zero, factor, state.M, H_tot, result)
+
+        # Frozen cells don't move (the other minimizers use f2, which is zero there)
+        if self.__have_frozen:
+            magneto.clear_masked_cells(result, self.frozen)
         return result
 
     def calculate_minimizer_M(self, state, h):
@@ -193,6 +210,72 @@ class LandauLifshitzGilbert(module.Module):
 
         return result
 
+    def calculate_implicit_part(self, state):
+        # The exchange term of dM/dt, linearized about state.M (used by the IMEX evolver).
+        if not self.__valid_factors: self.__initFactors()
+
+        if hasattr(state.cache, "implicit_part"): return state.cache.implicit_part
+
+        if self.__implicit_solver is None:
+            self.__implicit_solver = magneto.ImplicitExchangeSolver(self.system.mesh)
+
+        if "H_exch" in self.field_terms:
+            A = state.A
+        else:
+            A = Field(self.system.mesh); A.fill(0.0)
+
+        state.cache.implicit_part = ImplicitExchangePart(self.__implicit_solver, state.Ms, A, self.__f1, self.__f2, state.M)
+        return state.cache.implicit_part
+
+    def calculate_native_diffeq(self, state):
+        # The right-hand side dM/dt as a native object for the Cvode evolver,
+        # or None if a term of dM/dt has no native implementation there. It is
+        # created anew after any parameter change.
+        if not self.__valid_native_diffeq:
+            self.__native_diffeq = self.__createNativeDiffEq(state)
+            self.__valid_native_diffeq = True
+        return self.__native_diffeq
+
+    def __createNativeDiffEq(self, state):
+        from magnum.llgDiffEq import NativeLlgDiffEq
+        from magnum.micromagnetics.exchange_field import ExchangeField
+        from magnum.micromagnetics.anisotropy_field import AnisotropyField
+        from magnum.micromagnetics.stray_field import StrayField
+        from magnum.micromagnetics.static_field import StaticField
+
+        if not self.__valid_factors: self.__initFactors()
+        if self.llge_terms: return None
+
+        def is_zero(field):
+            return field.isUniform() and field.uniform_value == 0.0
+
+        def stray_field_convolution(mod):
+            # only the FFT convolution on the whole mesh, without frozen cells
+            if mod.frozen is not None or mod.box is not None: return None
+            if not mod.calc: mod.calc = mod.makeCalculator(mod.box)
+            conv = mod.calc.__self__.convolution()
+            if not isinstance(conv, magneto.SymmetricMatrixVectorConvolution_FFT): return None
+            return conv
+
+        mods = [self.system.calculators[H_id] for H_id in self.field_terms]
+        for mod in mods:
+            if isinstance(mod, StrayField):
+                if not stray_field_convolution(mod): return None
+            elif not isinstance(mod, (StaticField, ExchangeField, AnisotropyField)):
+                return None
+
+        static_field_ids = [H_id for H_id, mod in zip(self.field_terms, mods) if isinstance(mod, StaticField)]
+        rhs = NativeLlgDiffEq(state, self.Ms, self.__f1, self.__f2, static_field_ids)
+        for mod in mods:
+            if isinstance(mod, ExchangeField):
+                rhs.setExchange(state.A)
+            elif isinstance(mod, AnisotropyField):
+                if not is_zero(mod.k_uniaxial): rhs.setUniaxialAnisotropy(mod.axis1, mod.k_uniaxial)
+                if not is_zero(mod.k_cubic): rhs.setCubicAnisotropy(mod.axis1, mod.axis2, mod.k_cubic)
+            elif isinstance(mod, StrayField):
+                rhs.setStrayField(stray_field_convolution(mod))
+        return rhs
+
     def calculate_deg_per_ns(self, state):
         if hasattr(state.cache, "deg_per_ns"): return state.cache.deg_per_ns
         deg_per_timestep = (180.0 / math.pi) * math.atan2(state.dMdt.absMax() * state.h, state.M.absMax())  # we assume a<b at atan(a/b).
@@ -200,16 +283,24 @@ class LandauLifshitzGilbert(module.Module):
         return deg_per_ns
 
     def __initFactors(self):
-        self.__f1 = f1 = Field(self.system.mesh)  # precession factors of llge
-        self.__f2 = f2 = Field(self.system.mesh)  # damping factors of llge
+        # The factors are updated in place, since the native right-hand side
+        # and the Cvode preconditioner keep references to them.
+        if self.__f1 is None:
+            self.__f1 = Field(self.system.mesh)  # precession factors of llge
+            self.__f2 = Field(self.system.mesh)  # damping factors of llge
+        f1, f2 = self.__f1, self.__f2
 
-        alpha, Ms = self.alpha, self.Ms
+        alpha, Ms, frozen = self.alpha, self.Ms, self.frozen
+        self.__have_frozen = False
 
         # Prepare factors
         for x, y, z in self.system.mesh.iterateCellIndices():
             alpha_i, Ms_i = alpha.get(x, y, z), Ms.get(x, y, z)
 
-            if Ms_i != 0.0:
+            if frozen.get(x, y, z) != 0.0:
+                f1_i, f2_i = 0.0, 0.0
+                self.__have_frozen = True
+            elif Ms_i != 0.0:
                 gamma_prime = GYROMAGNETIC_RATIO / (1.0 + alpha_i ** 2)
                 f1_i = -gamma_prime
                 f2_i = -alpha_i * gamma_prime / Ms_i
@@ -225,3 +316,26 @@ class LandauLifshitzGilbert(module.Module):
 
         # Done.
         self.__valid_factors = True
+
+
+class ImplicitExchangePart(object):
+    """
+    The exchange term L(X) = LLGE(M, H_exch(X)) of dM/dt with the
+    magnetization M in the llge cross products held fixed (see
+    magneto.ImplicitExchangeSolver).
+    """
+
+    def __init__(self, solver, Ms, A, f1, f2, M):
+        self.solver = solver
+        self.Ms, self.A, self.f1, self.f2, self.M = Ms, A, f1, f2, M
+
+    def apply(self, X, Y):
+        """Y = L(X)."""
+        self.solver.apply(self.Ms, self.A, self.f1, self.f2, self.M, X, Y)
+
+    def solve(self, h, rhs, X, tol=1e-8, max_iter=100):
+        """
+        Solves X - h*L(X) = rhs for X, using X as the initial guess. Returns
+        the number of iterations or -1 if the solver did not converge.
+        """
+        return self.solver.solve(self.Ms, self.A, self.f1, self.f2, self.M, h, rhs, X, tol, max_iter)
@@ -60,7 +60,7 @@ class MacroSpinTorque(module.Module):
 
         if id == "dMdt_ST":
             if hasattr(cache, "dMdt_ST"): return cache.dMdt_ST
-            dMdt_ST = cache.dMdt_ST = VectorField(self.system.mesh)
+            dMdt_ST = cache.dMdt_ST = cache.vector_field(self.system.mesh)
 
             # Calculate macro spin torque term due to Slonchewski
             nx, ny, nz = self.system.mesh.num_nodes
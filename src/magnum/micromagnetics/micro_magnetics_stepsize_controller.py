@@ -24,6 +24,11 @@ import magnum.logger as logger
 from magnum.evolver import StepSizeController
 
 class MicroMagneticsStepSizeController(StepSizeController):
+    # Exponents (times 1/(order+1)) of the inverse error ratios of the current
+    # and the previous accepted steps in the step size update. The default
+    # is the classical I-controller; see the PI and PID controllers below.
+    BETA = (1.0,)
+
     def __init__(self, eps_abs=1e-4, eps_rel=1e-4):
         super(MicroMagneticsStepSizeController, self).__init__()
 
@@ -36,6 +41,9 @@ class MicroMagneticsStepSizeController(StepSizeController):
         self.MIN_TIMESTEP = 1e-15
         self.MAX_TIMESTEP = 1e-10
 
+        self.errors = []  # error ratios of the last accepted steps (most recent first)
+        self.rejected = False  # was the last step rejected?
+
     def adjust_stepsize(self, state, h, order, y, y_err, dydt):
         # [y] = A/m.
         # [dydt] = A/m (deriviative of y).
@@ -56,17 +64,20 @@ class MicroMagneticsStepSizeController(StepSizeController):
         # Accept the step only with tolerable errors.
         accept = (e_abs <= self.allowed_absolute_error) and (e_rel <= self.allowed_relative_error)
 
-        # Determine step size scaling factor for allowed absolute and relative errors.
-        h_scale_abs = self.STEP_HEADROOM * pow(self.allowed_absolute_error / e_abs, 1.0 / (order + 1.0))
-        h_scale_rel = self.STEP_HEADROOM * pow(self.allowed_relative_error / e_rel, 1.0 / order)
+        # Error ratio r for the most pessimistic of the absolute and relative
+        # errors, such that the step size scales with r^(-1/(order+1)).
+        r = max(e_abs / self.allowed_absolute_error, pow(e_rel / self.allowed_relative_error, (order + 1.0) / order), 1e-10)
+
+        # Determine step size scaling factor.
+        h_scale = self.STEP_HEADROOM * self.scale(r, order, accept)
 
         def clamp(x, min_x, max_x):
             if x < min_x: x = min_x
             if x > max_x: x = max_x
             return x
 
-        # Take the most pessimistic (= smallest) scaling factor and clamp by [max_step_decrease, max_step_increase]
-        h_scale = clamp(min([h_scale_abs, h_scale_rel]), self.MIN_TIMESTEP_SCALE, self.MAX_TIMESTEP_SCALE)
+        # Clamp by [max_step_decrease, max_step_increase]
+        h_scale = clamp(h_scale, self.MIN_TIMESTEP_SCALE, self.MAX_TIMESTEP_SCALE)
 
         # Determine next step size and clamp by [min_h, max_h]
         h_next = clamp(h * h_scale, self.MIN_TIMESTEP, self.MAX_TIMESTEP)
@@ -75,7 +86,47 @@ class MicroMagneticsStepSizeController(StepSizeController):
         if h_next == self.MIN_TIMESTEP:
             accept = True
 
+        if accept:
+            self.errors = [r] + self.errors[:len(self.BETA) - 2]
+        self.rejected = not accept
         return accept, h_next
 
+    def scale(self, r, order, accept):
+        # Step size scaling factor (without headroom) for the error ratio r.
+        k = order + 1.0
+        if not accept or len(self.errors) < len(self.BETA) - 1:
+            # I-controller after a rejection and while the history is incomplete.
+            return pow(r, -1.0 / k)
+
+        scale = 1.0
+        for beta, r_i in zip(self.BETA, [r] + self.errors):
+            scale *= pow(r_i, -beta / k)
+        # Don't increase the step size right after a rejection.
+        if self.rejected and len(self.BETA) > 1: scale = min(scale, 1.0)
+        return scale
+
     def __str__(self):
         return "MMM(eps_abs=%s, eps_rel=%s)" % (self.allowed_absolute_error, self.allowed_relative_error)
+
+
+class MicroMagneticsPIStepSizeController(MicroMagneticsStepSizeController):
+    """
+    PI step size controller (Gustafsson), which also takes the error of the
+    previous step into account. This damps the oscillation between accepted
+    and rejected steps of the I-controller.
+    """
+    BETA = (0.7, -0.4)
+
+    def __str__(self):
+        return "MMM-PI(eps_abs=%s, eps_rel=%s)" % (self.allowed_absolute_error, self.allowed_relative_error)
+
+
+class MicroMagneticsPIDStepSizeController(MicroMagneticsStepSizeController):
+    """
+    PID step size controller (Soederlind's H312 filter), which uses the
+    errors of the last three steps for smooth step size sequences.
+    """
+    BETA = (1.0/18.0, 1.0/9.0, 1.0/18.0)
+
+    def __str__(self):
+        return "MMM-PID(eps_abs=%s, eps_rel=%s)" % (self.allowed_absolute_error, self.allowed_relative_error)
@@ -46,7 +46,7 @@ class SpinTorque(module.Module):
         cache = state.cache
         if id == "dMdt_ST":
             if hasattr(cache, "dMdt_ST"): return cache.dMdt_ST
-            dMdt_ST = cache.dMdt_ST = VectorField(self.system.mesh)
+            dMdt_ST = cache.dMdt_ST = cache.vector_field(self.system.mesh)
 
             # Calculate spin torque term due to Zhang & Li
             nx, ny, nz = self.system.mesh.num_nodes
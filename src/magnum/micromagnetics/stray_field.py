@@ -18,17 +18,28 @@
 # You should have received a copy of the GNU General Public License
 # along with magnum.fd. If not, see <http://www.gnu.org/licenses/>.
 
+import magnum.magneto as magneto
+import magnum.logger as logger
+
+from magnum.config import cfg
 from magnum.mesh import VectorField
 from magnum.module import Module
 
-from magnum.micromagnetics.stray_field_calculator import DemagTensorField, StrayFieldCalculator
+from magnum.micromagnetics.stray_field_calculator import DemagTensorField, StrayFieldCalculator, crop_box, crop_mesh, cropped_convolution
 from magnum.micromagnetics.constants import MU0
 
 class StrayField(Module):
-    def __init__(self, method = "tensor"):
+    def __init__(self, method = "tensor", asymptotic_radius = 0.0, precision = "double", autotune = None, fmm_order = 4, fmm_tolerance = 1e-2, crop = True, lattice_sum = False):
         super(StrayField, self).__init__()
         self.method = method
         self.padding = DemagTensorField.PADDING_ROUND_4
+        self.asymptotic_radius = asymptotic_radius
+        self.precision = precision
+        self.autotune = autotune  # None: use cfg setting (--autotune)
+        self.fmm_order = fmm_order
+        self.fmm_tolerance = fmm_tolerance
+        self.crop = crop  # restrict the calculation to the bounding box of the (free) cells with Ms != 0
+        self.lattice_sum = lattice_sum  # periodic image sum mode of the demag tensor (see DemagTensorField)
 
     def calculates(self):
         return ["H_stray", "E_stray"]
@@ -39,15 +50,81 @@ class StrayField(Module):
 
     def initialize(self, system):
         self.system = system
-        self.calculator = StrayFieldCalculator(system.mesh, self.method, self.padding)
+        self.box = None          # box of the magnetic cells (None: whole mesh)
+        self.frozen = None       # frozen cells (see Body), None if there are none
+        self.calc = None         # set up on first use, after Ms is known
+        self.H_static = None     # stray field of the frozen cells (None: not yet computed)
+        self.crop_logged = False # the note that H_stray is zero outside of the box is only logged once
+
+    def on_param_update(self, id):
+        if id not in ("Ms", "frozen"): return
+
+        mesh = self.system.mesh
+        Ms = self.system.get_param("Ms")
+
+        frozen = None
+        if "frozen" in self.system.parameters:
+            frozen = self.system.get_param("frozen")
+            if frozen.maximum() == 0.0:  # (e.g. a frozen body was covered by a later one)
+                frozen = None
+
+        # The box contains the frozen cells too: The field of the free cells
+        # is also needed there (for H_stray and E_stray).
+        box = None
+        if self.crop:
+            box = crop_box(mesh, Ms)
+
+        if box != self.box:
+            self.box = box
+            self.calc = None
+        self.frozen = frozen
+        self.H_static = None
+
+    def on_var_update(self, id):
+        # The magnetization of the frozen cells only changes when M is assigned (e.g. state.M = ...).
+        if id == "M": self.H_static = None
+
+    def makeCalculator(self, box):
+        mesh = self.system.mesh
+        autotune = cfg.isAutotuneEnabled() if self.autotune is None else self.autotune
+        if box:
+            x0, y0, z0, x1, y1, z1 = box
+            box_mesh = crop_mesh(mesh, box)
+            logger.info("StrayField: Cropping the stray field calculation to the cells %s..%s, %s..%s, %s..%s (%sx%sx%s of %sx%sx%s cells)" % ((x0, x1-1, y0, y1-1, z0, z1-1) + box_mesh.num_nodes + mesh.num_nodes))
+            if not self.crop_logged:
+                logger.info("StrayField: H_stray is zero outside of the cropped cells (e.g. in the vacuum around the magnet), use StrayField(crop=False) to calculate it on the whole mesh.")
+                self.crop_logged = True
+            calculator = StrayFieldCalculator(box_mesh, self.method, self.padding, self.asymptotic_radius, self.precision, autotune, self.fmm_order, self.fmm_tolerance, self.lattice_sum)
+            return cropped_convolution(calculator.calculate, box)
+        else:
+            calculator = StrayFieldCalculator(mesh, self.method, self.padding, self.asymptotic_radius, self.precision, autotune, self.fmm_order, self.fmm_tolerance, self.lattice_sum)
+            return calculator.calculate
+
+    def calculateStatic(self, M, M_free):
+        # The stray field of the frozen cells is only recomputed after M was assigned (see on_var_update).
+        if self.H_static is None:
+            logger.info("StrayField: Calculating the stray field of the frozen cells")
+            M_frozen = VectorField(self.system.mesh); M_frozen.assign(M); M_frozen.add(M_free, -1.0)
+            self.H_static = VectorField(self.system.mesh)
+            self.calc(M_frozen, self.H_static)
+        return self.H_static
 
     def calculate(self, state, id):
         cache = state.cache
 
         if id == "H_stray":
             if hasattr(cache, "H_stray"): return cache.H_stray
-            H_stray = cache.H_stray = VectorField(self.system.mesh)
-            self.calculator.calculate(state.M, H_stray)
+            H_stray = cache.H_stray = cache.vector_field(self.system.mesh)
+            if not self.calc: self.calc = self.makeCalculator(self.box)
+
+            if self.frozen is not None:
+                # H_stray = H(M_free) + H(M_frozen), where only H(M_free) changes in time
+                M_free = cache.vector_field(self.system.mesh); M_free.assign(state.M)
+                magneto.clear_masked_cells(M_free, self.frozen)
+                self.calc(M_free, H_stray)
+                H_stray.add(self.calculateStatic(state.M, M_free))
+            else:
+                self.calc(state.M, H_stray)
             return H_stray
 
         elif id == "E_stray":
@@ -18,10 +18,15 @@
 # You should have received a copy of the GNU General Public License
 # along with magnum.fd. If not, see <http://www.gnu.org/licenses/>.
 
+import collections
+import os
+
 import magnum.magneto as magneto
 import magnum.logger as logger
 
 from magnum.config import cfg
+from magnum.mesh import RectangularMesh
+from magnum.micromagnetics.stray_field_tuner import StrayFieldTuner
 
 
 class TensorField(object):
@@ -49,8 +54,16 @@ class TensorField(object):
 
 
 class DemagTensorField(TensorField):
-    def __init__(self, mesh, padding=TensorField.PADDING_ROUND_4):
+    def __init__(self, mesh, padding=TensorField.PADDING_ROUND_4, asymptotic_radius=0.0, lattice_sum=False):
         super(DemagTensorField, self).__init__(mesh, padding)
+        # Cell pairs farther apart than asymptotic_radius (in units of the
+        # largest cell dimension) use a far field expansion instead of the
+        # exact integrals. A value of 0 disables the expansion.
+        self.asymptotic_radius = asymptotic_radius
+        # With periodic boundary conditions: Evaluate the far periodic images
+        # with the far field expansion and correct the tail of the image sum
+        # in 3D, too. This converges with far fewer repetitions.
+        self.lattice_sum = lattice_sum
 
     def generate(self):
         nx, ny, nz = self.mesh.num_nodes
@@ -62,10 +75,32 @@ class DemagTensorField(TensorField):
             dx, dy, dz,
             pbc_x, pbc_y, pbc_z, pbc_repeat,
             self.padding,
-            cfg.global_cache_directory
+            cfg.global_cache_directory,
+            cfg.getTensorThreads(),
+            self.asymptotic_radius,
+            self.lattice_sum
         )
         return N
 
+    def generateConvolution(self):
+        nx, ny, nz = self.mesh.num_nodes
+        dx, dy, dz = self.mesh.delta
+        pbc_x, pbc_y, pbc_z, pbc_repeat = self.getPeriodicBoundaries()
+
+        # Same as SymmetricMatrixVectorConvolution_FFT(self.generate(), nx, ny, nz),
+        # but the transformed tensor field is cached, too.
+        conv = magneto.GenerateDemagTensorConvolution(
+            nx, ny, nz,
+            dx, dy, dz,
+            pbc_x, pbc_y, pbc_z, pbc_repeat,
+            self.padding,
+            cfg.global_cache_directory,
+            cfg.getTensorThreads(),
+            self.asymptotic_radius,
+            self.lattice_sum
+        )
+        return conv
+
 
 class PhiTensorField(TensorField):
     def __init__(self, mesh, padding=TensorField.PADDING_ROUND_4):
@@ -86,8 +121,151 @@ class PhiTensorField(TensorField):
         return N
 
 
+def permute_mesh(mesh, axes):
+    # Returns the mesh whose axis a is axis axes[a] of the given mesh.
+    peri, peri_repeat = mesh.periodic_bc
+    num_nodes = tuple(mesh.num_nodes[a] for a in axes)
+    delta = tuple(mesh.delta[a] for a in axes)
+    peri = "".join("xyz"[b] for b, a in enumerate(axes) if "xyz"[a] in peri)
+    return RectangularMesh(num_nodes, delta, peri, peri_repeat)
+
+
+def permuted_convolution(execute, num_nodes, axes):
+    # Wraps execute (which works on fields with permuted axes, see permute_mesh)
+    # to take and return fields on the original mesh.
+    inverse = [axes.index(a) for a in range(3)]
+    M_perm = magneto.VectorMatrix(magneto.Shape(*num_nodes))
+    H_perm = magneto.VectorMatrix(magneto.Shape(*num_nodes))
+
+    def calc(M, H):
+        magneto.permute_axes(M, M_perm, *axes)
+        execute(M_perm, H_perm)
+        magneto.permute_axes(H_perm, H, *inverse)
+    return calc
+
+
+def cropped_convolution(execute, box):
+    # Wraps execute (which works on fields on the box, see crop_mesh) to take
+    # and return fields on the full mesh. The field outside of the box is zero.
+    x0, y0, z0, x1, y1, z1 = box
+    size = (x1 - x0, y1 - y0, z1 - z0)
+    M_box = magneto.VectorMatrix(magneto.Shape(*size))
+    H_box = magneto.VectorMatrix(magneto.Shape(*size))
+
+    def calc(M, H):
+        magneto.copy_box(M, M_box, x0, y0, z0, 0, 0, 0, *size)
+        execute(M_box, H_box)
+        H.clear()
+        magneto.copy_box(H_box, H, 0, 0, 0, x0, y0, z0, *size)
+    return calc
+
+
+def crop_box(mesh, Ms):
+    # Returns the bounding box (x0, y0, z0, x1, y1, z1) of the cells with
+    # Ms != 0, not cropped along periodic axes. Returns None if the box is the
+    # whole mesh or if all cells are zero.
+    box = magneto.nonzero_bounding_box(Ms)
+    if not box:
+        return None
+    peri, peri_repeat = mesh.periodic_bc
+    box = list(box)
+    for a, n in enumerate(mesh.num_nodes):
+        if "xyz"[a] in peri:
+            box[a], box[a+3] = 0, n
+    if tuple(box[3:]) == tuple(mesh.num_nodes) and box[:3] == [0, 0, 0]:
+        return None
+    return tuple(box)
+
+
+def crop_mesh(mesh, box):
+    x0, y0, z0, x1, y1, z1 = box
+    peri, peri_repeat = mesh.periodic_bc
+    return RectangularMesh((x1 - x0, y1 - y0, z1 - z0), mesh.delta, peri, peri_repeat)
+
+
+class ConvolutionCache(object):
+    """
+    In-memory LRU cache of stray field convolutions, so that solvers created
+    later in the same process (e.g. by a parameter sweep) on the same mesh
+    reuse the tensor, the FFT plans and the transformed kernel. The least
+    recently used convolutions are dropped when their estimated memory
+    exceeds cfg.getConvolutionCacheSize().
+    """
+
+    def __init__(self):
+        self.entries = collections.OrderedDict()  # key -> (calc, num_bytes), least recently used first
+
+    def get(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return None
+        self.entries[key] = entry
+        return entry[0]
+
+    def put(self, key, calc, num_bytes):
+        self.entries.pop(key, None)
+        max_bytes = cfg.getConvolutionCacheSize()
+        if num_bytes > max_bytes:
+            return
+        self.entries[key] = (calc, num_bytes)
+        while sum(n for c, n in self.entries.values()) > max_bytes:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+convolution_cache = ConvolutionCache()
+
+
+def estimate_convolution_memory(mesh, precision="double", use_fft=True):
+    # Rough estimate (in bytes) of the memory of a tensor convolution. FFT
+    # convolution: the transformed kernel (6 complex components on half of
+    # the zero-padded mesh) and two 3-component scratch buffers on the
+    # zero-padded mesh. Simple convolution: the tensor (6 components on the
+    # zero-padded mesh).
+    peri, peri_repeat = mesh.periodic_bc
+    num_cells = 1
+    for a, n in enumerate(mesh.num_nodes):
+        num_cells *= n if ("xyz"[a] in peri or n == 1) else 2 * n
+    word = 4 if precision == "single" or (cfg.isCudaEnabled() and not cfg.isCuda64Enabled()) else 8
+    return (12 if use_fft else 6) * word * num_cells
+
+
 class StrayFieldCalculator(object):
-    def __init__(self, mesh, method="tensor", padding=TensorField.PADDING_ROUND_4):
+    def __init__(self, mesh, method="tensor", padding=TensorField.PADDING_ROUND_4, asymptotic_radius=0.0, precision="double", autotune=False, fmm_order=4, fmm_tolerance=1e-2, lattice_sum=False):
+        if precision not in ("double", "single"):
+            raise ValueError("StrayFieldCalculator: precision must be 'double' or 'single'")
+
+        # Reuse the convolution of an earlier calculator with the same setup.
+        args = (mesh, method, padding, asymptotic_radius, precision, autotune, fmm_order, fmm_tolerance, lattice_sum)
+        cached = convolution_cache.get(self.cacheKey(*args))
+        if cached:
+            logger.debug("StrayFieldCalculator: Reusing the convolution of an earlier calculator for mesh %sx%sx%s" % tuple(mesh.num_nodes))
+            self.calc, self.calc_many = cached
+            return
+
+        self.setup(*args)
+        if self.num_bytes is not None:
+            # (the key is taken again since the autotuner may have changed the number of FFTW threads)
+            convolution_cache.put(self.cacheKey(*args), (self.calc, self.calc_many), self.num_bytes)
+
+    def cacheKey(self, mesh, method, padding, asymptotic_radius, precision, autotune, fmm_order, fmm_tolerance, lattice_sum):
+        # Everything that affects the convolution, including the FFTW setup its plans were made with.
+        return (
+            tuple(mesh.num_nodes), tuple(mesh.delta), tuple(mesh.periodic_bc),
+            method, padding, asymptotic_radius, precision, autotune, fmm_order, fmm_tolerance, lattice_sum,
+            cfg.isCudaEnabled(), cfg.isCuda64Enabled(), bool(os.environ.get("MAGNUM_DEMAG_GARBAGE")),
+            cfg.getFFTWThreads(), cfg.getFFTWPlanner()
+        )
+
+    def setup(self, mesh, method, padding, asymptotic_radius, precision, autotune, fmm_order, fmm_tolerance, lattice_sum):
+        single_precision = False
+        self.calc_many = None  # batched calculation (see calculate_many), if supported
+        self.num_bytes = None  # estimated memory of the convolution, None if unknown (it is not cached then)
+
         # are we periodic?
         peri, peri_repeat = mesh.periodic_bc
         peri_x, peri_y, peri_z = (s in peri for s in ("x", "y", "z"))
@@ -102,26 +280,68 @@ class StrayFieldCalculator(object):
             if (nx == 1 or ny == 1) and nz != 1:
                 logger.info("Performance hint: Meshes with 2-dimensional cell grids should span the xy-plane, i.e. the number of cells in z-direction should be 1.")
 
+        if method == "layered" and (cfg.isCudaEnabled() or peri_z):
+            logger.info("StrayFieldCalculator: The layered convolution is only supported on the CPU and without periodic boundary conditions in z-direction, using the tensor method.")
+            method = "tensor"
+
+        if method == "fmm" and (cfg.isCudaEnabled() or peri_x or peri_y or peri_z):
+            logger.info("StrayFieldCalculator: The fast multipole method is only supported on the CPU and without periodic boundary conditions, using the tensor method.")
+            method = "tensor"
+
         # generate calculation function depending on user-selected method
         if method == "tensor":
-            tensor = DemagTensorField(mesh, padding)
-            tensor.setPeriodicBoundaries(peri_x, peri_y, peri_z, peri_repeat)
+            # Our CPU implementation of fast convolution doesn't support meshes with nx == 1 (unless ny == nz == 1).
+            # For these, the convolution is done on a mesh with permuted axes, so that the longest axis becomes x.
+            axes = None
+            if not cfg.isCudaEnabled() and nx == 1 and (ny != 1 or nz != 1):
+                axes = sorted(range(3), key=lambda a: -mesh.num_nodes[a])
+                mesh = permute_mesh(mesh, axes)
+                nx, ny, nz = mesh.num_nodes
+                peri, peri_repeat = mesh.periodic_bc
+                peri_x, peri_y, peri_z = (s in peri for s in ("x", "y", "z"))
+                logger.info("StrayFieldCalculator: Using FFT convolution on the axis-permuted mesh %sx%sx%s" % (nx, ny, nz))
 
             # Determine if we should use the fast convolution (via FFT) or the simple convolution (using for-loops, CPU only).
-            if cfg.isCudaEnabled():
+            if autotune:
+                use_fft, padding, num_threads = StrayFieldTuner(mesh, precision).tune()
+                if num_threads:
+                    cfg.setFFTWThreads(num_threads, fixed=False)
+            elif cfg.isCudaEnabled():
                 use_fft = True
             else:
-                # HACK: Our CPU implementation of fast convolution doesn't support these input dimensions.
-                if nx == 1 and (ny != 1 or nz != 1):
-                    use_fft = False
-                else:
-                    use_fft = (nx * ny * nz >= 32)  # this is the break-even point for using FFT convolutions on my system.
+                use_fft = (nx * ny * nz >= 32)  # this is the break-even point for using FFT convolutions on my system.
+
+            tensor = DemagTensorField(mesh, padding, asymptotic_radius, lattice_sum)
+            tensor.setPeriodicBoundaries(peri_x, peri_y, peri_z, peri_repeat)
 
             if use_fft:
-                conv = magneto.SymmetricMatrixVectorConvolution_FFT(tensor.generate(), nx, ny, nz)
+                conv = tensor.generateConvolution()
+                if precision == "single" and not cfg.isCudaEnabled():
+                    single_precision = conv.enableSinglePrecision()
             else:
                 conv = magneto.SymmetricMatrixVectorConvolution_Simple(tensor.generate(), nx, ny, nz)
             self.calc = conv.execute
+            if use_fft:
+                self.calc_many = conv.execute_many
+            self.num_bytes = estimate_convolution_memory(mesh, "single" if single_precision else "double", use_fft)
+
+            if axes:
+                self.calc = permuted_convolution(conv.execute, mesh.num_nodes, axes)
+                self.calc_many = None
+
+        elif method == "layered":
+            # 2D FFTs per layer and a dense nz x nz layer coupling, for thin multilayer films.
+            if nz > 8:
+                logger.info("Performance hint: The layered stray field convolution is meant for meshes with few layers (nz <= 8), the tensor method is probably faster.")
+            tensor = DemagTensorField(mesh, padding, asymptotic_radius, lattice_sum)
+            tensor.setPeriodicBoundaries(peri_x, peri_y, peri_z, peri_repeat)
+            conv = magneto.LayeredMatrixVectorConvolution_FFT(tensor.generate(), nx, ny, nz)
+            self.calc = conv.execute
+
+        elif method == "fmm":
+            # Fast multipole method on the magnetic cells only, for sparse geometries.
+            fmm = magneto.DemagFMM(nx, ny, nz, dx, dy, dz, fmm_order, fmm_tolerance, cfg.global_cache_directory, cfg.getFFTWThreads())
+            self.calc = fmm.execute
 
         elif method == "potential":
             assert not peri_x and not peri_y and not peri_z
@@ -140,5 +360,28 @@ class StrayFieldCalculator(object):
         else:
             assert False
 
+        if precision == "single" and not single_precision:
+            logger.info("StrayFieldCalculator: Single precision is only supported by the FFT tensor convolution on the CPU, using the default precision.")
+
+    def convolution(self):
+        """
+        Returns the magneto convolution object if the stray field is computed
+        by a single convolution on the whole mesh, otherwise None.
+        """
+        return getattr(self.calc, "__self__", None)
+
     def calculate(self, M, H):
         self.calc(M, H)
+
+    def calculate_many(self, M_list, H_list):
+        # Calculates the stray fields H_list[i] of all magnetizations M_list[i]
+        # on the mesh. With the FFT convolution on the CPU, this is faster than
+        # separate calculations because the fields are transformed together and
+        # each tensor element is read only once.
+        if len(M_list) != len(H_list):
+            raise ValueError("StrayFieldCalculator.calculate_many: M_list and H_list must have the same length")
+        if self.calc_many:
+            self.calc_many(list(M_list), list(H_list))
+        else:
+            for M, H in zip(M_list, H_list):
+                self.calc(M, H)
@@ -0,0 +1,210 @@
+# Copyright 2012-2014 by the MicroMagnum Team
+# Copyright 2014 by the magnum.fd Team
+#
+# This file is part of magnum.fd.
+# magnum.fd is based heavily on MicroMagnum.
+# (https://github.com/MicroMagnum/MicroMagnum)
+#
+# magnum.fd is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# magnum.fd is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with magnum.fd. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import time
+
+import magnum.magneto as magneto
+import magnum.logger as logger
+import magnum.tools as tools
+
+from magnum.config import cfg
+
+
+class StrayFieldTuner(object):
+    """
+    Finds the fastest stray field convolution setup for a mesh on this
+    machine by timing short trial convolutions: the algorithm (FFT or
+    simple convolution), the padding strategy of the FFT convolution and
+    the number of FFTW threads. The padding is tuned first (with the
+    current number of threads), then the number of threads.
+
+    The tensor values don't affect the timings, so the trials use a
+    constant tensor instead of the demag tensor (which is not computed,
+    see MAGNUM_DEMAG_GARBAGE). Like the demag tensor, it is even, so the
+    FFT convolution takes the same (real kernel) multiplication path as
+    in the actual run.
+
+    Results are stored in the per-host cache directory and reused by
+    later runs with the same mesh size and settings.
+    """
+
+    PADDINGS = [
+        magneto.PADDING_ROUND_2,
+        magneto.PADDING_ROUND_4,
+        magneto.PADDING_ROUND_8,
+        magneto.PADDING_ROUND_POT,
+        magneto.PADDING_SMALL_PRIME_FACTORS,
+    ]
+
+    # The simple convolution is O(n^2) and not worth trying for larger meshes.
+    SIMPLE_MAX_CELLS = 4096
+
+    TRIAL_TIME = 0.2  # seconds per trial (at least 3 runs)
+
+    CACHE_FILE = "StrayFieldTuning.txt"
+
+    def __init__(self, mesh, precision="double"):
+        self.mesh = mesh
+        self.precision = precision
+
+    def tune(self):
+        """
+        Returns (use_fft, padding, num_fftw_threads). num_fftw_threads is
+        None if the thread count was not tuned.
+        """
+        key = self.key()
+        result = self.load(key)
+        if result:
+            logger.info("Stray field autotuning: using cached result (%s)" % self.describe(*result))
+            return result
+
+        logger.info("Stray field autotuning for mesh %sx%sx%s..." % self.mesh.num_nodes)
+        old_garbage = os.environ.get("MAGNUM_DEMAG_GARBAGE")
+        os.environ["MAGNUM_DEMAG_GARBAGE"] = "1"
+        try:
+            result = self.search()
+        finally:
+            if old_garbage is None:
+                del os.environ["MAGNUM_DEMAG_GARBAGE"]
+            else:
+                os.environ["MAGNUM_DEMAG_GARBAGE"] = old_garbage
+
+        logger.info("Stray field autotuning: %s" % self.describe(*result))
+        self.store(key, result)
+        return result
+
+    def search(self):
+        nx, ny, nz = self.mesh.num_nodes
+        tune_threads = self.tuneThreads()
+
+        candidates = []  # (time, use_fft, padding)
+        if nx * ny * nz <= self.SIMPLE_MAX_CELLS and not cfg.isCudaEnabled():
+            candidates.append((self.trial(False, magneto.PADDING_ROUND_4), False, magneto.PADDING_ROUND_4))
+        for padding in self.PADDINGS:
+            candidates.append((self.trial(True, padding), True, padding))
+        best_time, use_fft, padding = min(candidates)
+
+        num_threads = None
+        if use_fft and tune_threads:
+            thread_times = []
+            for n in self.threadCandidates():
+                cfg.setFFTWThreads(n, fixed=False)
+                thread_times.append((self.trial(True, padding), n))
+            best_time, num_threads = min(thread_times)
+
+        return use_fft, padding, num_threads
+
+    def trial(self, use_fft, padding):
+        nx, ny, nz = self.mesh.num_nodes
+        dx, dy, dz = self.mesh.delta
+        peri, peri_repeat = self.mesh.periodic_bc
+        peri_x, peri_y, peri_z = (s in peri for s in ("x", "y", "z"))
+
+        N = magneto.GenerateDemagTensor(nx, ny, nz, dx, dy, dz, peri_x, peri_y, peri_z, peri_repeat, padding, cfg.global_cache_directory)
+        N.fill(1.0)
+        if use_fft:
+            conv = magneto.SymmetricMatrixVectorConvolution_FFT(N, nx, ny, nz)
+            if self.precision == "single" and not cfg.isCudaEnabled():
+                conv.enableSinglePrecision()
+        else:
+            conv = magneto.SymmetricMatrixVectorConvolution_Simple(N, nx, ny, nz)
+
+        M = magneto.VectorMatrix(magneto.Shape(nx, ny, nz)); M.randomize()
+        H = magneto.VectorMatrix(magneto.Shape(nx, ny, nz))
+
+        conv.execute(M, H)  # warm-up
+        if cfg.isCudaEnabled(): magneto.cudaSync()
+
+        num_runs, t0 = 0, time.time()
+        while num_runs < 3 or time.time() - t0 < self.TRIAL_TIME:
+            conv.execute(M, H)
+            if cfg.isCudaEnabled(): magneto.cudaSync()
+            num_runs += 1
+        t = (time.time() - t0) / num_runs
+
+        logger.debug("  %s: %.3f ms" % (self.describe(use_fft, padding, cfg.getFFTWThreads()), t * 1000.0))
+        return t
+
+    def tuneThreads(self):
+        # Don't override an explicit thread count (-t).
+        return cfg.haveFFTWThreads() and not cfg.isCudaEnabled() and not cfg.isFFTWThreadsFixed()
+
+    def threadCandidates(self):
+        num_cpus = tools.cpu_count()
+        candidates, n = [], 1
+        while n < num_cpus:
+            candidates.append(n)
+            n *= 2
+        candidates.append(num_cpus)
+        return candidates
+
+    def describe(self, use_fft, padding, num_threads):
+        if not use_fft:
+            return "simple convolution"
+        names = {
+            magneto.PADDING_ROUND_2: "round_2",
+            magneto.PADDING_ROUND_4: "round_4",
+            magneto.PADDING_ROUND_8: "round_8",
+            magneto.PADDING_ROUND_POT: "round_pot",
+            magneto.PADDING_SMALL_PRIME_FACTORS: "small_prime_factors",
+        }
+        desc = "FFT convolution, padding %s" % names.get(padding, padding)
+        if num_threads:
+            desc += ", %s FFTW threads" % num_threads
+        return desc
+
+    def key(self):
+        # Everything that affects the timings, except the machine (the cache file is per host).
+        nx, ny, nz = self.mesh.num_nodes
+        peri, peri_repeat = self.mesh.periodic_bc
+        if cfg.isCuda64Enabled():
+            hw = "cuda64"
+        elif cfg.isCudaEnabled():
+            hw = "cuda32"
+        else:
+            hw = "cpu"
+        threads = "threads=auto" if self.tuneThreads() else "threads=%s" % cfg.getFFTWThreads()
+        return "%sx%sx%s-pbc=%s,%s-%s-%s-%s-%s" % (nx, ny, nz, peri or "none", peri_repeat, hw, self.precision, cfg.getFFTWPlanner(), threads)
+
+    def cachePath(self):
+        return os.path.join(cfg.cache_directory, self.CACHE_FILE)
+
+    def load(self, key):
+        # One line per entry: <key> <use_fft> <padding> <num_threads>; later entries win.
+        result = None
+        try:
+            with open(self.cachePath(), "r") as f:
+                for line in f:
+                    fields = line.split()
+                    if len(fields) == 4 and fields[0] == key:
+                        use_fft, padding, num_threads = int(fields[1]), int(fields[2]), int(fields[3])
+                        result = (bool(use_fft), padding, num_threads or None)
+        except (IOError, ValueError):
+            pass
+        return result
+
+    def store(self, key, result):
+        use_fft, padding, num_threads = result
+        try:
+            with open(self.cachePath(), "a") as f:
+                f.write("%s %d %d %d\n" % (key, int(use_fft), padding, num_threads or 0))
+        except IOError:
+            logger.warn("Could not write stray field autotuning result to %s" % self.cachePath())
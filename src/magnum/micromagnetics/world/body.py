@@ -27,11 +27,15 @@ class Body(object):
     volume.
     """
 
-    def __init__(self, id, material, shape=None):
+    def __init__(self, id, material, shape=None, frozen=False):
         """
         Create a body object with an ID, a material, and a shape. If no
         shape is given, the Everywhere shape, which encompasses the whole
         simulation volume, is used as a default.
+
+        The magnetization of a frozen body (frozen=True) does not evolve in
+        time, e.g. the pinned layer of a spin valve. Its stray field is
+        computed only once.
         """
 
         assert isinstance(id, str)
@@ -39,10 +43,13 @@ class Body(object):
         self.__id       = id
         self.__material = material
         self.__shape    = shape or Everywhere()
+        self.__frozen   = frozen
 
     material = property(lambda self: self.__material)
     shape    = property(lambda self: self.__shape)
     id       = property(lambda self: self.__id)
+    frozen   = property(lambda self: self.__frozen)
 
     def __repr__(self):
-        return "Body(" + repr(self.id) + ", " + repr(self.material) + ", " + repr(self.shape) + ")"
+        frozen = ", frozen=True" if self.frozen else ""
+        return "Body(" + repr(self.id) + ", " + repr(self.material) + ", " + repr(self.shape) + frozen + ")"
@@ -52,6 +52,9 @@ class Module(object):
     def on_param_update(self, id):
         pass
 
+    def on_var_update(self, id):
+        pass
+
     # Methods that have to be implemented:
 
     def initialize(self, system):
@@ -51,7 +51,9 @@ class System(object):
 
     def update(self, state, id, value):
         mod = self.updaters[id]
-        return mod.update(state, id, value)
+        result = mod.update(state, id, value)
+        for mod in self.modules: mod.on_var_update(id)  # notify modules
+        return result
 
     def get_param(self, id):
         mod = self.param_handlers[id]
@@ -126,7 +128,7 @@ class System(object):
             upd_mod = self.updaters.get(var, None)
             if upd_mod:
                 def setter(state, value):
-                    upd_mod.update(state, var, value)
+                    self.update(state, var, value)
             else:
                 def setter(state, value):
                     raise KeyError("Model variable '%s' is not changeable." % var)
@@ -79,6 +79,9 @@ class Solver(object):
     ### The solver loop ##############################################################
 
     def step_with_t_max(self, t_max):
+        if self.__evolver.dense_output:
+            return self.__step_with_dense_output(t_max)
+
         # I. Get "smallest time of interest in the future" from the step handlers
         t0 = self.__state.t
         t1 = min(filter(lambda t: t is not None and t > t0, [t_max] + [c.get_time_of_interest(self.__state) for s, c in self.__step_handlers]))
@@ -89,6 +92,31 @@ class Solver(object):
         # III. Call step handlers
         self.__call_step_handlers()
 
+    def __step_with_dense_output(self, t_max):
+        # I. Get the times of interest of the step handlers
+        t0 = self.__state.t
+        pending = [(c.get_time_of_interest(self.__state), s, c) for s, c in self.__step_handlers]
+
+        # II. Do step from t0 to up to t_max (the step handlers don't limit the step size).
+        self.__state = self.__evolver.evolve(self.__state, t_max)
+        t1 = self.__state.t
+
+        # III. Call step handlers at their times of interest within the step
+        #      with interpolated states, in chronological order...
+        while True:
+            times = [t for t, s, c in pending if t is not None and t0 < t < t1]
+            if not times: break
+            t0 = t = min(times)
+            state = self.__evolver.interpolate(self.__state, t)
+            for i, (t_s, s, c) in enumerate(pending):
+                if t_s == t:
+                    if c.check(state): s.handle(state)
+                    pending[i] = (c.get_time_of_interest(state), s, c)
+            state.flush_cache()
+
+        # ...and at the end of the step.
+        self.__call_step_handlers()
+
     def step(self):
         self.step_with_t_max(1e100)
 
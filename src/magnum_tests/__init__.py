@@ -36,7 +36,9 @@ from magnum_tests.vector_field_test import *
 
 from magnum_tests.exchange_test import *
 from magnum_tests.stray_field_test import *
+from magnum_tests.demag_tensor_test import *
 from magnum_tests.anisotropy_test import *
 from magnum_tests.llge_test import *
+from magnum_tests.runge_kutta_test import *
 from magnum_tests.spintorque_test import *
 from magnum_tests.external_field_test import *
@@ -37,5 +37,9 @@ class BodyTest(unittest.TestCase):
         body2 = Body("body2", Material.Py())
         self.assertTrue(isinstance(body2.shape, Everywhere))
 
+    def test_frozen(self):
+        self.assertFalse(Body("body3", Material.Py()).frozen)
+        self.assertTrue(Body("body4", Material.Py(), frozen=True).frozen)
+
 if __name__ == '__main__':
     unittest.main()
@@ -39,7 +39,7 @@ class CvodeTest(unittest.TestCase):
         self.solver.state.M = state0
         self.solver.state.alpha = 0.5
         self.llg = LlgDiffEq(self.solver.state)
-        self.cv = m.Cvode(self.llg)
+        self.cv = m.Cvode(self.llg, 1e-3, 1e-4, False)
             
     def test_getY(self):
         self.assertEqual(self.llg.getY(), self.solver.state.y)
@@ -55,7 +55,42 @@ class CvodeTest(unittest.TestCase):
         self.llg.printVectorMatrix(ydot2)
         # TODO equal test
         #self.assertEqual(ydot, ydot2)
-        
+
+    def test_newton_linear_solvers(self):
+        world = World(RectangularMesh((16, 16, 1), (2e-9, 2e-9, 2e-9)), Body("all", Material.Py(alpha=0.1)))
+        M = {}
+        for evolver, kwargs in (("rkf45", {}),
+                                ("cvode", {"newton_method": True, "linear_solver": "spgmr"}),
+                                ("cvode", {"newton_method": True, "linear_solver": "spbcg", "preconditioner": True})):
+            solver = create_solver(world, [StrayField, ExchangeField], evolver=evolver, eps_abs=1e-4, eps_rel=1e-5, **kwargs)
+            solver.state.M = (8e5, 4e5, 2e5)
+            solver.solve(condition.Time(5e-12))
+            M[kwargs.get("linear_solver", evolver)] = solver.state.M
+
+        for key in ("spgmr", "spbcg"):
+            for x, y in itertools.product(range(16), range(16)):
+                for a, b in zip(M["rkf45"].get(x, y, 0), M[key].get(x, y, 0)):
+                    self.assertAlmostEqual(a / 8e5, b / 8e5, places=2)
+
+    def test_native_rhs(self):
+        world = World(RectangularMesh((16, 16, 1), (5e-9, 5e-9, 3e-9)), Body("all", Material.Py(alpha=0.5)))
+        M = {}
+        for native_rhs in (False, True):
+            solver = create_solver(world, [StrayField, ExchangeField, AnisotropyField], evolver="cvode", native_rhs=native_rhs)
+            solver.state.M = (8e5, 4e5, 2e5)
+            solver.solve(condition.Time(1e-12))
+            self.assertEqual(isinstance(solver.evolver.llg, NativeLlgDiffEq), native_rhs)
+
+            # the native right-hand side follows parameter changes
+            solver.state.alpha = 0.02
+            solver.state.k_uniaxial = 1e5
+            solver.state.axis1 = (0, 0, 1)
+            solver.solve(condition.Time(2e-12))
+            M[native_rhs] = solver.state.M
+
+        for x, y in itertools.product(range(16), range(16)):
+            for a, b in zip(M[False].get(x, y, 0), M[True].get(x, y, 0)):
+                self.assertAlmostEqual(a / 8e5, b / 8e5, places=6)
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,105 @@
+#!/usr/bin/python
+
+# Copyright 2012-2014 by the MicroMagnum Team
+# Copyright 2014 by the magnum.fd Team
+#
+# This file is part of magnum.fd.
+# magnum.fd is based heavily on MicroMagnum.
+# (https://github.com/MicroMagnum/MicroMagnum)
+#
+# magnum.fd is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# magnum.fd is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+
+import unittest
+
+import magnum.magneto as magneto
+from magnum.config import cfg
+from magnum import RectangularMesh, VectorField
+from magnum_tests.helpers import MyTestCase
+
+
+class DemagTensorTest(MyTestCase):
+
+    def generate(self, num_threads, nn=(12, 10, 3), pbc=(False, False, False), pbc_repeat=1, asymptotic_radius=0.0, lattice_sum=False):
+        return magneto.GenerateDemagTensor(
+            nn[0], nn[1], nn[2],
+            5e-9, 5e-9, 3e-9,
+            pbc[0], pbc[1], pbc[2], pbc_repeat,
+            magneto.PADDING_ROUND_4,
+            cfg.global_cache_directory,
+            num_threads,
+            asymptotic_radius,
+            lattice_sum
+        )
+
+    def assertSameTensor(self, N1, N2):
+        self.assertEqual(N1.shape, N2.shape)
+        self.assertEqual(str(N1.toByteArray()), str(N2.toByteArray()))
+
+    def test_parallel_generation_is_bit_identical(self):
+        N1 = self.generate(1)
+        for num_threads in (2, 3, 8):
+            self.assertSameTensor(N1, self.generate(num_threads))
+
+    def test_parallel_generation_is_bit_identical_with_pbc(self):
+        N1 = self.generate(1, (6, 5, 2), (True, True, False), 3)
+        N4 = self.generate(4, (6, 5, 2), (True, True, False), 3)
+        self.assertSameTensor(N1, N4)
+
+    def assertTensorAlmostEqual(self, N_ref, N, rel_epsilon):
+        max_ref = max(abs(N_ref.get(i)) for i in range(N_ref.size()))
+        max_err = max(abs(N_ref.get(i) - N.get(i)) for i in range(N_ref.size()))
+        self.assertTrue(max_err < rel_epsilon * max_ref)
+
+    def test_asymptotic_expansion_matches_exact_tensor(self):
+        nn = (40, 24, 2)
+        N_exact = self.generate(1, nn)
+        for radius in (4.0, 8.0):
+            self.assertTensorAlmostEqual(N_exact, self.generate(1, nn, asymptotic_radius=radius), 1e-7)
+
+    def test_asymptotic_expansion_matches_exact_tensor_with_pbc(self):
+        nn = (10, 8, 1)
+        N_exact = self.generate(1, nn, (True, True, False), 5)
+        N_asymp = self.generate(1, nn, (True, True, False), 5, asymptotic_radius=6.0)
+        self.assertTensorAlmostEqual(N_exact, N_asymp, 1e-7)
+
+    def test_lattice_sum_matches_default_mode_with_2d_pbc(self):
+        nn = (10, 8, 1)
+        N_default = self.generate(1, nn, (True, True, False), 20)
+        N_lattice = self.generate(1, nn, (True, True, False), 20, lattice_sum=True)
+        self.assertTensorAlmostEqual(N_default, N_lattice, 1e-9)
+
+    def test_lattice_sum_converges_with_3d_pbc(self):
+        nn = (6, 6, 4)
+        N_ref = self.generate(1, nn, (True, True, True), 6, lattice_sum=True)
+        self.assertTensorAlmostEqual(N_ref, self.generate(1, nn, (True, True, True), 2, lattice_sum=True), 1e-3)
+
+    def test_generate_convolution(self):
+        for nn in ((16, 12, 1), (8, 6, 4)):
+            mesh = RectangularMesh(nn, (5e-9, 5e-9, 3e-9))
+            M = VectorField(mesh)
+            M.randomize()
+            M.scale(8e5)
+
+            N = self.generate(1, nn)
+            conv1 = magneto.SymmetricMatrixVectorConvolution_FFT(N, nn[0], nn[1], nn[2])
+            conv2 = magneto.GenerateDemagTensorConvolution(
+                nn[0], nn[1], nn[2], 5e-9, 5e-9, 3e-9, False, False, False, 1,
+                magneto.PADDING_ROUND_4, cfg.global_cache_directory
+            )
+
+            H1, H2 = VectorField(mesh), VectorField(mesh)
+            conv1.execute(M, H1)
+            conv2.execute(M, H2)
+            self.assertVectorFieldEqual(H1, H2, 1e-6)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+#!/usr/bin/python
+
+# Copyright 2012-2014 by the MicroMagnum Team
+# Copyright 2014 by the magnum.fd Team
+#
+# This file is part of magnum.fd.
+# magnum.fd is based heavily on MicroMagnum.
+# (https://github.com/MicroMagnum/MicroMagnum)
+#
+# magnum.fd is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# magnum.fd is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with magnum.fd. If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+
+from magnum import (
+    World, Body, Material, RectangularMesh, VectorField, StrayField, ExchangeField,
+    create_solver, StepHandler, EveryNthSecond, TimeGreaterEq
+)
+from magnum.mesh.field_pool import field_pool, FieldPool
+from magnum_tests.helpers import MyTestCase
+
+
+class Recorder(StepHandler):
+    def __init__(self):
+        self.t, self.M = [], []
+
+    def handle(self, state):
+        M = VectorField(state.mesh); M.assign(state.M)
+        self.t.append(state.t)
+        self.M.append(M)
+
+
+class RungeKuttaTest(MyTestCase):
+
+    def run_solver(self, evolver, dense_output):
+        world = World(RectangularMesh((8, 8, 1), (5e-9, 5e-9, 3e-9)), Body("all", Material.Py(alpha=0.02)))
+        solver = create_solver(world, [StrayField, ExchangeField], evolver=evolver, dense_output=dense_output, eps_abs=1e-4, eps_rel=1e-5)
+        solver.state.M = (8e5, 4e5, 2e5)
+
+        rec = Recorder()
+        solver.addStepHandler(rec, EveryNthSecond(2e-13))
+        solver.solve(TimeGreaterEq(5e-12))
+        return rec, solver.state.step
+
+    def test_dense_output_matches_truncated_steps(self):
+        for evolver in ("rk23", "rkf45", "dp54"):
+            rec0, num_steps0 = self.run_solver(evolver, False)
+            rec1, num_steps1 = self.run_solver(evolver, True)
+
+            self.assertTrue(num_steps1 < num_steps0)
+            self.assertEqual(len(rec0.t), len(rec1.t))
+            for t0, t1, M0, M1 in zip(rec0.t, rec1.t, rec0.M, rec1.M):
+                self.assertAlmostEqual(t0 / 1e-12, t1 / 1e-12)
+                self.assertVectorFieldEqual(M0, M1, 1e2)
+
+    def test_steps_dont_allocate_fields(self):
+        world = World(RectangularMesh((8, 8, 2), (5e-9, 5e-9, 3e-9)), Body("all", Material.Py(alpha=0.02)))
+        for evolver in ("rkf45", "dp54"):
+            solver = create_solver(world, [StrayField, ExchangeField], evolver=evolver)
+            solver.state.M = (8e5, 4e5, 2e5)
+            for n in range(3): solver.step()
+
+            field_pool.reset_statistics()
+            for n in range(10): solver.step()
+            self.assertEqual(field_pool.num_allocated, 0)
+            self.assertTrue(field_pool.num_reused > 0)
+
+    def test_field_pool_is_bounded(self):
+        pool = FieldPool()
+        mesh = RectangularMesh((4, 4, 1), (5e-9, 5e-9, 3e-9))
+
+        # fields that are still in use elsewhere don't pile up in the free list
+        in_use = [pool.vector_field(mesh) for n in range(3 * FieldPool.MAX_FREE)]
+        for field in in_use: pool.release(field)
+        self.assertTrue(len(pool) <= FieldPool.MAX_FREE)
+
+        # only the free lists of the most recently used meshes are kept
+        for n in range(FieldPool.MAX_KEYS + 4):
+            pool.release(pool.vector_field(RectangularMesh((4, 4, n + 1), (5e-9, 5e-9, 3e-9))))
+        self.assertEqual(len(pool), FieldPool.MAX_KEYS)
+
+    def test_step_size_controllers(self):
+        world = World(RectangularMesh((8, 8, 1), (5e-9, 5e-9, 3e-9)), Body("all", Material.Py(alpha=0.02)))
+        M = {}
+        for controller in ("i", "pi", "pid"):
+            solver = create_solver(world, [StrayField, ExchangeField], evolver="rkf45", controller=controller)
+            solver.state.M = (8e5, 4e5, 2e5)
+            solver.solve(TimeGreaterEq(5e-12))
+            M[controller] = solver.state.M
+
+            stats = solver.evolver.statistics()
+            self.assertEqual(stats['accepted_steps'], solver.state.step)
+            self.assertEqual(stats['rhs_evaluations'], 6 * stats['accepted_steps'] + 5 * stats['rejected_steps'])
+
+        self.assertVectorFieldEqual(M["i"], M["pi"], 1e2)
+        self.assertVectorFieldEqual(M["i"], M["pid"], 1e2)
+
+    def test_imex_matches_rkf45_on_fine_mesh(self):
+        # 1nm cells: the exchange term limits the explicit step size
+        world = World(RectangularMesh((16, 16, 1), (1e-9, 1e-9, 1e-9)), Body("all", Material.Py(alpha=0.1)))
+        M, num_steps = {}, {}
+        for evolver in ("rkf45", "imex"):
+            solver = create_solver(world, [StrayField, ExchangeField], evolver=evolver, eps_abs=1e-4, eps_rel=1e-5)
+            solver.state.M = (8e5, 4e5, 2e5)
+            solver.solve(TimeGreaterEq(2e-12))
+            M[evolver], num_steps[evolver] = solver.state.M, solver.state.step
+
+        self.assertTrue(num_steps["imex"] < num_steps["rkf45"])
+        self.assertVectorFieldEqual(M["rkf45"], M["imex"], 1e3)
+
+        stats = solver.evolver.statistics()
+        self.assertEqual(stats['accepted_steps'], num_steps["imex"])
+        self.assertTrue(stats['linear_iterations'] > 0)
+
+if __name__ == '__main__':
+    unittest.main()
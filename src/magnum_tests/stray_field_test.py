@@ -22,7 +22,12 @@
 
 import unittest
 
-from magnum import readOMF, RectangularMesh, VectorField, StrayFieldCalculator
+from magnum import (
+    readOMF, RectangularMesh, Field, VectorField, StrayFieldCalculator,
+    World, Body, Material, Cuboid, StrayField, create_solver
+)
+from magnum.config import cfg
+from magnum.micromagnetics.stray_field_calculator import crop_box, crop_mesh, cropped_convolution, ConvolutionCache
 from magnum_tests.helpers import (
     MyTestCase, right_rotate_vector_field, left_rotate_vector_field
 )
@@ -78,5 +83,184 @@ class StrayFieldTest(MyTestCase):
         self.assertVectorFieldEqual(H0, H1, 1e0)
         self.assertVectorFieldEqual(H0, H2, 1e0)
 
+    def test_layered_method_matches_tensor_method(self):
+        mesh = RectangularMesh((24, 16, 3), (5e-9, 5e-9, 3e-9))
+
+        M = VectorField(mesh)
+        M.randomize()
+        M.scale(8e5)
+
+        H_tensor = VectorField(mesh)
+        H_layered = VectorField(mesh)
+        StrayFieldCalculator(mesh, "tensor").calculate(M, H_tensor)
+        StrayFieldCalculator(mesh, "layered").calculate(M, H_layered)
+
+        self.assertVectorFieldEqual(H_tensor, H_layered, 1e-3)
+
+    def test_fmm_method_matches_tensor_method(self):
+        # sparse geometry: an array of 4x4 small discs
+        mesh = RectangularMesh((40, 40, 2), (5e-9, 5e-9, 5e-9))
+
+        M = VectorField(mesh)
+        M.randomize()
+        M.scale(8e5)
+        for x in range(40):
+            for y in range(40):
+                dx, dy = x % 10 - 4.5, y % 10 - 4.5
+                if dx*dx + dy*dy > 3.5**2:
+                    for z in range(2):
+                        M.set(x, y, z, (0.0, 0.0, 0.0))
+
+        H_tensor = VectorField(mesh)
+        H_fmm = VectorField(mesh)
+        StrayFieldCalculator(mesh, "tensor").calculate(M, H_tensor)
+        StrayFieldCalculator(mesh, "fmm").calculate(M, H_fmm)
+
+        # the fmm only computes the field in the magnetic cells
+        for x in range(40):
+            for y in range(40):
+                for z in range(2):
+                    if M.get(x, y, z) == (0.0, 0.0, 0.0):
+                        H_tensor.set(x, y, z, (0.0, 0.0, 0.0))
+
+        self.assertVectorFieldEqual(H_tensor, H_fmm, 1e1)
+
+    def test_fmm_method_standard_problem(self):
+        M = readOMF("ref/M1.omf")
+        H_ref = readOMF("ref/H1_stray.omf")
+        H = VectorField(M.mesh)
+        StrayFieldCalculator(M.mesh, "fmm", fmm_tolerance=1e-3).calculate(M, H)
+        self.assertVectorFieldEqual(H_ref, H, 1e0)
+
+    def test_cropped_calculation_matches_full_mesh(self):
+        # magnetic cells 5..20, 3..14, 1..2 inside a vacuum border
+        mesh = RectangularMesh((30, 20, 4), (5e-9, 5e-9, 5e-9))
+        Ms = Field(mesh); Ms.fill(0.0)
+        M = VectorField(mesh); M.fill((0.0, 0.0, 0.0))
+        for x in range(5, 21):
+            for y in range(3, 15):
+                for z in range(1, 3):
+                    Ms.set(x, y, z, 8e5)
+                    M.set(x, y, z, (8e5 * ((x+y) % 3 - 1), 4e5, 8e5 * (z % 2)))
+
+        box = crop_box(mesh, Ms)
+        self.assertEqual(box, (5, 3, 1, 21, 15, 3))
+
+        H_full = VectorField(mesh)
+        H_crop = VectorField(mesh); H_crop.fill((1.0, 2.0, 3.0))
+        StrayFieldCalculator(mesh).calculate(M, H_full)
+        cropped_convolution(StrayFieldCalculator(crop_mesh(mesh, box)).calculate, box)(M, H_crop)
+
+        # the cropped calculation only computes the field in the box
+        for x in range(30):
+            for y in range(20):
+                for z in range(4):
+                    if Ms.get(x, y, z) == 0.0:
+                        H_full.set(x, y, z, (0.0, 0.0, 0.0))
+
+        self.assertVectorFieldEqual(H_full, H_crop, 1e-3)
+
+    def test_crop_box_keeps_periodic_axes(self):
+        mesh = RectangularMesh((10, 10, 2), (5e-9, 5e-9, 5e-9), "x")
+        Ms = Field(mesh); Ms.fill(0.0)
+        Ms.set(2, 3, 0, 8e5)
+        Ms.set(6, 7, 0, 8e5)
+        self.assertEqual(crop_box(mesh, Ms), (0, 3, 0, 10, 8, 1))
+
+        Ms.fill(8e5)
+        self.assertEqual(crop_box(mesh, Ms), None)
+
+    def test_frozen_body(self):
+        mesh = RectangularMesh((20, 20, 4), (5e-9, 5e-9, 3e-9))
+
+        def make_solver(frozen):
+            world = World(mesh,
+                Body("pinned", Material.Py(), Cuboid((0, 0, 0), (100e-9, 100e-9, 6e-9)), frozen=frozen),
+                Body("free", Material.Py(), Cuboid((0, 0, 6e-9), (100e-9, 100e-9, 12e-9)))
+            )
+            solver = create_solver(world, [StrayField])
+            solver.state["pinned"].M = (8e5, 0, 0)
+            solver.state["free"].M = (0, 8e5, 0)
+            return solver
+
+        solver, solver_frozen = make_solver(False), make_solver(True)
+
+        # the static and the dynamic contribution add up to the full stray field
+        self.assertVectorFieldEqual(solver.state.H_stray, solver_frozen.state.H_stray, 1e-3)
+        self.assertAlmostEqual(solver.state.E_stray / solver_frozen.state.E_stray, 1.0, places=6)
+
+        # the magnetization of the frozen body does not evolve
+        M0 = VectorField(mesh); M0.assign(solver_frozen.state.M)
+        for n in range(10):
+            solver_frozen.step()
+        M1 = solver_frozen.state.M
+        for x in range(20):
+            for y in range(20):
+                self.assertEqual(M0.get(x, y, 0), M1.get(x, y, 0))
+                self.assertEqual(M0.get(x, y, 1), M1.get(x, y, 1))
+        self.assertNotEqual(M0.get(10, 10, 3), M1.get(10, 10, 3))
+
+    def test_later_body_overrides_frozen(self):
+        mesh = RectangularMesh((10, 10, 2), (5e-9, 5e-9, 3e-9))
+        world = World(mesh,
+            Body("all", Material.Py(), frozen=True),
+            Body("free", Material.Py(), Cuboid((0, 0, 3e-9), (50e-9, 50e-9, 6e-9)))
+        )
+        solver = create_solver(world, [StrayField])
+        solver.state.M = (8e5, 0, 4e5)
+        M0 = VectorField(mesh); M0.assign(solver.state.M)
+        solver.step()
+        self.assertEqual(M0.get(5, 5, 0), solver.state.M.get(5, 5, 0))
+        self.assertNotEqual(M0.get(5, 5, 1), solver.state.M.get(5, 5, 1))
+
+    def test_calculate_many_matches_calculate(self):
+        for nn in ((16, 12, 1), (8, 6, 4), (20, 3, 1)):
+            mesh = RectangularMesh(nn, (5e-9, 5e-9, 3e-9))
+            stray = StrayFieldCalculator(mesh)
+
+            M_list = []
+            for k in range(3):
+                M = VectorField(mesh); M.randomize(); M.scale(8e5)
+                M_list.append(M)
+            H_list = [VectorField(mesh) for k in range(3)]
+            stray.calculate_many(M_list, H_list)
+
+            for M, H in zip(M_list, H_list):
+                H_ref = VectorField(mesh)
+                stray.calculate(M, H_ref)
+                self.assertVectorFieldEqual(H_ref, H, 1e-6)
+
+    def test_calculators_on_same_mesh_share_convolution(self):
+        mesh = RectangularMesh((16, 12, 2), (5e-9, 5e-9, 3e-9))
+        stray1 = StrayFieldCalculator(mesh)
+        stray2 = StrayFieldCalculator(RectangularMesh((16, 12, 2), (5e-9, 5e-9, 3e-9)))
+        stray3 = StrayFieldCalculator(RectangularMesh((16, 12, 2), (5e-9, 5e-9, 3e-9), "x"))
+        self.assertTrue(stray1.calc is stray2.calc)
+        self.assertFalse(stray1.calc is stray3.calc)
+
+        M = VectorField(mesh); M.randomize(); M.scale(8e5)
+        H1, H2 = VectorField(mesh), VectorField(mesh)
+        stray1.calculate(M, H1)
+        stray2.calculate(M, H2)
+        self.assertVectorFieldEqual(H1, H2, 0.0)
+
+    def test_convolution_cache_evicts_least_recently_used(self):
+        old_size = cfg.getConvolutionCacheSize()
+        cfg.setConvolutionCacheSize(100)
+        try:
+            cache = ConvolutionCache()
+            cache.put("a", "conv_a", 40)
+            cache.put("b", "conv_b", 40)
+            self.assertEqual(cache.get("a"), "conv_a")
+            cache.put("c", "conv_c", 40)  # evicts b
+            self.assertEqual(cache.get("b"), None)
+            self.assertEqual(cache.get("a"), "conv_a")
+            self.assertEqual(cache.get("c"), "conv_c")
+            cache.put("d", "conv_d", 200)  # too large
+            self.assertEqual(cache.get("d"), None)
+            self.assertEqual(len(cache), 2)
+        finally:
+            cfg.setConvolutionCacheSize(old_size)
+
 if __name__ == '__main__':
     unittest.main()